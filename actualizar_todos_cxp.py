@@ -7,6 +7,8 @@ import pandas as pd
 from supabase import create_client
 import config
 import re
+from modulos.lotes_bd import escribir_por_id, aviso_por_fila
+from modulos.consultas import paginar_por_id
 
 st.set_page_config(page_title="🔄 Actualizar TODOS CXP", layout="wide")
 
@@ -99,19 +101,11 @@ if uploaded_file:
     
     for account in cxp_accounts:
         st.write(f"Obteniendo {account}...")
-        page = 0
-        while True:
-            offset = page * 1000
-            result = supabase.table('consolidated_orders').select(
-                'id, account_name, serial_number, asignacion, order_id, cxp_amt_due'
-            ).eq('account_name', account).range(offset, offset + 999).execute()
-            
-            if not result.data:
-                break
-            all_records.extend(result.data)
-            if len(result.data) < 1000:
-                break
-            page += 1
+        for page in paginar_por_id(
+            supabase, 'id, account_name, serial_number, asignacion, order_id, cxp_amt_due',
+            cuentas=account, anticipar=True
+        ):
+            all_records.extend(page)
         
         st.write(f"✅ {account}: {len([r for r in all_records if r['account_name'] == account])} registros")
     
@@ -263,36 +257,35 @@ if uploaded_file:
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        total_updated = 0
+        # Solo las columnas a actualizar; sin valores None
+        payloads = []
         errors = 0
-        
-        for i, update in enumerate(updates_to_perform):
-            try:
-                update_copy = update.copy()
-                db_id = update_copy.pop('id')
-                update_copy.pop('match_type', None)
-                update_copy.pop('old_amt', None)
-                
-                # Limpiar valores None
-                clean_update = {k: v for k, v in update_copy.items() if v is not None}
-                
-                if clean_update:
-                    result = supabase.table('consolidated_orders').update(clean_update).eq('id', db_id).execute()
-                    if result.data:
-                        total_updated += 1
-                else:
-                    errors += 1
-                    
-            except Exception as e:
+        for update in updates_to_perform:
+            clean_update = {k: v for k, v in update.items()
+                            if k not in ('id', 'match_type', 'old_amt') and v is not None}
+            if clean_update:
+                payloads.append({'id': update['id'], **clean_update})
+            else:
                 errors += 1
+        
+        def on_batch_done(result, done, total):
+            progress_bar.progress(done / total)
+            status_text.text(f"Procesando... {done} de {total} registros")
+        
+        # Un upsert por lote de 50 registros
+        batch_results = escribir_por_id(supabase, payloads, al_terminar_lote=on_batch_done)
+        
+        total_updated = sum(result['actualizados'] for result in batch_results)
+        for result in batch_results:
+            failed = result['registros'] - result['actualizados']
+            if failed > 0:
+                errors += failed
                 if errors <= 5:
-                    st.error(f"Error: {str(e)[:100]}")
-            
-            if i % 100 == 0:
-                progress_bar.progress(i / len(updates_to_perform))
-                status_text.text(f"Procesando... {total_updated} actualizados, {errors} errores")
+                    st.error(f"Error: {(result['error'] or 'respuesta vacía')[:100]}")
         
         progress_bar.progress(1.0)
+        if aviso_por_fila(batch_results):
+            st.warning(aviso_por_fila(batch_results))
         
         st.success(f"✅ COMPLETADO: {total_updated} registros actualizados")
         if errors > 0:
@@ -0,0 +1,87 @@
+"""
+Script para llenar las claves normalizadas en registros existentes
+(order_id_key, prealert_id_key, asignacion_key)
+
+setup_claves_id.sql ya llena las claves existentes con un UPDATE; este script
+es para tablas donde ese UPDATE excede el tiempo del SQL Editor (va por lotes):
+    python backfill_claves_id.py
+    python backfill_claves_id.py --dry-run
+Con el trigger de setup_claves_id.sql activo, la base de datos recalcula las
+claves de cada fila que se escribe; la regla es la misma que aquí.
+"""
+
+import sys
+from supabase import create_client
+import config
+from modulos.consolidacion import CLAVES_ID, claves_id
+
+TAMANO_PAGINA = 1000
+TAMANO_LOTE = 500
+
+
+def backfill_claves(dry_run=False):
+    try:
+        supabase = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
+
+        columnas = ['id', 'order_id', 'prealert_id', 'asignacion'] + list(CLAVES_ID)
+
+        print("=" * 60)
+        print("BACKFILL DE CLAVES NORMALIZADAS" + (" (DRY RUN)" if dry_run else ""))
+        print("=" * 60)
+
+        ultimo_id = None
+        total_leidos = 0
+        total_actualizados = 0
+        total_errores = 0
+
+        while True:
+            # Paginación por id (keyset): cada página continúa después del último id leído
+            query = supabase.table('consolidated_orders').select(', '.join(columnas)).order('id').limit(TAMANO_PAGINA)
+            if ultimo_id is not None:
+                query = query.gt('id', ultimo_id)
+            result = query.execute()
+
+            registros = result.data
+            if not registros:
+                break
+
+            ultimo_id = registros[-1]['id']
+            total_leidos += len(registros)
+
+            cambios = []
+            for registro in registros:
+                claves = claves_id(registro)
+                if any(registro.get(clave) != valor for clave, valor in claves.items()):
+                    # order_id se reenvía sin cambios para que el upsert no viole NOT NULL
+                    cambios.append({'id': registro['id'], 'order_id': registro['order_id'], **claves})
+
+            if cambios and not dry_run:
+                for i in range(0, len(cambios), TAMANO_LOTE):
+                    lote = cambios[i:i + TAMANO_LOTE]
+                    try:
+                        supabase.table('consolidated_orders').upsert(lote, on_conflict='id').execute()
+                        total_actualizados += len(lote)
+                    except Exception as e:
+                        total_errores += len(lote)
+                        print(f"❌ Error en lote desde id {lote[0]['id']}: {str(e)}")
+            elif cambios:
+                total_actualizados += len(cambios)
+
+            print(f"Leídos: {total_leidos:,} | Con claves nuevas: {total_actualizados:,} | Errores: {total_errores:,}")
+
+        print("\n" + "=" * 60)
+        print(f"✅ Backfill completado: {total_actualizados:,} de {total_leidos:,} registros"
+              + (" por actualizar" if dry_run else " actualizados"))
+        if total_errores:
+            print(f"⚠️ {total_errores:,} registros con error (volver a ejecutar para reintentar)")
+
+        return total_errores == 0
+
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    ok = backfill_claves(dry_run='--dry-run' in sys.argv)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1 @@
+# Generador de datos sintéticos y medición de rendimiento
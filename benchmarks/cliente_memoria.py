@@ -0,0 +1,520 @@
+"""
+Cliente Supabase en Memoria (pruebas locales y benchmarks)
+Implementa las consultas que usan el Consolidador y los reportes sobre listas de dicts
+
+Soporta rpc() y table().select(count='exact', head=True).eq().neq().in_().gte().lte()
+.gt().lt().like().ilike().is_().not_.<filtro>().or_() con .order(), .range(),
+.limit() y insert()/upsert()/update()/delete(); upsert acepta on_conflict
+compuesto ('account_name,fecha'). Como PostgREST, un select devuelve a lo
+sumo max_filas filas (1000 por defecto en Supabase) y `count` solo viene
+cuando se pide.
+
+Funciones (rpc): buscar_por_claves de setup_buscar_claves.sql,
+actualizar_por_id de setup_actualizar_por_id.sql, cambiar_versiones de
+setup_versiones_datos.sql y tomar_agregados_pendientes, guardar_agregados y
+devolver_agregados_pendientes de setup_agregados.sql (FUNCIONES). Con
+ClienteMemoria(funciones={}) rpc() falla como PostgREST cuando la función no
+existe (PGRST202), para medir el camino sin la función.
+
+Columnas generadas: como en la base de datos, consolidated_orders.fecha_reporte
+(columna generada) y las claves *_key (trigger de setup_claves_id.sql) se
+calculan en cada insert/upsert/update (COLUMNAS_GENERADAS, con las mismas
+reglas de modulos/consultas.fecha_reporte y clean_id_aggressive).
+
+Triggers: cada escritura en consolidated_orders marca en agregados_pendientes
+la cuenta y fecha de reporte de las filas antes y después del cambio, como el
+trigger de setup_agregados.sql (TRIGGERS).
+
+Latencia: con un ModeloLatencia cada execute() espera
+    latencia + filas transferidas / filas_por_segundo
+y el servidor atiende a lo sumo `conexiones` requests a la vez; el resto
+espera su turno. Así los lotes, la paginación y la concurrencia se pueden
+medir en un portátil con tiempos parecidos a los del proyecto real:
+    cliente = ClienteMemoria({'consolidated_orders': filas}, ModeloLatencia(0.08, 20000))
+    with usar_cliente(cliente):
+        ...  # obtener_cliente() y create_client() devuelven `cliente`
+
+El cliente es seguro entre hilos (modulos/lotes_bd.py ejecuta lotes en paralelo).
+`estadisticas` cuenta requests y filas leídas/escritas.
+"""
+
+import contextlib
+import re
+import threading
+import time
+import types
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from modulos.consolidacion import CLAVES_ID, clean_id_aggressive
+from modulos.consultas import COLUMNA_FECHA_REPORTE, fecha_reporte
+
+# Filas máximas por select en Supabase (PostgREST max-rows)
+MAX_FILAS_SUPABASE = 1000
+
+# Columnas GENERATED ALWAYS ... STORED por tabla: {tabla: {columna: función(fila)}}
+COLUMNAS_GENERADAS = {
+    'consolidated_orders': {
+        COLUMNA_FECHA_REPORTE: fecha_reporte,
+        **{clave: (lambda fila, columna=columna: clean_id_aggressive(fila.get(columna)))
+           for clave, columna in CLAVES_ID.items()},
+    },
+}
+
+
+def _generar(tabla: str, fila: Dict) -> Dict:
+    for columna, calcular in COLUMNAS_GENERADAS.get(tabla, {}).items():
+        fila[columna] = calcular(fila)
+    return fila
+
+
+def _marcar_agregados_pendientes(cliente, filas_viejas: List[Dict], filas_nuevas: List[Dict]):
+    pendientes = cliente.tablas.setdefault('agregados_pendientes', [])
+    marcados = {(fila['account_name'], fila['fecha']) for fila in pendientes}
+    for fila in filas_viejas + filas_nuevas:
+        dia = (fila.get('account_name'), fecha_reporte(fila))
+        if dia[0] and dia[1] and dia not in marcados:
+            marcados.add(dia)
+            pendientes.append({'account_name': dia[0], 'fecha': dia[1]})
+
+
+# Triggers por tabla: función(cliente, filas_viejas, filas_nuevas) después de cada escritura
+TRIGGERS = {
+    'consolidated_orders': _marcar_agregados_pendientes,
+}
+
+
+def _buscar_por_claves(cliente, columna, claves, columnas=('id',), cuentas=None) -> List[Dict]:
+    if columna not in ('order_id_key', 'prealert_id_key', 'asignacion_key'):
+        raise ValueError(f"Columna de clave no permitida: {columna}")
+    claves = set(claves)
+    columna_id = CLAVES_ID[columna]
+    nombres = list(dict.fromkeys(list(columnas or []) + [columna]))
+    # Como en la BD: una fila con la clave vacía se compara por clave_id() de su ID
+    return [{c: fila.get(c) for c in nombres} for fila in cliente.tablas.get('consolidated_orders', [])
+            if (fila.get(columna) if fila.get(columna) is not None else clean_id_aggressive(fila.get(columna_id))) in claves
+            and (cuentas is None or fila.get('account_name') in cuentas)]
+
+
+def _actualizar_por_id(cliente, filas) -> int:
+    tabla = 'consolidated_orders'
+    columnas = {clave for fila in filas for clave in fila if clave != 'id'}
+    # Las claves *_key las recalcula el trigger; la única columna generada es fecha_reporte
+    generadas = columnas & {COLUMNA_FECHA_REPORTE}
+    if generadas:
+        raise ValueError(f"Columnas desconocidas o generadas en consolidated_orders: {sorted(generadas)}")
+    por_id = {fila['id']: fila for fila in filas}
+    viejas, nuevas = [], []
+    for registro in cliente.tablas.get(tabla, []):
+        datos = por_id.get(registro.get('id'))
+        if datos is not None:
+            viejas.append(dict(registro))
+            registro.update(datos)
+            nuevas.append(_generar(tabla, registro))
+    TRIGGERS[tabla](cliente, viejas, nuevas)
+    return len(nuevas)
+
+
+def _cambiar_versiones(cliente, ambitos) -> None:
+    versiones = {fila['ambito']: fila for fila in cliente.tablas.setdefault('versiones_datos', [])}
+    for ambito in dict.fromkeys(a for a in ambitos if a):
+        fila = versiones.get(ambito)
+        if fila is None:
+            fila = {'ambito': ambito}
+            cliente.tablas['versiones_datos'].append(fila)
+        fila.update(version=uuid.uuid4().hex, actualizado=datetime.now().isoformat())
+
+
+def _tomar_agregados_pendientes(cliente, cuentas, desde, hasta) -> List[Dict]:
+    pendientes = cliente.tablas.setdefault('agregados_pendientes', [])
+    tomados = [fila for fila in pendientes
+               if fila['account_name'] in cuentas and desde <= str(fila['fecha'])[:10] <= hasta]
+    pendientes[:] = [fila for fila in pendientes if fila not in tomados]
+    return [{'account_name': fila['account_name'], 'fecha': fila['fecha']} for fila in tomados]
+
+
+def _devolver_agregados_pendientes(cliente, dias) -> None:
+    pendientes = cliente.tablas.setdefault('agregados_pendientes', [])
+    marcados = {(fila['account_name'], str(fila['fecha'])[:10]) for fila in pendientes}
+    for dia in dias:
+        clave = (dia['account_name'], str(dia['fecha'])[:10])
+        if clave not in marcados:
+            marcados.add(clave)
+            pendientes.append({'account_name': clave[0], 'fecha': clave[1]})
+
+
+def _guardar_agregados(cliente, borrar, dias, meses) -> None:
+    diarios = cliente.tablas.setdefault('agregados_diarios', [])
+    diarios[:] = [fila for fila in diarios
+                  if not any(fila['account_name'] == rango['account_name']
+                             and rango['desde'] <= str(fila['fecha'])[:10] <= rango['hasta']
+                             for rango in borrar)]
+    por_dia = {(fila['account_name'], str(fila['fecha'])[:10]): fila for fila in diarios}
+    for dia in dias:
+        fila = por_dia.get((dia['account_name'], str(dia['fecha'])[:10]))
+        if fila is None:
+            fila = {'id': cliente.siguiente_id()}
+            diarios.append(fila)
+        fila.update(dia)
+    calculados = cliente.tablas.setdefault('agregados_meses', [])
+    por_mes = {(fila['account_name'], str(fila['mes'])[:10]): fila for fila in calculados}
+    for mes in meses:
+        fila = por_mes.get((mes['account_name'], str(mes['mes'])[:10]))
+        if fila is None:
+            fila = {}
+            calculados.append(fila)
+        fila.update(mes, actualizado=datetime.now().isoformat())
+
+
+# Funciones de la BD disponibles por rpc(): nombre -> función(cliente, **parámetros)
+FUNCIONES = {
+    'buscar_por_claves': _buscar_por_claves,
+    'actualizar_por_id': _actualizar_por_id,
+    'cambiar_versiones': _cambiar_versiones,
+    'tomar_agregados_pendientes': _tomar_agregados_pendientes,
+    'guardar_agregados': _guardar_agregados,
+    'devolver_agregados_pendientes': _devolver_agregados_pendientes,
+}
+
+
+class ModeloLatencia:
+    """Tiempo de respuesta simulado: latencia fija por request más costo por fila transferida"""
+
+    def __init__(self, latencia: float = 0.05, filas_por_segundo: float = 20000, conexiones: int = 10):
+        self.latencia = latencia
+        self.filas_por_segundo = filas_por_segundo
+        self.conexiones = conexiones
+
+    def duracion(self, filas: int) -> float:
+        return self.latencia + (filas / self.filas_por_segundo if self.filas_por_segundo else 0)
+
+    def __repr__(self):
+        return (f"ModeloLatencia(latencia={self.latencia}, filas_por_segundo={self.filas_por_segundo}, "
+                f"conexiones={self.conexiones})")
+
+
+def _comparable(valor):
+    return '' if valor is None else valor
+
+
+def _patron_like(patron: str, ignorar_mayusculas: bool):
+    # % y * son comodines en PostgREST
+    regex = ''.join('.*' if c in '%*' else ('.' if c == '_' else re.escape(c)) for c in patron)
+    return re.compile(f'^{regex}$', (re.IGNORECASE | re.DOTALL) if ignorar_mayusculas else re.DOTALL)
+
+
+class _Negacion:
+    """query.not_.<filtro>(...) agrega el filtro negado"""
+
+    def __init__(self, consulta):
+        self.consulta = consulta
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self.consulta, nombre)
+
+        def negado(*args, **kwargs):
+            metodo(*args, **kwargs)
+            filtro = self.consulta.filtros.pop()
+            self.consulta.filtros.append(lambda r: not filtro(r))
+            return self.consulta
+
+        return negado
+
+
+class _Consulta:
+    def __init__(self, cliente, tabla: str):
+        self.cliente = cliente
+        self.tabla = tabla
+        self.filtros = []
+        self.columnas = None
+        self.contar = None
+        self.solo_conteo = False
+        self.orden = []
+        self.desde = None
+        self.hasta = None
+        self.limite = None
+        self.operacion = 'select'
+        self.datos = None
+        self.on_conflict = None
+
+    # --- Operaciones ---
+
+    def select(self, columnas: str = '*', count=None, head: bool = False):
+        self.operacion = 'select'
+        self.columnas = None if columnas.strip() == '*' else [c.strip() for c in columnas.split(',')]
+        self.contar = count
+        self.solo_conteo = head
+        return self
+
+    def insert(self, datos):
+        self.operacion = 'insert'
+        self.datos = datos if isinstance(datos, list) else [datos]
+        return self
+
+    def upsert(self, datos, on_conflict: str = 'id', ignore_duplicates: bool = False, **kwargs):
+        self.operacion = 'upsert'
+        self.datos = datos if isinstance(datos, list) else [datos]
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, datos):
+        self.operacion = 'update'
+        self.datos = datos
+        return self
+
+    def delete(self):
+        self.operacion = 'delete'
+        return self
+
+    # --- Filtros ---
+
+    @property
+    def not_(self):
+        return _Negacion(self)
+
+    def eq(self, columna, valor):
+        self.filtros.append(lambda r: r.get(columna) is not None and str(r.get(columna)) == str(valor))
+        return self
+
+    def neq(self, columna, valor):
+        self.filtros.append(lambda r: r.get(columna) is not None and str(r.get(columna)) != str(valor))
+        return self
+
+    def in_(self, columna, valores):
+        conjunto = {str(v) for v in valores}
+        self.filtros.append(lambda r: r.get(columna) is not None and str(r.get(columna)) in conjunto)
+        return self
+
+    def gte(self, columna, valor):
+        self.filtros.append(lambda r: r.get(columna) is not None and r.get(columna) >= valor)
+        return self
+
+    def lte(self, columna, valor):
+        self.filtros.append(lambda r: r.get(columna) is not None and r.get(columna) <= valor)
+        return self
+
+    def gt(self, columna, valor):
+        self.filtros.append(lambda r: r.get(columna) is not None and r.get(columna) > valor)
+        return self
+
+    def lt(self, columna, valor):
+        self.filtros.append(lambda r: r.get(columna) is not None and r.get(columna) < valor)
+        return self
+
+    def like(self, columna, patron):
+        regex = _patron_like(patron, False)
+        self.filtros.append(lambda r: r.get(columna) is not None and bool(regex.match(str(r.get(columna)))))
+        return self
+
+    def ilike(self, columna, patron):
+        regex = _patron_like(patron, True)
+        self.filtros.append(lambda r: r.get(columna) is not None and bool(regex.match(str(r.get(columna)))))
+        return self
+
+    def is_(self, columna, valor):
+        if str(valor).lower() == 'null' or valor is None:
+            self.filtros.append(lambda r: r.get(columna) is None)
+        else:
+            esperado = str(valor).lower() == 'true'
+            self.filtros.append(lambda r: r.get(columna) is esperado)
+        return self
+
+    def or_(self, condiciones: str):
+        # Solo las formas columna.is.null y columna.eq.valor
+        opciones = []
+        for condicion in condiciones.split(','):
+            columna, operador, valor = condicion.split('.', 2)
+            if operador == 'is' and valor == 'null':
+                opciones.append(lambda r, c=columna: r.get(c) is None)
+            else:
+                opciones.append(lambda r, c=columna, v=valor: r.get(c) is not None and str(r.get(c)) == v)
+        self.filtros.append(lambda r: any(opcion(r) for opcion in opciones))
+        return self
+
+    def order(self, columna, desc: bool = False):
+        self.orden.append((columna, desc))
+        return self
+
+    def range(self, desde: int, hasta: int):
+        self.desde, self.hasta = desde, hasta
+        return self
+
+    def limit(self, cantidad: int):
+        self.limite = cantidad
+        return self
+
+    # --- Ejecución ---
+
+    def _disparar(self, filas_viejas: List[Dict], filas_nuevas: List[Dict]):
+        trigger = TRIGGERS.get(self.tabla)
+        if trigger:
+            trigger(self.cliente, filas_viejas, filas_nuevas)
+
+    def _filtrados(self) -> List[Dict]:
+        return [r for r in self.cliente.tablas.setdefault(self.tabla, []) if all(f(r) for f in self.filtros)]
+
+    def execute(self):
+        with self.cliente.candado:
+            respuesta = self._ejecutar()
+        self.cliente.esperar(len(respuesta.data))
+        return respuesta
+
+    def _ejecutar(self):
+        filas = self.cliente.tablas.setdefault(self.tabla, [])
+
+        if self.operacion in ('insert', 'upsert'):
+            # on_conflict puede ser compuesto: 'account_name,fecha'
+            columnas = [c.strip() for c in self.on_conflict.split(',')] if self.operacion == 'upsert' else []
+            clave = lambda r: tuple(str(r.get(c)) for c in columnas)
+            indice = {clave(r): r for r in filas} if columnas else {}
+            resultado, viejas = [], []
+            for dato in self.datos:
+                existente = indice.get(clave(dato)) if columnas else None
+                if existente is not None:
+                    viejas.append(dict(existente))
+                    existente.update(dato)
+                    _generar(self.tabla, existente)
+                    resultado.append(existente)
+                else:
+                    nuevo = _generar(self.tabla, dict(dato))
+                    nuevo.setdefault('id', self.cliente.siguiente_id())
+                    filas.append(nuevo)
+                    if columnas:
+                        indice[clave(nuevo)] = nuevo
+                    resultado.append(nuevo)
+            self._disparar(viejas, resultado)
+            self.cliente.registrar(escritas=len(resultado))
+            return types.SimpleNamespace(data=[dict(r) for r in resultado], count=None)
+
+        seleccion = self._filtrados()
+
+        if self.operacion == 'update':
+            viejas = [dict(fila) for fila in seleccion]
+            for fila in seleccion:
+                fila.update(self.datos)
+                _generar(self.tabla, fila)
+            self._disparar(viejas, seleccion)
+            self.cliente.registrar(escritas=len(seleccion))
+            return types.SimpleNamespace(data=[dict(r) for r in seleccion], count=None)
+
+        if self.operacion == 'delete':
+            ids = {id(f) for f in seleccion}
+            self.cliente.tablas[self.tabla] = [f for f in filas if id(f) not in ids]
+            self._disparar(seleccion, [])
+            self.cliente.registrar(escritas=len(seleccion))
+            return types.SimpleNamespace(data=[dict(r) for r in seleccion], count=None)
+
+        # Orden estable: se aplica de la última columna a la primera
+        for columna, desc in reversed(self.orden):
+            seleccion = sorted(seleccion, key=lambda r: _comparable(r.get(columna)), reverse=desc)
+        total = len(seleccion) if self.contar else None
+
+        if self.solo_conteo:
+            self.cliente.registrar()
+            return types.SimpleNamespace(data=[], count=total)
+
+        if self.desde is not None:
+            seleccion = seleccion[self.desde:self.hasta + 1]
+        if self.limite is not None:
+            seleccion = seleccion[:self.limite]
+        if self.cliente.max_filas is not None:
+            seleccion = seleccion[:self.cliente.max_filas]
+        if self.columnas is not None:
+            seleccion = [{c: r.get(c) for c in self.columnas} for r in seleccion]
+        else:
+            seleccion = [dict(r) for r in seleccion]
+        self.cliente.registrar(leidas=len(seleccion))
+        return types.SimpleNamespace(data=seleccion, count=total)
+
+
+class _Llamada:
+    """rpc(): la función corre con la tabla bloqueada y devuelve su resultado completo"""
+
+    def __init__(self, cliente, funcion: str, parametros: Dict):
+        self.cliente = cliente
+        self.funcion = funcion
+        self.parametros = parametros
+
+    def execute(self):
+        with self.cliente.candado:
+            funcion = self.cliente.funciones.get(self.funcion)
+            datos = funcion(self.cliente, **self.parametros) if funcion else None
+            if isinstance(datos, int):
+                # Escritura: viajan las filas enviadas, vuelve solo la cantidad
+                filas = len(self.parametros.get('filas') or [])
+                self.cliente.registrar(escritas=datos)
+            else:
+                filas = len(datos or [])
+                self.cliente.registrar(leidas=filas)
+        self.cliente.esperar(filas)
+        if funcion is None:
+            raise RuntimeError(str({'code': 'PGRST202', 'details': None, 'hint': None,
+                                    'message': f'Could not find the function public.{self.funcion} in the schema cache'}))
+        return types.SimpleNamespace(data=datos, count=None)
+
+
+class ClienteMemoria:
+    """Reemplazo de supabase.Client con tablas en memoria y latencia opcional"""
+
+    def __init__(self, tablas: Dict[str, List[Dict]] = None, latencia: Optional[ModeloLatencia] = None,
+                 max_filas: Optional[int] = MAX_FILAS_SUPABASE, funciones: Optional[Dict] = None):
+        self.tablas = {nombre: [_generar(nombre, dict(f)) for f in filas] for nombre, filas in (tablas or {}).items()}
+        self.latencia = latencia
+        self.max_filas = max_filas
+        self.funciones = FUNCIONES if funciones is None else funciones
+        self.candado = threading.RLock()
+        self._conexiones = threading.BoundedSemaphore(latencia.conexiones) if latencia else None
+        self._ultimo_id = max((f.get('id') or 0 for filas in self.tablas.values() for f in filas), default=0)
+        self.reiniciar_estadisticas()
+
+    def siguiente_id(self) -> int:
+        self._ultimo_id += 1
+        return self._ultimo_id
+
+    def table(self, nombre: str) -> _Consulta:
+        return _Consulta(self, nombre)
+
+    def rpc(self, funcion: str, parametros: Optional[Dict] = None) -> _Llamada:
+        return _Llamada(self, funcion, parametros or {})
+
+    # --- Latencia y estadísticas ---
+
+    def esperar(self, filas: int):
+        """Simula el viaje de red del request (fuera del candado, para que los hilos se solapen)"""
+        if not self.latencia:
+            return
+        with self._conexiones:
+            time.sleep(self.latencia.duracion(filas))
+
+    def registrar(self, leidas: int = 0, escritas: int = 0):
+        self.estadisticas['requests'] += 1
+        self.estadisticas['filas_leidas'] += leidas
+        self.estadisticas['filas_escritas'] += escritas
+
+    def reiniciar_estadisticas(self):
+        self.estadisticas = {'requests': 0, 'filas_leidas': 0, 'filas_escritas': 0}
+
+
+@contextlib.contextmanager
+def usar_cliente(cliente, *modulos):
+    """
+    Hace que obtener_cliente() (modulos/cliente_bd.py) y create_client()
+    devuelvan `cliente` mientras dura el bloque: create_client en el paquete
+    supabase y en cada módulo de `modulos` que ya lo importó con
+    `from supabase import create_client`.
+    """
+    import supabase as supabase_pkg
+    from modulos.cliente_bd import reemplazar_cliente
+
+    objetivos = [supabase_pkg] + [m for m in modulos if hasattr(m, 'create_client')]
+    originales = [(m, m.create_client) for m in objetivos]
+    for modulo in objetivos:
+        modulo.create_client = lambda *args, **kwargs: cliente
+    reemplazo_anterior = reemplazar_cliente(cliente)
+    try:
+        yield cliente
+    finally:
+        reemplazar_cliente(reemplazo_anterior)
+        for modulo, original in originales:
+            modulo.create_client = original
@@ -0,0 +1,320 @@
+"""
+Benchmark de Consolidación y Reportes
+Mide cada etapa del pipeline, las actualizaciones parciales y los reportes
+
+Para cada tamaño se generan los archivos sintéticos (benchmarks/generador.py)
+y se mide:
+- consolidación: lectura CSV, cruces, asignación, formatos, duplicados,
+  preparación de registros y guardado (etapas de modulos/consolidar.py)
+- actualización parcial: update_logistics_only, update_aditionals_only y
+  update_cxp_only de la página del Consolidador
+- reportes: generar_reporte de cada módulo en modulos/reportes
+
+La base de datos es un cliente en memoria (benchmarks/cliente_memoria.py).
+Sin --latencia los tiempos son de procesamiento en Python; con --latencia cada
+request espera como si fuera a Supabase, para medir lotes y concurrencia.
+También se guarda cuántos requests hizo cada medición. Streamlit corre en
+modo sin servidor: los st.* no dibujan nada.
+
+El resultado se guarda en JSON con el commit actual, para comparar entre commits:
+    python -m benchmarks.ejecutar --filas 10000 100000
+    python -m benchmarks.ejecutar --filas 10000 --comparar benchmarks/resultados/abc1234.json
+    python -m benchmarks.ejecutar --filas 10000 --latencia 0.08 --filas-por-segundo 20000
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.cliente_memoria import ClienteMemoria, ModeloLatencia, usar_cliente
+from benchmarks.generador import generar_archivos, guardar_archivos, TAMANOS
+from modulos.consolidar import process_files_according_to_rules, insert_or_update_to_supabase, map_column_names
+from modulos.consolidacion import preparar_registros_df
+from modulos.progreso import Reporte
+
+PAGINA_CONSOLIDADOR = os.path.join(RAIZ, 'pages', '2_📦_Consolidador.py')
+
+MODULOS_REPORTES = [
+    'reporte_global', 'todoencargo_co', 'mega_tiendas_peruanas', 'dtpt_group',
+    'megatienda_veendelo', 'faborcargo', 'reembolsos_meli'
+]
+
+TRM_ACTUAL = [
+    {'pais': 'colombia', 'valor': 4100.0},
+    {'pais': 'peru', 'valor': 3.75},
+    {'pais': 'chile', 'valor': 950.0},
+]
+
+INICIO = date(2025, 8, 1)
+FIN = date(2025, 8, 31)
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _medir(funcion, repeticiones: int):
+    """Mejor tiempo (segundos) de varias ejecuciones y el resultado de la última"""
+    mejor = None
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, resultado
+
+
+def _silenciar_streamlit():
+    # En modo sin servidor Streamlit avisa en cada st.*; los avisos no son parte de la medición
+    from streamlit import logger
+    logger.set_log_level('error')
+
+
+def _registros_bd(archivos, semilla: int):
+    """Consolida los archivos y los deja como filas de consolidated_orders"""
+    consolidado = process_files_according_to_rules(
+        archivos['drapify'], archivos['logistics'], archivos['aditionals'], archivos['cxp'], str(FIN)
+    )
+    df = map_column_names(consolidado)
+    registros = preparar_registros_df(df)
+
+    # Repartir logistics_date en el mes, como quedan después de varias cargas diarias
+    rng = np.random.default_rng(semilla + 10)
+    dias = rng.integers(0, (FIN - INICIO).days + 1, len(registros))
+    for i, registro in enumerate(registros):
+        registro['id'] = i + 1
+        if registro.get('logistics_date'):
+            registro['logistics_date'] = str(INICIO + pd.Timedelta(days=int(dias[i])))
+    return registros
+
+
+# ============================================================================
+# MEDICIONES
+# ============================================================================
+
+def medir_consolidacion(archivos, rutas, repeticiones: int, latencia=None):
+    tiempos = {}
+
+    tiempos['Lectura CSV'], _ = _medir(lambda: {n: pd.read_csv(r) for n, r in rutas.items()}, repeticiones)
+
+    mejor_total = None
+    mejores_etapas = {}
+    for _ in range(repeticiones):
+        reporte = Reporte()
+        inicio = time.perf_counter()
+        consolidado = process_files_according_to_rules(
+            archivos['drapify'], archivos['logistics'], archivos['aditionals'], archivos['cxp'], str(FIN), reporte
+        )
+        insert_or_update_to_supabase(ClienteMemoria(latencia=latencia), consolidado, reporte)
+        total = time.perf_counter() - inicio
+
+        mejor_total = total if mejor_total is None else min(mejor_total, total)
+        for etapa, segundos in reporte.resumen_tiempos().items():
+            mejores_etapas[etapa] = min(segundos, mejores_etapas.get(etapa, segundos))
+
+    tiempos.update(mejores_etapas)
+    tiempos['Total consolidación'] = mejor_total
+    return tiempos
+
+
+def medir_actualizaciones(archivos, registros, repeticiones: int, latencia=None, requests=None):
+    tiempos = {}
+    cliente = ClienteMemoria({'consolidated_orders': registros}, latencia)
+
+    with usar_cliente(cliente):
+        pagina = runpy.run_path(PAGINA_CONSOLIDADOR, run_name='benchmark')
+
+    casos = {
+        'update_logistics_only': lambda: pagina['update_logistics_only'](archivos['logistics'], FIN),
+        'update_aditionals_only': lambda: pagina['update_aditionals_only'](archivos['aditionals']),
+        'update_cxp_only': lambda: pagina['update_cxp_only'](archivos['cxp']),
+    }
+    for nombre, funcion in casos.items():
+        cliente.reiniciar_estadisticas()
+        tiempos[nombre], _ = _medir(funcion, repeticiones)
+        if requests is not None:
+            requests[nombre] = cliente.estadisticas['requests'] // repeticiones
+    return tiempos
+
+
+def medir_reportes(registros, repeticiones: int, latencia=None, requests=None):
+    import streamlit as st
+
+    tiempos = {}
+    cliente = ClienteMemoria({'consolidated_orders': registros, 'trm_actual': TRM_ACTUAL}, latencia)
+
+    for nombre in MODULOS_REPORTES:
+        modulo = importlib.import_module(f'modulos.reportes.{nombre}')
+
+        def generar():
+            st.cache_data.clear()
+            st.cache_resource.clear()
+            modulo.generar_reporte(INICIO, FIN)
+
+        cliente.reiniciar_estadisticas()
+        with usar_cliente(cliente, modulo):
+            tiempos[nombre], _ = _medir(generar, repeticiones)
+        if requests is not None:
+            requests[nombre] = cliente.estadisticas['requests'] // repeticiones
+
+    # Volver a ver el mismo período sin cambios en los datos (caché de reportes)
+    modulo = importlib.import_module('modulos.reportes.reporte_global')
+    nombre = 'reporte_global (repetido)'
+    cliente.reiniciar_estadisticas()
+    with usar_cliente(cliente, modulo):
+        modulo.generar_reporte(INICIO, FIN)
+        cliente.reiniciar_estadisticas()
+        tiempos[nombre], _ = _medir(lambda: modulo.generar_reporte(INICIO, FIN), repeticiones)
+    if requests is not None:
+        requests[nombre] = cliente.estadisticas['requests'] // repeticiones
+    return tiempos
+
+
+# ============================================================================
+# EJECUCIÓN
+# ============================================================================
+
+def ejecutar(filas_por_corrida, semilla: int = 42, repeticiones: int = 1,
+             reportes: bool = True, actualizaciones: bool = True, latencia: ModeloLatencia = None):
+    _silenciar_streamlit()
+
+    resultado = {
+        'commit': _commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'semilla': semilla,
+        'repeticiones': repeticiones,
+        'latencia': repr(latencia) if latencia else None,
+        'resultados': {},
+    }
+
+    for filas in filas_por_corrida:
+        print(f"\n📊 {filas:,} filas")
+        medicion = {}
+        requests = {}
+
+        medicion['generacion'], archivos = _medir(lambda: generar_archivos(filas, semilla), 1)
+        print(f"   Generación: {medicion['generacion']:.2f} s")
+
+        with tempfile.TemporaryDirectory() as carpeta:
+            rutas = guardar_archivos(archivos, carpeta, 'csv')
+            medicion['consolidacion'] = medir_consolidacion(archivos, rutas, repeticiones, latencia)
+        _imprimir(medicion['consolidacion'])
+
+        if actualizaciones or reportes:
+            registros = _registros_bd(archivos, semilla)
+
+        if actualizaciones:
+            medicion['actualizacion'] = medir_actualizaciones(archivos, registros, repeticiones, latencia, requests)
+            _imprimir(medicion['actualizacion'])
+
+        if reportes:
+            medicion['reportes'] = medir_reportes(registros, repeticiones, latencia, requests)
+            _imprimir(medicion['reportes'])
+
+        if requests:
+            print("   Requests: " + ", ".join(f"{nombre}={cantidad}" for nombre, cantidad in requests.items()))
+        resultado['resultados'][str(filas)] = medicion
+        resultado.setdefault('requests', {})[str(filas)] = requests
+
+    return resultado
+
+
+def _imprimir(tiempos):
+    for nombre, segundos in tiempos.items():
+        print(f"   {nombre}: {segundos:.3f} s")
+
+
+def _aplanar(medicion, prefijo=''):
+    plano = {}
+    for clave, valor in medicion.items():
+        if isinstance(valor, dict):
+            plano.update(_aplanar(valor, f'{prefijo}{clave} / '))
+        else:
+            plano[f'{prefijo}{clave}'] = valor
+    return plano
+
+
+def comparar(anterior, actual, umbral: float = 1.10):
+    """Imprime la razón actual/anterior por medición. Retorna cuántas empeoraron más que el umbral"""
+    regresiones = 0
+    print(f"\n🔍 Comparación {anterior.get('commit')} -> {actual.get('commit')}")
+    for filas, medicion in actual['resultados'].items():
+        base = _aplanar(anterior['resultados'].get(filas, {}))
+        for nombre, segundos in _aplanar(medicion).items():
+            if nombre not in base or not base[nombre]:
+                continue
+            razon = segundos / base[nombre]
+            marca = '⚠️' if razon > umbral else ('✅' if razon < 1 / umbral else '  ')
+            regresiones += razon > umbral
+            print(f"   {marca} [{filas}] {nombre}: {base[nombre]:.3f} s -> {segundos:.3f} s ({razon:.2f}x)")
+    return regresiones
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.ejecutar',
+                                     description='Mide consolidación, actualizaciones parciales y reportes')
+    parser.add_argument('--filas', type=int, nargs='+', default=[TAMANOS[0]],
+                        help=f'Tamaños de Drapify a medir (por ejemplo {" ".join(map(str, TAMANOS))})')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--repeticiones', type=int, default=1, help='Se reporta el mejor tiempo')
+    parser.add_argument('--sin-reportes', action='store_true')
+    parser.add_argument('--sin-actualizaciones', action='store_true')
+    parser.add_argument('--salida', default=os.path.join(RAIZ, 'benchmarks', 'resultados'),
+                        help='Carpeta o archivo .json de salida')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior')
+    parser.add_argument('--latencia', type=float, help='Segundos por request simulados (sin esto no hay latencia)')
+    parser.add_argument('--filas-por-segundo', type=float, default=20000, help='Filas transferidas por segundo')
+    parser.add_argument('--conexiones', type=int, default=10, help='Requests simultáneos que atiende el servidor')
+    args = parser.parse_args(argv)
+
+    latencia = None
+    if args.latencia is not None:
+        latencia = ModeloLatencia(args.latencia, args.filas_por_segundo, args.conexiones)
+
+    resultado = ejecutar(args.filas, args.semilla, args.repeticiones,
+                         reportes=not args.sin_reportes, actualizaciones=not args.sin_actualizaciones,
+                         latencia=latencia)
+
+    if args.salida.endswith('.json'):
+        ruta = args.salida
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    else:
+        os.makedirs(args.salida, exist_ok=True)
+        ruta = os.path.join(args.salida, f"{resultado['commit'] or 'sin_commit'}.json")
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados guardados en {ruta}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            anterior = json.load(archivo)
+        if comparar(anterior, resultado):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
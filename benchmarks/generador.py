@@ -0,0 +1,301 @@
+"""
+Generador de Archivos Sintéticos (Drapify, Logistics, Aditionals, CXP)
+Datos reproducibles con la forma de los archivos reales para medir rendimiento
+
+Con la misma semilla y cantidad de filas se generan siempre los mismos
+archivos. Incluye los casos que complican los cruces en producción:
+- IDs con comilla inicial ('2000...) y con sufijo .0 (2000....0)
+- Reference "PACKAGE RECALLED FROM UNKNOWN" en Logistics
+- Order Id repetidos en Aditionals (se suman en el cruce)
+- Encabezados CXP con espacios y variantes de nombre, columna vacía y fila TOTAL
+
+Uso:
+    python -m benchmarks.generador --filas 100000 --semilla 7 --carpeta datos_bench
+    python -m benchmarks.generador --filas 10000 --formato xlsx
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from modulos.consolidacion import PREFIJOS_ASIGNACION
+
+CUENTAS = list(config.ACCOUNT_UTILITY_MAPPING)
+
+# Participación aproximada de cada cuenta en el volumen de órdenes
+PESOS_CUENTAS = np.array([0.30, 0.12, 0.06, 0.14, 0.12, 0.10, 0.08, 0.08])
+
+# Cuentas cuyo costo llega por Logistics (Anicam) o por CXP (Chilexpress)
+CUENTAS_LOGISTICS = ['1-TODOENCARGO-CO', '4-MEGA TIENDAS PERUANAS',
+                     '5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']
+CUENTAS_CXP = ['2-MEGATIENDA SPA', '3-VEENDELO', '8-FABORCARGO']
+
+# Moneda local por USD para net_received_amount
+TASA_LOCAL = {
+    '1-TODOENCARGO-CO': 4100.0, '5-DETODOPARATODOS': 4100.0,
+    '6-COMPRAFACIL': 4100.0, '7-COMPRA-YA': 4100.0,
+    '4-MEGA TIENDAS PERUANAS': 3.75,
+    '2-MEGATIENDA SPA': 950.0, '3-VEENDELO': 950.0, '8-FABORCARGO': 950.0,
+}
+
+ESTADOS = ['approved', 'refunded', 'cancelled']
+PESOS_ESTADOS = [0.85, 0.08, 0.07]
+
+TAMANOS = [10_000, 100_000, 1_000_000]
+
+
+def _fechas(rng, n: int, inicio: date, dias: int) -> pd.Series:
+    """Fechas YYYY-MM-DD uniformes dentro de [inicio, inicio + dias)"""
+    desplazamientos = rng.integers(0, dias, n)
+    return pd.Series(pd.Timestamp(inicio) + pd.to_timedelta(desplazamientos, unit='D')).dt.strftime('%Y-%m-%d')
+
+
+def _ids_sucios(rng, ids: np.ndarray, con_comilla: float, con_punto_cero: float) -> np.ndarray:
+    """Escribe una parte de los IDs como 'ID o ID.0, como llegan en los archivos"""
+    texto = ids.astype(str).astype(object)
+    sorteo = rng.random(len(ids))
+    comilla = sorteo < con_comilla
+    punto_cero = (sorteo >= con_comilla) & (sorteo < con_comilla + con_punto_cero)
+    texto[comilla] = "'" + texto[comilla]
+    texto[punto_cero] = texto[punto_cero] + '.0'
+    return texto
+
+
+def generar_drapify(n: int, semilla: int = 42, inicio: date = date(2025, 8, 1), dias: int = 31) -> pd.DataFrame:
+    """Archivo Drapify (base) con n órdenes repartidas entre las 8 cuentas"""
+    rng = np.random.default_rng(semilla)
+
+    cuentas = rng.choice(CUENTAS, n, p=PESOS_CUENTAS / PESOS_CUENTAS.sum())
+    estados = rng.choice(ESTADOS, n, p=PESOS_ESTADOS)
+    serial = 500_000 + np.arange(n)
+    order_ids = 2_000_008_000_000_000 + np.arange(n) * 7
+    prealert_ids = 1_049_072 + np.arange(n)
+
+    cantidad = rng.choice([1, 1, 1, 2, 3], n)
+    declare_value = np.round(rng.gamma(2.0, 25.0, n) + 3, 2)
+    tasa = pd.Series(cuentas).map(TASA_LOCAL).to_numpy()
+    net_received = np.round(declare_value * cantidad * rng.uniform(1.2, 1.9, n) * tasa, 2)
+    peso_lbs = np.round(rng.gamma(1.6, 1.8, n) + 0.1, 2)
+
+    refunded_date = _fechas(rng, n, inicio, dias).where(estados == 'refunded', None)
+    amz_order_id = pd.Series([f'111-{a:07d}-{b:07d}' for a, b in rng.integers(0, 10**7, (n, 2))])
+    amz_order_id[rng.random(n) < 0.05] = None
+
+    df = pd.DataFrame({
+        'System#': 900_000 + np.arange(n),
+        'Serial#': serial,
+        'order_id': _ids_sucios(rng, order_ids, 0.03, 0.02),
+        'pack_id': np.where(rng.random(n) < 0.6, (2_000_009_000_000_000 + np.arange(n)).astype(str), None),
+        'ASIN': pd.Series(rng.integers(0, 36**9, n)).map(lambda v: 'B0' + np.base_repr(v, 36).rjust(8, '0')),
+        'client_first_name': rng.choice(['Juan', 'María', 'José', 'Ana', 'Luis', 'Camila', 'Jorge', 'Sofía'], n),
+        'client_last_name': rng.choice(['Pérez', 'González', 'Rodríguez', 'Muñoz', 'Rojas', 'Díaz'], n),
+        'client_doc_id': rng.integers(10**7, 10**9, n).astype(str),
+        'account_name': cuentas,
+        'date_created': _fechas(rng, n, inicio, dias) + 'T' + pd.Series(rng.integers(0, 86400, n)).map(
+            lambda s: f'{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}') + '.000-04:00',
+        'quantity': cantidad,
+        'title': rng.choice(['Audífonos Bluetooth', 'Reloj Inteligente', 'Cargador USB-C',
+                             'Lámpara LED', 'Funda Protectora', 'Teclado Mecánico'], n),
+        'unit_price': np.round(net_received / cantidad, 2),
+        'logistic_type': rng.choice(['xd_drop_off', 'cross_docking', 'fulfillment'], n, p=[0.5, 0.35, 0.15]),
+        'city': rng.choice(['Bogotá', 'Medellín', 'Lima', 'Santiago', 'Valparaíso', 'Cali'], n),
+        'country': pd.Series(cuentas).map(lambda c: 'CO' if TASA_LOCAL[c] > 1000 else ('PE' if TASA_LOCAL[c] < 10 else 'CL')),
+        'amz_order_id': amz_order_id,
+        'prealert_id': _ids_sucios(rng, prealert_ids, 0.02, 0.03),
+        'order_status_meli': estados,
+        'Declare Value': declare_value,
+        'Meli Fee': np.round(net_received * 0.13, 2),
+        'IVA': np.round(net_received * 0.19).astype(np.int64),
+        'ICA': np.round(net_received * 0.004).astype(np.int64),
+        'FUENTE': np.round(net_received * 0.015, 2),
+        'senders_cost': np.round(rng.uniform(0, 8, n) * tasa, 2),
+        'gross_amount': np.round(net_received * 1.15, 2),
+        'net_received_amount': net_received,
+        'net_real_amount': np.round(net_received * 0.97, 2),
+        'logistic_weight_lbs': peso_lbs,
+        'refunded_date': refunded_date,
+    })
+
+    # Valores basura que aparecen en columnas numéricas de los archivos reales
+    basura = rng.random(n) < 0.01
+    df['Declare Value'] = df['Declare Value'].astype(object)
+    df.loc[basura, 'Declare Value'] = 'XXXXXXXXXX'
+    return df
+
+
+def _order_ids_limpios(drapify_df: pd.DataFrame) -> pd.Series:
+    return drapify_df['order_id'].astype(str).str.lstrip("'").str.replace(r'\.0$', '', regex=True)
+
+
+def generar_logistics(drapify_df: pd.DataFrame, semilla: int = 42, cobertura: float = 0.85) -> pd.DataFrame:
+    """Logistics (Anicam) para las cuentas que cruzan por Reference / Order number"""
+    rng = np.random.default_rng(semilla + 1)
+
+    candidatos = drapify_df[drapify_df['account_name'].isin(CUENTAS_LOGISTICS)]
+    candidatos = candidatos[rng.random(len(candidatos)) < cobertura]
+    n = len(candidatos)
+
+    order_ids = _order_ids_limpios(candidatos).to_numpy()
+    prealert_ids = candidatos['prealert_id'].astype(str).str.lstrip("'").str.replace(r'\.0$', '', regex=True).to_numpy()
+
+    # 70% por Reference = order_id, 20% por Order number = order_id, 10% por Order number = prealert_id
+    via = rng.choice(3, n, p=[0.7, 0.2, 0.1])
+    reference = np.where(via == 0, _ids_sucios(rng, order_ids, 0.05, 0.0), None).astype(object)
+    order_number = np.where(via == 1, order_ids, np.where(via == 2, prealert_ids, None)).astype(object)
+
+    recalled = (via == 0) & (rng.random(n) < 0.005)
+    reference[recalled] = 'PACKAGE RECALLED FROM UNKNOWN'
+
+    peso = np.round(candidatos['logistic_weight_lbs'].to_numpy() / 2.2046, 2)
+    fob = np.round(pd.to_numeric(candidatos['Declare Value'], errors='coerce').fillna(20).to_numpy(), 2)
+    logistics = np.round(8 + peso * rng.uniform(9, 12, n), 2)
+    duties = np.round(np.where(fob > 200, fob * 0.19, 0), 2)
+
+    return pd.DataFrame({
+        'Guide Number': [f'AN{g:010d}' for g in rng.integers(0, 10**10, n)],
+        'Order number': order_number,
+        'Reference': reference,
+        'SAP Code': rng.integers(10**5, 10**6, n).astype(str),
+        'Invoice': [f'INV-{i:08d}' for i in range(n)],
+        'Status': rng.choice(['Delivered', 'In transit', 'Customs'], n, p=[0.8, 0.15, 0.05]),
+        'FOB': fob,
+        'Unit': 'KG',
+        'Weight': peso,
+        'Length': rng.integers(5, 60, n),
+        'Width': rng.integers(5, 40, n),
+        'Height': rng.integers(2, 30, n),
+        'Insurance': np.round(fob * 0.01, 2),
+        'Logistics': logistics,
+        'Duties Prealert': duties,
+        'Duties Pay': duties,
+        'Duty Fee': np.round(np.where(duties > 0, 5.0, 0.0), 2),
+        'Saving': 0.0,
+        'Total': np.round(logistics + duties, 2),
+        'Description': candidatos['title'].to_numpy(),
+        'Shipper': 'AMAZON.COM',
+        'Phone': rng.integers(3 * 10**9, 4 * 10**9, n).astype(str),
+        'Consignee': (candidatos['client_first_name'] + ' ' + candidatos['client_last_name']).to_numpy(),
+        'Identification': candidatos['client_doc_id'].to_numpy(),
+        'Country': candidatos['country'].to_numpy(),
+        'State': '',
+        'City': candidatos['city'].to_numpy(),
+        'Address': 'Calle 1 # 2-3',
+        'Master Guide': [f'MG{m:08d}' for m in rng.integers(0, 10**8, n)],
+        'Tariff Position': '8517.62.00.00',
+        'External Id': rng.integers(10**6, 10**7, n).astype(str),
+    })
+
+
+def generar_aditionals(drapify_df: pd.DataFrame, semilla: int = 42, cobertura: float = 0.3,
+                       repetidos: float = 0.25) -> pd.DataFrame:
+    """Aditionals por prealert_id; una parte de los Order Id aparece 2 o 3 veces"""
+    rng = np.random.default_rng(semilla + 2)
+
+    candidatos = drapify_df[drapify_df['account_name'].isin(CUENTAS_LOGISTICS)]
+    candidatos = candidatos[rng.random(len(candidatos)) < cobertura]
+
+    repeticiones = np.where(rng.random(len(candidatos)) < repetidos, rng.integers(2, 4, len(candidatos)), 1)
+    order_ids = np.repeat(candidatos['prealert_id'].to_numpy(), repeticiones)
+    n = len(order_ids)
+
+    cantidad = rng.integers(1, 3, n)
+    precio = np.round(rng.uniform(1, 15, n), 2)
+
+    return pd.DataFrame({
+        'Order Id': order_ids,
+        'Item': rng.choice(['Repacking', 'Photo', 'Extra insurance', 'Storage'], n),
+        'Reference': '',
+        'Description': rng.choice(['Servicio adicional', 'Reempaque', ''], n),
+        'Quantity': cantidad,
+        'UnitPrice': precio,
+        'Total': np.round(cantidad * precio, 2),
+    })
+
+
+def generar_cxp(drapify_df: pd.DataFrame, semilla: int = 42, cobertura: float = 0.9,
+                inicio: date = date(2025, 8, 1), dias: int = 31) -> pd.DataFrame:
+    """CXP (Chilexpress) por Ref # = Asignacion, con encabezados irregulares y fila TOTAL"""
+    rng = np.random.default_rng(semilla + 3)
+
+    candidatos = drapify_df[drapify_df['account_name'].isin(CUENTAS_CXP)]
+    candidatos = candidatos[rng.random(len(candidatos)) < cobertura]
+    n = len(candidatos)
+
+    asignacion = candidatos['account_name'].map(PREFIJOS_ASIGNACION) + candidatos['Serial#'].astype(str)
+    ref = asignacion.to_numpy().astype(object)
+    comilla = rng.random(n) < 0.03
+    ref[comilla] = "'" + ref[comilla]
+
+    co_aereo = np.round(candidatos['logistic_weight_lbs'].to_numpy() * rng.uniform(3, 4.5, n), 2)
+    goods = np.round(pd.to_numeric(candidatos['Declare Value'], errors='coerce').fillna(20).to_numpy(), 2)
+    arancel = np.round(np.where(goods > 41, goods * 0.06, 0), 2)
+    iva = np.round(np.where(goods > 41, (goods + arancel) * 0.19, 0), 2)
+    handling = np.full(n, 2.5)
+    delivery = np.round(rng.uniform(2, 6, n), 2)
+
+    cxp = pd.DataFrame({
+        'OT Number': rng.integers(10**8, 10**9, n).astype(str),
+        'Date': pd.to_datetime(_fechas(rng, n, inicio, dias)).dt.strftime('%m/%d/%Y'),
+        ' Ref # ': ref,
+        'Consignee ': (candidatos['client_first_name'] + ' ' + candidatos['client_last_name']).to_numpy(),
+        'CO Aereo': co_aereo,
+        'Arancel': arancel,
+        'IVA': iva,
+        'Handling': handling,
+        'Dest. Delivery': delivery,
+        'Amt. Due': np.round(co_aereo + arancel + iva + handling + delivery, 2),
+        'Goods Value': goods,
+        'Unnamed: 11': None,
+    })
+
+    # Fila de totales al final, como en el reporte exportado de Chilexpress
+    total = {col: None for col in cxp.columns}
+    total[' Ref # '] = 'TOTAL'
+    total['Amt. Due'] = float(cxp['Amt. Due'].sum())
+    return pd.concat([cxp, pd.DataFrame([total])], ignore_index=True)
+
+
+def generar_archivos(filas: int, semilla: int = 42) -> Dict[str, pd.DataFrame]:
+    """Genera los 4 archivos relacionados entre sí"""
+    drapify = generar_drapify(filas, semilla)
+    return {
+        'drapify': drapify,
+        'logistics': generar_logistics(drapify, semilla),
+        'aditionals': generar_aditionals(drapify, semilla),
+        'cxp': generar_cxp(drapify, semilla),
+    }
+
+
+def guardar_archivos(archivos: Dict[str, pd.DataFrame], carpeta: str, formato: str = 'csv') -> Dict[str, str]:
+    """Guarda los archivos como csv o xlsx. Retorna nombre -> ruta"""
+    os.makedirs(carpeta, exist_ok=True)
+    rutas = {}
+    for nombre, df in archivos.items():
+        ruta = os.path.join(carpeta, f'{nombre}.{formato}')
+        if formato == 'csv':
+            df.to_csv(ruta, index=False)
+        else:
+            df.to_excel(ruta, index=False)
+        rutas[nombre] = ruta
+    return rutas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Genera archivos Drapify/Logistics/Aditionals/CXP sintéticos')
+    parser.add_argument('--filas', type=int, default=TAMANOS[0], help='Órdenes en Drapify')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--carpeta', default='datos_bench')
+    parser.add_argument('--formato', choices=['csv', 'xlsx'], default='csv')
+    args = parser.parse_args()
+
+    archivos = generar_archivos(args.filas, args.semilla)
+    for nombre, ruta in guardar_archivos(archivos, args.carpeta, args.formato).items():
+        print(f"✅ {nombre}: {len(archivos[nombre]):,} filas -> {ruta}")
@@ -0,0 +1,348 @@
+"""
+Planes de las Consultas Frecuentes de consolidated_orders
+Imprime el plan de PostgreSQL (EXPLAIN) de cada filtro que usa la app
+
+Cada consulta reproduce la forma del SQL que PostgREST ejecuta para los
+filtros de la app: .in_() -> columna = ANY(lista), .eq(), .gte()/.lte()
+sobre texto, .order() + .range() -> ORDER BY ... LIMIT 1000. Los valores
+(IDs, cuenta, mes) se toman de la misma tabla. Al final se resume qué índice
+usó cada consulta y se marcan las que recorren la tabla completa (Seq Scan).
+
+Se corre contra un PostgreSQL local, nunca contra Supabase:
+    # copia de la tabla (pg_dump) ya cargada
+    python -m benchmarks.planes_consultas --dsn postgresql://postgres@localhost/gss
+    # aplicar setup_*.sql de consolidated_orders y migraciones/ antes de medir
+    python -m benchmarks.planes_consultas --dsn ... --aplicar
+    # base vacía: tabla sintética (benchmarks/generador.py) con un año de fechas
+    python -m benchmarks.planes_consultas --dsn ... --crear 200000 --aplicar
+
+Requiere psycopg (pip install "psycopg[binary]") o psycopg2. No está en
+requirements.txt: la app habla con Supabase por HTTP, no con PostgreSQL.
+Retorna 1 si alguna consulta recorre consolidated_orders completa.
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from modulos.consultas import CUENTAS_FECHA_CXP
+
+TABLA = 'consolidated_orders'
+
+# Scripts de la raíz que tocan consolidated_orders, en el orden del README
+ARCHIVOS_SETUP = ['setup_claves_id.sql', 'setup_fecha_reporte.sql', 'setup_buscar_claves.sql']
+CARPETA_MIGRACIONES = os.path.join(RAIZ, 'migraciones')
+
+# IDs por consulta de búsqueda (como un lote de la app)
+IDS_POR_CONSULTA = 100
+
+# Filas por INSERT al crear la tabla sintética
+FILAS_POR_INSERT = 5000
+
+# Consultas frecuentes: columna requerida (o None), origen en la app, SQL
+CONSULTAS = [
+    {
+        'nombre': 'Existentes por order_id',
+        'origen': 'consolidar.insert_or_update_to_supabase (respaldo .in_())',
+        'requiere': None,
+        'sql': "SELECT order_id FROM consolidated_orders WHERE order_id = ANY(%(order_ids)s)",
+    },
+    {
+        'nombre': 'Búsqueda por prealert_id',
+        'origen': 'lotes_bd.buscar_por_ids (Logistics / Aditionals, Validador)',
+        'requiere': None,
+        'sql': ("SELECT id, order_id, prealert_id, account_name FROM consolidated_orders "
+                "WHERE prealert_id = ANY(%(prealert_ids)s)"),
+    },
+    {
+        'nombre': 'Búsqueda por asignacion y cuentas',
+        'origen': 'lotes_bd.buscar_por_ids (CXP)',
+        'requiere': None,
+        'sql': ("SELECT id, account_name, serial_number, asignacion, cxp_amt_due FROM consolidated_orders "
+                "WHERE asignacion = ANY(%(asignaciones)s) AND account_name = ANY(%(cuentas_cxp)s)"),
+    },
+    {
+        'nombre': 'Búsqueda por clave normalizada',
+        'origen': 'buscar_por_claves (setup_buscar_claves.sql)',
+        'requiere': 'order_id_key',
+        'sql': "SELECT id, order_id FROM consolidated_orders WHERE order_id_key = ANY(%(claves)s)",
+    },
+    {
+        'nombre': 'Cuenta por logistics_date',
+        'origen': 'Date Update, scripts de actualización',
+        'requiere': None,
+        'sql': ("SELECT id, order_id, logistics_date FROM consolidated_orders "
+                "WHERE account_name = %(cuenta)s AND logistics_date >= %(desde)s AND logistics_date <= %(hasta)s "
+                "ORDER BY id LIMIT 1000"),
+    },
+    {
+        'nombre': 'Cuenta por cxp_date',
+        'origen': 'actualizar_todos_cxp.py, cuentas Chilexpress',
+        'requiere': None,
+        'sql': ("SELECT id, order_id, cxp_date FROM consolidated_orders "
+                "WHERE account_name = %(cuenta_cxp)s AND cxp_date >= %(desde)s AND cxp_date <= %(hasta)s "
+                "ORDER BY id LIMIT 1000"),
+    },
+    {
+        'nombre': 'Cuenta por fecha_reporte',
+        'origen': 'reportes por cuenta y Reporte Global (consultas.cargar_registros)',
+        'requiere': 'fecha_reporte',
+        'sql': ("SELECT id, order_id, fecha_reporte FROM consolidated_orders "
+                "WHERE account_name = %(cuenta)s AND fecha_reporte >= %(desde)s::date "
+                "AND fecha_reporte <= %(hasta)s::date ORDER BY fecha_reporte, id LIMIT 1000"),
+    },
+    {
+        'nombre': 'Reembolsos por refunded_date',
+        'origen': 'reportes/reembolsos_meli.py',
+        'requiere': None,
+        'sql': ("SELECT id, order_id, account_name, refunded_date FROM consolidated_orders "
+                "WHERE order_status_meli = 'refunded' AND refunded_date >= %(desde)s "
+                "AND refunded_date <= %(hasta)s ORDER BY id LIMIT 1000"),
+    },
+]
+
+_INDICE_USADO = re.compile(r'(?:Index Scan|Index Only Scan|Bitmap Index Scan)(?: Backward)? (?:using|on) (\S+)')
+_TIEMPO = re.compile(r'Execution Time: ([\d.]+) ms')
+
+
+# ============================================================================
+# CONEXIÓN
+# ============================================================================
+
+def conectar(dsn: str):
+    """Conexión en autocommit con psycopg 3 o psycopg2"""
+    try:
+        import psycopg
+        return psycopg.connect(dsn, autocommit=True)
+    except ImportError:
+        pass
+    try:
+        import psycopg2
+    except ImportError:
+        raise SystemExit('❌ Falta el driver de PostgreSQL: pip install "psycopg[binary]"')
+    conexion = psycopg2.connect(dsn)
+    conexion.autocommit = True
+    return conexion
+
+
+def _filas(conexion, sql: str, parametros=None) -> list:
+    with conexion.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return cursor.fetchall() if cursor.description else []
+
+
+def _columnas_tabla(conexion) -> set:
+    return {fila[0] for fila in _filas(
+        conexion,
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = 'public' AND table_name = %s",
+        [TABLA])}
+
+
+# ============================================================================
+# PREPARACIÓN DE LA BASE LOCAL
+# ============================================================================
+
+def aplicar_sql(conexion) -> None:
+    """Ejecuta los setup_*.sql de consolidated_orders y luego migraciones/ en orden"""
+    rutas = [os.path.join(RAIZ, nombre) for nombre in ARCHIVOS_SETUP]
+    rutas += sorted(glob.glob(os.path.join(CARPETA_MIGRACIONES, '*.sql')))
+    for ruta in rutas:
+        with open(ruta, encoding='utf-8') as archivo:
+            texto = archivo.read()
+        with conexion.cursor() as cursor:
+            cursor.execute(texto)
+        print(f"✅ {os.path.relpath(ruta, RAIZ)}")
+
+
+def _tipo_sql(valor) -> str:
+    if isinstance(valor, bool):
+        return 'BOOLEAN'
+    if isinstance(valor, (int, np.integer)):
+        return 'BIGINT'
+    if isinstance(valor, (float, np.floating)):
+        return 'DOUBLE PRECISION'
+    return 'TEXT'
+
+
+def _valor_json(valor):
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return None
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+def crear_tabla_sintetica(conexion, filas: int, semilla: int) -> None:
+    """
+    Crea consolidated_orders con órdenes sintéticas consolidadas (mismo camino
+    que benchmarks/ejecutar.py) repartidas en un año de fechas. No toca una
+    tabla que ya existe.
+    """
+    from benchmarks.ejecutar import _registros_bd, _silenciar_streamlit
+    from benchmarks.generador import generar_archivos
+
+    if _filas(conexion, "SELECT to_regclass(%s)", [TABLA])[0][0] is not None:
+        raise SystemExit(f"❌ {TABLA} ya existe en esta base; --crear solo se usa con una base vacía")
+
+    _silenciar_streamlit()
+    print(f"⏳ Generando {filas:,} órdenes sintéticas...")
+    registros = _registros_bd(generar_archivos(filas, semilla), semilla)
+
+    # Un año de fechas: así un mes es ~1/12 de cada cuenta, como en producción
+    rng = np.random.default_rng(semilla)
+    inicio = date.today().replace(month=1, day=1) - timedelta(days=365)
+    for registro, dia in zip(registros, rng.integers(0, 365, len(registros))):
+        fecha = inicio + timedelta(days=int(dia))
+        if registro.get('logistics_date'):
+            registro['logistics_date'] = str(fecha)
+        if registro.get('account_name') in CUENTAS_FECHA_CXP:
+            registro['cxp_date'] = str(fecha)
+        if registro.get('order_status_meli') == 'refunded':
+            registro['refunded_date'] = str(fecha + timedelta(days=int(dia) % 20))
+
+    tipos = {}
+    for registro in registros:
+        for columna, valor in registro.items():
+            if tipos.get(columna) is None:
+                tipos[columna] = _tipo_sql(valor) if valor is not None else None
+    definiciones = []
+    for columna, tipo in tipos.items():
+        if columna == 'id':
+            definiciones.append('id BIGINT PRIMARY KEY')
+        elif columna == 'order_id':
+            # Como en producción: upsert(on_conflict='order_id') exige un índice único
+            definiciones.append('order_id TEXT UNIQUE')
+        else:
+            definiciones.append(f'{columna} {tipo or "TEXT"}')
+    with conexion.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {TABLA} ({', '.join(definiciones)})")
+
+    for desde in range(0, len(registros), FILAS_POR_INSERT):
+        lote = [{columna: _valor_json(valor) for columna, valor in registro.items()}
+                for registro in registros[desde:desde + FILAS_POR_INSERT]]
+        with conexion.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TABLA} SELECT * FROM json_populate_recordset(NULL::{TABLA}, %s)",
+                           [json.dumps(lote)])
+    _filas(conexion, f"ANALYZE {TABLA}")
+    print(f"✅ {TABLA}: {len(registros):,} filas")
+
+
+# ============================================================================
+# PLANES
+# ============================================================================
+
+def _muestra(conexion, columna: str) -> list:
+    return [fila[0] for fila in _filas(
+        conexion,
+        f"SELECT {columna} FROM {TABLA} WHERE {columna} IS NOT NULL ORDER BY random() LIMIT %s",
+        [IDS_POR_CONSULTA])]
+
+
+def _cuenta_mas_frecuente(conexion, cxp: bool) -> str:
+    condicion = 'account_name = ANY(%s)' if cxp else 'NOT (account_name = ANY(%s))'
+    filas = _filas(conexion, f"SELECT account_name FROM {TABLA} WHERE {condicion} "
+                             "GROUP BY account_name ORDER BY COUNT(*) DESC LIMIT 1", [list(CUENTAS_FECHA_CXP)])
+    return filas[0][0] if filas else ''
+
+
+def parametros_consultas(conexion, columnas: set) -> dict:
+    """Valores reales de la tabla para las consultas: IDs, cuentas y el último mes con datos"""
+    ultima = _filas(conexion, f"SELECT max(left(logistics_date::text, 10)) FROM {TABLA} "
+                              r"WHERE logistics_date::text ~ '^\d{4}-\d{2}-\d{2}'")[0][0]
+    fin = date.fromisoformat(ultima) if ultima else date.today()
+    desde = fin.replace(day=1)
+
+    return {
+        'order_ids': _muestra(conexion, 'order_id'),
+        'prealert_ids': _muestra(conexion, 'prealert_id'),
+        'asignaciones': _muestra(conexion, 'asignacion'),
+        'claves': _muestra(conexion, 'order_id_key') if 'order_id_key' in columnas else [],
+        'cuentas_cxp': list(CUENTAS_FECHA_CXP),
+        'cuenta': _cuenta_mas_frecuente(conexion, cxp=False),
+        'cuenta_cxp': _cuenta_mas_frecuente(conexion, cxp=True),
+        'desde': str(desde),
+        'hasta': str(fin),
+    }
+
+
+def explicar(conexion, sql: str, parametros: dict, analizar: bool = True) -> str:
+    opciones = '(ANALYZE, BUFFERS)' if analizar else ''
+    return '\n'.join(fila[0] for fila in _filas(conexion, f"EXPLAIN {opciones} {sql}", parametros))
+
+
+def resumen_plan(plan: str) -> dict:
+    tiempo = _TIEMPO.search(plan)
+    return {
+        'indices': list(dict.fromkeys(_INDICE_USADO.findall(plan))),
+        'tabla_completa': f'Seq Scan on {TABLA}' in plan,
+        'ms': float(tiempo.group(1)) if tiempo else None,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.planes_consultas',
+                                     description='Planes de PostgreSQL de las consultas frecuentes de consolidated_orders')
+    parser.add_argument('--dsn', default=os.getenv('DATABASE_URL', 'postgresql://postgres@localhost:5432/postgres'),
+                        help='PostgreSQL local (por defecto $DATABASE_URL)')
+    parser.add_argument('--crear', type=int, metavar='FILAS',
+                        help='Crear consolidated_orders sintética con FILAS órdenes de Drapify (base vacía)')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--aplicar', action='store_true',
+                        help='Ejecutar setup_*.sql de consolidated_orders y migraciones/ antes de medir')
+    parser.add_argument('--sin-analyze', action='store_true', help='Solo EXPLAIN, sin ejecutar las consultas')
+    args = parser.parse_args(argv)
+
+    if 'supabase' in args.dsn:
+        print("❌ Este script es para un PostgreSQL local, no para la base de Supabase")
+        return 2
+
+    conexion = conectar(args.dsn)
+    if args.crear:
+        crear_tabla_sintetica(conexion, args.crear, args.semilla)
+    if args.aplicar:
+        aplicar_sql(conexion)
+
+    if _filas(conexion, "SELECT to_regclass('migraciones_aplicadas')")[0][0] is not None:
+        aplicadas = [fila[0] for fila in _filas(conexion, "SELECT version FROM migraciones_aplicadas ORDER BY version")]
+        print(f"📦 Migraciones aplicadas: {', '.join(aplicadas) or 'ninguna'}")
+
+    columnas = _columnas_tabla(conexion)
+    if not columnas:
+        print(f"❌ No existe {TABLA} (usa --crear FILAS en una base vacía)")
+        return 2
+    parametros = parametros_consultas(conexion, columnas)
+    print(f"📅 Mes de las consultas por fecha: {parametros['desde']} a {parametros['hasta']}")
+
+    resumenes = []
+    for consulta in CONSULTAS:
+        print(f"\n{'=' * 80}\n🔍 {consulta['nombre']}  ({consulta['origen']})\n{'=' * 80}")
+        if consulta['requiere'] and consulta['requiere'] not in columnas:
+            print(f"⏭️  Falta la columna {consulta['requiere']} (ver setup_*.sql)")
+            continue
+        plan = explicar(conexion, consulta['sql'], parametros, analizar=not args.sin_analyze)
+        print(plan)
+        resumenes.append((consulta['nombre'], resumen_plan(plan)))
+
+    print(f"\n{'=' * 80}\n📊 RESUMEN\n{'=' * 80}")
+    for nombre, resumen in resumenes:
+        marca = '⚠️ ' if resumen['tabla_completa'] else '✅'
+        tiempo = f"{resumen['ms']:.2f} ms" if resumen['ms'] is not None else ''
+        indices = ', '.join(resumen['indices']) or ('Seq Scan' if resumen['tabla_completa'] else '-')
+        print(f"{marca} {nombre:<36} {tiempo:>12}  {indices}")
+
+    conexion.close()
+    return 1 if any(resumen['tabla_completa'] for _, resumen in resumenes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,6 +24,12 @@ except:
     # En caso de error, usar variables de entorno
     pass
 
+# CONEXIÓN HTTP A SUPABASE (modulos/cliente_bd.py)
+BD_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "60"))                  # segundos por request
+BD_TIMEOUT_CONEXION = float(os.getenv("SUPABASE_TIMEOUT_CONEXION", "10"))  # segundos para conectar
+BD_MAX_CONEXIONES = int(os.getenv("SUPABASE_MAX_CONEXIONES", "20"))       # conexiones abiertas a la vez
+BD_KEEPALIVE = float(os.getenv("SUPABASE_KEEPALIVE", "60"))              # segundos que vive una conexión inactiva
+
 # MAPEO DE CUENTAS A TIPOS DE UTILIDAD
 ACCOUNT_UTILITY_MAPPING = {
     '1-TODOENCARGO-CO': 'tipo1_todoencargo',
@@ -7,7 +7,7 @@ import streamlit as st
 import pandas as pd
 from supabase import create_client
 import config
-import time
+from modulos.lotes_bd import escribir_por_id, aviso_por_fila
 
 # Page config
 st.set_page_config(
@@ -97,42 +97,35 @@ def aplicar_correcciones(df, tipo_correccion):
 def actualizar_supabase(actualizaciones):
     """
     Actualiza los registros en Supabase con los valores corregidos
+    (un upsert por lote de 50 con solo las columnas corregidas)
     """
-    exitos = 0
-    errores = 0
-    
     progress_bar = st.progress(0)
-    total = len(actualizaciones)
     
-    for i, actualizacion in enumerate(actualizaciones):
-        try:
-            record_id = actualizacion['id']
-            
-            # Preparar datos para actualizar
-            update_data = {}
-            if 'cxp_amt_due' in actualizacion:
-                update_data['cxp_amt_due'] = actualizacion['cxp_amt_due']
-            if 'dest_delivery' in actualizacion:
-                update_data['dest_delivery'] = actualizacion['dest_delivery']
-            if 'declare_value' in actualizacion:
-                update_data['declare_value'] = actualizacion['declare_value']
-            
-            # Ejecutar actualización
-            result = supabase.table('consolidated_orders').update(update_data).eq('id', record_id).execute()
-            
-            if result.data:
-                exitos += 1
-            else:
-                errores += 1
-                st.error(f"Error actualizando registro {record_id}")
-                
-        except Exception as e:
-            errores += 1
-            st.error(f"Error actualizando registro {record_id}: {str(e)}")
-        
-        # Actualizar barra de progreso
-        progress_bar.progress((i + 1) / total)
-        time.sleep(0.1)  # Pequeña pausa para no saturar la API
+    # Preparar datos para actualizar
+    payloads = []
+    for actualizacion in actualizaciones:
+        update_data = {'id': actualizacion['id']}
+        if 'cxp_amt_due' in actualizacion:
+            update_data['cxp_amt_due'] = actualizacion['cxp_amt_due']
+        if 'dest_delivery' in actualizacion:
+            update_data['dest_delivery'] = actualizacion['dest_delivery']
+        if 'declare_value' in actualizacion:
+            update_data['declare_value'] = actualizacion['declare_value']
+        payloads.append(update_data)
+    
+    resultados = escribir_por_id(
+        supabase, payloads,
+        al_terminar_lote=lambda resultado, procesados, total: progress_bar.progress(procesados / total)
+    )
+    
+    exitos = sum(resultado['actualizados'] for resultado in resultados)
+    errores = len(payloads) - exitos
+    
+    for resultado in resultados:
+        if resultado['actualizados'] < resultado['registros']:
+            st.error(f"Error actualizando lote {resultado['lote']}: {resultado['error'] or 'respuesta vacía'}")
+    if aviso_por_fila(resultados):
+        st.warning(aviso_por_fila(resultados))
     
     return exitos, errores
 
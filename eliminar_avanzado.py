@@ -7,6 +7,8 @@ import pandas as pd
 from supabase import create_client
 import config
 import time
+from modulos.lotes_bd import eliminar_por_ids
+from modulos.consultas import paginar_por_id
 
 st.set_page_config(page_title="🗑️ Eliminación Avanzada", layout="wide")
 
@@ -41,29 +43,12 @@ with tab1:
                     with st.spinner("Eliminando..."):
                         total = 0
                         for account in selected_accounts:
-                            # Eliminar con paginación
-                            ids_to_delete = []
-                            offset = 0
-                            limit = 1000
+                            # IDs de la cuenta con paginación por id
+                            ids_to_delete = [r['id'] for page in paginar_por_id(supabase, 'id', cuentas=account)
+                                             for r in page]
                             
-                            while True:
-                                result = supabase.table('consolidated_orders').select('id').eq('account_name', account).range(offset, offset + limit - 1).execute()
-                                if not result.data:
-                                    break
-                                ids_to_delete.extend([r['id'] for r in result.data])
-                                if len(result.data) < limit:
-                                    break
-                                offset += limit
-                            
-                            # Eliminar en lotes
-                            for i in range(0, len(ids_to_delete), 100):
-                                batch = ids_to_delete[i:i+100]
-                                for id_del in batch:
-                                    try:
-                                        supabase.table('consolidated_orders').delete().eq('id', id_del).execute()
-                                        total += 1
-                                    except:
-                                        pass
+                            # Eliminar en lotes de 100 (en paralelo, con reintentos)
+                            total += eliminar_por_ids(supabase, ids_to_delete)
                             
                             st.success(f"✅ {account}: {len(ids_to_delete)} eliminados")
                         
@@ -128,46 +113,30 @@ with tab2:
             if st.button("🗑️ Eliminar", key="del_col"):
                 with st.spinner("Eliminando..."):
                     try:
-                        # Obtener IDs a eliminar
-                        query = supabase.table('consolidated_orders').select('id')
-                        
-                        if operator == "igual a (=)":
-                            query = query.eq(selected_column, value)
-                        elif operator == "diferente de (!=)":
-                            query = query.neq(selected_column, value)
-                        elif operator == "mayor que (>)":
-                            query = query.gt(selected_column, value)
-                        elif operator == "menor que (<)":
-                            query = query.lt(selected_column, value)
-                        elif operator == "contiene (LIKE)":
-                            query = query.like(selected_column, f"%{value}%")
-                        elif operator == "es NULL":
-                            query = query.is_(selected_column, 'null')
-                        elif operator == "no es NULL":
-                            query = query.not_.is_(selected_column, 'null')
-                        
-                        # Obtener todos con paginación
-                        ids_to_delete = []
-                        offset = 0
-                        limit = 1000
+                        # Filtro de la condición elegida
+                        def filtro(query):
+                            if operator == "igual a (=)":
+                                query = query.eq(selected_column, value)
+                            elif operator == "diferente de (!=)":
+                                query = query.neq(selected_column, value)
+                            elif operator == "mayor que (>)":
+                                query = query.gt(selected_column, value)
+                            elif operator == "menor que (<)":
+                                query = query.lt(selected_column, value)
+                            elif operator == "contiene (LIKE)":
+                                query = query.like(selected_column, f"%{value}%")
+                            elif operator == "es NULL":
+                                query = query.is_(selected_column, 'null')
+                            elif operator == "no es NULL":
+                                query = query.not_.is_(selected_column, 'null')
+                            return query
                         
-                        while True:
-                            result = query.range(offset, offset + limit - 1).execute()
-                            if not result.data:
-                                break
-                            ids_to_delete.extend([r['id'] for r in result.data])
-                            if len(result.data) < limit:
-                                break
-                            offset += limit
+                        # Obtener todos los IDs con paginación por id
+                        ids_to_delete = [r['id'] for page in paginar_por_id(supabase, 'id', filtros=filtro)
+                                         for r in page]
                         
-                        # Eliminar
-                        deleted = 0
-                        for id_del in ids_to_delete:
-                            try:
-                                supabase.table('consolidated_orders').delete().eq('id', id_del).execute()
-                                deleted += 1
-                            except:
-                                pass
+                        # Eliminar en lotes de 100 (en paralelo, con reintentos)
+                        deleted = eliminar_por_ids(supabase, ids_to_delete)
                         
                         st.success(f"✅ Eliminados {deleted} registros")
                     except Exception as e:
@@ -208,32 +177,16 @@ with tab3:
         if st.button("🗑️ Eliminar", key="del_date"):
             with st.spinner("Eliminando..."):
                 try:
-                    # Obtener IDs en el rango
-                    ids_to_delete = []
-                    offset = 0
-                    limit = 1000
-                    
-                    while True:
-                        result = supabase.table('consolidated_orders').select('id')\
-                            .gte(date_column, str(fecha_inicio))\
-                            .lte(date_column, str(fecha_fin))\
-                            .range(offset, offset + limit - 1).execute()
-                        
-                        if not result.data:
-                            break
-                        ids_to_delete.extend([r['id'] for r in result.data])
-                        if len(result.data) < limit:
-                            break
-                        offset += limit
+                    # Obtener IDs en el rango (paginación por id)
+                    ids_to_delete = [
+                        r['id'] for page in paginar_por_id(
+                            supabase, 'id',
+                            filtros=lambda query: query.gte(date_column, str(fecha_inicio)).lte(date_column, str(fecha_fin))
+                        ) for r in page
+                    ]
                     
-                    # Eliminar
-                    deleted = 0
-                    for id_del in ids_to_delete:
-                        try:
-                            supabase.table('consolidated_orders').delete().eq('id', id_del).execute()
-                            deleted += 1
-                        except:
-                            pass
+                    # Eliminar en lotes de 100 (en paralelo, con reintentos)
+                    deleted = eliminar_por_ids(supabase, ids_to_delete)
                     
                     st.success(f"✅ Eliminados {deleted} registros del {fecha_inicio} al {fecha_fin}")
                 except Exception as e:
@@ -8,6 +8,8 @@ import pandas as pd
 from supabase import create_client
 import config
 import time
+from modulos.cache_reportes import invalidar_reportes
+from modulos.consultas import paginar_por_id
 
 st.set_page_config(page_title="⚠️ Eliminar y Recargar", layout="wide")
 
@@ -23,23 +25,8 @@ st.header("📊 Estado actual")
 cxp_accounts = ['3-VEENDELO', '8-FABORCARGO', '2-MEGATIENDA SPA']
 
 for account in cxp_accounts:
-    # Contar TODOS los registros usando paginación
-    total_count = 0
-    offset = 0
-    limit = 1000
-    
-    while True:
-        result = supabase.table('consolidated_orders').select('id').eq('account_name', account).range(offset, offset + limit - 1).execute()
-        
-        if not result.data:
-            break
-            
-        total_count += len(result.data)
-        
-        if len(result.data) < limit:
-            break
-            
-        offset += limit
+    # Contar TODOS los registros usando paginación por id
+    total_count = sum(len(page) for page in paginar_por_id(supabase, 'id', cuentas=account))
     
     st.write(f"• {account}: {total_count} registros")
 
@@ -59,23 +46,9 @@ if st.checkbox("⚠️ Quiero eliminar TODOS los registros de estas cuentas"):
                 total_deleted = 0
                 
                 for account in cxp_accounts:
-                    # Obtener TODOS los IDs usando paginación
-                    ids_to_delete = []
-                    offset = 0
-                    limit = 1000
-                    
-                    while True:
-                        result = supabase.table('consolidated_orders').select('id').eq('account_name', account).range(offset, offset + limit - 1).execute()
-                        
-                        if not result.data:
-                            break
-                            
-                        ids_to_delete.extend([r['id'] for r in result.data])
-                        
-                        if len(result.data) < limit:
-                            break
-                            
-                        offset += limit
+                    # Obtener TODOS los IDs usando paginación por id
+                    ids_to_delete = [r['id'] for page in paginar_por_id(supabase, 'id', cuentas=account)
+                                     for r in page]
                     
                     if ids_to_delete:
                         # Eliminar en lotes
@@ -90,6 +63,7 @@ if st.checkbox("⚠️ Quiero eliminar TODOS los registros de estas cuentas"):
                                     pass
                             time.sleep(0.1)  # Evitar saturar API
                         
+                        invalidar_reportes(supabase, [account])
                         st.success(f"✅ {account}: {len(ids_to_delete)} registros eliminados")
                 
                 st.success(f"✅ TOTAL ELIMINADOS: {total_deleted} registros")
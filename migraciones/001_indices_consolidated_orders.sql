@@ -0,0 +1,60 @@
+-- Migración 001: índices de los filtros frecuentes de consolidated_orders
+-- Búsquedas por ID del Consolidador, Validador y Date Update (.in_() / .eq()
+-- sobre order_id, prealert_id, asignacion, con account_name en CXP) y filtros
+-- por cuenta y fecha de los scripts de actualización (logistics_date, cxp_date).
+-- Los reportes usan además idx_consolidated_orders_cuenta_fecha_reporte
+-- (setup_fecha_reporte.sql) y las búsquedas masivas los índices *_key
+-- (setup_claves_id.sql).
+--
+-- Los filtros solo por account_name usan los índices compuestos de abajo
+-- (account_name es su primera columna); no hace falta uno propio.
+--
+-- Crear un índice bloquea las escrituras en la tabla mientras se construye:
+-- ejecutar fuera del horario de carga. Se puede ejecutar más de una vez.
+-- Planes de cada consulta: python -m benchmarks.planes_consultas
+
+CREATE TABLE IF NOT EXISTS migraciones_aplicadas (
+    version TEXT PRIMARY KEY,
+    descripcion TEXT NOT NULL,
+    aplicada TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE migraciones_aplicadas DISABLE ROW LEVEL SECURITY;
+
+-- order_id: el upsert on_conflict='order_id' ya exige un índice único en la
+-- mayoría de las instalaciones; solo se crea si ningún índice empieza por order_id
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_index indice
+        JOIN pg_attribute columna
+          ON columna.attrelid = indice.indrelid AND columna.attnum = indice.indkey[0]
+        WHERE indice.indrelid = 'consolidated_orders'::regclass
+          AND columna.attname = 'order_id'
+    ) THEN
+        CREATE INDEX idx_consolidated_orders_order_id ON consolidated_orders(order_id);
+    END IF;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_prealert_id ON consolidated_orders(prealert_id);
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_asignacion ON consolidated_orders(asignacion);
+
+-- Cuenta y rango de fechas (Anicam: logistics_date, Chilexpress: cxp_date)
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_cuenta_logistics_date
+    ON consolidated_orders(account_name, logistics_date);
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_cuenta_cxp_date
+    ON consolidated_orders(account_name, cxp_date);
+
+ANALYZE consolidated_orders;
+
+INSERT INTO migraciones_aplicadas (version, descripcion)
+VALUES ('001', 'Índices de IDs y de cuenta + fecha en consolidated_orders')
+ON CONFLICT (version) DO NOTHING;
+
+-- Verificar
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'consolidated_orders'
+ORDER BY indexname;
@@ -0,0 +1,32 @@
+-- Migración 002: índices parciales del reporte de Reembolsos Meli
+-- modulos/reportes/reembolsos_meli.py pide
+--     order_status_meli = 'refunded' AND refunded_date BETWEEN inicio AND fin
+-- ordenado por id. Las órdenes reembolsadas son una parte chica de la tabla:
+-- un índice parcial guarda solo esas filas, es mucho más chico que uno sobre
+-- toda la tabla y no se toca al escribir órdenes aprobadas o canceladas.
+-- refunded_date solo tiene valor en órdenes reembolsadas, así que el segundo
+-- índice (para filtros por refunded_date sin el estado) también es chico.
+--
+-- Requiere migraciones/001_indices_consolidated_orders.sql (tabla migraciones_aplicadas).
+
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_reembolsos
+    ON consolidated_orders(refunded_date, id)
+    WHERE order_status_meli = 'refunded';
+
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_refunded_date
+    ON consolidated_orders(refunded_date)
+    WHERE refunded_date IS NOT NULL;
+
+ANALYZE consolidated_orders;
+
+INSERT INTO migraciones_aplicadas (version, descripcion)
+VALUES ('002', 'Índices parciales de órdenes reembolsadas')
+ON CONFLICT (version) DO NOTHING;
+
+-- Verificar: tamaño de cada índice parcial frente a la tabla
+SELECT indexrelname AS indice,
+       pg_size_pretty(pg_relation_size(indexrelid)) AS tamano,
+       pg_size_pretty(pg_relation_size(relid)) AS tamano_tabla
+FROM pg_stat_user_indexes
+WHERE relname = 'consolidated_orders'
+  AND indexrelname IN ('idx_consolidated_orders_reembolsos', 'idx_consolidated_orders_refunded_date');
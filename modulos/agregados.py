@@ -0,0 +1,227 @@
+"""
+Módulo de Agregados Diarios
+Resumen del Reporte Global por cuenta × día, guardado en Supabase
+
+El Reporte Global necesita sus métricas (conteos, Amazon, Meli USD, Utilidad
+GSS, Bodegal...) sobre todas las órdenes del período. En vez de traer y
+calcular cada orden cada vez, la tabla agregados_diarios (setup_agregados.sql)
+guarda una fila por cuenta y día con las sumas ya calculadas, y el resumen de
+un mes son unos cientos de filas. El detalle por orden solo se carga si el
+usuario lo pide.
+
+Cobertura: agregados_meses tiene una fila por cuenta y mes calculado, con
+las TRM que usó. Un mes que no está (o con otras TRM) se calcula completo
+desde consolidated_orders con el mismo cálculo del reporte y se guarda.
+Después, los días que cambian los marca la base de datos: un trigger sobre
+consolidated_orders (setup_agregados.sql) anota en agregados_pendientes la
+cuenta y fecha de reporte de cada fila escrita, antes y después del cambio.
+Quien escribe órdenes no hace nada más. Al consultar un período,
+resumen_periodo() toma los días pendientes de cada mes y recalcula solo esos
+días con las órdenes que tienen ahora.
+
+Las tablas tienen RLS (solo lectura con la clave anon): los días pendientes se
+toman y lo recalculado se guarda con las funciones de setup_agregados.sql
+(tomar_agregados_pendientes, guardar_agregados, devolver_agregados_pendientes).
+Si faltan, resumen_periodo() retorna None y el reporte usa el detalle.
+"""
+
+import calendar
+import logging
+from datetime import date
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+from modulos.consultas import cargar_registros
+
+logger = logging.getLogger(__name__)
+
+TABLA_DIAS = 'agregados_diarios'
+TABLA_MESES = 'agregados_meses'
+
+# Métricas por cuenta y día (columnas de agregados_diarios)
+METRICAS = ['registros', 'ordenes', 'aprobadas', 'reembolsadas', 'amazon', 'meli_usd',
+            'utilidad_gss', 'bodegal', 'socio_cuenta', 'impuesto_facturacion']
+
+COLUMNAS_DIAS = ['account_name', 'fecha'] + METRICAS
+
+# Columnas del reporte que se suman en cada métrica
+SUMAS = {
+    'amazon': 'Amazon',
+    'meli_usd': 'Meli_USD',
+    'utilidad_gss': 'Utilidad_Gss',
+    'bodegal': 'Bodegal',
+    'socio_cuenta': 'Socio_cuenta',
+    'impuesto_facturacion': 'Impuesto_facturacion',
+}
+
+
+def agregar(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Suma por cuenta y día un DataFrame calculado del Reporte Global"""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=COLUMNAS_DIAS)
+
+    estado = df['order_status_meli']
+    base = pd.DataFrame({
+        'account_name': df['account_name'],
+        'fecha': pd.to_datetime(df['fecha_unificada'], errors='coerce').dt.strftime('%Y-%m-%d'),
+        'registros': 1,
+        'ordenes': df['order_id'].notna().astype(int),
+        'aprobadas': (estado == 'approved').astype(int),
+        'reembolsadas': (estado == 'refunded').astype(int),
+    })
+    for metrica, columna in SUMAS.items():
+        base[metrica] = pd.to_numeric(df[columna], errors='coerce').fillna(0) if columna in df.columns else 0.0
+
+    agregados = base.groupby(['account_name', 'fecha'], as_index=False)[METRICAS].sum()
+    return agregados[COLUMNAS_DIAS]
+
+
+def _mes(fecha) -> date:
+    return date(fecha.year, fecha.month, 1)
+
+
+def _fin_mes(mes: date) -> date:
+    return mes.replace(day=calendar.monthrange(mes.year, mes.month)[1])
+
+
+def _meses_entre(fecha_inicio, fecha_fin) -> List[date]:
+    meses = []
+    mes = _mes(fecha_inicio)
+    while mes <= fecha_fin:
+        meses.append(mes)
+        mes = date(mes.year + 1, 1, 1) if mes.month == 12 else date(mes.year, mes.month + 1, 1)
+    return meses
+
+
+def _clave_trm(trm_dict: dict) -> str:
+    return ';'.join(f"{pais}={float(valor)}" for pais, valor in sorted(trm_dict.items()))
+
+
+def _guardar(supabase, borrar: List[dict], dias: pd.DataFrame, meses: List[dict]):
+    """
+    Reemplaza en una transacción (guardar_agregados) los rangos de días
+    borrar [{'account_name', 'desde', 'hasta'}] por las filas de dias, y marca
+    como calculados los meses [{'account_name', 'mes', 'trm'}]. Se puede
+    reintentar: repetirlo deja lo mismo.
+    """
+    from modulos.lotes_bd import reintentar
+
+    parametros = {'borrar': borrar, 'dias': dias.to_dict('records'), 'meses': meses}
+    reintentar(lambda: supabase.rpc('guardar_agregados', parametros).execute())
+
+
+def _recalcular_mes(supabase, mes: date, cuentas: List[str], trm_dict: dict):
+    """Calcula el mes completo de las cuentas desde consolidated_orders y lo guarda"""
+    from modulos.reportes.reporte_global import preparar_datos  # import aquí: el reporte usa este módulo
+
+    fin = _fin_mes(mes)
+    dias = agregar(preparar_datos(supabase, mes, fin, trm_dict, cuentas=cuentas))
+
+    # Se borra el mes entero: días que ya no tienen órdenes (fechas que cambiaron de mes)
+    borrar = [{'account_name': cuenta, 'desde': str(mes), 'hasta': str(fin)} for cuenta in cuentas]
+    trm = _clave_trm(trm_dict)
+    meses = [{'account_name': cuenta, 'mes': str(mes), 'trm': trm} for cuenta in cuentas]
+    _guardar(supabase, borrar, dias, meses)
+
+
+def _recalcular_dias(supabase, pendientes: List[dict], trm_dict: dict):
+    """
+    Recalcula los días pendientes [{'account_name', 'fecha'}] de un mes: carga
+    las órdenes entre el primer y el último día pendiente de esas cuentas y
+    guarda solo los días pendientes.
+    """
+    from modulos.reportes.reporte_global import preparar_datos
+
+    marcados = {(fila['account_name'], str(fila['fecha'])[:10]) for fila in pendientes}
+    fechas = sorted(fecha for _, fecha in marcados)
+    cuentas = sorted({cuenta for cuenta, _ in marcados})
+    desde, hasta = date.fromisoformat(fechas[0]), date.fromisoformat(fechas[-1])
+    dias = agregar(preparar_datos(supabase, desde, hasta, trm_dict, cuentas=cuentas))
+
+    marcado = [(cuenta, fecha) in marcados for cuenta, fecha in zip(dias['account_name'], dias['fecha'])]
+    dias = dias[marcado]
+
+    # Se borra cada día marcado: los que se quedaron sin órdenes no vuelven
+    borrar = [{'account_name': cuenta, 'desde': fecha, 'hasta': fecha} for cuenta, fecha in sorted(marcados)]
+    _guardar(supabase, borrar, dias, [])
+
+
+def _tomar_pendientes(supabase, mes: date, cuentas: List[str]) -> List[dict]:
+    """
+    Saca de agregados_pendientes los días del mes de las cuentas
+    (tomar_agregados_pendientes los borra y los devuelve). Se toman ANTES de
+    cargar las órdenes: lo que se escriba en medio vuelve a quedar marcado.
+    Sin reintentos: repetirlo no devolvería lo que ya borró.
+    """
+    result = supabase.rpc('tomar_agregados_pendientes', {
+        'cuentas': cuentas, 'desde': str(mes), 'hasta': str(_fin_mes(mes)),
+    }).execute()
+    return result.data or []
+
+
+def _devolver_pendientes(supabase, pendientes: List[dict]):
+    """Vuelve a marcar días tomados que no se alcanzaron a guardar"""
+    if not pendientes:
+        return
+    filas = [{'account_name': fila['account_name'], 'fecha': str(fila['fecha'])[:10]} for fila in pendientes]
+    try:
+        supabase.rpc('devolver_agregados_pendientes', {'dias': filas}).execute()
+    except Exception as e:
+        logger.warning("No se pudieron volver a marcar %d días de agregados pendientes: %s", len(filas), e)
+
+
+def resumen_periodo(supabase, fecha_inicio, fecha_fin, trm_dict: dict,
+                    cuentas: Iterable[str]) -> Optional[pd.DataFrame]:
+    """
+    Agregados por cuenta y día del período (columnas COLUMNAS_DIAS).
+    Antes calcula los meses que no están o tienen otras TRM, y recalcula los
+    días pendientes de los demás.
+    Retorna None si las tablas de agregados no se pueden leer o guardar
+    (el reporte calcula entonces el resumen desde el detalle).
+    """
+    cuentas = list(cuentas)
+    trm = _clave_trm(trm_dict)
+    meses = _meses_entre(fecha_inicio, fecha_fin)
+
+    try:
+        result = supabase.table(TABLA_MESES).select('account_name, mes, trm') \
+            .in_('mes', [str(mes) for mes in meses]).execute()
+        cubiertos = {(fila['account_name'], str(fila['mes'])[:10]) for fila in result.data or []
+                     if fila['trm'] == trm}
+    except Exception as e:
+        logger.warning("Agregados no disponibles: %s", e)
+        return None
+
+    for mes in meses:
+        try:
+            pendientes = _tomar_pendientes(supabase, mes, cuentas)
+        except Exception as e:
+            logger.warning("Agregados no disponibles: %s", e)
+            return None
+        try:
+            sin_calcular = [cuenta for cuenta in cuentas if (cuenta, str(mes)) not in cubiertos]
+            if sin_calcular:
+                _recalcular_mes(supabase, mes, sin_calcular, trm_dict)
+            pendientes_dias = [fila for fila in pendientes if fila['account_name'] not in sin_calcular]
+            if pendientes_dias:
+                _recalcular_dias(supabase, pendientes_dias, trm_dict)
+        except Exception as e:
+            _devolver_pendientes(supabase, pendientes)
+            logger.warning("No se pudieron actualizar los agregados de %s: %s", f"{mes:%Y-%m}", e)
+            return None
+
+    try:
+        resumen = cargar_registros(supabase, COLUMNAS_DIAS, 'fecha', fecha_inicio, fecha_fin,
+                                   cuentas=cuentas, tabla=TABLA_DIAS)
+    except Exception as e:
+        logger.warning("Agregados no disponibles: %s", e)
+        return None
+
+    if resumen.empty:
+        return pd.DataFrame(columns=COLUMNAS_DIAS)
+    resumen = resumen[COLUMNAS_DIAS].copy()
+    resumen['fecha'] = resumen['fecha'].astype(str).str[:10]
+    for metrica in METRICAS:
+        resumen[metrica] = pd.to_numeric(resumen[metrica], errors='coerce').fillna(0)
+    return resumen.sort_values(['fecha', 'account_name'], ignore_index=True)
@@ -6,7 +6,7 @@ import bcrypt
 import secrets
 import hashlib
 from datetime import datetime, timedelta
-from supabase import create_client, Client
+from supabase import Client
 import os
 from typing import Optional, Dict, Any
 
@@ -26,7 +26,9 @@ def get_supabase_client():
     if not url or not key:
         st.error("❌ Configuración de Supabase no encontrada")
         return None
-    return create_client(url, key)
+
+    from modulos.cliente_bd import obtener_cliente
+    return obtener_cliente(url, key)
 
 def hash_password(password: str) -> str:
     """Hashear contraseña con bcrypt"""
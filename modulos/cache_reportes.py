@@ -0,0 +1,119 @@
+"""
+Módulo de Caché de Reportes
+Guarda los DataFrames calculados de cada reporte y los invalida cuando cambian los datos
+
+Cada reporte separa la carga y el cálculo (preparar_datos) de la presentación.
+reporte_en_cache() guarda el resultado de preparar_datos con la clave
+    (reporte, fecha_inicio, fecha_fin, TRM usadas, versión de los datos)
+así volver a generar el mismo período no vuelve a consultar Supabase.
+
+Versión de los datos: la tabla versiones_datos (setup_versiones_datos.sql)
+tiene una fila por ámbito con un token que cambia en cada escritura:
+    - una cuenta (account_name): escrituras del consolidador sobre esa cuenta
+    - '*': escrituras que no saben qué cuentas tocan (updates/deletes por id,
+      actualización de fechas); afectan a todos los reportes
+    - 'trm_actual': cambios de TRM
+Quien escribe en consolidated_orders llama a invalidar_reportes() (descarta
+también el resumen del inicio, modulos/resumen_cuentas.py); quien cambia
+trm_actual, a invalidar_trm(). versiones_datos tiene RLS (solo lectura con la
+clave anon): los tokens se cambian con la función cambiar_versiones de la BD.
+Leer las versiones es un solo request pequeño por reporte. Si la tabla no
+existe o no se puede leer, el reporte se calcula sin caché (nunca desactualizado).
+"""
+
+import logging
+import uuid
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+import pandas as pd
+import streamlit as st
+
+from modulos.resumen_cuentas import invalidar_resumen
+
+logger = logging.getLogger(__name__)
+
+TABLA_VERSIONES = 'versiones_datos'
+FUNCION_VERSIONES = 'cambiar_versiones'
+
+# Ámbitos especiales de versiones_datos
+TODAS_LAS_CUENTAS = '*'
+AMBITO_TRM = 'trm_actual'
+
+# Resultados de reportes que se guardan a la vez (por proceso)
+MAX_REPORTES_EN_CACHE = 50
+
+
+def version_datos(supabase, cuentas: Optional[Iterable[str]] = None) -> Optional[tuple]:
+    """
+    Versión actual de los datos que usa un reporte: tokens de sus cuentas,
+    de '*' y de 'trm_actual'. cuentas=None: todas las cuentas.
+    Retorna None si no se pudo leer versiones_datos.
+    """
+    try:
+        query = supabase.table(TABLA_VERSIONES).select('ambito, version')
+        if cuentas is not None:
+            query = query.in_('ambito', [TODAS_LAS_CUENTAS, AMBITO_TRM] + sorted(set(cuentas)))
+        result = query.execute()
+    except Exception:
+        return None
+    return tuple(sorted((fila['ambito'], fila['version']) for fila in result.data or []))
+
+
+def _cambiar_versiones(supabase, ambitos) -> bool:
+    from modulos.lotes_bd import es_funcion_faltante, reintentar  # import aquí: lotes_bd invalida al escribir
+
+    if not ambitos:
+        return True
+    try:
+        try:
+            reintentar(lambda: supabase.rpc(FUNCION_VERSIONES, {'ambitos': list(ambitos)}).execute())
+        except Exception as e:
+            if not es_funcion_faltante(str(e)):
+                raise
+            # setup_versiones_datos.sql anterior (sin la función ni RLS): escribir la tabla
+            actualizado = datetime.now().isoformat()
+            filas = [{'ambito': ambito, 'version': uuid.uuid4().hex, 'actualizado': actualizado}
+                     for ambito in ambitos]
+            reintentar(lambda: supabase.table(TABLA_VERSIONES).upsert(filas, on_conflict='ambito').execute())
+        return True
+    except Exception as e:
+        logger.warning("No se pudo invalidar la caché de reportes (%s): %s", ', '.join(ambitos), e)
+        return False
+
+
+def invalidar_reportes(supabase, cuentas: Optional[Iterable[str]] = None) -> bool:
+    """
+    Cambia la versión de los datos después de escribir en consolidated_orders.
+    cuentas: account_name afectados (None: no se sabe, afecta a todas las cuentas)
+    """
+    invalidar_resumen()
+    if cuentas is None:
+        return _cambiar_versiones(supabase, [TODAS_LAS_CUENTAS])
+    return _cambiar_versiones(supabase, sorted({str(c) for c in cuentas if c}))
+
+
+def invalidar_trm(supabase) -> bool:
+    """Cambia la versión de las TRM después de actualizar trm_actual"""
+    return _cambiar_versiones(supabase, [AMBITO_TRM])
+
+
+@st.cache_data(max_entries=MAX_REPORTES_EN_CACHE, show_spinner=False)
+def _reporte_calculado(reporte: str, fecha_inicio, fecha_fin, trm: tuple, version: tuple,
+                       _preparar: Callable, _supabase):
+    # Los argumentos con _ no forman parte de la clave
+    return _preparar(_supabase, fecha_inicio, fecha_fin, dict(trm))
+
+
+def reporte_en_cache(supabase, reporte: str, preparar: Callable, fecha_inicio, fecha_fin, trm_dict: dict,
+                     cuentas: Optional[Iterable[str]] = None) -> Optional[pd.DataFrame]:
+    """
+    Resultado de preparar(supabase, fecha_inicio, fecha_fin, trm_dict), desde la caché
+    si los datos de `cuentas` y las TRM no cambiaron desde que se calculó.
+    Cada llamada entrega una copia: el reporte puede modificarla.
+    """
+    version = version_datos(supabase, cuentas)
+    if version is None:
+        return preparar(supabase, fecha_inicio, fecha_fin, trm_dict)
+    trm = tuple(sorted(trm_dict.items()))
+    return _reporte_calculado(reporte, fecha_inicio, fecha_fin, trm, version, preparar, supabase)
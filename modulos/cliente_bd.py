@@ -0,0 +1,212 @@
+"""
+Módulo de Cliente de Base de Datos
+Un solo cliente de Supabase por proceso, con conexiones reutilizadas y medidas
+
+Antes cada reporte, página y módulo llamaba a create_client() en cada render:
+un cliente nuevo con su propio pool HTTP, así que cada consulta abría otra
+conexión TLS. obtener_cliente() entrega siempre el mismo cliente (uno por URL
+y key) y todos sus requests pasan por un único httpx.Client:
+    - pool de conexiones con keep-alive (config.BD_MAX_CONEXIONES,
+      config.BD_KEEPALIVE): la conexión abierta se reutiliza entre consultas,
+      reportes y sesiones de Streamlit
+    - HTTP/2 si el paquete h2 está instalado (varias consultas en paralelo
+      sobre una misma conexión)
+    - respuestas comprimidas (httpx pide gzip/deflate y las descomprime)
+    - timeouts configurables (config.BD_TIMEOUT, config.BD_TIMEOUT_CONEXION)
+El transporte cuenta cada request por método y tabla: cantidad, errores,
+tiempo y bytes recibidos (comprimidos). estadisticas() / tabla_estadisticas()
+los muestran en un solo lugar.
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+import pandas as pd
+from supabase import Client, create_client
+
+import config
+
+try:
+    import h2  # noqa: F401 (solo para saber si HTTP/2 está disponible)
+    HTTP2_DISPONIBLE = True
+except ImportError:
+    HTTP2_DISPONIBLE = False
+
+PREFIJO_REST = '/rest/v1/'
+
+_clientes: Dict[Tuple[str, str], Client] = {}
+_transportes: Dict[Tuple[str, str], '_TransporteMedido'] = {}
+_reemplazo: Optional[Client] = None
+_bloqueo = threading.Lock()
+
+_estadisticas: Dict[Tuple[str, str], dict] = {}
+_bloqueo_estadisticas = threading.Lock()
+
+
+def _recurso(url: httpx.URL) -> str:
+    """Tabla o función de un request ('consolidated_orders', 'rpc/mi_funcion')"""
+    ruta = url.path
+    if ruta.startswith(PREFIJO_REST):
+        return ruta[len(PREFIJO_REST):] or '/'
+    return ruta
+
+
+def _registrar(metodo: str, recurso: str, segundos: float, bytes_recibidos: int, error: bool):
+    with _bloqueo_estadisticas:
+        fila = _estadisticas.setdefault((metodo, recurso), {
+            'requests': 0, 'errores': 0, 'segundos': 0.0, 'maximo': 0.0, 'bytes': 0})
+        fila['requests'] += 1
+        fila['errores'] += int(error)
+        fila['segundos'] += segundos
+        fila['maximo'] = max(fila['maximo'], segundos)
+        fila['bytes'] += bytes_recibidos
+
+
+class _FlujoMedido(httpx.SyncByteStream):
+    """Cuerpo de la respuesta que registra el request al terminar de leerse"""
+
+    def __init__(self, flujo, al_cerrar):
+        self._flujo = flujo
+        self._al_cerrar = al_cerrar
+        self._bytes = 0
+
+    def __iter__(self):
+        for parte in self._flujo:
+            self._bytes += len(parte)
+            yield parte
+
+    def close(self):
+        try:
+            self._flujo.close()
+        finally:
+            if self._al_cerrar:
+                self._al_cerrar(self._bytes)
+                self._al_cerrar = None
+
+
+class _TransporteMedido(httpx.BaseTransport):
+    """HTTPTransport con pool de conexiones que mide cada request"""
+
+    def __init__(self):
+        self._transporte = httpx.HTTPTransport(
+            http2=HTTP2_DISPONIBLE,
+            limits=httpx.Limits(
+                max_connections=config.BD_MAX_CONEXIONES,
+                max_keepalive_connections=config.BD_MAX_CONEXIONES,
+                keepalive_expiry=config.BD_KEEPALIVE,
+            ),
+        )
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        metodo, recurso = request.method, _recurso(request.url)
+        inicio = time.perf_counter()
+        try:
+            respuesta = self._transporte.handle_request(request)
+        except Exception:
+            _registrar(metodo, recurso, time.perf_counter() - inicio, 0, error=True)
+            raise
+
+        error = respuesta.status_code >= 400
+        respuesta.stream = _FlujoMedido(
+            respuesta.stream,
+            lambda bytes_recibidos: _registrar(metodo, recurso, time.perf_counter() - inicio,
+                                               bytes_recibidos, error)
+        )
+        return respuesta
+
+    def conexiones_abiertas(self) -> int:
+        return len(getattr(self._transporte._pool, 'connections', []))
+
+    def close(self):
+        self._transporte.close()
+
+
+def _crear_cliente(url: str, key: str) -> Tuple[Client, Optional[_TransporteMedido]]:
+    transporte = _TransporteMedido()
+    http = httpx.Client(
+        transport=transporte,
+        timeout=httpx.Timeout(config.BD_TIMEOUT, connect=config.BD_TIMEOUT_CONEXION),
+        follow_redirects=True,
+    )
+    try:
+        from supabase import ClientOptions
+        opciones = ClientOptions(httpx_client=http, postgrest_client_timeout=config.BD_TIMEOUT)
+    except (ImportError, TypeError):
+        # supabase sin httpx_client en ClientOptions (versiones 1.x): cliente normal
+        http.close()
+        return create_client(url, key), None
+    return create_client(url, key, options=opciones), transporte
+
+
+def obtener_cliente(url: Optional[str] = None, key: Optional[str] = None) -> Client:
+    """
+    Cliente de Supabase compartido por todo el proceso.
+    Sin argumentos usa config.SUPABASE_URL y config.SUPABASE_KEY.
+    """
+    if _reemplazo is not None:
+        return _reemplazo
+
+    clave = (url or config.SUPABASE_URL, key or config.SUPABASE_KEY)
+    cliente = _clientes.get(clave)
+    if cliente is None:
+        with _bloqueo:
+            cliente = _clientes.get(clave)
+            if cliente is None:
+                cliente, transporte = _crear_cliente(*clave)
+                _clientes[clave] = cliente
+                if transporte is not None:
+                    _transportes[clave] = transporte
+    return cliente
+
+
+def reemplazar_cliente(cliente: Optional[Client]) -> Optional[Client]:
+    """
+    Hace que obtener_cliente() devuelva `cliente` (None vuelve al normal).
+    Para benchmarks y pruebas. Retorna el reemplazo anterior.
+    """
+    global _reemplazo
+    anterior, _reemplazo = _reemplazo, cliente
+    return anterior
+
+
+def estadisticas() -> dict:
+    """
+    Requests hechos desde que arrancó el proceso (o desde reiniciar_estadisticas):
+    {'requests', 'errores', 'segundos', 'bytes', 'conexiones_abiertas',
+     'por_recurso': {(método, tabla): {'requests', 'errores', 'segundos', 'maximo', 'bytes'}}}
+    """
+    with _bloqueo_estadisticas:
+        por_recurso = {clave: dict(fila) for clave, fila in _estadisticas.items()}
+    return {
+        'requests': sum(fila['requests'] for fila in por_recurso.values()),
+        'errores': sum(fila['errores'] for fila in por_recurso.values()),
+        'segundos': sum(fila['segundos'] for fila in por_recurso.values()),
+        'bytes': sum(fila['bytes'] for fila in por_recurso.values()),
+        'conexiones_abiertas': sum(t.conexiones_abiertas() for t in list(_transportes.values())),
+        'por_recurso': por_recurso,
+    }
+
+
+def tabla_estadisticas() -> pd.DataFrame:
+    """Estadísticas por método y tabla, de más a menos tiempo total"""
+    filas = [{
+        'Método': metodo,
+        'Tabla': recurso,
+        'Requests': fila['requests'],
+        'Errores': fila['errores'],
+        'Tiempo total (s)': round(fila['segundos'], 3),
+        'Promedio (ms)': round(fila['segundos'] / fila['requests'] * 1000, 1),
+        'Máximo (ms)': round(fila['maximo'] * 1000, 1),
+        'KB recibidos': round(fila['bytes'] / 1024, 1),
+    } for (metodo, recurso), fila in estadisticas()['por_recurso'].items()]
+    if not filas:
+        return pd.DataFrame(columns=['Método', 'Tabla', 'Requests', 'Errores', 'Tiempo total (s)',
+                                     'Promedio (ms)', 'Máximo (ms)', 'KB recibidos'])
+    return pd.DataFrame(filas).sort_values('Tiempo total (s)', ascending=False, ignore_index=True)
+
+
+def reiniciar_estadisticas():
+    with _bloqueo_estadisticas:
+        _estadisticas.clear()
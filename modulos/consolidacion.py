@@ -0,0 +1,648 @@
+"""
+Módulo de Consolidación de Archivos
+Normalización de IDs y cruces (joins) entre Drapify, Logistics, Aditionals y CXP
+
+Las funciones escalares (clean_id, clean_id_aggressive, ...) se mantienen con
+la misma semántica que usaba el Consolidador fila por fila. Las versiones
+vectorizadas operan sobre columnas completas y los cruces se resuelven con
+índices hash (una pasada por archivo) en lugar de iterrows + .loc por celda.
+"""
+
+import re
+import math
+import numpy as np
+import pandas as pd
+from datetime import datetime, date
+from typing import Dict, List, Optional
+
+
+# Prefijos de asignación por cuenta (Asignacion = prefijo + Serial#)
+PREFIJOS_ASIGNACION = {
+    '1-TODOENCARGO-CO': 'TDC',
+    '2-MEGATIENDA SPA': 'MEGA',
+    '4-MEGA TIENDAS PERUANAS': 'MGA-PE',
+    '5-DETODOPARATODOS': 'DTPT',
+    '6-COMPRAFACIL': 'CFA',
+    '7-COMPRA-YA': 'CPYA',
+    '8-FABORCARGO': 'FBC',
+    '3-VEENDELO': 'VEEN'
+}
+
+LOGISTICS_COLUMNS = [
+    'Guide Number', 'Order number', 'Reference', 'SAP Code', 'Invoice',
+    'Status', 'FOB', 'Unit', 'Weight', 'Length', 'Width', 'Height',
+    'Insurance', 'Logistics', 'Duties Prealert', 'Duties Pay',
+    'Duty Fee', 'Saving', 'Total', 'Description', 'Shipper', 'Phone',
+    'Consignee', 'Identification', 'Country', 'State', 'City',
+    'Address', 'Master Guide', 'Tariff Position', 'External Id'
+]
+
+ADITIONALS_COLUMNS = ['Order Id', 'Item', 'Reference', 'Description', 'Quantity', 'UnitPrice', 'Total']
+ADITIONALS_TEXTO = ['Item', 'Reference', 'Description']
+ADITIONALS_NUMERICAS = ['Quantity', 'UnitPrice', 'Total']
+
+CXP_CAMPOS = ['ot_number', 'date', 'ref_number', 'consignee', 'co_aereo',
+              'arancel', 'iva', 'handling', 'dest_delivery', 'amt_due', 'goods_value']
+CXP_CAMPOS_NUMERICOS = ['co_aereo', 'arancel', 'iva', 'handling', 'dest_delivery', 'amt_due', 'goods_value']
+
+# Claves normalizadas guardadas en consolidated_orders (clave -> columna origen).
+# Usan la regla de clean_id_aggressive, así '123, 123.0 y 123 dan la misma clave.
+CLAVES_ID = {
+    'order_id_key': 'order_id',
+    'prealert_id_key': 'prealert_id',
+    'asignacion_key': 'asignacion',
+}
+
+# Tipos de columna para preparar registros hacia la BD
+COLUMNAS_ENTERAS = ['system_number', 'quantity', 'iva', 'ica']
+
+COLUMNAS_NUMERICAS = [
+    'unit_price', 'declare_value', 'meli_fee', 'fuente',
+    'senders_cost', 'gross_amount', 'net_received_amount',
+    'digital_verification', 'net_real_amount', 'logistic_weight_lbs',
+    'logistics_fob', 'logistics_weight', 'logistics_length',
+    'logistics_width', 'logistics_height', 'logistics_insurance',
+    'logistics_logistics', 'logistics_duties_prealert',
+    'logistics_duties_pay', 'logistics_duty_fee', 'logistics_saving',
+    'logistics_total',
+    'aditionals_quantity', 'aditionals_unitprice', 'aditionals_total',
+    'cxp_co_aereo', 'cxp_arancel', 'cxp_iva', 'cxp_handling',
+    'cxp_dest_delivery', 'cxp_amt_due', 'cxp_goods_value'
+]
+
+COLUMNAS_FECHA = ['logistics_date', 'date_created', 'refunded_date', 'cxp_date']
+
+GARBAGE_VALUES = [
+    'XXXXXXXXXX', 'XXXXXXX', 'XXXXX', 'XXX',
+    'N/A', 'n/a', 'NA', 'na',
+    '-', '--', '---',
+    '#N/A', '#VALUE!', '#REF!',
+    'null', 'NULL', 'Null',
+    '', ' '
+]
+
+
+# ============================================================================
+# FUNCIONES ESCALARES (un valor)
+# ============================================================================
+
+def format_date_standard(date_value, input_format="auto"):
+    """Convierte fechas a formato YYYY-MM-DD"""
+    if pd.isna(date_value) or date_value == "":
+        return None
+
+    date_str = str(date_value).strip()
+
+    try:
+        if re.match(r'\d{4}-\d{2}-\d{2}\s', date_str):
+            return date_str.split(' ')[0]
+
+        if re.match(r'\d{1,2}/\d{1,2}/\d{4}', date_str):
+            parts = date_str.split('/')
+            if len(parts) == 3:
+                month = parts[0].zfill(2)
+                day = parts[1].zfill(2)
+                year = parts[2]
+                return f"{year}-{month}-{day}"
+
+        if re.match(r'\d{4}-\d{2}-\d{2}$', date_str):
+            return date_str
+
+    except:
+        pass
+
+    return date_str
+
+
+def clean_id(value):
+    """Limpia y normaliza IDs removiendo comillas y espacios"""
+    if pd.isna(value):
+        return None
+    str_value = str(value).strip()
+    if str_value.startswith("'"):
+        str_value = str_value[1:]
+    if str_value.endswith('.0'):
+        str_value = str_value[:-2]
+    return str_value if str_value and str_value != 'nan' else None
+
+
+def clean_id_aggressive(value):
+    """Limpieza más agresiva para IDs corruptos"""
+    if pd.isna(value):
+        return None
+
+    str_value = str(value).strip()
+    str_value = str_value.replace("'", "")
+    str_value = str_value.replace('"', "")
+    str_value = str_value.replace(" ", "")
+    str_value = str_value.replace("\t", "")
+    str_value = str_value.replace("\n", "")
+    str_value = str_value.replace(".", "")
+
+    if str_value.endswith('0') and len(str_value) > 1:
+        original = str(value)
+        if '.0' in original:
+            str_value = str_value[:-1]
+
+    return str_value if str_value and str_value != 'nan' else None
+
+
+def normalize_id_for_db_match(value):
+    """Normaliza IDs para hacer match con la base de datos que tiene formato 'ID"""
+    if pd.isna(value):
+        return None
+
+    # Convertir a string y limpiar espacios
+    str_value = str(value).strip()
+
+    # Si está vacío o es 'nan', retornar None
+    if not str_value or str_value.lower() == 'nan':
+        return None
+
+    # Remover .0 si es un número entero (1049072.0 -> 1049072)
+    if str_value.endswith('.0'):
+        str_value = str_value[:-2]
+
+    # NO agregar comilla aquí - la dejaremos para el matching
+    return str_value
+
+
+def clean_numeric_value(value):
+    """Limpia valores numéricos, eliminando basura como 'XXXXXXXXXX'"""
+    if pd.isna(value) or value is None:
+        return None
+
+    str_value = str(value).strip()
+
+    if str_value in GARBAGE_VALUES:
+        return None
+
+    try:
+        clean_value = str_value.replace('$', '').replace(',', '').replace(' ', '')
+        return float(clean_value)
+    except:
+        return None
+
+
+def calculate_asignacion(account_name, serial_number):
+    """Calcula la asignación basada en el account_name y serial_number"""
+    if pd.isna(account_name) or pd.isna(serial_number):
+        return None
+
+    clean_serial = clean_id(serial_number)
+    if not clean_serial:
+        return None
+
+    prefix = PREFIJOS_ASIGNACION.get(account_name, '')
+    return f"{prefix}{clean_serial}" if prefix else clean_serial
+
+
+def prepare_value_for_db(key, value):
+    """Prepara un valor para la base de datos según el tipo declarado de su columna"""
+    if pd.isna(value) or value is None:
+        return None
+    elif isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    elif key in COLUMNAS_FECHA:
+        if isinstance(value, (pd.Timestamp, datetime)):
+            return value.strftime('%Y-%m-%d')
+        elif isinstance(value, date):
+            return value.strftime('%Y-%m-%d')
+        elif isinstance(value, str) and value and value != 'nan':
+            return value
+        else:
+            return None
+    elif isinstance(value, (pd.Timestamp, datetime)):
+        return value.strftime('%Y-%m-%d') if hasattr(value, 'strftime') else str(value)
+    elif key in COLUMNAS_ENTERAS:
+        try:
+            clean_val = clean_numeric_value(value)
+            if clean_val is not None and not math.isnan(clean_val) and not math.isinf(clean_val):
+                return int(float(clean_val))
+            else:
+                return None
+        except:
+            return None
+    elif key in COLUMNAS_NUMERICAS:
+        clean_val = clean_numeric_value(value)
+        if clean_val is not None and not math.isnan(clean_val) and not math.isinf(clean_val):
+            return clean_val
+        else:
+            return None
+    else:
+        str_value = str(value)
+        if str_value == 'nan' or str_value == 'None':
+            return None
+        else:
+            return str_value
+
+
+def prepare_record_for_db(record):
+    """Prepara un registro para inserción en la base de datos"""
+    return {key: prepare_value_for_db(key, value) for key, value in record.items()}
+
+
+def detect_cxp_column(df, target_field):
+    """
+    Detecta inteligentemente la columna correcta para un campo CXP
+    NO depende de posiciones, solo de nombres y patrones
+    """
+    column_patterns = {
+        'ot_number': ['OT Number', 'OT_Number', 'ot number', 'OT#', 'OT #', 'Order Transfer'],
+        'date': ['Date', 'DATE', 'Fecha', 'date', 'Creation Date'],
+        'ref_number': ['Ref #', 'Ref#', 'REF #', 'Reference', 'ref_number', 'Referencia', 'REF#'],
+        'consignee': ['Consignee', 'CONSIGNEE', 'Destinatario', 'Recipient'],
+        'co_aereo': ['CO Aereo', 'CO_Aereo', 'co aereo', 'CO AEREO', 'Aereo', 'Air Cost', 'Costo Aereo'],
+        'arancel': ['Arancel', 'ARANCEL', 'Tariff', 'Duty', 'Customs Duty', 'Impuesto'],
+        'iva': ['IVA', 'iva', 'I.V.A.', 'Tax', 'VAT', 'Value Added Tax'],
+        'handling': ['Handling', 'HANDLING', 'Manejo', 'Handle', 'Processing'],
+        'dest_delivery': ['Dest. Delivery', 'Dest Delivery', 'Destination Delivery', 'Delivery', 'Entrega Destino'],
+        'amt_due': ['Amt. Due', 'Amt Due', 'Amount Due', 'Total Due', 'Monto Adeudado', 'Total'],
+        'goods_value': ['Goods Value', 'GOODS VALUE', 'Valor Mercancia', 'Value', 'Merchandise Value']
+    }
+
+    patterns = column_patterns.get(target_field, [])
+
+    # Primero buscar coincidencia exacta
+    for pattern in patterns:
+        if pattern in df.columns:
+            return pattern
+
+    # Luego buscar coincidencia parcial (case-insensitive)
+    for col in df.columns:
+        col_lower = col.lower().strip()
+        for pattern in patterns:
+            pattern_lower = pattern.lower().strip()
+            if pattern_lower in col_lower or col_lower in pattern_lower:
+                return col
+
+    return None
+
+
+def claves_id(registro) -> Dict[str, Optional[str]]:
+    """Calcula las claves normalizadas de un registro de consolidated_orders"""
+    return {clave: clean_id_aggressive(registro.get(columna)) for clave, columna in CLAVES_ID.items()}
+
+
+def detectar_columnas_cxp(cxp_df) -> Dict[str, str]:
+    """Detecta el mapeo campo -> columna para todos los campos CXP"""
+    column_mappings = {}
+    for field in CXP_CAMPOS:
+        detected_col = detect_cxp_column(cxp_df, field)
+        if detected_col:
+            column_mappings[field] = detected_col
+    return column_mappings
+
+
+# ============================================================================
+# FUNCIONES VECTORIZADAS (columna completa)
+# ============================================================================
+
+def _como_texto(serie: pd.Series):
+    """Retorna (str(valor) por elemento, máscara de nulos) sin tocar los nulos"""
+    nulos = serie.isna().to_numpy()
+    texto = serie.astype(object).where(~nulos, '').astype(str)
+    return texto, nulos
+
+
+def _columna_o_vacia(df: pd.DataFrame, columna: str) -> pd.Series:
+    """Equivalente vectorizado de row.get(columna, '')"""
+    if columna in df.columns:
+        return df[columna]
+    return pd.Series('', index=df.index, dtype=object)
+
+
+def _resultado(valores, invalidos, index) -> pd.Series:
+    """Construye una Series object con None donde la clave no es válida"""
+    salida = np.array(valores, dtype=object)
+    salida[np.asarray(invalidos, dtype=bool)] = None
+    return pd.Series(salida, index=index, dtype=object)
+
+
+def clean_id_series(serie: pd.Series) -> pd.Series:
+    """Versión vectorizada de clean_id"""
+    texto, nulos = _como_texto(serie)
+    limpio = texto.str.strip()
+    limpio = limpio.where(~limpio.str.startswith("'"), limpio.str[1:])
+    limpio = limpio.where(~limpio.str.endswith('.0'), limpio.str[:-2])
+    invalidos = nulos | (limpio == '').to_numpy() | (limpio == 'nan').to_numpy()
+    return _resultado(limpio, invalidos, serie.index)
+
+
+def clean_id_aggressive_series(serie: pd.Series) -> pd.Series:
+    """Versión vectorizada de clean_id_aggressive"""
+    texto, nulos = _como_texto(serie)
+    limpio = texto.str.strip().str.replace(r"['\" \t\n.]", "", regex=True)
+    recortar = (
+        limpio.str.endswith('0')
+        & (limpio.str.len() > 1)
+        & texto.str.contains('.0', regex=False)
+    )
+    limpio = limpio.where(~recortar, limpio.str[:-1])
+    invalidos = nulos | (limpio == '').to_numpy() | (limpio == 'nan').to_numpy()
+    return _resultado(limpio, invalidos, serie.index)
+
+
+def normalize_id_for_db_match_series(serie: pd.Series) -> pd.Series:
+    """Versión vectorizada de normalize_id_for_db_match"""
+    texto, nulos = _como_texto(serie)
+    limpio = texto.str.strip()
+    invalidos = nulos | (limpio == '').to_numpy() | (limpio.str.lower() == 'nan').to_numpy()
+    limpio = limpio.where(~limpio.str.endswith('.0'), limpio.str[:-2])
+    return _resultado(limpio, invalidos, serie.index)
+
+
+def calculate_asignacion_series(account_name: pd.Series, serial_number: pd.Series) -> pd.Series:
+    """Versión vectorizada de calculate_asignacion"""
+    serial = clean_id_series(serial_number)
+    prefijo = account_name.map(PREFIJOS_ASIGNACION).fillna('')
+    asignacion = (prefijo.astype(object) + serial.where(serial.notna(), '')).astype(object)
+    invalidos = account_name.isna().to_numpy() | serial.isna().to_numpy()
+    return _resultado(asignacion, invalidos, account_name.index)
+
+
+# ============================================================================
+# ÍNDICES HASH Y CRUCES
+# ============================================================================
+
+def _indice_ultimo(claves: pd.Series) -> pd.Series:
+    """Índice clave -> posición de fila; ante claves repetidas gana la última (como dict[k] = row)"""
+    posiciones = pd.Series(np.arange(len(claves)), index=claves.to_numpy())
+    posiciones = posiciones[claves.notna().to_numpy()]
+    return posiciones[~posiciones.index.duplicated(keep='last')]
+
+
+def _buscar(claves: pd.Series, indice: pd.Series) -> np.ndarray:
+    """Busca cada clave en el índice; retorna posiciones (-1 si no hay match)"""
+    if len(indice) == 0:
+        return np.full(len(claves), -1, dtype=np.int64)
+    posiciones = pd.Index(indice.index).get_indexer(claves.to_numpy())
+    encontrado = posiciones >= 0
+    resultado = np.full(len(claves), -1, dtype=np.int64)
+    resultado[encontrado] = indice.to_numpy()[posiciones[encontrado]]
+    return resultado
+
+
+def _columna_cruzada(valores, posiciones: np.ndarray) -> np.ndarray:
+    """
+    Trae los valores de la fila cruzada (NaN si no hubo match).
+    Columnas numéricas quedan float64, el resto object, igual que
+    asignar celda a celda sobre una columna inicializada en np.nan.
+    """
+    valores = np.asarray(valores)
+    encontrado = posiciones >= 0
+    if valores.dtype.kind in 'iuf':
+        salida = np.full(len(posiciones), np.nan)
+        salida[encontrado] = valores[posiciones[encontrado]].astype(float)
+    else:
+        salida = np.full(len(posiciones), np.nan, dtype=object)
+        salida[encontrado] = valores[posiciones[encontrado]]
+    return salida
+
+
+def cruzar_logistics(consolidated_df: pd.DataFrame, logistics_df: pd.DataFrame,
+                     logistics_date=None) -> Dict[str, int]:
+    """
+    Agrega las columnas logistics_* a consolidated_df (in place).
+
+    Precedencia por fila: order_id -> Reference, order_id -> Order number,
+    prealert_id -> Order number. Retorna los contadores de match.
+    """
+    por_reference = normalize_id_for_db_match_series(_columna_o_vacia(logistics_df, 'Reference'))
+    # Ignorar valores inválidos como "PACKAGE RECALLED FROM UNKNOWN"
+    con_package = por_reference.astype(str).str.upper().str.contains('PACKAGE', regex=False).to_numpy()
+    por_reference = por_reference.where(~con_package, None)
+    por_order_number = normalize_id_for_db_match_series(_columna_o_vacia(logistics_df, 'Order number'))
+
+    indice_reference = _indice_ultimo(por_reference)
+    indice_order_number = _indice_ultimo(por_order_number)
+
+    order_ids = clean_id_aggressive_series(_columna_o_vacia(consolidated_df, 'order_id'))
+    prealert_ids = clean_id_aggressive_series(_columna_o_vacia(consolidated_df, 'prealert_id'))
+
+    pos_reference = _buscar(order_ids, indice_reference)
+    pos_order_number = _buscar(order_ids, indice_order_number)
+    pos_prealert = _buscar(prealert_ids, indice_order_number)
+
+    posiciones = np.where(pos_reference >= 0, pos_reference,
+                          np.where(pos_order_number >= 0, pos_order_number, pos_prealert))
+    por_order_id = (pos_reference >= 0) | (pos_order_number >= 0)
+    por_prealert_id = ~por_order_id & (pos_prealert >= 0)
+
+    if logistics_date:
+        columna_fecha = np.full(len(consolidated_df), np.nan, dtype=object)
+        columna_fecha[posiciones >= 0] = str(logistics_date)
+        consolidated_df['logistics_date'] = columna_fecha
+
+    for col in LOGISTICS_COLUMNS:
+        if col in logistics_df.columns:
+            consolidated_df[f'logistics_{col.lower().replace(" ", "_")}'] = _columna_cruzada(
+                logistics_df[col].to_numpy(), posiciones
+            )
+
+    return {
+        'indexados_reference': len(indice_reference),
+        'indexados_order_number': len(indice_order_number),
+        'por_order_id': int(por_order_id.sum()),
+        'por_prealert_id': int(por_prealert_id.sum()),
+        'sin_match': int((posiciones < 0).sum()),
+    }
+
+
+def _es_falso(valores: np.ndarray) -> np.ndarray:
+    """Evalúa `not valor` elemento a elemento (NaN es verdadero, '' y None falsos)"""
+    if len(valores) == 0:
+        return np.zeros(0, dtype=bool)
+    return np.frompyfunc(lambda v: not v, 1, 1)(valores).astype(bool)
+
+
+def agrupar_aditionals(aditionals_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrupa Aditionals por Order Id limpio, en orden de primera aparición.
+    Quantity/UnitPrice/Total se suman; Item/Reference/Description conservan
+    el primer valor no vacío (o el primero si todos están vacíos).
+    """
+    claves = clean_id_aggressive_series(_columna_o_vacia(aditionals_df, 'Order Id'))
+    validas = claves.notna().to_numpy()
+    codigos, unicos = pd.factorize(claves[validas], sort=False)
+    n_grupos = len(unicos)
+    agrupado = {'Order Id': np.asarray(unicos, dtype=object)}
+
+    for col in ADITIONALS_TEXTO:
+        valores = _columna_o_vacia(aditionals_df, col).to_numpy(dtype=object)[validas]
+        _, primera = np.unique(codigos, return_index=True)
+        elegida = primera.copy()
+        verdaderos = np.flatnonzero(~_es_falso(valores))
+        if len(verdaderos):
+            grupos, primera_verdadera = np.unique(codigos[verdaderos], return_index=True)
+            elegida[grupos] = verdaderos[primera_verdadera]
+        agrupado[col] = valores[elegida]
+
+    for col in ADITIONALS_NUMERICAS:
+        if col in aditionals_df.columns:
+            serie = aditionals_df[col][validas]
+            valores = serie.astype(float).where(serie.notna(), 0.0).to_numpy(dtype=float)
+        else:
+            valores = np.zeros(len(codigos))
+        suma = np.zeros(n_grupos)
+        # np.add.at suma en orden de aparición, igual que el acumulado fila a fila
+        np.add.at(suma, codigos, valores)
+        agrupado[col] = suma
+
+    return pd.DataFrame(agrupado)
+
+
+def cruzar_aditionals(consolidated_df: pd.DataFrame, aditionals_df: pd.DataFrame) -> Dict[str, int]:
+    """Agrega las columnas aditionals_* a consolidated_df (in place) cruzando prealert_id = Order Id"""
+    agrupado = agrupar_aditionals(aditionals_df)
+    indice = pd.Series(np.arange(len(agrupado)), index=agrupado['Order Id'].to_numpy())
+
+    prealert_ids = clean_id_aggressive_series(_columna_o_vacia(consolidated_df, 'prealert_id'))
+    posiciones = _buscar(prealert_ids, indice)
+
+    for col in ADITIONALS_COLUMNS:
+        if col in aditionals_df.columns:
+            consolidated_df[f'aditionals_{col.lower().replace(" ", "_")}'] = _columna_cruzada(
+                agrupado[col].to_numpy(), posiciones
+            )
+
+    return {
+        'matches': int((posiciones >= 0).sum()),
+        'unicos': len(agrupado),
+        'filas_sumadas': len(aditionals_df) - len(agrupado),
+    }
+
+
+def calcular_asignacion_df(consolidated_df: pd.DataFrame) -> Optional[int]:
+    """Calcula la columna Asignacion (in place). Retorna None si faltan columnas base"""
+    if 'account_name' not in consolidated_df.columns or 'Serial#' not in consolidated_df.columns:
+        return None
+    consolidated_df['Asignacion'] = calculate_asignacion_series(
+        consolidated_df['account_name'], consolidated_df['Serial#']
+    )
+    return int(consolidated_df['Asignacion'].notna().sum())
+
+
+def _campo_cxp(cxp_df: pd.DataFrame, column_mappings: Dict[str, str], field: str) -> np.ndarray:
+    """Valores del campo CXP ya transformados (fecha estándar / numérico limpio)"""
+    column_name = column_mappings.get(field)
+    if not column_name or column_name not in cxp_df.columns:
+        return np.full(len(cxp_df), np.nan)
+    valores = cxp_df[column_name]
+    if field == 'date':
+        return valores.map(format_date_standard).to_numpy(dtype=object)
+    if field in CXP_CAMPOS_NUMERICOS:
+        return valores.map(clean_numeric_value).to_numpy(dtype=float, na_value=np.nan)
+    return valores.to_numpy()
+
+
+def cruzar_cxp(consolidated_df: pd.DataFrame, cxp_df: pd.DataFrame,
+               column_mappings: Dict[str, str]) -> Dict[str, int]:
+    """
+    Agrega las columnas cxp_* a consolidated_df (in place) cruzando
+    Ref # = Asignacion. Ante Ref # repetidos gana la última fila.
+    """
+    ref_column = column_mappings['ref_number']
+    claves = clean_id_aggressive_series(cxp_df[ref_column])
+    indice = _indice_ultimo(claves)
+
+    # Transformar solo las filas indexadas del CXP, no cada fila cruzada
+    cxp_unico = cxp_df.iloc[indice.to_numpy()]
+    indice = pd.Series(np.arange(len(indice)), index=indice.index)
+
+    if 'Asignacion' in consolidated_df.columns:
+        asignaciones = clean_id_aggressive_series(consolidated_df['Asignacion'])
+        posiciones = _buscar(asignaciones, indice)
+    else:
+        posiciones = np.full(len(consolidated_df), -1, dtype=np.int64)
+
+    for field in CXP_CAMPOS:
+        valores = _campo_cxp(cxp_unico, column_mappings, field)
+        consolidated_df[f'cxp_{field}'] = _columna_cruzada(valores, posiciones)
+
+    return {
+        'indexados': len(indice),
+        'matches': int((posiciones >= 0).sum()),
+    }
+
+
+# ============================================================================
+# PREPARACIÓN DE REGISTROS PARA LA BD (columna completa)
+# ============================================================================
+
+def _nativo(valor):
+    """Convierte escalares numpy al tipo Python que entrega to_dict('records')"""
+    if isinstance(valor, np.datetime64):
+        return pd.Timestamp(valor)
+    if isinstance(valor, np.timedelta64):
+        return pd.Timedelta(valor)
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+def _preparar_columna(serie: pd.Series, key: str) -> np.ndarray:
+    """
+    Aplica prepare_value_for_db a una columna completa.
+
+    Las columnas con dtype numérico, booleano o de fecha se convierten con
+    operaciones de numpy. Las de texto se resuelven una vez por valor único.
+    Las columnas object mezcladas usan la función escalar celda por celda.
+    """
+    n = len(serie)
+    salida = np.full(n, None, dtype=object)
+    if n == 0:
+        return salida
+
+    if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        # Timestamps: strftime en cualquier columna (antes que la regla de enteros/numéricos)
+        validos = serie.notna().to_numpy()
+        salida[validos] = serie[validos].dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+        return salida
+
+    if pd.api.types.is_bool_dtype(serie.dtype):
+        # 'True'/'False' no es un número válido; solo las columnas de texto lo conservan
+        if key not in COLUMNAS_FECHA and key not in COLUMNAS_ENTERAS and key not in COLUMNAS_NUMERICAS:
+            validos = serie.notna().to_numpy()
+            salida[validos] = [str(v) for v in serie[validos].tolist()]
+        return salida
+
+    if pd.api.types.is_numeric_dtype(serie.dtype):
+        if key in COLUMNAS_FECHA:
+            return salida
+
+        valores = serie.to_numpy(dtype='float64', na_value=np.nan)
+        finitos = np.isfinite(valores)
+
+        if key in COLUMNAS_ENTERAS:
+            salida[finitos] = [int(v) for v in valores[finitos].tolist()]
+        elif key in COLUMNAS_NUMERICAS:
+            salida[finitos] = valores[finitos].tolist()
+        else:
+            # Texto: str() del valor original (entero o float), no del float64
+            originales = serie.tolist()
+            salida[finitos] = [str(originales[i]) for i in np.flatnonzero(finitos)]
+        return salida
+
+    if pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty'):
+        # Solo strings: la preparación depende únicamente del valor, se calcula por valor único
+        codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+        preparados = np.array([prepare_value_for_db(key, u) for u in unicos] + [None], dtype=object)
+        return preparados[codigos]
+
+    salida[:] = [prepare_value_for_db(key, _nativo(v)) for v in serie.tolist()]
+    return salida
+
+
+def preparar_registros_df(df: pd.DataFrame) -> List[Dict]:
+    """
+    Equivalente a [prepare_record_for_db(r) for r in df.to_dict('records')]:
+    cada columna se convierte una sola vez según su tipo declarado (entera,
+    numérica, fecha o texto) y los registros se arman en una sola pasada.
+
+    Las columnas preparadas ya contienen tipos Python nativos, así que los
+    registros se arman con zip en lugar de to_dict (que revisa cada celda).
+    """
+    columnas = list(df.columns)
+    preparadas = [_preparar_columna(df[col], col) for col in columnas]
+    return [dict(zip(columnas, fila)) for fila in zip(*preparadas)] if columnas else [{} for _ in range(len(df))]
@@ -0,0 +1,592 @@
+"""
+Pipeline de Consolidación (Drapify + Logistics + Aditionals + CXP)
+Cruces, formatos y guardado en consolidated_orders sin depender de la interfaz
+
+Las funciones reciben un reporte (modulos/progreso.py) en lugar de llamar a
+st.*: la página del Consolidador usa ReporteStreamlit y la línea de comandos
+ReporteConsola. Ejecución sin navegador (por ejemplo desde cron):
+
+    python -m modulos.consolidar --drapify drapify.xlsx --logistics logistics.xlsx --fecha 2025-08-14
+    python -m modulos.consolidar --drapify drapify.csv --cxp cxp.xlsx --tamano-bloque 10000
+
+Códigos de salida: 0 completado, 1 error, 2 argumentos inválidos,
+3 completado con registros que no se pudieron guardar.
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, datetime
+
+import pandas as pd
+
+# Agregar la carpeta raíz al path para importar config al ejecutar como script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modulos.cache_reportes import invalidar_reportes
+from modulos.consolidacion import (
+    format_date_standard, detectar_columnas_cxp, cruzar_logistics, cruzar_aditionals,
+    calcular_asignacion_df, cruzar_cxp, preparar_registros_df, clean_id_aggressive,
+    LOGISTICS_COLUMNS, ADITIONALS_COLUMNS
+)
+from modulos.lectura_archivos import leer_en_bloques, leer_completo, TAMANO_BLOQUE
+from modulos.lotes_bd import buscar_claves, ejecutar_lotes, dividir_en_lotes
+from modulos.progreso import Reporte, ReporteConsola
+
+SALIDA_OK = 0
+SALIDA_ERROR = 1
+SALIDA_ARGUMENTOS = 2
+SALIDA_PARCIAL = 3
+
+
+# ============================================================================
+# FORMATOS Y NOMBRES DE COLUMNAS
+# ============================================================================
+
+def fix_encoding(text):
+    """Corrige caracteres mal codificados automáticamente"""
+    if pd.isna(text) or not isinstance(text, str):
+        return text
+
+    try:
+        if 'Ã' in text:
+            fixed = text.encode('latin-1').decode('utf-8')
+            return fixed
+    except:
+        pass
+
+    return text
+
+
+def map_column_names(df):
+    """Mapea nombres de columnas del CSV a los nombres de la base de datos"""
+    column_mapping = {
+        'System#': 'system_number',
+        'Serial#': 'serial_number',
+        'order_id': 'order_id',
+        'pack_id': 'pack_id',
+        'ASIN': 'asin',
+        'client_first_name': 'client_first_name',
+        'client_last_name': 'client_last_name',
+        'client_doc_id': 'client_doc_id',
+        'account_name': 'account_name',
+        'date_created': 'date_created',
+        'quantity': 'quantity',
+        'title': 'title',
+        'unit_price': 'unit_price',
+        'logistic_type': 'logistic_type',
+        'address_line': 'address_line',
+        'street_name': 'street_name',
+        'street_number': 'street_number',
+        'city': 'city',
+        'state': 'state',
+        'country': 'country',
+        'receiver_phone': 'receiver_phone',
+        'amz_order_id': 'amz_order_id',
+        'prealert_id': 'prealert_id',
+        'ETIQUETA_ENVIO': 'etiqueta_envio',
+        'order_status_meli': 'order_status_meli',
+        'Declare Value': 'declare_value',
+        'Meli Fee': 'meli_fee',
+        'IVA': 'iva',
+        'ICA': 'ica',
+        'FUENTE': 'fuente',
+        'senders_cost': 'senders_cost',
+        'gross_amount': 'gross_amount',
+        'net_received_amount': 'net_received_amount',
+        'nombre_del_tercero': 'nombre_del_tercero',
+        'direccion': 'direccion',
+        'apelido_del_tercero': 'apelido_del_tercero',
+        'Estado': 'estado',
+        'razon_social': 'razon_social',
+        'Ciudad': 'ciudad',
+        'Numero de documento': 'numero_de_documento',
+        'digital_verification': 'digital_verification',
+        'tipo': 'tipo',
+        'telefono': 'telefono',
+        'giro': 'giro',
+        'correo': 'correo',
+        'net_real_amount': 'net_real_amount',
+        'logistic_weight_lbs': 'logistic_weight_lbs',
+        'refunded_date': 'refunded_date',
+        'Asignacion': 'asignacion',
+    }
+
+    renamed_df = df.rename(columns={k: v for k, v in column_mapping.items() if k in df.columns})
+    return renamed_df
+
+
+def apply_basic_formatting(df, reporte: Reporte):
+    """Aplica formatos básicos sin afectar campos numéricos para BD"""
+
+    reporte.info("🔧 Aplicando formatos básicos para base de datos...")
+
+    text_columns = [
+        'client_first_name', 'client_last_name', 'title', 'address_line',
+        'street_name', 'city', 'state', 'country', 'nombre_del_tercero',
+        'direccion', 'apelido_del_tercero', 'estado', 'razon_social', 'ciudad',
+        'logistics_description', 'logistics_shipper', 'logistics_consignee',
+        'logistics_country', 'logistics_state', 'logistics_city', 'logistics_address'
+    ]
+
+    for col in text_columns:
+        if col in df.columns:
+            df[col] = df[col].apply(fix_encoding)
+
+    date_columns = {
+        'date_created': 'datetime',
+        'cxp_date': 'cxp_format'
+    }
+
+    for col, format_type in date_columns.items():
+        if col in df.columns:
+            df[col] = df[col].apply(format_date_standard)
+
+    reporte.success("✅ Formatos básicos aplicados")
+    return df
+
+
+def count_matched(consolidated_df, prefix):
+    """Cuenta registros con datos de un archivo complementario (logistics_, aditionals_, cxp_)"""
+    prefixed_cols = [col for col in consolidated_df.columns if col.startswith(prefix)]
+    if prefixed_cols:
+        return int(consolidated_df[prefixed_cols[0]].notna().sum())
+    return 0
+
+
+# ============================================================================
+# CONSOLIDACIÓN
+# ============================================================================
+
+def process_files_according_to_rules(drapify_df, logistics_df=None, aditionals_df=None, cxp_df=None,
+                                     logistics_date=None, reporte: Reporte = None):
+    """
+    Procesa y consolida todos los archivos según las reglas especificadas
+    """
+    reporte = reporte or Reporte()
+
+    reporte.info("🔄 Iniciando consolidación según reglas especificadas...")
+
+    # PASO 1: Usar Drapify como base
+    consolidated_df = drapify_df.copy()
+    reporte.success(f"✅ Archivo base Drapify procesado: {len(consolidated_df)} registros")
+
+    # PASO 2: Procesar archivo Logistics (SE CONECTA VIA Reference = order_id O Order number = order_id)
+    if logistics_df is not None and len(logistics_df) > 0:
+        with reporte.etapa("Cruce Logistics"):
+            reporte.info("🚚 Procesando archivo Logistics...")
+            reporte.caption("🔗 Conexión: Reference = order_id O Order number = order_id")
+
+            if logistics_date:
+                reporte.info(f"📅 Aplicando fecha {logistics_date} a registros de Logistics")
+
+            logistics_stats = cruzar_logistics(consolidated_df, logistics_df, logistics_date)
+
+            reporte.info(f"📋 Logistics indexado: {logistics_stats['indexados_reference']} por Reference, {logistics_stats['indexados_order_number']} por Order number")
+            reporte.success(f"✅ Logistics procesado: {logistics_stats['por_order_id']} por order_id, {logistics_stats['por_prealert_id']} por prealert_id, {logistics_stats['sin_match']} sin match")
+
+    # PASO 3: Procesar archivo Aditionals (SE CONECTA VIA Order Id = prealert_id)
+    if aditionals_df is not None and len(aditionals_df) > 0:
+        with reporte.etapa("Cruce Aditionals"):
+            reporte.info("➕ Procesando archivo Aditionals...")
+            reporte.caption("🔗 Conexión: Order Id = prealert_id (NO order_id)")
+
+            # Las filas con el mismo Order Id se suman antes del cruce
+            aditionals_stats = cruzar_aditionals(consolidated_df, aditionals_df)
+
+            if aditionals_stats['filas_sumadas'] > 0:
+                reporte.info(f"ℹ️ Se encontraron {aditionals_stats['filas_sumadas']} filas duplicadas que fueron sumadas automáticamente")
+
+            reporte.success(f"✅ Aditionals procesado: {aditionals_stats['matches']} matches por prealert_id (de {aditionals_stats['unicos']} Order Id únicos procesados)")
+
+    # PASO 4: Calcular columna Asignacion
+    reporte.info("🏷️ Calculando columna Asignacion...")
+
+    with reporte.etapa("Asignación"):
+        asignaciones_calculadas = calcular_asignacion_df(consolidated_df)
+    if asignaciones_calculadas is not None:
+        reporte.success(f"✅ Asignaciones calculadas: {asignaciones_calculadas}")
+    else:
+        reporte.warning("⚠️ No se pudo calcular Asignacion: faltan columnas account_name o Serial#")
+
+    # PASO 5: Procesar archivo CXP (SE CONECTA VIA Ref # = asignacion)
+    if cxp_df is not None and len(cxp_df) > 0:
+        with reporte.etapa("Cruce CXP"):
+            reporte.info("💰 Procesando archivo CXP (Chilexpress)...")
+            reporte.caption("🔗 Conexión: Ref # = asignacion (campo calculado)")
+
+            # Detectar automáticamente el mapeo de columnas
+            column_mappings = detectar_columnas_cxp(cxp_df)
+
+            reporte.write("🔍 Columnas detectadas automáticamente en CXP:")
+            for field, col in column_mappings.items():
+                if col:
+                    reporte.write(f"   • {field} → {col}")
+
+            if not column_mappings.get('ref_number'):
+                reporte.warning("⚠️ No se encontró columna de referencia en CXP")
+                return consolidated_df
+
+            cxp_stats = cruzar_cxp(consolidated_df, cxp_df, column_mappings)
+
+            reporte.info(f"📋 CXP indexado: {cxp_stats['indexados']} registros")
+            reporte.success(f"✅ CXP procesado: {cxp_stats['matches']} matches por Asignacion")
+
+    # PASO 6: Aplicar formatos básicos
+    with reporte.etapa("Formatos"):
+        consolidated_df = apply_basic_formatting(consolidated_df, reporte)
+
+    # PASO 7: Validación de duplicados
+    reporte.info("🔍 Validando duplicados por order_id...")
+
+    if 'order_id' in consolidated_df.columns:
+        initial_count = len(consolidated_df)
+        with reporte.etapa("Duplicados"):
+            consolidated_df = consolidated_df.drop_duplicates(subset=['order_id'], keep='first')
+        final_count = len(consolidated_df)
+
+        if initial_count != final_count:
+            removed_count = initial_count - final_count
+            reporte.warning(f"⚠️ Se removieron {removed_count} registros duplicados por order_id")
+        else:
+            reporte.success("✅ No se encontraron duplicados por order_id")
+
+    reporte.success(f"🎉 Consolidación completada: {len(consolidated_df)} registros finales")
+    return consolidated_df
+
+
+# ============================================================================
+# GUARDADO EN SUPABASE
+# ============================================================================
+
+def insert_or_update_to_supabase(supabase, df, reporte: Reporte = None):
+    """Inserta nuevos registros o actualiza existentes en Supabase"""
+    reporte = reporte or Reporte()
+
+    try:
+        reporte.info("🔍 Verificando registros existentes en la base de datos...")
+
+        # Las claves normalizadas (order_id_key, ...) las calcula el trigger de
+        # setup_claves_id.sql: no se envían, así funciona también sin esas columnas
+        df_mapped = map_column_names(df)
+
+        order_ids_to_process = df_mapped['order_id'].dropna().unique().tolist()
+
+        if not order_ids_to_process:
+            reporte.error("❌ No se encontraron order_ids válidos para procesar")
+            return 0, 0
+
+        reporte.info(f"📊 Procesando {len(order_ids_to_process)} order_ids únicos")
+
+        existing_order_ids = []
+
+        # Consulta de existencia: por order_id_key con buscar_claves (miles de IDs por
+        # request); si la función no está en la BD (o para los IDs de un lote que
+        # falló), .in_() en paralelo en lotes de 100.
+        # Existe quien tiene exactamente el mismo order_id (la clave del upsert).
+        with reporte.etapa("Consulta de existentes"):
+            lookup_errors = []
+            failed_keys = []
+            found = buscar_claves(supabase, 'order_id', order_ids_to_process, 'order_id',
+                                  claves_fallidas=failed_keys)
+            if found is None:
+                pending_ids, found = order_ids_to_process, []
+            else:
+                failed_keys = set(failed_keys)
+                pending_ids = [order_id for order_id in order_ids_to_process
+                               if clean_id_aggressive(order_id) in failed_keys]
+            if pending_ids:
+                lookup_results = ejecutar_lotes(
+                    lambda batch: supabase.table('consolidated_orders').select('order_id').in_('order_id', batch).execute().data,
+                    dividir_en_lotes(pending_ids, 100)
+                )
+                for result in lookup_results:
+                    if result['error']:
+                        lookup_errors.append(result['error'])
+                    else:
+                        found.extend(result['resultado'])
+        for error in lookup_errors:
+            reporte.error(f"Error consultando registros existentes: {error}")
+        existing_order_ids.extend([record['order_id'] for record in found])
+
+        existing_order_ids_set = set(existing_order_ids)
+
+        new_records = []
+        update_records = []
+
+        db_columns = [
+            'system_number', 'serial_number', 'order_id', 'pack_id', 'asin',
+            'client_first_name', 'client_last_name', 'client_doc_id', 'account_name',
+            'date_created', 'quantity', 'title', 'unit_price', 'logistic_type',
+            'address_line', 'street_name', 'street_number', 'city', 'state', 'country',
+            'receiver_phone', 'amz_order_id', 'prealert_id', 'etiqueta_envio',
+            'order_status_meli', 'declare_value', 'meli_fee', 'iva', 'ica', 'fuente',
+            'senders_cost', 'gross_amount', 'net_received_amount', 'nombre_del_tercero',
+            'direccion', 'apelido_del_tercero', 'estado', 'razon_social', 'ciudad',
+            'numero_de_documento', 'digital_verification', 'tipo', 'telefono', 'giro',
+            'correo', 'net_real_amount', 'logistic_weight_lbs', 'refunded_date',
+            'asignacion'
+        ]
+
+        for col in df_mapped.columns:
+            if (col.startswith('logistics_') or col.startswith('aditionals_') or col.startswith('cxp_')) and col not in db_columns:
+                db_columns.append(col)
+
+        df_filtered = df_mapped[[col for col in db_columns if col in df_mapped.columns]]
+
+        # Preparación por columna (mismo resultado que prepare_record_for_db por registro)
+        with reporte.etapa("Preparación de registros"):
+            records = preparar_registros_df(df_filtered)
+
+        for cleaned_record in records:
+            order_id = cleaned_record.get('order_id')
+
+            if order_id and order_id in existing_order_ids_set:
+                update_records.append(cleaned_record)
+            else:
+                new_records.append(cleaned_record)
+
+        reporte.info("📊 Resumen de procesamiento:")
+        reporte.metricas({
+            "Total a procesar": len(records),
+            "Registros existentes": len(update_records),
+            "Registros nuevos": len(new_records),
+        })
+
+        total_inserted = 0
+        total_updated = 0
+
+        if new_records:
+            reporte.info(f"➕ Insertando {len(new_records)} nuevos registros...")
+
+            progress = reporte.progreso("Insertando nuevos")
+
+            def on_insert_batch(result, done, total):
+                progress.actualizar(done / total, f"Insertando nuevos: lote {done}/{total}")
+
+            # Lotes de 50 en paralelo; upsert por order_id para que un reintento no duplique
+            insert_batches = dividir_en_lotes(new_records, 50)
+            with reporte.etapa("Inserción"):
+                insert_results = ejecutar_lotes(
+                    lambda batch: supabase.table('consolidated_orders').upsert(batch, on_conflict='order_id').execute(),
+                    insert_batches, al_terminar_lote=on_insert_batch
+                )
+
+            for batch, result in zip(insert_batches, insert_results):
+                if result['error']:
+                    reporte.error(f"Error insertando lote {result['lote']}: {result['error']}")
+                else:
+                    total_inserted += len(batch)
+
+            progress.cerrar()
+            reporte.success(f"✅ {total_inserted} registros nuevos insertados")
+
+        if update_records:
+            reporte.info(f"🔄 Actualizando {len(update_records)} registros existentes...")
+
+            progress = reporte.progreso("Actualizando")
+
+            def on_update_batch(result, done, total):
+                progress.actualizar(done / total, f"Actualizando: lote {done}/{total}")
+
+            update_batches = dividir_en_lotes(update_records, 50)
+            with reporte.etapa("Actualización"):
+                update_results = ejecutar_lotes(
+                    lambda batch: supabase.table('consolidated_orders').upsert(
+                        batch,
+                        on_conflict='order_id',
+                        ignore_duplicates=False
+                    ).execute(),
+                    update_batches, al_terminar_lote=on_update_batch
+                )
+
+            for batch, result in zip(update_batches, update_results):
+                if result['error']:
+                    reporte.warning(f"Error actualizando lote {result['lote']}: {result['error']}")
+                else:
+                    total_updated += len(batch)
+
+            progress.cerrar()
+            reporte.success(f"✅ {total_updated} registros actualizados")
+
+        # Nueva versión de los datos de las cuentas escritas (caché de reportes)
+        if total_inserted or total_updated:
+            cuentas = {record.get('account_name') for record in new_records + update_records}
+            invalidar_reportes(supabase, cuentas if all(cuentas) else None)
+
+        return total_inserted, total_updated
+
+    except Exception as e:
+        reporte.error(f"Error general: {str(e)}")
+        return 0, 0
+
+
+def process_drapify_streaming(supabase, drapify_file, logistics_df=None, aditionals_df=None, cxp_df=None,
+                              logistics_date=None, reporte: Reporte = None, tamano_bloque: int = TAMANO_BLOQUE):
+    """
+    Consolida y guarda Drapify bloque por bloque: cada bloque pasa por los cruces,
+    prepare_record_for_db y el upsert antes de leer el siguiente, así la memoria
+    depende del tamaño del bloque y no del archivo.
+    """
+    reporte = reporte or Reporte()
+
+    totals = {
+        'processed': 0, 'inserted': 0, 'updated': 0,
+        'logistics_matched': 0, 'aditionals_matched': 0, 'cxp_matched': 0,
+        'duplicates': 0
+    }
+
+    # order_ids ya procesados en bloques anteriores (se conserva la primera aparición, como drop_duplicates)
+    seen_order_ids = set()
+
+    chunks = leer_en_bloques(drapify_file, tamano_bloque)
+    chunk_number = 0
+
+    while True:
+        with reporte.etapa("Lectura Drapify"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        chunk_number += 1
+
+        if 'order_id' in chunk.columns:
+            repeated = chunk['order_id'].isin(seen_order_ids)
+            totals['duplicates'] += int(repeated.sum())
+            chunk = chunk[~repeated].reset_index(drop=True)
+            seen_order_ids.update(chunk['order_id'].where(chunk['order_id'].notna(), None))
+
+        if len(chunk) == 0:
+            continue
+
+        with reporte.bloque(chunk_number, totals['processed'] + len(chunk)):
+            consolidated_chunk = process_files_according_to_rules(
+                chunk, logistics_df, aditionals_df, cxp_df, logistics_date, reporte
+            )
+
+            logistics_matched = count_matched(consolidated_chunk, 'logistics_')
+            aditionals_matched = count_matched(consolidated_chunk, 'aditionals_')
+            cxp_matched = count_matched(consolidated_chunk, 'cxp_')
+
+            inserted, updated = insert_or_update_to_supabase(supabase, consolidated_chunk, reporte)
+
+        totals['processed'] += len(consolidated_chunk)
+        totals['inserted'] += inserted
+        totals['updated'] += updated
+        totals['logistics_matched'] += logistics_matched
+        totals['aditionals_matched'] += aditionals_matched
+        totals['cxp_matched'] += cxp_matched
+
+        del chunk, consolidated_chunk
+
+    reporte.fin_bloques(f"✅ Drapify procesado por bloques: {totals['processed']:,} registros")
+
+    if totals['duplicates'] > 0:
+        reporte.warning(f"⚠️ Se omitieron {totals['duplicates']} registros duplicados por order_id entre bloques")
+
+    return totals
+
+
+# ============================================================================
+# LÍNEA DE COMANDOS
+# ============================================================================
+
+def _leer_archivo(ruta, columnas=None):
+    if columnas is not None:
+        return leer_completo(ruta, columnas=columnas)
+    if ruta.lower().endswith('.csv'):
+        return pd.read_csv(ruta)
+    return pd.read_excel(ruta)
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida '{valor}' (formato YYYY-MM-DD)")
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m modulos.consolidar',
+        description='Consolida Drapify con Logistics, Aditionals y CXP y guarda en consolidated_orders.'
+    )
+    parser.add_argument('--drapify', required=True, help='Archivo Drapify (csv, xlsx, xls)')
+    parser.add_argument('--logistics', help='Archivo Logistics')
+    parser.add_argument('--aditionals', help='Archivo Aditionals')
+    parser.add_argument('--cxp', help='Archivo CXP')
+    parser.add_argument('--fecha', type=_fecha, default=None,
+                        help='Fecha para Logistics (YYYY-MM-DD). Por defecto: hoy')
+    parser.add_argument('--tamano-bloque', type=int, default=TAMANO_BLOQUE,
+                        help=f'Registros de Drapify por bloque (por defecto {TAMANO_BLOQUE})')
+    parser.add_argument('--sin-bloques', action='store_true',
+                        help='Cargar Drapify completo en memoria en lugar de procesarlo por bloques')
+    parser.add_argument('--sin-tiempos', action='store_true',
+                        help='No imprimir el tiempo de cada etapa a medida que termina')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = crear_parser().parse_args(argv)
+    reporte = ReporteConsola(mostrar_tiempos=not args.sin_tiempos)
+
+    for ruta in [args.drapify, args.logistics, args.aditionals, args.cxp]:
+        if ruta and not os.path.isfile(ruta):
+            reporte.error(f"❌ No existe el archivo: {ruta}")
+            return SALIDA_ARGUMENTOS
+
+    try:
+        from modulos.cliente_bd import obtener_cliente
+        supabase = obtener_cliente()
+
+        streaming = not args.sin_bloques
+        logistics_date = (args.fecha or date.today()) if args.logistics else None
+
+        # Los archivos complementarios se cargan completos: cada bloque se cruza contra ellos
+        with reporte.etapa("Lectura archivos complementarios"):
+            logistics_df = _leer_archivo(args.logistics, LOGISTICS_COLUMNS if streaming else None) if args.logistics else None
+            aditionals_df = _leer_archivo(args.aditionals, ADITIONALS_COLUMNS if streaming else None) if args.aditionals else None
+            cxp_df = _leer_archivo(args.cxp) if args.cxp else None
+
+        for nombre, df in [('Logistics', logistics_df), ('Aditionals', aditionals_df), ('CXP', cxp_df)]:
+            if df is not None:
+                reporte.success(f"✅ {nombre} cargado: {len(df)} registros")
+
+        if streaming:
+            totals = process_drapify_streaming(
+                supabase, args.drapify, logistics_df, aditionals_df, cxp_df, logistics_date,
+                reporte, tamano_bloque=args.tamano_bloque
+            )
+            procesados, insertados, actualizados = totals['processed'], totals['inserted'], totals['updated']
+        else:
+            with reporte.etapa("Lectura Drapify"):
+                drapify_df = _leer_archivo(args.drapify)
+            reporte.success(f"✅ Drapify cargado: {len(drapify_df)} registros")
+
+            consolidated_df = process_files_according_to_rules(
+                drapify_df, logistics_df, aditionals_df, cxp_df, logistics_date, reporte
+            )
+            procesados = len(consolidated_df)
+            insertados, actualizados = insert_or_update_to_supabase(supabase, consolidated_df, reporte)
+
+    except Exception as e:
+        reporte.error(f"❌ Error: {str(e)}")
+        return SALIDA_ERROR
+
+    reporte.info("\n" + "=" * 60)
+    reporte.info("RESUMEN")
+    reporte.info("=" * 60)
+    reporte.metricas({'Procesados': procesados, 'Nuevos': insertados, 'Actualizados': actualizados})
+
+    reporte.info("\nTiempo por etapa:")
+    for etapa, segundos in reporte.resumen_tiempos().items():
+        reporte.info(f"   {etapa}: {segundos:.2f} s")
+
+    if insertados + actualizados < procesados:
+        reporte.warning(f"⚠️ {procesados - insertados - actualizados:,} registros no se pudieron guardar")
+        return SALIDA_PARCIAL
+
+    return SALIDA_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""
+Módulo de Consultas Paginadas
+Carga registros de consolidated_orders por páginas y con solo las columnas pedidas
+
+Supabase (PostgREST) devuelve a lo sumo 1000 filas por select: una consulta
+sin paginar se corta en silencio. cargar_registros() recorre el resultado
+completo con .range() ordenando por id (orden estable entre páginas) y pide
+solo las columnas que el reporte declara, en vez de las ~150 de select('*').
+El DataFrame se arma página por página.
+
+cargar_varias() hace varias de esas cargas a la vez (p. ej. una por cuenta en
+el Reporte Global): la primera página de cada consulta trae además el total
+de filas (count='exact'), así las páginas restantes se conocen de antemano y
+todas se piden en paralelo en un pool acotado. El resultado se arma en el
+orden de las consultas y de las páginas, igual que cargándolas una por una;
+el tiempo total se acerca al de la consulta más lenta y no a la suma.
+
+paginar_por_id() recorre cuentas completas (scripts de actualización y
+eliminación) por keyset: cada página pide id > último id de la anterior, en
+vez de .range(offset): el costo de cada página no crece con el offset y las
+escrituras hechas mientras se recorre no hacen saltar ni repetir filas. Es un
+generador de páginas; con anticipar=True la página siguiente se pide mientras
+se procesa la actual.
+
+Fecha de reporte: logistics_date y cxp_date son texto. La columna
+fecha_reporte (DATE, setup_fecha_reporte.sql) la calcula la base de datos al
+escribir cada fila: cxp_date para las cuentas Chilexpress (CUENTAS_FECHA_CXP),
+logistics_date para el resto. Los reportes filtran y ordenan por ella
+(ORDEN_FECHA_REPORTE) con el índice (account_name, fecha_reporte, id).
+fecha_reporte() es la misma regla en Python.
+En una base sin setup_fecha_reporte.sql (tiene_fecha_reporte() lo revisa una
+vez por cliente) las consultas sobre fecha_reporte se hacen como antes, por
+texto sobre cxp_date / logistics_date según la cuenta, y la columna se calcula
+con fecha_reporte(); se registra un aviso para ejecutar el script.
+"""
+
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from modulos.lotes_bd import ejecutar_lotes, reintentar
+
+TABLA = 'consolidated_orders'
+
+# Filas por página (igual al máximo que entrega Supabase por request)
+TAMANO_PAGINA = 1000
+
+# Páginas en vuelo simultáneas de cargar_varias (una por cuenta del Reporte Global)
+MAX_CONSULTAS_EN_PARALELO = 8
+
+# Fecha de reporte (columna generada en consolidated_orders)
+COLUMNA_FECHA_REPORTE = 'fecha_reporte'
+ORDEN_FECHA_REPORTE = (COLUMNA_FECHA_REPORTE, 'id')
+
+# Cuentas Chilexpress: su fecha de reporte es cxp_date (las demás, logistics_date).
+# Debe coincidir con fecha_reporte_de() en setup_fecha_reporte.sql
+CUENTAS_FECHA_CXP = ('2-MEGATIENDA SPA', '3-VEENDELO', '8-FABORCARGO')
+
+logger = logging.getLogger(__name__)
+
+# id(cliente) -> si consolidated_orders tiene fecha_reporte
+_fecha_reporte_por_cliente: Dict[int, bool] = {}
+
+_FECHA_ISO = re.compile(r'^\s*(\d{4})-(\d{2})-(\d{2})')
+_FECHA_MDY = re.compile(r'^\s*(\d{1,2})/(\d{1,2})/(\d{4})')
+
+
+def fecha_texto(valor) -> Optional[str]:
+    """'YYYY-MM-DD' de un texto 'YYYY-MM-DD...' o 'M/D/YYYY...' (None si no es una fecha válida)"""
+    if valor is None:
+        return None
+    texto = str(valor)
+    coincidencia = _FECHA_ISO.match(texto)
+    if coincidencia:
+        anio, mes, dia = coincidencia.groups()
+    else:
+        coincidencia = _FECHA_MDY.match(texto)
+        if not coincidencia:
+            return None
+        mes, dia, anio = coincidencia.groups()
+    try:
+        return date(int(anio), int(mes), int(dia)).isoformat()
+    except ValueError:
+        return None
+
+
+def fecha_reporte(registro: dict) -> Optional[str]:
+    """Fecha de reporte de un registro: cxp_date (Chilexpress) o logistics_date"""
+    if registro.get('account_name') in CUENTAS_FECHA_CXP:
+        return fecha_texto(registro.get('cxp_date'))
+    return fecha_texto(registro.get('logistics_date'))
+
+
+def _es_columna_faltante(error: Exception) -> bool:
+    mensaje = str(error).lower()
+    return '42703' in mensaje or ('column' in mensaje and 'does not exist' in mensaje)
+
+
+def tiene_fecha_reporte(supabase) -> bool:
+    """
+    True si consolidated_orders tiene la columna fecha_reporte (setup_fecha_reporte.sql).
+    Se consulta una vez por cliente; ante otros errores se asume que sí (la
+    consulta real mostrará el error).
+    """
+    clave = id(supabase)
+    if clave not in _fecha_reporte_por_cliente:
+        try:
+            supabase.table(TABLA).select(COLUMNA_FECHA_REPORTE).limit(1).execute()
+        except Exception as e:
+            if not _es_columna_faltante(e):
+                return True
+            logger.warning("consolidated_orders no tiene la columna %s: los reportes filtran por "
+                           "logistics_date / cxp_date. Ejecuta setup_fecha_reporte.sql.", COLUMNA_FECHA_REPORTE)
+            _fecha_reporte_por_cliente[clave] = False
+        else:
+            _fecha_reporte_por_cliente[clave] = True
+    return _fecha_reporte_por_cliente[clave]
+
+
+def _consulta(supabase, seleccion: str, columna_fecha=None, fecha_inicio=None, fecha_fin=None,
+              cuentas=None, iguales=None, tabla: str = TABLA, orden: Sequence[str] = ('id',), count=None,
+              cuentas_excluidas=None):
+    query = supabase.table(tabla).select(seleccion, count=count)
+    if cuentas is not None:
+        if isinstance(cuentas, str):
+            query = query.eq('account_name', cuentas)
+        else:
+            query = query.in_('account_name', list(cuentas))
+    if cuentas_excluidas:
+        query = query.not_.in_('account_name', list(cuentas_excluidas))
+    for columna, valor in (iguales or {}).items():
+        query = query.eq(columna, valor)
+    if columna_fecha and fecha_inicio is not None:
+        query = query.gte(columna_fecha, str(fecha_inicio))
+    if columna_fecha and fecha_fin is not None:
+        query = query.lte(columna_fecha, str(fecha_fin))
+    for columna in orden:
+        query = query.order(columna)
+    return query
+
+
+def cargar_registros(supabase, columnas: List[str],
+                     columna_fecha: Optional[str] = None, fecha_inicio=None, fecha_fin=None,
+                     cuentas: Union[str, Iterable[str], None] = None,
+                     iguales: Optional[Dict[str, object]] = None,
+                     tabla: str = TABLA,
+                     orden: Sequence[str] = ('id',),
+                     tamano_pagina: int = TAMANO_PAGINA) -> pd.DataFrame:
+    """
+    Carga todas las filas que cumplen los filtros, página por página.
+
+    columnas: columnas a traer (el DataFrame siempre las tiene, aunque esté vacío)
+    columna_fecha / fecha_inicio / fecha_fin: rango inclusivo sobre esa columna
+    cuentas: una cuenta (.eq) o varias (.in_) de account_name
+    iguales: otros filtros de igualdad {columna: valor}
+    orden: columnas del orden entre páginas (la última debe ser única: 'id')
+    """
+    if columna_fecha == COLUMNA_FECHA_REPORTE and tabla == TABLA and not tiene_fecha_reporte(supabase):
+        consulta = {'columna_fecha': columna_fecha, 'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin,
+                    'cuentas': cuentas, 'iguales': iguales, 'orden': orden}
+        return _cargar_sin_fecha_reporte(supabase, columnas, [consulta], tamano_pagina)[0]
+
+    nombres = list(dict.fromkeys(columnas))
+    seleccion = ', '.join(nombres)
+    paginas = []
+    desde = 0
+
+    while True:
+        query = _consulta(supabase, seleccion, columna_fecha, fecha_inicio, fecha_fin, cuentas, iguales, tabla,
+                          orden)
+        result = query.range(desde, desde + tamano_pagina - 1).execute()
+        datos = result.data or []
+        if datos:
+            paginas.append(pd.DataFrame(datos, columns=nombres))
+
+        if len(datos) < tamano_pagina:
+            break
+        desde += tamano_pagina
+
+    if not paginas:
+        return pd.DataFrame(columns=nombres)
+    if len(paginas) == 1:
+        return paginas[0]
+    return pd.concat(paginas, ignore_index=True)
+
+
+def cargar_varias(supabase, columnas: List[str], consultas: List[dict],
+                  tamano_pagina: int = TAMANO_PAGINA,
+                  max_concurrencia: int = MAX_CONSULTAS_EN_PARALELO) -> List[pd.DataFrame]:
+    """
+    Resultado de cargar_registros(supabase, columnas, **consulta) para cada
+    consulta, con todas las páginas de todas las consultas pedidas en paralelo.
+    Retorna un DataFrame por consulta, en el orden de `consultas`.
+    Si una página falla (después de los reintentos) se lanza el error: un
+    reporte nunca se arma con páginas faltantes.
+    """
+    if any(consulta.get('columna_fecha') == COLUMNA_FECHA_REPORTE and consulta.get('tabla', TABLA) == TABLA
+           for consulta in consultas) and not tiene_fecha_reporte(supabase):
+        return _cargar_sin_fecha_reporte(supabase, columnas, consultas, tamano_pagina, max_concurrencia)
+
+    nombres = list(dict.fromkeys(columnas))
+    seleccion = ', '.join(nombres)
+
+    def pagina(tarea):
+        indice, desde, hasta, contar = tarea
+        query = _consulta(supabase, seleccion, count='exact' if contar else None, **consultas[indice])
+        return query.range(desde, hasta).execute()
+
+    def ejecutar(tareas):
+        resultados = ejecutar_lotes(pagina, tareas, max_concurrencia=max_concurrencia)
+        for resultado in resultados:
+            if resultado['error']:
+                raise RuntimeError(resultado['error'])
+        return [resultado['resultado'] for resultado in resultados]
+
+    # 1) Primera página de cada consulta, con el total de filas
+    primeras = ejecutar([(indice, 0, tamano_pagina - 1, True) for indice in range(len(consultas))])
+
+    # 2) Páginas restantes de todas las consultas a la vez. Si el servidor
+    #    entrega menos filas por página que las pedidas, se pagina a su tamaño.
+    restantes = []
+    for indice, result in enumerate(primeras):
+        recibidas = len(result.data or [])
+        total = result.count if result.count is not None else recibidas
+        paso = recibidas if 0 < recibidas < tamano_pagina else tamano_pagina
+        for desde in range(recibidas, total, paso):
+            restantes.append((indice, desde, desde + paso - 1, False))
+    siguientes = ejecutar(restantes)
+
+    paginas = [[result.data or []] for result in primeras]
+    for (indice, _, _, _), result in zip(restantes, siguientes):
+        paginas[indice].append(result.data or [])
+
+    dataframes = []
+    for datos_consulta in paginas:
+        datos_consulta = [pd.DataFrame(datos, columns=nombres) for datos in datos_consulta if datos]
+        if not datos_consulta:
+            dataframes.append(pd.DataFrame(columns=nombres))
+        elif len(datos_consulta) == 1:
+            dataframes.append(datos_consulta[0])
+        else:
+            dataframes.append(pd.concat(datos_consulta, ignore_index=True))
+    return dataframes
+
+
+
+def _por_columna_de_fecha(consulta: dict) -> List[dict]:
+    """Una consulta sobre fecha_reporte como consultas por texto sobre cxp_date / logistics_date"""
+    orden = tuple(columna for columna in consulta.get('orden', ('id',)) if columna != COLUMNA_FECHA_REPORTE)
+    cuentas = consulta.get('cuentas')
+    if cuentas is None:
+        grupos = [(list(CUENTAS_FECHA_CXP), None, 'cxp_date'),
+                  (None, list(CUENTAS_FECHA_CXP), 'logistics_date')]
+    else:
+        lista = [cuentas] if isinstance(cuentas, str) else list(cuentas)
+        grupos = [(grupo, None, columna) for grupo, columna in (
+            ([c for c in lista if c in CUENTAS_FECHA_CXP], 'cxp_date'),
+            ([c for c in lista if c not in CUENTAS_FECHA_CXP], 'logistics_date')) if grupo]
+    return [dict(consulta, cuentas=grupo, cuentas_excluidas=excluidas, columna_fecha=columna, orden=orden or ('id',))
+            for grupo, excluidas, columna in grupos]
+
+
+def _cargar_sin_fecha_reporte(supabase, columnas: List[str], consultas: List[dict],
+                              tamano_pagina: int = TAMANO_PAGINA,
+                              max_concurrencia: int = MAX_CONSULTAS_EN_PARALELO) -> List[pd.DataFrame]:
+    """cargar_varias() para una base sin la columna fecha_reporte: la calcula con fecha_reporte()"""
+    nombres = list(dict.fromkeys(columnas))
+    ordenes = [columna for consulta in consultas for columna in consulta.get('orden', ('id',))]
+    seleccion = [columna for columna in dict.fromkeys(nombres + ['id', 'account_name', 'cxp_date', 'logistics_date']
+                                                      + ordenes)
+                 if columna != COLUMNA_FECHA_REPORTE]
+
+    partes, origen = [], []
+    for indice, consulta in enumerate(consultas):
+        divididas = _por_columna_de_fecha(consulta) if consulta.get('columna_fecha') == COLUMNA_FECHA_REPORTE \
+            else [consulta]
+        partes.extend(divididas)
+        origen.extend([indice] * len(divididas))
+    cargadas = cargar_varias(supabase, seleccion, partes, tamano_pagina, max_concurrencia)
+
+    dataframes = []
+    for indice, consulta in enumerate(consultas):
+        propias = [df for i, df in zip(origen, cargadas) if i == indice and not df.empty]
+        df = pd.concat(propias, ignore_index=True) if propias else pd.DataFrame(columns=seleccion)
+        es_cxp = df['account_name'].isin(CUENTAS_FECHA_CXP)
+        df[COLUMNA_FECHA_REPORTE] = df['logistics_date'].where(~es_cxp, df['cxp_date']).map(fecha_texto)
+        orden = list(consulta.get('orden', ('id',)))
+        if len(propias) > 1 or COLUMNA_FECHA_REPORTE in orden:
+            df = df.sort_values(orden, kind='stable', ignore_index=True)
+        dataframes.append(df[nombres])
+    return dataframes
+
+def paginar_por_id(supabase, columnas: Union[str, List[str]],
+                   cuentas: Union[str, Iterable[str], None] = None,
+                   iguales: Optional[Dict[str, object]] = None,
+                   filtros: Optional[Callable] = None,
+                   tabla: str = TABLA,
+                   tamano_pagina: int = TAMANO_PAGINA,
+                   anticipar: bool = False) -> Iterator[List[dict]]:
+    """
+    Páginas (listas de registros) de todas las filas que cumplen los filtros,
+    en orden de id, pidiendo cada una con id > último id de la anterior.
+
+    columnas: 'id, account_name, ...' o lista; 'id' se agrega si falta
+    cuentas / iguales: como en cargar_registros
+    filtros: función query -> query para otros filtros (.or_(), .neq(), ...)
+    anticipar: pedir la página siguiente en segundo plano mientras quien
+        recorre procesa la actual
+    Cada página se reintenta ante errores transitorios; si falla, se lanza el error.
+    """
+    if isinstance(columnas, str):
+        columnas = [columna.strip() for columna in columnas.split(',')]
+    seleccion = ', '.join(dict.fromkeys(['id'] + [columna for columna in columnas if columna]))
+
+    def pagina(ultimo_id) -> List[dict]:
+        query = _consulta(supabase, seleccion, cuentas=cuentas, iguales=iguales, tabla=tabla)
+        if filtros is not None:
+            query = filtros(query)
+        if ultimo_id is not None:
+            query = query.gt('id', ultimo_id)
+        return reintentar(lambda: query.limit(tamano_pagina).execute()).data or []
+
+    if not anticipar:
+        ultimo_id = None
+        while True:
+            datos = pagina(ultimo_id)
+            if datos:
+                yield datos
+            if len(datos) < tamano_pagina:
+                return
+            ultimo_id = datos[-1]['id']
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        siguiente = pool.submit(pagina, None)
+        try:
+            while True:
+                datos = siguiente.result()
+                siguiente = pool.submit(pagina, datos[-1]['id']) if len(datos) >= tamano_pagina else None
+                if datos:
+                    yield datos
+                if siguiente is None:
+                    return
+        finally:
+            # Quien recorre dejó de pedir páginas: la anticipada ya no se usa
+            if siguiente is not None:
+                siguiente.cancel()
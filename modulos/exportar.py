@@ -0,0 +1,260 @@
+"""
+Módulo de Exportación
+Archivos de descarga de los reportes escritos desde el DataFrame numérico
+
+Antes cada reporte armaba una copia del detalle con los montos convertidos a
+texto ("$1,234.00") y con ella generaba el CSV y el Excel completos en memoria
+en cada render, aunque nadie descargara. Ahora:
+    - el reporte declara sus columnas de exportación (título, columna numérica,
+      formato de número) y el archivo se escribe directo del DataFrame
+    - Excel (.xlsx) se escribe con openpyxl en modo write-only: cada fila se
+      serializa al agregarla, sin armar el libro completo en memoria; los
+      formatos ("$"#,##0.00, COP, S/, fechas) van en la celda, el valor sigue
+      siendo un número
+    - CSV comprimido (.csv.gz) y Parquet (si pyarrow está instalado) guardan
+      los valores numéricos tal cual
+    - el archivo se genera solo cuando el usuario lo pide (mostrar_descarga)
+Cada exportación informa filas, tamaño y filas por segundo.
+"""
+
+import gzip
+import io
+import time
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+try:
+    import pyarrow  # noqa: F401 (solo para saber si Parquet está disponible)
+    PARQUET_DISPONIBLE = True
+except ImportError:
+    PARQUET_DISPONIBLE = False
+
+# Formatos de número de Excel (la tercera sección vacía deja en blanco los ceros)
+FORMATO_USD = '"$"#,##0.00'
+FORMATO_USD_SIN_CEROS = '"$"#,##0.00;-"$"#,##0.00;'
+FORMATO_COP = '"$"#,##0" COP"'
+FORMATO_COP_SIN_CEROS = '"$"#,##0" COP";-"$"#,##0" COP";'
+FORMATO_PEN = '"S/"#,##0.00'
+FORMATO_PEN_SIN_CEROS = '"S/"#,##0.00;-"S/"#,##0.00;'
+FORMATO_CLP = '"$"#,##0" CLP"'
+FORMATO_CLP_SIN_CEROS = '"$"#,##0" CLP";-"$"#,##0" CLP";'
+FORMATO_PESOS = '"$"#,##0'
+FORMATO_DECIMAL = '#,##0.00'
+FORMATO_ENTERO = '#,##0'
+FORMATO_LIBRAS = '0.00" lbs"'
+FORMATO_KILOS = '0.00" kg"'
+FORMATO_FECHA = 'yyyy-mm-dd'
+
+# Formatos de descarga: etiqueta -> (extensión, MIME)
+FORMATOS = {
+    'Excel (.xlsx)': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'CSV comprimido (.csv.gz)': ('csv.gz', 'application/gzip'),
+}
+if PARQUET_DISPONIBLE:
+    FORMATOS['Parquet (.parquet)'] = ('parquet', 'application/vnd.apache.parquet')
+
+# Clave en st.session_state de los archivos preparados
+PREFIJO_ARCHIVOS = 'exportar_archivo_'
+
+# Filas por escritura del CSV (el texto se genera y comprime por partes)
+FILAS_POR_BLOQUE_CSV = 10000
+
+Formato = Union[None, str, pd.Series]
+Hoja = Tuple[str, pd.DataFrame, Dict[str, Formato]]
+
+
+def tabla_exportacion(df: pd.DataFrame, columnas: List[tuple]) -> Tuple[pd.DataFrame, Dict[str, Formato]]:
+    """
+    Arma la tabla a exportar y sus formatos desde el DataFrame numérico.
+
+    columnas: [(título, valores, formato)], donde valores es el nombre de una
+    columna de df (se omite si no existe), una Series o un escalar, y formato
+    es un formato de número de Excel, una Series con un formato por fila, o None
+    """
+    datos = {}
+    formatos = {}
+    for titulo, valores, formato in columnas:
+        if isinstance(valores, str):
+            if valores not in df.columns:
+                continue
+            valores = df[valores]
+        datos[titulo] = valores
+        if formato is not None:
+            formatos[titulo] = formato
+    return pd.DataFrame(datos, index=df.index), formatos
+
+
+def _valores_columna(serie: pd.Series) -> list:
+    """Valores nativos de Python para openpyxl (NaN/NaT -> celda vacía)"""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        if getattr(serie.dt, 'tz', None) is not None:
+            serie = serie.dt.tz_localize(None)
+        return [None if pd.isna(valor) else valor.to_pydatetime() for valor in serie]
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        valores = serie.to_numpy(dtype=float, na_value=np.nan)
+        return [None if valor != valor else valor for valor in valores.tolist()]
+    return [None if valor is None or (not isinstance(valor, str) and pd.isna(valor)) else valor
+            for valor in serie.astype(object).tolist()]
+
+
+def escribir_xlsx(destino, hojas: List[Hoja]) -> int:
+    """Escribe un .xlsx en modo write-only (fila por fila). Retorna las filas escritas."""
+    libro = Workbook(write_only=True)
+    filas = 0
+
+    for nombre, tabla, formatos in hojas:
+        hoja = libro.create_sheet(title=nombre[:31])
+        titulos = [str(titulo) for titulo in tabla.columns]
+
+        for posicion, titulo in enumerate(titulos, start=1):
+            hoja.column_dimensions[get_column_letter(posicion)].width = max(12, len(titulo) + 4)
+
+        encabezado = []
+        for titulo in titulos:
+            celda = WriteOnlyCell(hoja, value=titulo)
+            celda.font = Font(bold=True)
+            encabezado.append(celda)
+        hoja.append(encabezado)
+
+        columnas = [_valores_columna(tabla.iloc[:, posicion]) for posicion in range(len(titulos))]
+
+        # Una celda con estilo por columna y formato: write-only la serializa en
+        # cada append, así que se reutiliza cambiando solo el valor. (El estilo de
+        # una celda no se puede cambiar después de escribirla: openpyxl guarda
+        # la referencia, por eso hay una celda por formato y no una por columna.)
+        celdas_por_formato = {}
+
+        def celda_con_formato(posicion, formato):
+            if (posicion, formato) not in celdas_por_formato:
+                celda = WriteOnlyCell(hoja)
+                celda.number_format = formato
+                celdas_por_formato[(posicion, formato)] = celda
+            return celdas_por_formato[(posicion, formato)]
+
+        formatos_columna = []
+        for posicion, titulo in enumerate(tabla.columns):
+            formato = formatos.get(titulo)
+            if isinstance(formato, pd.Series):
+                formatos_columna.append(formato.reindex(tabla.index).tolist())
+            else:
+                formatos_columna.append([formato] * len(tabla) if formato else None)
+
+        for indice_fila, fila in enumerate(zip(*columnas)):
+            salida = []
+            for posicion, valor in enumerate(fila):
+                formato = formatos_columna[posicion][indice_fila] if formatos_columna[posicion] else None
+                if not formato or valor is None or isinstance(valor, str):
+                    salida.append(valor)
+                    continue
+                celda = celda_con_formato(posicion, formato)
+                celda.value = valor
+                salida.append(celda)
+            hoja.append(salida)
+        filas += len(tabla)
+
+    libro.save(destino)
+    return filas
+
+
+def escribir_csv_gz(destino, tabla: pd.DataFrame) -> int:
+    """Escribe un CSV (UTF-8 con BOM, como los CSV de siempre) comprimido con gzip, por bloques"""
+    with gzip.GzipFile(fileobj=destino, mode='wb', compresslevel=6) as comprimido:
+        with io.TextIOWrapper(comprimido, encoding='utf-8-sig', newline='') as texto:
+            for inicio in range(0, max(len(tabla), 1), FILAS_POR_BLOQUE_CSV):
+                tabla.iloc[inicio:inicio + FILAS_POR_BLOQUE_CSV].to_csv(texto, index=False, header=inicio == 0)
+    return len(tabla)
+
+
+def escribir_parquet(destino, tabla: pd.DataFrame) -> int:
+    """Escribe un Parquet (requiere pyarrow)"""
+    tabla = tabla.copy(deep=False)
+    # Columnas de texto con mezclas de tipos (IDs numéricos y texto): como texto
+    for columna in tabla.columns:
+        if tabla[columna].dtype == object:
+            tabla[columna] = tabla[columna].map(lambda valor: None if pd.isna(valor) else str(valor))
+    tabla.to_parquet(destino, index=False, engine='pyarrow')
+    return len(tabla)
+
+
+def exportar(formato: str, hojas: List[Hoja]) -> dict:
+    """
+    Genera el archivo en memoria. formato: extensión ('xlsx', 'csv.gz', 'parquet').
+    CSV y Parquet llevan solo la primera hoja.
+    Retorna {'datos', 'filas', 'bytes', 'segundos', 'filas_por_segundo'}
+    """
+    destino = io.BytesIO()
+    inicio = time.perf_counter()
+
+    if formato == 'xlsx':
+        filas = escribir_xlsx(destino, hojas)
+    elif formato == 'csv.gz':
+        filas = escribir_csv_gz(destino, hojas[0][1])
+    elif formato == 'parquet':
+        if not PARQUET_DISPONIBLE:
+            raise ValueError("Parquet requiere pyarrow (pip install pyarrow)")
+        filas = escribir_parquet(destino, hojas[0][1])
+    else:
+        raise ValueError(f"Formato de exportación desconocido: {formato}")
+
+    segundos = time.perf_counter() - inicio
+    datos = destino.getvalue()
+    return {
+        'datos': datos,
+        'filas': filas,
+        'bytes': len(datos),
+        'segundos': segundos,
+        'filas_por_segundo': filas / segundos if segundos > 0 else float('inf'),
+    }
+
+
+def resumen_exportacion(resultado: dict) -> str:
+    """Texto corto con el rendimiento de una exportación"""
+    return (f"{resultado['filas']:,} filas · {resultado['bytes'] / 1024 / 1024:,.2f} MB · "
+            f"{resultado['segundos']:.2f} s ({resultado['filas_por_segundo']:,.0f} filas/s)")
+
+
+def mostrar_descarga(nombre: str, hojas: List[Hoja], clave: str):
+    """
+    Selector de formato + botón que genera el archivo solo cuando se pide.
+    El último archivo preparado queda en st.session_state (uno por `clave`)
+    para que el botón de descarga siga disponible después del rerun.
+    """
+    col_formato, col_preparar, col_descargar = st.columns([2, 1, 1])
+
+    with col_formato:
+        etiqueta = st.selectbox("Formato de descarga", list(FORMATOS), key=f"exportar_formato_{clave}")
+    extension, mime = FORMATOS[etiqueta]
+
+    with col_preparar:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("📦 Preparar archivo", key=f"exportar_preparar_{clave}", use_container_width=True):
+            with st.spinner("Generando archivo..."):
+                st.session_state[f"{PREFIJO_ARCHIVOS}{clave}"] = (nombre, extension, exportar(extension, hojas))
+
+    preparado = st.session_state.get(f"{PREFIJO_ARCHIVOS}{clave}")
+    if preparado and preparado[:2] == (nombre, extension):
+        resultado = preparado[2]
+        with col_descargar:
+            st.markdown("<br>", unsafe_allow_html=True)
+            st.download_button(
+                f"📥 Descargar .{extension}",
+                resultado['datos'],
+                f'{nombre}.{extension}',
+                mime,
+                key=f"exportar_descargar_{clave}",
+                use_container_width=True
+            )
+        st.caption(f"⚡ {resumen_exportacion(resultado)}")
+
+
+def descartar_archivos():
+    """Borra de la sesión los archivos preparados (p. ej. al generar otro reporte)"""
+    for clave in [clave for clave in st.session_state if str(clave).startswith(PREFIJO_ARCHIVOS)]:
+        del st.session_state[clave]
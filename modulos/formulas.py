@@ -0,0 +1,274 @@
+"""
+Módulo de Fórmulas de Utilidad
+Cálculo vectorizado de las columnas de utilidad de los reportes
+
+Cada reporte calculaba su utilidad con df.apply(calc_utilidad_*, axis=1), fila
+por fila. Aquí las mismas fórmulas se evalúan sobre columnas completas, con
+máscaras por account_name y por order_status_meli. Cada fórmula conserva el
+orden de las operaciones del cálculo por fila, así que los resultados son
+idénticos (mismo redondeo de punto flotante).
+
+Las funciones calcular_* agregan al DataFrame las columnas que antes calculaba
+cada reporte. Esperan las columnas monetarias ya limpias (numéricas, sin NaN).
+"""
+
+from functools import reduce
+from operator import add
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+CUENTAS_COLOMBIA = ['1-TODOENCARGO-CO', '5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']
+CUENTAS_DTPT = ['5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']
+CUENTAS_CHILE = ['2-MEGATIENDA SPA', '3-VEENDELO']
+CUENTAS_SOCIO = ['2-MEGATIENDA SPA', '4-MEGA TIENDAS PERUANAS', '3-VEENDELO']
+
+# Bodegal: 3.5 USD por orden xd_drop_off
+BODEGAL_XD_DROP_OFF = 3.5
+
+# Reparto DTPT: el socio recibe hasta 7.5 USD por orden, GSS el resto
+TOPE_SOCIO_DTPT = 7.5
+
+
+# ============================================================================
+# COMPONENTES
+# ============================================================================
+
+def _suma(columnas: List) -> pd.Series:
+    """Suma de izquierda a derecha, igual que a + b + c en el cálculo por fila"""
+    return reduce(add, columnas)
+
+
+def _resta(inicial, columnas: List) -> pd.Series:
+    """inicial - a - b - c, de izquierda a derecha"""
+    return reduce(lambda total, columna: total - columna, columnas, inicial)
+
+
+def _es_estado(df: pd.DataFrame, estado: str) -> pd.Series:
+    if 'order_status_meli' not in df.columns:
+        return pd.Series(False, index=df.index)
+    return (df['order_status_meli'] == estado).fillna(False).astype(bool)
+
+
+def _serie(valores, df: pd.DataFrame) -> pd.Series:
+    return pd.Series(valores, index=df.index)
+
+
+def amazon(df: pd.DataFrame) -> pd.Series:
+    """Costo Amazon: declare_value * quantity"""
+    return df['declare_value'] * df['quantity']
+
+
+def bodegal(df: pd.DataFrame) -> pd.Series:
+    """3.5 USD si logistic_type es xd_drop_off, 0 si no (0 si no hay columna)"""
+    if 'logistic_type' not in df.columns:
+        return _serie(0, df)
+    return _serie(np.where(df['logistic_type'] == 'xd_drop_off', BODEGAL_XD_DROP_OFF, 0), df)
+
+
+def uno_si_aprobada(df: pd.DataFrame, cuentas: Optional[List[str]] = None) -> pd.Series:
+    """1 si la orden está approved (y su cuenta está en `cuentas`, si se indica), 0 si no"""
+    mascara = _es_estado(df, 'approved')
+    if cuentas is not None:
+        mascara &= df['account_name'].isin(cuentas)
+    return mascara.astype('int64')
+
+
+def trm_por_cuenta(df: pd.DataFrame, trm_dict: Dict[str, float], trm_defecto: Dict[str, float]) -> pd.Series:
+    """TRM de Colombia, Perú o Chile (el resto) según account_name"""
+    colombia = trm_dict.get('colombia', trm_defecto['colombia'])
+    peru = trm_dict.get('peru', trm_defecto['peru'])
+    chile = trm_dict.get('chile', trm_defecto['chile'])
+    cuentas = df['account_name']
+    return _serie(np.where(cuentas.isin(CUENTAS_COLOMBIA), colombia,
+                           np.where(cuentas == '4-MEGA TIENDAS PERUANAS', peru, chile)), df)
+
+
+def utilidad_por_estado(df: pd.DataFrame, ingreso: pd.Series, costos_reembolso: List,
+                        costos: List, columna_activa: str) -> pd.Series:
+    """
+    Fórmula común de los reportes por cuenta:
+    - refunded: -(suma de costos_reembolso)
+    - si columna_activa > 0: ingreso - costos (en orden)
+    - si no: 0
+    """
+    reembolsada = _es_estado(df, 'refunded')
+    activa = ~reembolsada & (df[columna_activa] > 0)
+    perdida = -_suma(costos_reembolso)
+    utilidad = _resta(ingreso, costos)
+    return _serie(np.select([reembolsada.to_numpy(), activa.to_numpy()],
+                            [np.asarray(perdida, dtype=float), np.asarray(utilidad, dtype=float)], 0), df)
+
+
+def reparto_socio(utilidad: pd.Series, tope: float = TOPE_SOCIO_DTPT):
+    """(socio, gss): si utilidad >= tope el socio recibe el tope y GSS el resto; si no, el socio recibe todo"""
+    alcanza = utilidad >= tope
+    socio = pd.Series(np.where(alcanza, tope, utilidad), index=utilidad.index)
+    gss = pd.Series(np.where(alcanza, utilidad - tope, 0), index=utilidad.index)
+    return socio, gss
+
+
+# ============================================================================
+# FÓRMULAS POR REPORTE
+# ============================================================================
+
+def calcular_todoencargo(df: pd.DataFrame, trm_colombia: float) -> pd.DataFrame:
+    """TRM_Colombia, Meli_USD y Utilidad_Gss de TODOENCARGO-CO"""
+    df['TRM_Colombia'] = trm_colombia
+    df['Meli_USD'] = df['net_received_amount'] / df['TRM_Colombia']
+    df['Utilidad_Gss'] = utilidad_por_estado(
+        df, df['Meli_USD'],
+        [amazon(df), df['logistics_total'], df['aditionals_total']],
+        [amazon(df), df['logistics_total'], df['aditionals_total']],
+        'logistics_total'
+    )
+    return df
+
+
+def calcular_mega_tiendas(df: pd.DataFrame, trm_peru: float) -> pd.DataFrame:
+    """TRM_Peru, Socio_cuenta, Meli_USD y Utilidad_Gss de MEGA TIENDAS PERUANAS"""
+    df['TRM_Peru'] = trm_peru
+    df['Socio_cuenta'] = uno_si_aprobada(df)
+    df['Meli_USD'] = df['net_received_amount'] / df['TRM_Peru']
+    df['Utilidad_Gss'] = utilidad_por_estado(
+        df, df['Meli_USD'],
+        [amazon(df), df['logistics_total'], df['aditionals_total']],
+        [amazon(df), df['logistics_total'], df['aditionals_total'], df['Socio_cuenta']],
+        'logistics_total'
+    )
+    return df
+
+
+def calcular_dtpt(df: pd.DataFrame, trm_colombia: float) -> pd.DataFrame:
+    """TRM_Colombia, Impuesto_facturacion, Meli_USD, Utilidad y su reparto Utilidad_Socio / Utilidad_Gss"""
+    df['TRM_Colombia'] = trm_colombia
+    df['Impuesto_facturacion'] = uno_si_aprobada(df)
+    df['Meli_USD'] = df['net_received_amount'] / df['TRM_Colombia']
+    df['Utilidad'] = utilidad_por_estado(
+        df, df['Meli_USD'],
+        [amazon(df), df['logistics_total'], df['aditionals_total']],
+        [amazon(df), df['logistics_total'], df['aditionals_total'], df['Impuesto_facturacion']],
+        'logistics_total'
+    )
+    df['Utilidad_Socio'], df['Utilidad_Gss'] = reparto_socio(df['Utilidad'])
+    return df
+
+
+def calcular_megatienda_veendelo(df: pd.DataFrame, trm_chile: float) -> pd.DataFrame:
+    """TRM_Chile, Bodegal, Socio_cuenta, Meli_USD y Utilidad_Gss de MEGATIENDA SPA / VEENDELO"""
+    df['TRM_Chile'] = trm_chile
+    df['Bodegal'] = bodegal(df)
+    df['Socio_cuenta'] = uno_si_aprobada(df)
+    df['Meli_USD'] = df['net_received_amount'] / df['TRM_Chile']
+    df['Utilidad_Gss'] = utilidad_por_estado(
+        df, df['Meli_USD'],
+        [amazon(df), df['cxp_amt_due'], df['Bodegal'], df['Socio_cuenta']],
+        [amazon(df), df['cxp_amt_due'], df['Bodegal'], df['Socio_cuenta']],
+        'cxp_amt_due'
+    )
+    return df
+
+
+def utilidad_faborcargo(df: pd.DataFrame, gss_logistica: Optional[pd.Series] = None) -> pd.Series:
+    """
+    Gss_Logistica + cxp_arancel + cxp_iva - cxp_amt_due si cxp_amt_due > 0, si no 0.
+    Sin gss_logistica es la versión simplificada del reporte global.
+    """
+    componentes = ([gss_logistica] if gss_logistica is not None else []) + [df['cxp_arancel'], df['cxp_iva']]
+    utilidad = _resta(_suma(componentes), [df['cxp_amt_due']])
+    return _serie(np.where(df['cxp_amt_due'] > 0, utilidad, 0), df)
+
+
+def calcular_faborcargo(df: pd.DataFrame, trm_chile: float) -> pd.DataFrame:
+    """TRM_Chile, Bodegal y Utilidad_Gss de FABORCARGO (requiere Gss_Logistica)"""
+    df['TRM_Chile'] = trm_chile
+    df['Bodegal'] = bodegal(df)
+    df['Utilidad_Gss'] = utilidad_faborcargo(df, df['Gss_Logistica'])
+    return df
+
+
+def calcular_global(df: pd.DataFrame, trm_dict: Dict[str, float], trm_defecto: Dict[str, float]) -> pd.DataFrame:
+    """Bodegal, Socio_cuenta, Impuesto_facturacion, Amazon, TRM, Meli_USD y Utilidad_Gss de las 8 cuentas"""
+    df['Bodegal'] = bodegal(df)
+    df['Socio_cuenta'] = uno_si_aprobada(df, CUENTAS_SOCIO)
+    df['Impuesto_facturacion'] = uno_si_aprobada(df, CUENTAS_DTPT)
+    df['Amazon'] = amazon(df)
+    df['TRM'] = trm_por_cuenta(df, trm_dict, trm_defecto)
+    df['Meli_USD'] = df['net_received_amount'] / df['TRM']
+
+    cuentas = df['account_name']
+    anicam = [df['Amazon'], df['logistics_total'], df['aditionals_total']]
+
+    # FABORCARGO (simplificada, sin Gss_Logistica)
+    fabor = utilidad_faborcargo(df)
+    chile = utilidad_por_estado(
+        df, df['Meli_USD'],
+        [df['Amazon'], df['cxp_amt_due'], df['Bodegal']],
+        [df['Amazon'], df['cxp_amt_due'], df['Bodegal'], df['Socio_cuenta']],
+        'cxp_amt_due'
+    )
+    peru = utilidad_por_estado(df, df['Meli_USD'], anicam, anicam + [df['Socio_cuenta']], 'logistics_total')
+    # DTPT: GSS recibe utilidad - 7.5 si la utilidad alcanza el tope; los reembolsos van completos
+    dtpt_base = utilidad_por_estado(df, df['Meli_USD'], anicam, anicam + [df['Impuesto_facturacion']],
+                                    'logistics_total')
+    _, dtpt_gss = reparto_socio(dtpt_base)
+    dtpt = _serie(np.where(_es_estado(df, 'refunded'), dtpt_base, dtpt_gss), df)
+    tdc = utilidad_por_estado(df, df['Meli_USD'], anicam, anicam, 'logistics_total')
+
+    df['Utilidad_Gss'] = _serie(np.select(
+        [cuentas == '8-FABORCARGO', cuentas.isin(CUENTAS_CHILE), cuentas == '4-MEGA TIENDAS PERUANAS',
+         cuentas.isin(CUENTAS_DTPT), cuentas == '1-TODOENCARGO-CO'],
+        [fabor, chile, peru, dtpt, tdc], 0
+    ), df)
+    return df
+
+
+def calcular_reembolsos(df: pd.DataFrame, trm_dict: Dict[str, float], trm_defecto: Dict[str, float]) -> pd.DataFrame:
+    """
+    TRM, Meli_USD, Utilidad_Gss, Reversion_Socio, Reversion_Gss, Perdida e
+    Impuesto_Facturacion de órdenes reembolsadas (requiere Bodegal, 0 en DTPT).
+    Las cuentas fuera de las 7 conocidas quedan en 0.
+    """
+    cuentas = df['account_name']
+    tdc = (cuentas == '1-TODOENCARGO-CO').to_numpy()
+    peru = (cuentas == '4-MEGA TIENDAS PERUANAS').to_numpy()
+    chile = cuentas.isin(CUENTAS_CHILE).to_numpy()
+    dtpt = cuentas.isin(CUENTAS_DTPT).to_numpy()
+    condiciones = [tdc, peru, chile, dtpt]
+
+    trm = np.select(condiciones, [trm_dict.get('colombia', trm_defecto['colombia']),
+                                  trm_dict.get('peru', trm_defecto['peru']),
+                                  trm_dict.get('chile', trm_defecto['chile']),
+                                  trm_dict.get('colombia', trm_defecto['colombia'])], 0.0)
+    conocida = tdc | peru | chile | dtpt
+    meli_usd = np.where(conocida, df['net_received_amount'].to_numpy() / np.where(conocida, trm, 1.0), 0.0)
+    meli_usd = _serie(meli_usd, df)
+    impuesto = _serie(np.where(dtpt, 1.0, 0.0), df)
+    socio_cuenta = 0.0
+
+    anicam = [amazon(df), df['logistics_total'], df['aditionals_total']]
+    utilidad_anicam = _resta(meli_usd, anicam)
+    utilidad_peru = _resta(meli_usd, anicam + [socio_cuenta])
+    utilidad_chile = _resta(meli_usd, [amazon(df), df['cxp_amt_due'], df['Bodegal'], socio_cuenta])
+    utilidad_dtpt = _resta(meli_usd, anicam + [impuesto])
+    utilidad = np.select(condiciones, [utilidad_anicam, utilidad_peru, utilidad_chile, utilidad_dtpt], 0.0)
+
+    perdida_anicam = -_suma([df['logistics_total'], df['aditionals_total'], amazon(df)])
+    perdida_chile = -_suma([amazon(df), df['cxp_amt_due'], df['Bodegal']])
+    perdida_dtpt = -_suma([df['logistics_total'], df['aditionals_total'], amazon(df), impuesto])
+    perdida = np.select(condiciones, [perdida_anicam, perdida_anicam, perdida_chile, perdida_dtpt], 0.0)
+
+    socio_dtpt, gss_dtpt = reparto_socio(_serie(utilidad, df))
+    reversion_socio = np.where(dtpt, socio_dtpt, 0.0)
+    reversion_gss = np.where(dtpt, gss_dtpt.astype(float), np.where(conocida, -utilidad, 0.0))
+
+    df['TRM'] = trm
+    df['Meli_USD'] = meli_usd
+    df['Utilidad_Gss'] = utilidad
+    df['Reversion_Socio'] = reversion_socio
+    df['Reversion_Gss'] = reversion_gss
+    df['Perdida'] = perdida
+    df['Impuesto_Facturacion'] = impuesto
+    return df
@@ -5,11 +5,11 @@ de Colombia, Chile y Perú
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
-from supabase import create_client
 import config
+from modulos.cliente_bd import obtener_cliente
 
-# Conexión a Supabase
-supabase = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
+# Conexión a Supabase (cliente compartido)
+supabase = obtener_cliente()
 
 def obtener_trm_fecha(pais: str, fecha: date) -> float:
     """
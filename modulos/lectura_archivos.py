@@ -0,0 +1,147 @@
+"""
+Módulo de Lectura de Archivos por Bloques
+Lee CSV / xlsx subidos en bloques de filas para no cargar el archivo completo
+
+CSV: pd.read_csv con chunksize.
+xlsx: openpyxl en modo read_only, recorriendo las filas en streaming.
+xls: el formato no permite streaming; se lee completo y se entrega en bloques.
+
+Los IDs (order_id, prealert_id, pack_id) se leen como texto. Si se dejara que
+pandas infiera el tipo en cada bloque, un bloque con celdas vacías convertiría
+los IDs a float ('123.0') y otro sin vacías los dejaría como entero ('123'),
+y el upsert por order_id no reconocería el mismo registro.
+"""
+
+from typing import Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+# Filas por bloque
+TAMANO_BLOQUE = 5000
+
+# Columnas que se leen siempre como texto
+COLUMNAS_ID = ['order_id', 'prealert_id', 'pack_id']
+
+
+def _nombre_archivo(archivo) -> str:
+    return getattr(archivo, 'name', str(archivo)).lower()
+
+
+def _encabezados(fila) -> List[str]:
+    """Nombres de columna con las mismas reglas que pandas (Unnamed: N, duplicados .1, .2)"""
+    encabezados = []
+    vistos = {}
+    for i, valor in enumerate(fila):
+        nombre = f'Unnamed: {i}' if valor is None or str(valor).strip() == '' else str(valor)
+        if nombre in vistos:
+            vistos[nombre] += 1
+            nombre = f'{nombre}.{vistos[nombre]}'
+        else:
+            vistos[nombre] = 0
+        encabezados.append(nombre)
+    return encabezados
+
+
+def _id_como_texto(valor):
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _construir_bloque(filas: List[tuple], encabezados: List[str], posiciones: List[int]) -> pd.DataFrame:
+    columnas = [encabezados[i] for i in posiciones]
+    datos = {col: [] for col in columnas}
+    for fila in filas:
+        for col, i in zip(columnas, posiciones):
+            datos[col].append(fila[i] if i < len(fila) else None)
+
+    bloque = {}
+    for col in columnas:
+        if col in COLUMNAS_ID:
+            bloque[col] = pd.Series([_id_como_texto(v) for v in datos[col]], dtype=object)
+        else:
+            bloque[col] = pd.Series(datos[col]).infer_objects()
+    return pd.DataFrame(bloque, columns=columnas)
+
+
+def _leer_xlsx_en_bloques(archivo, tamano_bloque: int, columnas: Optional[Iterable[str]]) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        hoja = libro.worksheets[0]
+        filas = hoja.iter_rows(values_only=True)
+
+        encabezados = None
+        for fila in filas:
+            if any(v is not None for v in fila):
+                encabezados = _encabezados(fila)
+                break
+        if encabezados is None:
+            return
+
+        seleccion = set(columnas) if columnas is not None else None
+        posiciones = [i for i, nombre in enumerate(encabezados) if seleccion is None or nombre in seleccion]
+
+        pendientes = []
+        for fila in filas:
+            # Igual que pd.read_excel: las filas completamente vacías se omiten
+            if all(v is None for v in fila):
+                continue
+            pendientes.append(fila)
+            if len(pendientes) >= tamano_bloque:
+                yield _construir_bloque(pendientes, encabezados, posiciones)
+                pendientes = []
+
+        if pendientes:
+            yield _construir_bloque(pendientes, encabezados, posiciones)
+    finally:
+        libro.close()
+
+
+def _leer_csv_en_bloques(archivo, tamano_bloque: int, columnas: Optional[Iterable[str]]) -> Iterator[pd.DataFrame]:
+    seleccion = set(columnas) if columnas is not None else None
+    lector = pd.read_csv(
+        archivo,
+        chunksize=tamano_bloque,
+        dtype={col: str for col in COLUMNAS_ID},
+        usecols=(lambda col: col in seleccion) if seleccion is not None else None
+    )
+    with lector:
+        for bloque in lector:
+            for col in COLUMNAS_ID:
+                if col in bloque.columns:
+                    bloque[col] = bloque[col].astype(object).where(bloque[col].notna(), None)
+            yield bloque
+
+
+def leer_en_bloques(archivo, tamano_bloque: int = TAMANO_BLOQUE,
+                    columnas: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Genera DataFrames de hasta tamano_bloque filas.
+
+    archivo puede ser una ruta o un archivo subido con st.file_uploader.
+    Si se indica columnas, solo se conservan esas (las que no existan se ignoran).
+    """
+    nombre = _nombre_archivo(archivo)
+
+    if nombre.endswith('.csv'):
+        yield from _leer_csv_en_bloques(archivo, tamano_bloque, columnas)
+    elif nombre.endswith('.xls'):
+        df = pd.read_excel(archivo)
+        if columnas is not None:
+            df = df[[col for col in df.columns if col in set(columnas)]]
+        for inicio in range(0, len(df), tamano_bloque):
+            yield df.iloc[inicio:inicio + tamano_bloque].reset_index(drop=True)
+    else:
+        yield from _leer_xlsx_en_bloques(archivo, tamano_bloque, columnas)
+
+
+def leer_completo(archivo, columnas: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Lee el archivo completo por bloques, conservando solo las columnas indicadas"""
+    bloques = list(leer_en_bloques(archivo, columnas=columnas))
+    if not bloques:
+        return pd.DataFrame()
+    return pd.concat(bloques, ignore_index=True)
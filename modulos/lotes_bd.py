@@ -0,0 +1,490 @@
+"""
+Módulo de Operaciones por Lotes en Supabase
+Búsqueda, escritura y eliminación de registros de consolidated_orders por lotes
+
+Búsqueda: los IDs existen en la BD en varias formas (123, '123, 123.0, '123.0).
+En vez de una consulta .eq() por ID y por variante, cada lote de IDs se resuelve
+con una sola consulta .in_() sobre todas sus variantes, y los resultados se
+asignan de vuelta al ID del archivo con un diccionario variante -> ID.
+Si la base de datos tiene la función buscar_por_claves (setup_buscar_claves.sql),
+la búsqueda va por las claves normalizadas (order_id_key, ...): miles de IDs
+por request en el cuerpo de un POST (rpc), en vez de 50 por URL. El resultado
+se filtra con las mismas variantes, así que coincide con el de .in_(). La
+función también encuentra registros con la clave vacía (compara clave_id()
+del ID en la base); los IDs de un lote de rpc que falla se buscan con .in_().
+
+Escritura: las actualizaciones parciales por id se envían en un request por
+lote, con solo las columnas que cambian, en lugar de un update().eq('id') por
+registro. Con la función actualizar_por_id (setup_actualizar_por_id.sql) el
+lote es un UPDATE ... FROM jsonb en la BD: no inserta ni pide las columnas
+NOT NULL que no se envían. Sin la función, un upsert por lote
+(on_conflict='id'); si el upsert falla, el lote se escribe registro por
+registro y el resultado lo cuenta (aviso_por_fila).
+
+Después de escribir o eliminar se invalida la caché de reportes
+(modulos/cache_reportes.py).
+
+Ejecución: los lotes corren en un pool de hilos acotado (máximo de requests
+en vuelo), con reintentos y backoff exponencial con jitter ante errores
+transitorios (timeouts, 429, 5xx). El callback de progreso se invoca siempre
+desde el hilo que llama, así que puede usar st.progress / st.write.
+"""
+
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import httpx
+
+from modulos.cache_reportes import invalidar_reportes
+from modulos.consolidacion import CLAVES_ID, clean_id, clean_id_aggressive
+
+logger = logging.getLogger(__name__)
+
+TABLA = 'consolidated_orders'
+
+# IDs de archivo por consulta .in_() (cada ID genera hasta 5 variantes en la URL)
+TAMANO_LOTE_BUSQUEDA = 50
+
+# Claves por llamada a buscar_por_claves (viajan en el cuerpo del POST, no en la URL)
+TAMANO_LOTE_CLAVES = 5000
+
+FUNCION_CLAVES = 'buscar_por_claves'
+
+# Columna de ID -> columna de clave normalizada ('order_id' -> 'order_id_key')
+COLUMNAS_CLAVE = {columna: clave for clave, columna in CLAVES_ID.items()}
+
+# Error de PostgREST cuando la función no existe (setup_buscar_claves.sql sin ejecutar)
+CODIGO_SIN_FUNCION = 'PGRST202'
+
+# Registros por upsert / llamada a actualizar_por_id
+TAMANO_LOTE_ESCRITURA = 50
+
+FUNCION_ACTUALIZAR = 'actualizar_por_id'
+
+# IDs por delete().in_()
+TAMANO_LOTE_ELIMINACION = 100
+
+# Requests en vuelo simultáneos (no superar los límites de PostgREST)
+MAX_CONCURRENCIA = 4
+
+# Reintentos ante errores transitorios: espera aleatoria en [0, min(max, base * 2^intento)]
+REINTENTOS = 3
+ESPERA_BASE = 0.5
+ESPERA_MAXIMA = 8.0
+
+CODIGOS_HTTP_TRANSITORIOS = {408, 425, 429, 500, 502, 503, 504}
+
+# SQLSTATE que se pueden reintentar: serialización, deadlock, statement timeout
+CODIGOS_SQL_TRANSITORIOS = {'40001', '40P01', '57014'}
+
+MENSAJES_TRANSITORIOS = (
+    'timeout', 'timed out', 'connection reset', 'connection aborted', 'connection refused',
+    'temporarily unavailable', 'too many requests', 'rate limit',
+    'bad gateway', 'service unavailable', 'gateway timeout'
+)
+
+
+# ============================================================================
+# EJECUCIÓN CONCURRENTE CON REINTENTOS
+# ============================================================================
+
+def es_error_transitorio(error: Exception) -> bool:
+    """True si el error es de red / timeout / 429 / 5xx y vale la pena reintentar"""
+    if isinstance(error, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)):
+        return True
+
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status in CODIGOS_HTTP_TRANSITORIOS:
+        return True
+
+    codigo = str(getattr(error, 'code', '') or '')
+    if codigo in CODIGOS_SQL_TRANSITORIOS or codigo in {str(c) for c in CODIGOS_HTTP_TRANSITORIOS}:
+        return True
+
+    mensaje = str(error).lower()
+    return any(texto in mensaje for texto in MENSAJES_TRANSITORIOS)
+
+
+def reintentar(funcion: Callable[[], Any], reintentos: int = REINTENTOS,
+               espera_base: float = ESPERA_BASE, espera_maxima: float = ESPERA_MAXIMA):
+    """Ejecuta funcion(); ante errores transitorios reintenta con backoff exponencial y jitter"""
+    intento = 0
+    while True:
+        try:
+            return funcion()
+        except Exception as e:
+            if intento >= reintentos or not es_error_transitorio(e):
+                raise
+            time.sleep(random.uniform(0, min(espera_maxima, espera_base * (2 ** intento))))
+            intento += 1
+
+
+def ejecutar_lotes(funcion: Callable[[Any], Any], lotes: List[Any],
+                   max_concurrencia: int = MAX_CONCURRENCIA,
+                   reintentos: int = REINTENTOS,
+                   al_terminar_lote: Optional[Callable[[dict, int, int], None]] = None) -> List[dict]:
+    """
+    Ejecuta funcion(lote) para cada lote en un pool de hilos acotado.
+
+    Cada lote se reintenta ante errores transitorios; un lote que falla no
+    detiene a los demás. Retorna, en el orden de `lotes`:
+        {'lote': n (desde 1), 'resultado': valor retornado o None, 'error': str o None}
+    al_terminar_lote recibe (resultado, lotes terminados, total de lotes) y se
+    invoca desde el hilo que llama a ejecutar_lotes.
+    """
+    total = len(lotes)
+    resultados = [None] * total
+
+    def ejecutar(indice):
+        try:
+            valor = reintentar(lambda: funcion(lotes[indice]), reintentos=reintentos)
+            return {'lote': indice + 1, 'resultado': valor, 'error': None}
+        except Exception as e:
+            return {'lote': indice + 1, 'resultado': None, 'error': str(e)}
+
+    if total == 0:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrencia, total))) as pool:
+        futuros = [pool.submit(ejecutar, indice) for indice in range(total)]
+        for terminados, futuro in enumerate(as_completed(futuros), start=1):
+            resultado = futuro.result()
+            resultados[resultado['lote'] - 1] = resultado
+            if al_terminar_lote:
+                al_terminar_lote(resultado, terminados, total)
+
+    return resultados
+
+
+def dividir_en_lotes(elementos: List[Any], tamano_lote: int) -> List[List[Any]]:
+    """Divide una lista en lotes consecutivos de tamano_lote"""
+    return [elementos[i:i + tamano_lote] for i in range(0, len(elementos), tamano_lote)]
+
+
+# ============================================================================
+# BÚSQUEDA POR LOTES
+# ============================================================================
+
+def variantes_id(id_archivo) -> List[str]:
+    """Formas en que un ID puede estar guardado en la BD, en orden de preferencia"""
+    base = clean_id(id_archivo)
+    if not base:
+        return []
+    variantes = [str(id_archivo).strip(), base, f"'{base}", f"{base}.0", f"'{base}.0"]
+    # Quitar repetidos manteniendo el orden
+    return list(dict.fromkeys(variantes))
+
+
+def indice_variantes(ids: Iterable) -> Dict[str, str]:
+    """Diccionario variante -> ID del archivo (ante choques gana el primer ID)"""
+    indice = {}
+    for id_archivo in ids:
+        for variante in variantes_id(id_archivo):
+            indice.setdefault(variante, id_archivo)
+    return indice
+
+
+def es_funcion_faltante(error: str) -> bool:
+    """True si el error es de PostgREST porque la función (rpc) no existe en la BD"""
+    return CODIGO_SIN_FUNCION in error or 'could not find the function' in error.lower()
+
+
+def buscar_claves(supabase, columna: str, ids: Iterable, columnas: str = 'id',
+                  cuentas: Optional[Iterable[str]] = None,
+                  tamano_lote: int = TAMANO_LOTE_CLAVES,
+                  errores: Optional[List[str]] = None,
+                  max_concurrencia: int = MAX_CONCURRENCIA,
+                  claves_fallidas: Optional[List[str]] = None) -> Optional[List[dict]]:
+    """
+    Registros de consolidated_orders cuya clave normalizada (order_id_key,
+    prealert_id_key o asignacion_key, según `columna`) es la de alguno de los
+    IDs, con las `columnas` pedidas más la columna de clave.
+
+    Usa la función buscar_por_claves de la BD: cada request lleva hasta
+    tamano_lote claves en el cuerpo del POST y devuelve todas sus filas.
+    Retorna None si la función no existe (quien llama usa .in_()); si falla
+    un lote, el error va a `errores` y sus claves a `claves_fallidas` (quien
+    llama puede buscar esos IDs con .in_()).
+    """
+    lista_columnas = [c.strip() for c in columnas.split(',') if c.strip()]
+    if columna not in COLUMNAS_CLAVE or '*' in lista_columnas:
+        return None
+    columna_clave = COLUMNAS_CLAVE[columna]
+    claves = list(dict.fromkeys(clave for clave in (clean_id_aggressive(i) for i in ids if i) if clave))
+    cuentas = list(cuentas) if cuentas else None
+
+    def consultar(lote):
+        return supabase.rpc(FUNCION_CLAVES, {
+            'columna': columna_clave, 'claves': lote, 'columnas': lista_columnas, 'cuentas': cuentas
+        }).execute().data or []
+
+    lotes = dividir_en_lotes(claves, tamano_lote)
+    resultados = ejecutar_lotes(consultar, lotes, max_concurrencia=max_concurrencia)
+    if any(resultado['error'] and es_funcion_faltante(resultado['error']) for resultado in resultados):
+        return None
+
+    registros = []
+    for lote, resultado in zip(lotes, resultados):
+        if resultado['error']:
+            if errores is not None:
+                errores.append(f"Lote {resultado['lote']} ({columna_clave}): {resultado['error']}")
+            if claves_fallidas is not None:
+                claves_fallidas.extend(lote)
+            continue
+        registros.extend(resultado['resultado'])
+    return registros
+
+
+def _asignar_por_variante(encontrados: Dict[str, List[dict]], ids: List, registros: List[dict], columna: str):
+    """Agrega a `encontrados` los registros cuya `columna` es una variante de algún ID"""
+    indice = indice_variantes(ids)
+    prioridad = {}
+    for id_archivo in ids:
+        for orden, variante in enumerate(variantes_id(id_archivo)):
+            prioridad.setdefault(variante, orden)
+
+    for registro in registros:
+        valor = registro.get(columna)
+        id_archivo = indice.get(str(valor)) if valor is not None else None
+        if id_archivo is not None:
+            encontrados.setdefault(id_archivo, []).append(registro)
+
+    for id_archivo in ids:
+        if id_archivo in encontrados:
+            encontrados[id_archivo].sort(key=lambda r: prioridad.get(str(r.get(columna)), len(prioridad)))
+
+
+def _asignar_por_clave(encontrados: Dict[str, List[dict]], ids: List, registros: List[dict], columna: str):
+    """
+    Agrega a `encontrados` los registros de buscar_claves(): cada uno va al ID
+    del archivo con su misma clave normalizada (clean_id_aggressive), aunque
+    el valor guardado no sea una de las variantes_id (espacios, comillas...)
+    """
+    columna_clave = COLUMNAS_CLAVE[columna]
+    indice = {}
+    for id_archivo in ids:
+        indice.setdefault(clean_id_aggressive(id_archivo), id_archivo)
+
+    for registro in registros:
+        # Registros con la clave vacía (la función los encuentra por clave_id() del ID)
+        clave = registro.get(columna_clave) or clean_id_aggressive(registro.get(columna))
+        id_archivo = indice.get(clave) if clave else None
+        if id_archivo is not None:
+            encontrados.setdefault(id_archivo, []).append(registro)
+
+    # Primero los registros cuyo valor es una variante preferida del ID
+    for id_archivo in ids:
+        if id_archivo in encontrados:
+            prioridad = {variante: orden for orden, variante in enumerate(variantes_id(id_archivo))}
+            encontrados[id_archivo].sort(key=lambda r: prioridad.get(str(r.get(columna)), len(prioridad)))
+
+
+def buscar_por_ids(supabase, columna: str, ids: Iterable, columnas: str = 'id, order_id, prealert_id',
+                   cuentas: Optional[List[str]] = None,
+                   tamano_lote: int = TAMANO_LOTE_BUSQUEDA,
+                   errores: Optional[List[str]] = None,
+                   max_concurrencia: int = MAX_CONCURRENCIA,
+                   usar_claves: bool = True) -> Dict[str, List[dict]]:
+    """
+    Busca en consolidated_orders los registros de cada ID: por su clave
+    normalizada con buscar_claves(), o cuya `columna` coincide con alguna
+    variante del ID en las consultas .in_().
+
+    Retorna {id_archivo: [registros]}; los registros de cada ID quedan
+    ordenados por la preferencia de la variante que coincidió. Los IDs sin
+    registros no aparecen en el resultado; si falla la consulta de un lote,
+    sus IDs quedan como no encontrados y el error se agrega a `errores`.
+    usar_claves: buscar primero con buscar_claves() (pocos requests grandes)
+    y usar .in_() por lotes de tamano_lote solo si la función no existe o
+    para los IDs de un lote de rpc que falló.
+    """
+    ids = [id_archivo for id_archivo in dict.fromkeys(ids) if id_archivo]
+    encontrados = {}
+    pedidas = [c.strip() for c in columnas.split(',') if c.strip()]
+    # La columna de búsqueda se trae siempre (para asignar cada registro a su ID)
+    seleccion = ', '.join(dict.fromkeys(pedidas + [columna]))
+
+    if usar_claves:
+        fallidas = []
+        registros = buscar_claves(supabase, columna, ids, seleccion, cuentas=cuentas,
+                                  max_concurrencia=max_concurrencia, claves_fallidas=fallidas)
+        if registros is not None:
+            _asignar_por_clave(encontrados, ids, registros, columna)
+            fallidas = set(fallidas)
+            ids = [id_archivo for id_archivo in ids if clean_id_aggressive(id_archivo) in fallidas]
+
+    def consultar(lote):
+        query = supabase.table(TABLA).select(seleccion).in_(columna, list(indice_variantes(lote)))
+        if cuentas:
+            query = query.in_('account_name', cuentas)
+        return query.execute().data or []
+
+    lotes = dividir_en_lotes(ids, tamano_lote)
+
+    for lote, resultado in zip(lotes, ejecutar_lotes(consultar, lotes, max_concurrencia=max_concurrencia)):
+        if resultado['error']:
+            if errores is not None:
+                errores.append(f"Lote {resultado['lote']} ({columna}): {resultado['error']}")
+            continue
+        _asignar_por_variante(encontrados, lote, resultado['resultado'], columna)
+
+    # Solo las columnas pedidas
+    if '*' in pedidas:
+        return encontrados
+    return {id_archivo: [{c: registro.get(c) for c in pedidas} for registro in lista]
+            for id_archivo, lista in encontrados.items()}
+
+
+# ============================================================================
+# ESCRITURA POR LOTES
+# ============================================================================
+
+def _agrupar_por_columnas(registros: List[dict]) -> List[List[dict]]:
+    """
+    Separa un lote en grupos con las mismas columnas. Un upsert masivo
+    completa con NULL las columnas que faltan en algún registro, así que
+    cada request lleva registros con exactamente las mismas llaves.
+    """
+    grupos = {}
+    for registro in registros:
+        grupos.setdefault(tuple(sorted(registro)), []).append(registro)
+    return list(grupos.values())
+
+
+def _actualizar_por_fila(supabase, registros: List[dict]) -> int:
+    """Respaldo: update().eq('id') registro por registro. Retorna cuántos se actualizaron"""
+    actualizados = 0
+    for registro in registros:
+        datos = {k: v for k, v in registro.items() if k != 'id'}
+        try:
+            result = reintentar(lambda: supabase.table(TABLA).update(datos).eq('id', registro['id']).execute())
+            if result.data:
+                actualizados += 1
+        except Exception:
+            continue
+    return actualizados
+
+
+def escribir_por_id(supabase, actualizaciones: List[dict],
+                    tamano_lote: int = TAMANO_LOTE_ESCRITURA,
+                    al_terminar_lote: Optional[Callable[[dict, int, int], None]] = None,
+                    respaldo_por_fila: bool = True,
+                    max_concurrencia: int = MAX_CONCURRENCIA,
+                    cuentas: Optional[Iterable[str]] = None) -> List[dict]:
+    """
+    Escribe actualizaciones parciales [{'id': ..., columna: valor, ...}]
+    con un request por lote: la función actualizar_por_id de la BD, o un
+    upsert keyed en id si la función no existe. Los lotes corren en paralelo
+    (max_concurrencia) y se reintentan ante errores transitorios.
+    cuentas: account_name de los registros, si quien llama los conoce
+    (solo se invalidan los reportes de esas cuentas).
+
+    Si el lote falla de forma definitiva (por ejemplo el upsert por una
+    restricción NOT NULL de una columna que no se envía) y respaldo_por_fila
+    está activo, ese lote se reintenta con update().eq('id') por registro.
+
+    Retorna un resultado por lote, en orden:
+        {'lote', 'inicio', 'registros', 'actualizados', 'por_fila', 'error'}
+    `inicio` es la posición del lote en `actualizaciones`; `por_fila`, cuántos
+    de sus registros se escribieron uno por uno. al_terminar_lote recibe
+    (resultado, registros procesados, total) después de cada lote.
+    """
+    total = len(actualizaciones)
+    lotes = dividir_en_lotes(actualizaciones, tamano_lote)
+    # Se apaga en el primer lote que no encuentra la función (PGRST202)
+    con_funcion = [True]
+
+    def escribir(lote):
+        if con_funcion[0]:
+            try:
+                result = reintentar(lambda: supabase.rpc(FUNCION_ACTUALIZAR, {'filas': lote}).execute())
+                return (result.data if isinstance(result.data, int) else len(lote)), 0, None
+            except Exception as e:
+                if not es_funcion_faltante(str(e)):
+                    if not respaldo_por_fila:
+                        return 0, 0, str(e)
+                    return _actualizar_por_fila(supabase, lote), len(lote), str(e)
+                con_funcion[0] = False
+
+        actualizados = 0
+        por_fila = 0
+        error = None
+        for grupo in _agrupar_por_columnas(lote):
+            try:
+                result = reintentar(lambda: supabase.table(TABLA).upsert(grupo, on_conflict='id').execute())
+                actualizados += len(result.data) if result.data is not None else len(grupo)
+            except Exception as e:
+                error = str(e)
+                if respaldo_por_fila:
+                    actualizados += _actualizar_por_fila(supabase, grupo)
+                    por_fila += len(grupo)
+        return actualizados, por_fila, error
+
+    def a_resultado(resultado_lote):
+        indice = resultado_lote['lote'] - 1
+        actualizados, por_fila, error = resultado_lote['resultado'] or (0, 0, resultado_lote['error'])
+        return {
+            'lote': resultado_lote['lote'],
+            'inicio': indice * tamano_lote,
+            'registros': len(lotes[indice]),
+            'actualizados': actualizados,
+            'por_fila': por_fila,
+            'error': error,
+        }
+
+    procesados = [0]
+
+    def progreso(resultado_lote, terminados, total_lotes):
+        resultado = a_resultado(resultado_lote)
+        procesados[0] += resultado['registros']
+        if al_terminar_lote:
+            al_terminar_lote(resultado, procesados[0], total)
+
+    # escribir() maneja sus propios reintentos por request
+    resultados = ejecutar_lotes(escribir, lotes, max_concurrencia=max_concurrencia,
+                                reintentos=0, al_terminar_lote=progreso)
+    resultados = [a_resultado(resultado) for resultado in resultados]
+
+    aviso = aviso_por_fila(resultados)
+    if aviso:
+        logger.warning("%s%s", aviso, "" if con_funcion[0] else
+                       "; sin la función actualizar_por_id (setup_actualizar_por_id.sql)")
+
+    # Las actualizaciones por id no dicen de qué cuenta son: sin `cuentas`, invalida todos los reportes
+    if any(resultado['actualizados'] for resultado in resultados):
+        invalidar_reportes(supabase, cuentas)
+    return resultados
+
+
+def aviso_por_fila(resultados: List[dict]) -> Optional[str]:
+    """
+    Mensaje para mostrar si algún lote de escribir_por_id() se escribió
+    registro por registro (un request por registro), o None
+    """
+    lotes = [resultado for resultado in resultados if resultado.get('por_fila')]
+    if not lotes:
+        return None
+    registros = sum(resultado['por_fila'] for resultado in lotes)
+    return (f"⚠️ {registros} registros de {len(lotes)} lotes se escribieron uno por uno "
+            f"(falló la escritura del lote: {lotes[0]['error']})")
+
+
+def eliminar_por_ids(supabase, ids: List[Any],
+                     tamano_lote: int = TAMANO_LOTE_ELIMINACION,
+                     al_terminar_lote: Optional[Callable[[dict, int, int], None]] = None,
+                     max_concurrencia: int = MAX_CONCURRENCIA) -> int:
+    """Elimina registros por id con un delete().in_() por lote. Retorna cuántos se eliminaron"""
+    def eliminar(lote):
+        supabase.table(TABLA).delete().in_('id', lote).execute()
+        return len(lote)
+
+    resultados = ejecutar_lotes(eliminar, dividir_en_lotes(list(ids), tamano_lote),
+                                max_concurrencia=max_concurrencia, al_terminar_lote=al_terminar_lote)
+    eliminados = sum(resultado['resultado'] or 0 for resultado in resultados)
+    if eliminados:
+        invalidar_reportes(supabase)
+    return eliminados
@@ -0,0 +1,222 @@
+"""
+Módulo de Reporte de Progreso
+Salida del pipeline de consolidación independiente de la interfaz
+
+El pipeline (modulos/consolidar.py) no llama a st.* directamente: recibe un
+reporte y le envía mensajes, métricas y avance. ReporteStreamlit los muestra
+en la página del Consolidador; ReporteConsola los imprime para ejecutar la
+consolidación desde la línea de comandos (cron). Ambos registran el tiempo
+de cada etapa.
+"""
+
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Tuple
+
+
+class Reporte:
+    """Reporte base: no muestra nada, solo registra los tiempos por etapa"""
+
+    def __init__(self):
+        self.tiempos: List[Tuple[str, float]] = []
+
+    def info(self, mensaje: str):
+        pass
+
+    def success(self, mensaje: str):
+        pass
+
+    def warning(self, mensaje: str):
+        pass
+
+    def error(self, mensaje: str):
+        pass
+
+    def caption(self, mensaje: str):
+        pass
+
+    def write(self, mensaje: str):
+        pass
+
+    def metricas(self, valores: Dict[str, object]):
+        pass
+
+    def progreso(self, titulo: str = ''):
+        """Retorna un objeto con actualizar(fraccion, texto) y cerrar()"""
+        return _ProgresoVacio()
+
+    def bloque(self, numero: int, leidos: int):
+        """Contexto para los mensajes de un bloque del modo streaming"""
+        return nullcontext()
+
+    def fin_bloques(self, mensaje: str):
+        self.success(mensaje)
+
+    def al_terminar_etapa(self, nombre: str, segundos: float):
+        pass
+
+    @contextmanager
+    def etapa(self, nombre: str):
+        """Mide la duración de una etapa del pipeline"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            self.tiempos.append((nombre, segundos))
+            self.al_terminar_etapa(nombre, segundos)
+
+    def resumen_tiempos(self) -> Dict[str, float]:
+        """Segundos acumulados por etapa (las etapas de cada bloque se suman)"""
+        resumen = {}
+        for nombre, segundos in self.tiempos:
+            resumen[nombre] = resumen.get(nombre, 0.0) + segundos
+        return resumen
+
+
+class _ProgresoVacio:
+    def actualizar(self, fraccion: float, texto: str = ''):
+        pass
+
+    def cerrar(self):
+        pass
+
+
+# ============================================================================
+# STREAMLIT
+# ============================================================================
+
+class _ProgresoStreamlit:
+    def __init__(self, st):
+        self.barra = st.progress(0)
+        self.texto = st.empty()
+
+    def actualizar(self, fraccion: float, texto: str = ''):
+        self.barra.progress(min(1.0, fraccion))
+        if texto:
+            self.texto.text(texto)
+
+    def cerrar(self):
+        self.barra.progress(1.0)
+
+
+class ReporteStreamlit(Reporte):
+    """Muestra el avance en la página con st.info / st.success / st.progress"""
+
+    def __init__(self):
+        super().__init__()
+        import streamlit as st
+        self.st = st
+        self._estado_bloques = None
+        self._mensajes_bloque = None
+
+    def info(self, mensaje: str):
+        self.st.info(mensaje)
+
+    def success(self, mensaje: str):
+        self.st.success(mensaje)
+
+    def warning(self, mensaje: str):
+        self.st.warning(mensaje)
+
+    def error(self, mensaje: str):
+        self.st.error(mensaje)
+
+    def caption(self, mensaje: str):
+        self.st.caption(mensaje)
+
+    def write(self, mensaje: str):
+        self.st.write(mensaje)
+
+    def metricas(self, valores: Dict[str, object]):
+        columnas = self.st.columns(len(valores))
+        for columna, (etiqueta, valor) in zip(columnas, valores.items()):
+            with columna:
+                self.st.metric(etiqueta, valor)
+
+    def progreso(self, titulo: str = ''):
+        return _ProgresoStreamlit(self.st)
+
+    def bloque(self, numero: int, leidos: int):
+        # Los mensajes de cada bloque reemplazan a los del bloque anterior
+        if self._estado_bloques is None:
+            self._estado_bloques = self.st.empty()
+            self._mensajes_bloque = self.st.empty()
+        self._estado_bloques.info(f"🌊 Bloque {numero}: {leidos:,} registros leídos")
+        return self._mensajes_bloque.container()
+
+    def fin_bloques(self, mensaje: str):
+        if self._estado_bloques is None:
+            self.success(mensaje)
+            return
+        self._mensajes_bloque.empty()
+        self._estado_bloques.success(mensaje)
+        self._estado_bloques = None
+        self._mensajes_bloque = None
+
+
+# ============================================================================
+# CONSOLA
+# ============================================================================
+
+class _ProgresoConsola:
+    def __init__(self, salida, titulo: str):
+        self.salida = salida
+        self.titulo = titulo
+        self.ultimo_decil = -1
+
+    def actualizar(self, fraccion: float, texto: str = ''):
+        # Una línea cada 10% para no llenar el log de cron
+        decil = int(min(1.0, fraccion) * 10)
+        if decil > self.ultimo_decil:
+            self.ultimo_decil = decil
+            print(f"   [{decil * 10:3d}%] {texto or self.titulo}", file=self.salida, flush=True)
+
+    def cerrar(self):
+        pass
+
+
+class ReporteConsola(Reporte):
+    """Imprime el avance y el tiempo de cada etapa"""
+
+    def __init__(self, salida=None, mostrar_tiempos: bool = True):
+        super().__init__()
+        self.salida = salida or sys.stdout
+        self.mostrar_tiempos = mostrar_tiempos
+
+    def _imprimir(self, mensaje: str):
+        print(mensaje, file=self.salida, flush=True)
+
+    def info(self, mensaje: str):
+        self._imprimir(mensaje)
+
+    def success(self, mensaje: str):
+        self._imprimir(mensaje)
+
+    def warning(self, mensaje: str):
+        self._imprimir(mensaje)
+
+    def error(self, mensaje: str):
+        self._imprimir(mensaje)
+
+    def caption(self, mensaje: str):
+        self._imprimir(f"   {mensaje}")
+
+    def write(self, mensaje: str):
+        self._imprimir(mensaje)
+
+    def metricas(self, valores: Dict[str, object]):
+        for etiqueta, valor in valores.items():
+            self._imprimir(f"   {etiqueta}: {valor:,}" if isinstance(valor, int) else f"   {etiqueta}: {valor}")
+
+    def progreso(self, titulo: str = ''):
+        return _ProgresoConsola(self.salida, titulo)
+
+    def bloque(self, numero: int, leidos: int):
+        self._imprimir(f"\n--- Bloque {numero}: {leidos:,} registros leídos ---")
+        return nullcontext()
+
+    def al_terminar_etapa(self, nombre: str, segundos: float):
+        if self.mostrar_tiempos:
+            self._imprimir(f"⏱️ {nombre}: {segundos:.2f} s")
@@ -7,7 +7,6 @@ Incluye: DETODOPARATODOS, COMPRAFACIL, COMPRA-YA
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-import io
 import sys
 import os
 import calendar
@@ -16,8 +15,62 @@ import calendar
 parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, parent_dir)
 
-from supabase import create_client
-import config
+from modulos.cliente_bd import obtener_cliente
+from modulos.cache_reportes import reporte_en_cache
+from modulos.consultas import COLUMNA_FECHA_REPORTE, ORDEN_FECHA_REPORTE, cargar_registros
+from modulos.formulas import calcular_dtpt
+from modulos.exportar import FORMATO_COP, FORMATO_DECIMAL, FORMATO_USD, mostrar_descarga, tabla_exportacion
+from modulos.tabla_paginada import mostrar_tabla
+
+# Columnas de consolidated_orders que usa el reporte
+COLUMNAS = [
+    'account_name', 'asignacion', 'order_id', 'prealert_id', 'order_status_meli',
+    'logistics_date', 'net_received_amount', 'declare_value', 'quantity',
+    'logistics_total', 'aditionals_total'
+]
+
+# Las 3 cuentas del DTPT GROUP (filtro de la consulta y versión de los datos en la caché)
+CUENTAS = ['5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']
+
+
+def preparar_datos(supabase, fecha_inicio, fecha_fin, trm_dict):
+    """
+    Carga los registros del período y calcula las columnas del reporte
+    (None si no hay registros)
+    """
+    # Query paginada con filtro de fecha (DTPT usa logistics_date = fecha_reporte)
+    df = cargar_registros(supabase, COLUMNAS, COLUMNA_FECHA_REPORTE, fecha_inicio, fecha_fin,
+                          cuentas=CUENTAS, orden=ORDEN_FECHA_REPORTE)
+
+    if df.empty:
+        return None
+
+    # Convertir logistics_date (ya viene filtrada por la query)
+    df['logistics_date'] = pd.to_datetime(df['logistics_date'], errors='coerce')
+
+    # CALCULAR COLUMNAS PARA DTPT GROUP
+
+    # Limpiar valores monetarios
+    columnas_monetarias = ['declare_value', 'net_received_amount', 'logistics_total', 
+                          'aditionals_total']
+
+    for col in columnas_monetarias:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    # Asegurar que quantity existe
+    if 'quantity' in df.columns:
+        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(1)
+    else:
+        df['quantity'] = 1
+
+    # TRM Colombia, Impuesto por facturación (1 USD si es approved), Meli USD y utilidad
+    # DISTRIBUCIÓN DE UTILIDADES (especial para DTPT)
+    # Si la utilidad es >= 7.5, el socio recibe 7.5 y GSS el resto
+    # Si es < 7.5, el socio recibe todo (incluso si es negativo)
+    calcular_dtpt(df, trm_dict.get('colombia', 4250.0))
+    return df
+
 
 def generar_reporte(fecha_inicio=None, fecha_fin=None):
     """
@@ -37,12 +90,7 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
     st.caption("Proveedor: Anicam | País: Colombia | Campo: logistics_date")
     st.caption("Incluye: DETODOPARATODOS, COMPRAFACIL, COMPRA-YA")
 
-    # Initialize Supabase
-    @st.cache_resource
-    def init_supabase():
-        return create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
-
-    supabase = init_supabase()
+    supabase = obtener_cliente()
 
     # Constants
     MESES = {
@@ -77,73 +125,12 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
         
         # CARGAR DATOS - CORREGIDO PARA EVITAR PROBLEMAS DE PAGINACIÓN
         try:
-            # Las 3 cuentas del DTPT GROUP
-            account_names = ['5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']
-            
-            # Query directa con filtro de fecha (DTPT usa logistics_date)
-            query = supabase.table('consolidated_orders').select('*')
-            query = query.in_('account_name', account_names)
-            query = query.gte('logistics_date', str(fecha_inicio))
-            query = query.lte('logistics_date', str(fecha_fin))
-            result = query.execute()
+            # Carga y cálculo del período (desde la caché si los datos no cambiaron)
+            df = reporte_en_cache(supabase, 'dtpt_group', preparar_datos, fecha_inicio, fecha_fin,
+                                  trm_dict, cuentas=CUENTAS)
             
-            all_records = result.data
-            
-            if all_records:
-                df = pd.DataFrame(all_records)
-                
-                # Convertir logistics_date (ya viene filtrada por la query)
-                df['logistics_date'] = pd.to_datetime(df['logistics_date'], errors='coerce')
-                
+            if df is not None:
                 if not df.empty:
-                    # CALCULAR COLUMNAS PARA DTPT GROUP
-                    
-                    # Limpiar valores monetarios
-                    columnas_monetarias = ['declare_value', 'net_received_amount', 'logistics_total', 
-                                          'aditionals_total']
-                    
-                    for col in columnas_monetarias:
-                        if col in df.columns:
-                            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                    
-                    # Asegurar que quantity existe
-                    if 'quantity' in df.columns:
-                        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(1)
-                    else:
-                        df['quantity'] = 1
-                    
-                    # TRM Colombia
-                    df['TRM_Colombia'] = trm_dict.get('colombia', 4250.0)
-                    
-                    # Impuesto por facturación (1 USD si es approved)
-                    df['Impuesto_facturacion'] = df['order_status_meli'].apply(lambda x: 1 if x == 'approved' else 0)
-                    
-                    # Meli USD
-                    df['Meli_USD'] = df['net_received_amount'] / df['TRM_Colombia']
-                    
-                    # Calcular utilidad DTPT
-                    def calc_utilidad_dtpt(row):
-                        # Si es refunded, la utilidad es negativa
-                        if row.get('order_status_meli', '') == 'refunded':
-                            return -(row['declare_value'] * row['quantity'] + 
-                                    row['logistics_total'] + 
-                                    row['aditionals_total'])
-                        # Si hay logistics_total, calcular normal
-                        elif row['logistics_total'] > 0:
-                            return (row['Meli_USD'] - 
-                                   (row['declare_value'] * row['quantity']) - 
-                                   row['logistics_total'] - 
-                                   row['aditionals_total'] - 
-                                   row['Impuesto_facturacion'])
-                        return 0
-                    
-                    df['Utilidad'] = df.apply(calc_utilidad_dtpt, axis=1)
-                    
-                    # DISTRIBUCIÓN DE UTILIDADES (especial para DTPT)
-                    # Si la utilidad es >= 7.5, el socio recibe 7.5 y GSS el resto
-                    # Si es < 7.5, el socio recibe todo (incluso si es negativo)
-                    df['Utilidad_Socio'] = df['Utilidad'].apply(lambda x: 7.5 if x >= 7.5 else x)
-                    df['Utilidad_Gss'] = df['Utilidad'].apply(lambda x: x - 7.5 if x >= 7.5 else 0)
                     
                     # MOSTRAR MÉTRICAS COMPACTAS
                     total_registros = len(df)
@@ -183,101 +170,33 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
                     st.markdown("---")
                     st.subheader("📋 Detalle del Reporte")
                     
-                    # Columnas a mostrar
-                    columnas_mostrar = [
-                        'logistics_date', 'account_name', 'asignacion', 'prealert_id', 'order_id',
-                        'order_status_meli', 'net_received_amount', 'declare_value', 
-                        'quantity', 'logistics_total', 'aditionals_total',
-                        'TRM_Colombia', 'Meli_USD', 'Impuesto_facturacion',
-                        'Utilidad', 'Utilidad_Socio', 'Utilidad_Gss'
-                    ]
-                    
-                    columnas_disponibles = [col for col in columnas_mostrar if col in df.columns]
-                    df_mostrar = df[columnas_disponibles].copy()
-                    
-                    # FORMATEAR PARA DISPLAY CON INDICADORES VISUALES
-                    # Formatear net_received_amount según país (Colombia - COP)
-                    if 'net_received_amount' in df_mostrar.columns:
-                        df_mostrar['💵 Net Received'] = df_mostrar['net_received_amount'].apply(
-                            lambda x: f"${x * trm_dict.get('colombia', 4250):,.0f} COP" if pd.notna(x) and x != 0 else "$0 COP"
-                        )
-                        df_mostrar = df_mostrar.drop('net_received_amount', axis=1)
-                    
-                    # Formatear otras columnas con indicadores
-                    if 'declare_value' in df_mostrar.columns:
-                        df_mostrar['🟢 Declare Value'] = df_mostrar['declare_value'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('declare_value', axis=1)
-                    
-                    if 'Meli_USD' in df_mostrar.columns:
-                        df_mostrar['🟡 Meli USD'] = df_mostrar['Meli_USD'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('Meli_USD', axis=1)
-                    
-                    # Para Colombia, Bodegal equivale a logistics_total
-                    if 'logistics_total' in df_mostrar.columns:
-                        df_mostrar['🔵 Bodegal'] = df_mostrar['logistics_total'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('logistics_total', axis=1)
-                    
-                    # Para Colombia, Socio Cuenta sería Utilidad_Socio
-                    if 'Utilidad_Socio' in df_mostrar.columns:
-                        df_mostrar['🟣 Socio Cuenta'] = df_mostrar['Utilidad_Socio'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('Utilidad_Socio', axis=1)
-                    
-                    # Impuesto Fact (Impuesto_facturacion para Colombia)
-                    if 'Impuesto_facturacion' in df_mostrar.columns:
-                        df_mostrar['🔴 Impuesto Fact.'] = df_mostrar['Impuesto_facturacion'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('Impuesto_facturacion', axis=1)
-                    
-                    if 'Utilidad_Gss' in df_mostrar.columns:
-                        df_mostrar['⚪ Utilidad GSS'] = df_mostrar['Utilidad_Gss'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('Utilidad_Gss', axis=1)
-                    
-                    # Agregar columna Amazon (que sería el declare_value * quantity para este reporte)
-                    if 'quantity' in df.columns:
-                        df_mostrar['🟠 Amazon'] = (df['declare_value'] * df['quantity']).apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                    
-                    # Mostrar dataframe formateado
-                    st.dataframe(df_mostrar, use_container_width=True, height=500)
+                    # Columnas del detalle (valores numéricos; el formato se aplica a la página visible)
+                    tabla, formatos = tabla_exportacion(df, [
+                        ('logistics_date', 'logistics_date', None),
+                        ('account_name', 'account_name', None),
+                        ('asignacion', 'asignacion', None),
+                        ('prealert_id', 'prealert_id', None),
+                        ('order_id', 'order_id', None),
+                        ('order_status_meli', 'order_status_meli', None),
+                        ('quantity', 'quantity', None),
+                        ('aditionals_total', 'aditionals_total', FORMATO_USD),
+                        ('TRM_Colombia', 'TRM_Colombia', FORMATO_DECIMAL),
+                        ('Utilidad', 'Utilidad', FORMATO_USD),
+                        ('💵 Net Received', df['net_received_amount'] * trm_dict.get('colombia', 4250), FORMATO_COP),
+                        ('🟢 Declare Value', 'declare_value', FORMATO_USD),
+                        ('🟡 Meli USD', 'Meli_USD', FORMATO_USD),
+                        ('🔵 Bodegal', 'logistics_total', FORMATO_USD),
+                        ('🟣 Socio Cuenta', 'Utilidad_Socio', FORMATO_USD),
+                        ('🔴 Impuesto Fact.', 'Impuesto_facturacion', FORMATO_USD),
+                        ('⚪ Utilidad GSS', 'Utilidad_Gss', FORMATO_USD),
+                        ('🟠 Amazon', df['declare_value'] * df['quantity'], FORMATO_USD),
+                    ])
+                    mostrar_tabla(tabla, formatos, 'dtpt_group')
                     
                     # EXPORTAR
                     st.markdown("---")
-                    col1, col2 = st.columns(2)
-                    
                     nombre = f'dtpt_group_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}'
-                    
-                    with col1:
-                        csv = df_mostrar.to_csv(index=False, encoding='utf-8-sig')
-                        st.download_button(
-                            "📥 Descargar CSV",
-                            csv,
-                            f'{nombre}.csv',
-                            'text/csv'
-                        )
-                    
-                    with col2:
-                        buffer = io.BytesIO()
-                        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                            df_mostrar.to_excel(writer, sheet_name='DTPT-GROUP', index=False)
-                        
-                        st.download_button(
-                            "📥 Descargar Excel",
-                            buffer.getvalue(),
-                            f'{nombre}.xlsx',
-                            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                        )
+                    mostrar_descarga(nombre, [('DTPT-GROUP', tabla, formatos)], 'dtpt_group')
                     
                     # Información adicional
                     st.info(f"""
@@ -6,7 +6,6 @@ Proveedor: Anicam | País: Perú
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-import io
 import sys
 import os
 import calendar
@@ -15,8 +14,60 @@ import calendar
 parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, parent_dir)
 
-from supabase import create_client
-import config
+from modulos.cliente_bd import obtener_cliente
+from modulos.cache_reportes import reporte_en_cache
+from modulos.consultas import COLUMNA_FECHA_REPORTE, ORDEN_FECHA_REPORTE, cargar_registros
+from modulos.formulas import calcular_mega_tiendas
+from modulos.exportar import FORMATO_DECIMAL, FORMATO_PEN, FORMATO_USD, mostrar_descarga, tabla_exportacion
+from modulos.tabla_paginada import mostrar_tabla
+
+# Columnas de consolidated_orders que usa el reporte
+COLUMNAS = [
+    'account_name', 'asignacion', 'order_id', 'prealert_id', 'order_status_meli',
+    'logistics_date', 'net_received_amount', 'declare_value', 'quantity',
+    'logistics_total', 'aditionals_total'
+]
+
+# Cuentas del reporte (filtro de la consulta y versión de los datos en la caché)
+CUENTAS = ['4-MEGA TIENDAS PERUANAS']
+
+
+def preparar_datos(supabase, fecha_inicio, fecha_fin, trm_dict):
+    """
+    Carga los registros del período y calcula las columnas del reporte
+    (None si no hay registros)
+    """
+    # Query paginada con filtro de fecha y solo las columnas del reporte
+    # (fecha_reporte = logistics_date en las cuentas Anicam)
+    df = cargar_registros(supabase, COLUMNAS, COLUMNA_FECHA_REPORTE, fecha_inicio, fecha_fin,
+                          cuentas=CUENTAS, orden=ORDEN_FECHA_REPORTE)
+
+    if df.empty:
+        return None
+
+    # Convertir logistics_date (ya viene filtrada por la query)
+    df['logistics_date'] = pd.to_datetime(df['logistics_date'], errors='coerce')
+
+    # CALCULAR COLUMNAS PARA MEGA TIENDAS PERUANAS
+
+    # Limpiar valores monetarios
+    columnas_monetarias = ['declare_value', 'net_received_amount', 'logistics_total', 
+                          'aditionals_total']
+
+    for col in columnas_monetarias:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    # Asegurar que quantity existe
+    if 'quantity' in df.columns:
+        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(1)
+    else:
+        df['quantity'] = 1
+
+    # TRM Peru, Socio cuenta (1 USD si es approved), Meli USD y utilidad (vectorizado)
+    calcular_mega_tiendas(df, trm_dict.get('peru', 3.75))
+    return df
+
 
 def generar_reporte(fecha_inicio=None, fecha_fin=None):
     """
@@ -35,12 +86,7 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
     
     st.caption("Proveedor: Anicam | País: Perú | Campo: logistics_date")
     
-    # Initialize Supabase
-    @st.cache_resource
-    def init_supabase():
-        return create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
-
-    supabase = init_supabase()
+    supabase = obtener_cliente()
 
     # Constants
     MESES = {
@@ -75,64 +121,12 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
         
         # CARGAR DATOS - CORREGIDO PARA EVITAR PROBLEMAS DE PAGINACIÓN
         try:
-            # Query directa con filtro de fecha para mayor eficiencia
-            query = supabase.table('consolidated_orders').select('*')
-            query = query.eq('account_name', '4-MEGA TIENDAS PERUANAS')
-            query = query.gte('logistics_date', str(fecha_inicio))
-            query = query.lte('logistics_date', str(fecha_fin))
-            result = query.execute()
+            # Carga y cálculo del período (desde la caché si los datos no cambiaron)
+            df = reporte_en_cache(supabase, 'mega_tiendas_peruanas', preparar_datos, fecha_inicio, fecha_fin,
+                                  trm_dict, cuentas=CUENTAS)
             
-            all_records = result.data
-            
-            if all_records:
-                df = pd.DataFrame(all_records)
-                
-                # Convertir logistics_date (ya viene filtrada por la query)
-                df['logistics_date'] = pd.to_datetime(df['logistics_date'], errors='coerce')
-                
+            if df is not None:
                 if not df.empty:
-                    # CALCULAR COLUMNAS PARA MEGA TIENDAS PERUANAS
-                    
-                    # Limpiar valores monetarios
-                    columnas_monetarias = ['declare_value', 'net_received_amount', 'logistics_total', 
-                                          'aditionals_total']
-                    
-                    for col in columnas_monetarias:
-                        if col in df.columns:
-                            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                    
-                    # Asegurar que quantity existe
-                    if 'quantity' in df.columns:
-                        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(1)
-                    else:
-                        df['quantity'] = 1
-                    
-                    # TRM Peru
-                    df['TRM_Peru'] = trm_dict.get('peru', 3.75)
-                    
-                    # Socio cuenta (1 USD si es approved)
-                    df['Socio_cuenta'] = df['order_status_meli'].apply(lambda x: 1 if x == 'approved' else 0)
-                    
-                    # Meli USD
-                    df['Meli_USD'] = df['net_received_amount'] / df['TRM_Peru']
-                        
-                    # Calcular utilidad MEGA TIENDAS
-                    def calc_utilidad_mega(row):
-                        # Si es refunded, la utilidad es negativa
-                        if row.get('order_status_meli', '') == 'refunded':
-                            return -(row['declare_value'] * row['quantity'] + 
-                                    row['logistics_total'] + 
-                                    row['aditionals_total'])
-                        # Si hay logistics_total, calcular normal
-                        elif row['logistics_total'] > 0:
-                            return (row['Meli_USD'] - 
-                                   (row['declare_value'] * row['quantity']) - 
-                                   row['logistics_total'] - 
-                                   row['aditionals_total'] - 
-                                   row['Socio_cuenta'])  # Se resta Socio_cuenta
-                        return 0
-                    
-                    df['Utilidad_Gss'] = df.apply(calc_utilidad_mega, axis=1)
                     
                     # MOSTRAR MÉTRICAS COMPACTAS
                     total_registros = len(df)
@@ -156,99 +150,30 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
                     st.markdown("---")
                     st.subheader("📋 Detalle del Reporte")
                     
-                    # Columnas a mostrar
-                    columnas_mostrar = [
-                        'logistics_date', 'asignacion', 'prealert_id', 'order_id',
-                        'order_status_meli', 'net_received_amount', 'declare_value', 
-                        'quantity', 'logistics_total', 'aditionals_total',
-                        'TRM_Peru', 'Socio_cuenta', 'Meli_USD', 'Utilidad_Gss'
-                    ]
-                    
-                    columnas_disponibles = [col for col in columnas_mostrar if col in df.columns]
-                    df_mostrar = df[columnas_disponibles].copy()
-                    
-                    # FORMATEAR PARA DISPLAY CON INDICADORES VISUALES
-                    # Formatear net_received_amount según país (Perú - Soles)
-                    if 'net_received_amount' in df_mostrar.columns:
-                        df_mostrar['💵 Net Received'] = df_mostrar['net_received_amount'].apply(
-                            lambda x: f"S/{x * trm_dict.get('peru', 3.75):.2f}" if pd.notna(x) and x != 0 else "S/0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('net_received_amount', axis=1)
-                    
-                    # Formatear otras columnas con indicadores
-                    if 'declare_value' in df_mostrar.columns:
-                        df_mostrar['🟢 Declare Value'] = df_mostrar['declare_value'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('declare_value', axis=1)
-                    
-                    if 'Meli_USD' in df_mostrar.columns:
-                        df_mostrar['🟡 Meli USD'] = df_mostrar['Meli_USD'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('Meli_USD', axis=1)
-                    
-                    # Para Perú, Bodegal no se aplica típicamente, pero agregamos las columnas disponibles
-                    if 'logistics_total' in df_mostrar.columns:
-                        df_mostrar['🔵 Bodegal'] = df_mostrar['logistics_total'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('logistics_total', axis=1)
-                    
-                    if 'Socio_cuenta' in df_mostrar.columns:
-                        df_mostrar['🟣 Socio Cuenta'] = df_mostrar['Socio_cuenta'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('Socio_cuenta', axis=1)
-                    
-                    # Impuesto Fact (aditionals_total para Perú)
-                    if 'aditionals_total' in df_mostrar.columns:
-                        df_mostrar['🔴 Impuesto Fact.'] = df_mostrar['aditionals_total'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('aditionals_total', axis=1)
-                    
-                    if 'Utilidad_Gss' in df_mostrar.columns:
-                        df_mostrar['⚪ Utilidad GSS'] = df_mostrar['Utilidad_Gss'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('Utilidad_Gss', axis=1)
-                    
-                    # Agregar columna Amazon (que sería el declare_value * quantity para este reporte)
-                    if 'quantity' in df.columns:
-                        df_mostrar['🟠 Amazon'] = (df['declare_value'] * df['quantity']).apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                    
-                    # Mostrar dataframe formateado
-                    st.dataframe(df_mostrar, use_container_width=True, height=500)
+                    # Columnas del detalle (valores numéricos; el formato se aplica a la página visible)
+                    tabla, formatos = tabla_exportacion(df, [
+                        ('logistics_date', 'logistics_date', None),
+                        ('asignacion', 'asignacion', None),
+                        ('prealert_id', 'prealert_id', None),
+                        ('order_id', 'order_id', None),
+                        ('order_status_meli', 'order_status_meli', None),
+                        ('quantity', 'quantity', None),
+                        ('TRM_Peru', 'TRM_Peru', FORMATO_DECIMAL),
+                        ('💵 Net Received', df['net_received_amount'] * trm_dict.get('peru', 3.75), FORMATO_PEN),
+                        ('🟢 Declare Value', 'declare_value', FORMATO_USD),
+                        ('🟡 Meli USD', 'Meli_USD', FORMATO_USD),
+                        ('🔵 Bodegal', 'logistics_total', FORMATO_USD),
+                        ('🟣 Socio Cuenta', 'Socio_cuenta', FORMATO_USD),
+                        ('🔴 Impuesto Fact.', 'aditionals_total', FORMATO_USD),
+                        ('⚪ Utilidad GSS', 'Utilidad_Gss', FORMATO_USD),
+                        ('🟠 Amazon', df['declare_value'] * df['quantity'], FORMATO_USD),
+                    ])
+                    mostrar_tabla(tabla, formatos, 'mega_tiendas_peruanas')
                     
                     # EXPORTAR
                     st.markdown("---")
-                    col1, col2 = st.columns(2)
-                    
                     nombre = f'mega_tiendas_peruanas_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}'
-                    
-                    with col1:
-                        csv = df_mostrar.to_csv(index=False, encoding='utf-8-sig')
-                        st.download_button(
-                            "📥 Descargar CSV",
-                            csv,
-                            f'{nombre}.csv',
-                            'text/csv'
-                        )
-                    
-                    with col2:
-                        buffer = io.BytesIO()
-                        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                            df_mostrar.to_excel(writer, sheet_name='MEGA-TIENDAS-PE', index=False)
-                        
-                        st.download_button(
-                            "📥 Descargar Excel",
-                            buffer.getvalue(),
-                            f'{nombre}.xlsx',
-                            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                        )
+                    mostrar_descarga(nombre, [('MEGA-TIENDAS-PE', tabla, formatos)], 'mega_tiendas_peruanas')
                     
                     # Información adicional
                     st.info(f"""
@@ -6,7 +6,6 @@ Proveedor: Chilexpress | País: Chile
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-import io
 import sys
 import os
 import calendar
@@ -15,8 +14,60 @@ import calendar
 parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, parent_dir)
 
-from supabase import create_client
-import config
+from modulos.cliente_bd import obtener_cliente
+from modulos.cache_reportes import reporte_en_cache
+from modulos.consultas import COLUMNA_FECHA_REPORTE, ORDEN_FECHA_REPORTE, cargar_registros
+from modulos.formulas import calcular_megatienda_veendelo
+from modulos.exportar import FORMATO_CLP, FORMATO_DECIMAL, FORMATO_USD, mostrar_descarga, tabla_exportacion
+from modulos.tabla_paginada import mostrar_tabla
+
+# Columnas de consolidated_orders que usa el reporte
+COLUMNAS = [
+    'account_name', 'asignacion', 'order_status_meli', 'cxp_date', 'cxp_ref_number',
+    'cxp_consignee', 'cxp_amt_due', 'cxp_arancel', 'cxp_iva', 'logistic_type',
+    'net_received_amount', 'declare_value', 'quantity'
+]
+
+# MEGATIENDA SPA y VEENDELO (filtro de la consulta y versión de los datos en la caché)
+CUENTAS = ['2-MEGATIENDA SPA', '3-VEENDELO']
+
+
+def preparar_datos(supabase, fecha_inicio, fecha_fin, trm_dict):
+    """
+    Carga los registros del período y calcula las columnas del reporte
+    (None si no hay registros)
+    """
+    # Query paginada con filtro de cxp_date (campo principal para Chile = fecha_reporte)
+    df = cargar_registros(supabase, COLUMNAS, COLUMNA_FECHA_REPORTE, fecha_inicio, fecha_fin,
+                          cuentas=CUENTAS, orden=ORDEN_FECHA_REPORTE)
+
+    if df.empty:
+        return None
+
+    # Convertir cxp_date (ya viene filtrada por la query)
+    df['cxp_date'] = pd.to_datetime(df['cxp_date'], errors='coerce')
+
+    # CALCULAR COLUMNAS PARA MEGATIENDA/VEENDELO
+
+    # Limpiar valores monetarios (incluye columnas CXP)
+    columnas_monetarias = ['declare_value', 'net_received_amount', 
+                          'cxp_amt_due', 'cxp_arancel', 'cxp_iva']
+
+    for col in columnas_monetarias:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    # Asegurar que quantity existe
+    if 'quantity' in df.columns:
+        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(1)
+    else:
+        df['quantity'] = 1
+
+    # TRM Chile, Bodegal (3.5 USD si xd_drop_off), Socio cuenta (1 USD si es approved),
+    # Meli USD y utilidad (vectorizado)
+    calcular_megatienda_veendelo(df, trm_dict.get('chile', 990.0))
+    return df
+
 
 def generar_reporte(fecha_inicio=None, fecha_fin=None):
     """
@@ -35,12 +86,7 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
     
     st.caption("Proveedor: Chilexpress | País: Chile | Campo: cxp_date")
 
-    # Initialize Supabase
-    @st.cache_resource
-    def init_supabase():
-        return create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
-
-    supabase = init_supabase()
+    supabase = obtener_cliente()
 
     # Constants
     MESES = {
@@ -75,75 +121,12 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
         
         # CARGAR DATOS - CORREGIDO PARA EVITAR PROBLEMAS DE PAGINACIÓN
         try:
-            # Buscar ambas cuentas: MEGATIENDA SPA y VEENDELO
-            account_names = ['2-MEGATIENDA SPA', '3-VEENDELO']
+            # Carga y cálculo del período (desde la caché si los datos no cambiaron)
+            df = reporte_en_cache(supabase, 'megatienda_veendelo', preparar_datos, fecha_inicio, fecha_fin,
+                                  trm_dict, cuentas=CUENTAS)
             
-            # Query directa con filtro de cxp_date (campo principal para Chile)
-            query = supabase.table('consolidated_orders').select('*')
-            query = query.in_('account_name', account_names)
-            query = query.gte('cxp_date', str(fecha_inicio))
-            query = query.lte('cxp_date', str(fecha_fin))
-            result = query.execute()
-            
-            all_records = result.data
-            
-            if all_records:
-                df = pd.DataFrame(all_records)
-                
-                # Convertir cxp_date (ya viene filtrada por la query)
-                df['cxp_date'] = pd.to_datetime(df['cxp_date'], errors='coerce')
-                
+            if df is not None:
                 if not df.empty:
-                    # CALCULAR COLUMNAS PARA MEGATIENDA/VEENDELO
-                    
-                    # Limpiar valores monetarios (incluye columnas CXP)
-                    columnas_monetarias = ['declare_value', 'net_received_amount', 
-                                          'cxp_amt_due', 'cxp_arancel', 'cxp_iva']
-                    
-                    for col in columnas_monetarias:
-                        if col in df.columns:
-                            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                    
-                    # Asegurar que quantity existe
-                    if 'quantity' in df.columns:
-                        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(1)
-                    else:
-                        df['quantity'] = 1
-                    
-                    # TRM Chile
-                    df['TRM_Chile'] = trm_dict.get('chile', 990.0)
-                    
-                    # Bodegal (3.5 USD si logistic_type es xd_drop_off)
-                    if 'logistic_type' in df.columns:
-                        df['Bodegal'] = df['logistic_type'].apply(lambda x: 3.5 if x == 'xd_drop_off' else 0)
-                    else:
-                        df['Bodegal'] = 0
-                    
-                    # Socio cuenta (1 USD si es approved)
-                    df['Socio_cuenta'] = df['order_status_meli'].apply(lambda x: 1 if x == 'approved' else 0)
-                    
-                    # Meli USD
-                    df['Meli_USD'] = df['net_received_amount'] / df['TRM_Chile']
-                    
-                    # Calcular utilidad MEGATIENDA/VEENDELO
-                    def calc_utilidad_veen(row):
-                        # Si es refunded, la utilidad es negativa (solo costos, sin ingresos)
-                        if row.get('order_status_meli', '') == 'refunded':
-                            # Para refunded: solo pérdidas (declare_value + cxp_amt_due + Bodegal + Socio)
-                            return -(row['declare_value'] * row['quantity'] + 
-                                   row['cxp_amt_due'] + 
-                                   row['Bodegal'] + 
-                                   row['Socio_cuenta'])
-                        # Si hay cxp_amt_due y NO es refunded, calcular normal
-                        elif row['cxp_amt_due'] > 0:
-                            return (row['Meli_USD'] - 
-                                   (row['declare_value'] * row['quantity']) - 
-                                   row['cxp_amt_due'] - 
-                                   row['Bodegal'] - 
-                                   row['Socio_cuenta'])
-                        return 0
-                    
-                    df['Utilidad_Gss'] = df.apply(calc_utilidad_veen, axis=1)
                     
                     # MOSTRAR MÉTRICAS COMPACTAS
                     total_registros = len(df)
@@ -169,92 +152,33 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
                     st.markdown("---")
                     st.subheader("📋 Detalle del Reporte")
                     
-                    # Columnas a mostrar (usando columnas CXP)
-                    columnas_mostrar = [
-                        'cxp_date', 'account_name', 'asignacion', 'order_status_meli', 
-                        'net_received_amount', 'cxp_ref_number', 'cxp_consignee',
-                        'cxp_arancel', 'cxp_iva', 'cxp_amt_due', 
-                        'declare_value', 'quantity', 'TRM_Chile', 'Bodegal', 
-                        'Socio_cuenta', 'Meli_USD', 'Utilidad_Gss'
-                    ]
-                    
-                    columnas_disponibles = [col for col in columnas_mostrar if col in df.columns]
-                    df_mostrar = df[columnas_disponibles].copy()
-                    
-                    # FORMATEAR PARA DISPLAY CON INDICADORES VISUALES
-                    # Formatear net_received_amount según país (Chile - CLP)
-                    if 'net_received_amount' in df_mostrar.columns:
-                        df_mostrar['💵 Net Received'] = df_mostrar['net_received_amount'].apply(
-                            lambda x: f"${x * trm_dict.get('chile', 990):,.0f} CLP" if pd.notna(x) and x != 0 else "$0 CLP"
-                        )
-                        df_mostrar = df_mostrar.drop('net_received_amount', axis=1)
-                    
-                    # Formatear otras columnas con indicadores
-                    if 'declare_value' in df_mostrar.columns:
-                        df_mostrar['🟢 Declare Value'] = df_mostrar['declare_value'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('declare_value', axis=1)
-                    
-                    if 'Meli_USD' in df_mostrar.columns:
-                        df_mostrar['🟡 Meli USD'] = df_mostrar['Meli_USD'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('Meli_USD', axis=1)
-                    
-                    if 'Bodegal' in df_mostrar.columns:
-                        df_mostrar['🔵 Bodegal'] = df_mostrar['Bodegal'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('Bodegal', axis=1)
-                    
-                    if 'Socio_cuenta' in df_mostrar.columns:
-                        df_mostrar['🟣 Socio Cuenta'] = df_mostrar['Socio_cuenta'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('Socio_cuenta', axis=1)
-                    
-                    if 'Utilidad_Gss' in df_mostrar.columns:
-                        df_mostrar['⚪ Utilidad GSS'] = df_mostrar['Utilidad_Gss'].apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                        df_mostrar = df_mostrar.drop('Utilidad_Gss', axis=1)
-                    
-                    # Agregar columna Amazon (que sería el declare_value * quantity para este reporte)
-                    if 'quantity' in df.columns:
-                        df_mostrar['🟠 Amazon'] = (df['declare_value'] * df['quantity']).apply(
-                            lambda x: f"${x:,.2f}" if pd.notna(x) else "$0.00"
-                        )
-                    
-                    # Mostrar dataframe formateado
-                    st.dataframe(df_mostrar, use_container_width=True, height=500)
+                    # Columnas del detalle (valores numéricos; el formato se aplica a la página visible)
+                    tabla, formatos = tabla_exportacion(df, [
+                        ('cxp_date', 'cxp_date', None),
+                        ('account_name', 'account_name', None),
+                        ('asignacion', 'asignacion', None),
+                        ('order_status_meli', 'order_status_meli', None),
+                        ('cxp_ref_number', 'cxp_ref_number', None),
+                        ('cxp_consignee', 'cxp_consignee', None),
+                        ('cxp_arancel', 'cxp_arancel', FORMATO_USD),
+                        ('cxp_iva', 'cxp_iva', FORMATO_USD),
+                        ('cxp_amt_due', 'cxp_amt_due', FORMATO_USD),
+                        ('quantity', 'quantity', None),
+                        ('TRM_Chile', 'TRM_Chile', FORMATO_DECIMAL),
+                        ('💵 Net Received', df['net_received_amount'] * trm_dict.get('chile', 990), FORMATO_CLP),
+                        ('🟢 Declare Value', 'declare_value', FORMATO_USD),
+                        ('🟡 Meli USD', 'Meli_USD', FORMATO_USD),
+                        ('🔵 Bodegal', 'Bodegal', FORMATO_USD),
+                        ('🟣 Socio Cuenta', 'Socio_cuenta', FORMATO_USD),
+                        ('⚪ Utilidad GSS', 'Utilidad_Gss', FORMATO_USD),
+                        ('🟠 Amazon', df['declare_value'] * df['quantity'], FORMATO_USD),
+                    ])
+                    mostrar_tabla(tabla, formatos, 'megatienda_veendelo')
                     
                     # EXPORTAR
                     st.markdown("---")
-                    col1, col2 = st.columns(2)
-                    
                     nombre = f'megatienda_veendelo_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}'
-                    
-                    with col1:
-                        csv = df_mostrar.to_csv(index=False, encoding='utf-8-sig')
-                        st.download_button(
-                            "📥 Descargar CSV",
-                            csv,
-                            f'{nombre}.csv',
-                            'text/csv'
-                        )
-                    
-                    with col2:
-                        buffer = io.BytesIO()
-                        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                            df_mostrar.to_excel(writer, sheet_name='MEGATIENDA-VEENDELO', index=False)
-                        
-                        st.download_button(
-                            "📥 Descargar Excel",
-                            buffer.getvalue(),
-                            f'{nombre}.xlsx',
-                            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                        )
+                    mostrar_descarga(nombre, [('MEGATIENDA-VEENDELO', tabla, formatos)], 'megatienda_veendelo')
                     
                     # Información adicional
                     st.info(f"""
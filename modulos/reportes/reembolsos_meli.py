@@ -6,7 +6,6 @@ Cálculo de Reversión basado en las fórmulas de Utilidad GSS de cada cuenta
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-import io
 import sys
 import os
 import calendar
@@ -16,8 +15,74 @@ import math
 parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, parent_dir)
 
-from supabase import create_client
-import config
+from modulos.cliente_bd import obtener_cliente
+from modulos.cache_reportes import reporte_en_cache
+from modulos.consultas import cargar_registros
+from modulos.formulas import calcular_reembolsos, bodegal, CUENTAS_DTPT
+from modulos.exportar import FORMATO_DECIMAL, FORMATO_PESOS, FORMATO_USD, mostrar_descarga, tabla_exportacion
+from modulos.tabla_paginada import mostrar_tabla
+
+# TRM si falta un país en trm_actual
+TRM_DEFECTO = {'colombia': 4300.0, 'peru': 3.70, 'chile': 950.0}
+
+# Columnas de consolidated_orders que usa el reporte
+COLUMNAS = [
+    'account_name', 'asignacion', 'order_id', 'amz_order_id', 'order_status_meli',
+    'refunded_date', 'logistic_type', 'net_received_amount', 'declare_value',
+    'quantity', 'logistics_total', 'aditionals_total', 'cxp_amt_due', 'cxp_arancel',
+    'cxp_iva'
+]
+
+
+def preparar_datos(supabase, fecha_inicio, fecha_fin, trm_dict):
+    """
+    Carga los reembolsos del período y calcula las columnas del reporte
+    (None si no hay registros; vacío si ninguno pasa los filtros)
+    """
+    # Query paginada con filtros aplicados en Supabase
+    df = cargar_registros(supabase, COLUMNAS, 'refunded_date', fecha_inicio, fecha_fin,
+                          iguales={'order_status_meli': 'refunded'})
+    if df.empty:
+        return None
+
+    # EXCLUIR FABORCARGO
+    df = df[df['account_name'] != '8-FABORCARGO']
+
+    # FILTRAR: Solo registros con amz_order_id con valor
+    df = df[df['amz_order_id'].notna()]
+    df = df[df['amz_order_id'] != '']
+
+    # Convertir refunded_date (ya viene filtrada) y eliminar timezone
+    df['refunded_date'] = pd.to_datetime(df['refunded_date'], errors='coerce')
+    # Remover timezone si existe para compatibilidad con Excel
+    if df['refunded_date'].dt.tz is not None:
+        df['refunded_date'] = df['refunded_date'].dt.tz_localize(None)
+
+    if df.empty:
+        return df
+
+    # LIMPIAR VALORES MONETARIOS
+    columnas_monetarias = ['logistics_total', 'aditionals_total', 'declare_value',
+                        'cxp_amt_due', 'net_received_amount', 'cxp_arancel', 'cxp_iva']
+
+    for col in columnas_monetarias:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    # Asegurar que quantity existe
+    if 'quantity' in df.columns:
+        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(1)
+    else:
+        df['quantity'] = 1
+
+    # Calcular Bodegal para cuentas de Chile y poner 0 para DTPT Group
+    df['Bodegal'] = bodegal(df)
+    df.loc[df['account_name'].isin(CUENTAS_DTPT), 'Bodegal'] = 0
+
+    # TRM, Meli USD, Utilidad GSS, reversiones (socio 7.5 en DTPT), pérdida e impuesto por cuenta
+    calcular_reembolsos(df, trm_dict, TRM_DEFECTO)
+    return df
+
 
 def generar_reporte(fecha_inicio=None, fecha_fin=None):
     """
@@ -40,12 +105,7 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
     
     st.caption("Órdenes con status refunded y amz_order_id | Excluye FABORCARGO | Fecha: refunded_date")
 
-    # Configuración de Supabase 
-    @st.cache_resource
-    def init_supabase():
-        return create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
-
-    supabase = init_supabase()
+    supabase = obtener_cliente()
 
     # Constants
     MESES = {
@@ -78,121 +138,15 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
         # Cargar TRM
         trm_dict = cargar_trm()
         
-        # --- FUNCIÓN DE CÁLCULO GENERAL PARA TODAS LAS CUENTAS ---
-        def calcular_metricas_completas(row, trm_dict):
-            account = row['account_name']
-            
-            # Inicializar valores por defecto
-            trm = 0.0
-            meli_usd = 0.0
-            utilidad_gss = 0.0
-            reversion_socio = 0.0
-            reversion_gss = 0.0
-            perdida = 0.0
-            impuesto_facturacion = 0.0
-
-            # Cálculos para TODOENCARGO-CO
-            if account == '1-TODOENCARGO-CO':
-                trm = trm_dict.get('colombia', 4300.0)
-                meli_usd = row['net_received_amount'] / trm
-                utilidad_gss = meli_usd - row['declare_value'] * row['quantity'] - row['logistics_total'] - row['aditionals_total']
-                perdida = -(row['logistics_total'] + row['aditionals_total'] + row['declare_value'] * row['quantity'])
-                reversion_socio = 0.0 # No aplica para esta cuenta
-                reversion_gss = -utilidad_gss
-
-            # Cálculos para MEGA TIENDAS PERUANAS
-            elif account == '4-MEGA TIENDAS PERUANAS':
-                trm = trm_dict.get('peru', 3.70)
-                meli_usd = row['net_received_amount'] / trm
-                socio_cuenta = 0.0 # Para órdenes reembolsadas
-                utilidad_gss = meli_usd - row['declare_value'] * row['quantity'] - row['logistics_total'] - row['aditionals_total'] - socio_cuenta
-                perdida = -(row['logistics_total'] + row['aditionals_total'] + row['declare_value'] * row['quantity'])
-                reversion_socio = 0.0 # No aplica
-                reversion_gss = -utilidad_gss
-
-            # Cálculos para MEGATIENDA SPA / VEENDELO (Chile)
-            elif account in ['2-MEGATIENDA SPA', '3-VEENDELO']:
-                trm = trm_dict.get('chile', 950.0)
-                meli_usd = row['net_received_amount'] / trm
-                socio_cuenta = 0.0 # Para órdenes reembolsadas
-                utilidad_gss = meli_usd - row['declare_value'] * row['quantity'] - row['cxp_amt_due'] - row['Bodegal'] - socio_cuenta
-                perdida = -(row['declare_value'] * row['quantity'] + row['cxp_amt_due'] + row['Bodegal'])
-                reversion_socio = 0.0 # No aplica
-                reversion_gss = -utilidad_gss
-            
-            # --- CÁLCULOS CORREGIDOS PARA DTPT GROUP (5-DETODOPARATODOS, 6-COMPRAFACIL, 7-COMPRA-YA) ---
-            elif account in ['5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']:
-                trm = trm_dict.get('colombia', 4300.0)
-                meli_usd = row['net_received_amount'] / trm
-                impuesto_facturacion = 1.0 # Para DTPT siempre es 1 (incluso en reembolsos)
-
-                # CORREGIDO: La fórmula de Utilidad GSS debe incluir Impuesto_facturacion
-                utilidad_gss = meli_usd - (row['declare_value'] * row['quantity']) - row['logistics_total'] - row['aditionals_total'] - impuesto_facturacion
-                
-                # Cuentas de DTPT Group no tienen 'Bodegal', siempre debe ser 0.
-                row['Bodegal'] = 0.0
-
-                # Calculamos las reversiones según la nueva lógica
-                if utilidad_gss >= 7.5:
-                    reversion_socio = 7.5
-                    reversion_gss = utilidad_gss - 7.5
-                else:
-                    reversion_socio = utilidad_gss
-                    reversion_gss = 0.0
-
-                # La pérdida es la suma de los costos (valor negativo)
-                perdida = -(row['logistics_total'] + row['aditionals_total'] + row['declare_value'] * row['quantity'] + impuesto_facturacion)
-
-            return (trm, meli_usd, utilidad_gss, reversion_socio, reversion_gss, perdida, impuesto_facturacion)
         
         # --- CARGAR DATOS REALES DE SUPABASE - CORREGIDO ---
         try:
-            # Query directa con filtros aplicados en Supabase
-            query = supabase.table('consolidated_orders').select('*')
-            query = query.eq('order_status_meli', 'refunded')
-            query = query.gte('refunded_date', str(fecha_inicio))
-            query = query.lte('refunded_date', str(fecha_fin))
-            result = query.execute()
+            # Carga y cálculo del período (desde la caché si los datos no cambiaron)
+            df = reporte_en_cache(supabase, 'reembolsos_meli', preparar_datos, fecha_inicio, fecha_fin,
+                                  trm_dict)
             
-            if result.data:
-                df = pd.DataFrame(result.data)
-                
-                # EXCLUIR FABORCARGO
-                df = df[df['account_name'] != '8-FABORCARGO']
-                
-                # FILTRAR: Solo registros con amz_order_id con valor
-                df = df[df['amz_order_id'].notna()]
-                df = df[df['amz_order_id'] != '']
-                
-                # Convertir refunded_date (ya viene filtrada) y eliminar timezone
-                df['refunded_date'] = pd.to_datetime(df['refunded_date'], errors='coerce')
-                # Remover timezone si existe para compatibilidad con Excel
-                if df['refunded_date'].dt.tz is not None:
-                    df['refunded_date'] = df['refunded_date'].dt.tz_localize(None)
-                
+            if df is not None:
                 if not df.empty:
-                    # LIMPIAR VALORES MONETARIOS
-                    columnas_monetarias = ['logistics_total', 'aditionals_total', 'declare_value', 
-                                        'cxp_amt_due', 'net_received_amount', 'cxp_arancel', 'cxp_iva']
-                    
-                    for col in columnas_monetarias:
-                        if col in df.columns:
-                            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                    
-                    # Asegurar que quantity existe
-                    if 'quantity' in df.columns:
-                        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(1)
-                    else:
-                        df['quantity'] = 1
-
-                    # Calcular Bodegal para cuentas de Chile y poner 0 para DTPT Group
-                    df['Bodegal'] = df['logistic_type'].apply(lambda x: 3.5 if x == 'xd_drop_off' else 0)
-                    df.loc[df['account_name'].isin(['5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']), 'Bodegal'] = 0
-
-                    # Aplicar cálculos con la nueva función
-                    df[['TRM', 'Meli_USD', 'Utilidad_Gss', 'Reversion_Socio', 'Reversion_Gss', 'Perdida', 'Impuesto_Facturacion']] = df.apply(
-                        lambda row: pd.Series(calcular_metricas_completas(row, trm_dict)), axis=1
-                    )
                     
                     # MOSTRAR MÉTRICAS PRINCIPALES
                     st.markdown("---")
@@ -274,85 +228,39 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
                     columnas_mostrar = ['account_name'] + columnas_fijas + columnas_dinamicas
                     
                     columnas_disponibles = [col for col in columnas_mostrar if col in df.columns]
-                    df_mostrar = df[columnas_disponibles].copy()
                     
-                    # Aplicar formato de moneda
-                    # Columnas en DÓLARES
+                    # Formatos: DÓLARES, PESOS (net_received_amount) y TRM (sin símbolo $)
                     columnas_dolares = ['declare_value', 'logistics_total', 'aditionals_total', 
                                         'cxp_amt_due', 'Bodegal', 'Impuesto_Facturacion',
                                         'Meli_USD', 'Utilidad_Gss', 'Reversion_Socio', 
                                         'Reversion_Gss', 'Perdida']
+                    formatos_columnas = {col: FORMATO_USD for col in columnas_dolares}
+                    formatos_columnas['net_received_amount'] = FORMATO_PESOS
+                    formatos_columnas['TRM'] = FORMATO_DECIMAL
                     
-                    for col in columnas_dolares:
-                        if col in df_mostrar.columns:
-                            df_mostrar[col] = df_mostrar[col].apply(lambda x: f"${x:,.2f}" if pd.notnull(x) else "$0.00")
+                    # Columnas dinámicas renombradas para indicar que son calculadas
+                    tabla_mostrar, formatos_mostrar = tabla_exportacion(df, [
+                        (f'🔵 {col}' if col in columnas_dinamicas else col, col, formatos_columnas.get(col))
+                        for col in columnas_disponibles
+                    ])
                     
-                    # Columna en PESOS (net_received_amount)
-                    if 'net_received_amount' in df_mostrar.columns:
-                        df_mostrar['net_received_amount'] = df_mostrar['net_received_amount'].apply(
-                            lambda x: f"${x:,.0f}" if pd.notnull(x) else "$0"
-                        )
-                    
-                    # Formato para TRM (sin símbolo $)
-                    if 'TRM' in df_mostrar.columns:
-                        df_mostrar['TRM'] = df_mostrar['TRM'].apply(
-                            lambda x: f"{x:,.2f}" if pd.notnull(x) else "0"
-                        )
-                    
-                    # Renombrar columnas dinámicas para indicar que son calculadas
-                    rename_dict = {
-                        'TRM': '🔵 TRM',
-                        'Meli_USD': '🔵 Meli_USD', 
-                        'Utilidad_Gss': '🔵 Utilidad_Gss',
-                        'Reversion_Socio': '🔵 Reversion_Socio',
-                        'Reversion_Gss': '🔵 Reversion_Gss',
-                        'Perdida': '🔵 Perdida'
-                    }
-                    df_mostrar = df_mostrar.rename(columns=rename_dict)
-                    
-                    # Ordenar por fecha
-                    df_mostrar = df_mostrar.sort_values('refunded_date', ascending=False)
-                    
-                    # Mostrar tabla con formato
-                    st.dataframe(df_mostrar, use_container_width=True, height=500)
+                    # Tabla paginada, ordenada por fecha
+                    mostrar_tabla(tabla_mostrar, formatos_mostrar, 'reembolsos_meli',
+                                  orden_inicial=('refunded_date', True))
                     
                     # EXPORTAR
                     st.markdown("---")
-                    col1, col2 = st.columns(2)
-                    
                     nombre = f'reembolsos_meli_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}'
                     
-                    with col1:
-                        # Crear copia del dataframe para CSV sin formato
-                        df_export = df[columnas_disponibles].copy()
-                        csv = df_export.to_csv(index=False, encoding='utf-8-sig')
-                        st.download_button(
-                            "📥 Descargar CSV",
-                            csv,
-                            f'{nombre}.csv',
-                            'text/csv'
-                        )
-                    
-                    with col2:
-                        buffer = io.BytesIO()
-                        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                            # Preparar dataframe para Excel - remover timezone de todas las columnas datetime
-                            df_excel = df_export.copy()
-                            for col in df_excel.columns:
-                                if pd.api.types.is_datetime64_any_dtype(df_excel[col]):
-                                    if hasattr(df_excel[col].dtype, 'tz') and df_excel[col].dtype.tz is not None:
-                                        df_excel[col] = df_excel[col].dt.tz_localize(None)
-                            
-                            # Exportar a Excel
-                            df_excel.to_excel(writer, sheet_name='REEMBOLSOS', index=False)
-                            resumen.to_excel(writer, sheet_name='RESUMEN')
-                    
-                        st.download_button(
-                            "📥 Descargar Excel",
-                            buffer.getvalue(),
-                            f'{nombre}.xlsx',
-                            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                        )
+                    # Detalle sin renombrar, con el formato de número en la celda
+                    tabla, formatos = tabla_exportacion(df, [
+                        (col, col, formatos_columnas.get(col)) for col in columnas_disponibles
+                    ])
+                    formatos_resumen = {col: FORMATO_USD for col in resumen.columns if col != 'Cantidad'}
+                    mostrar_descarga(nombre, [
+                        ('REEMBOLSOS', tabla, formatos),
+                        ('RESUMEN', resumen.reset_index(), formatos_resumen),
+                    ], 'reembolsos_meli')
                     
                     # Información adicional
                     st.warning(f"""
@@ -6,7 +6,6 @@ Consolida todas las 8 cuentas de Mercado Libre
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-import io
 import sys
 import os
 import calendar
@@ -15,8 +14,87 @@ import calendar
 parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, parent_dir)
 
-from supabase import create_client
-import config
+from modulos.cliente_bd import obtener_cliente
+from modulos.agregados import agregar, resumen_periodo
+from modulos.cache_reportes import reporte_en_cache
+from modulos.consultas import COLUMNA_FECHA_REPORTE, CUENTAS_FECHA_CXP, ORDEN_FECHA_REPORTE, cargar_varias
+from modulos.exportar import (FORMATO_CLP_SIN_CEROS, FORMATO_COP_SIN_CEROS, FORMATO_DECIMAL, FORMATO_FECHA,
+                              FORMATO_PEN_SIN_CEROS, FORMATO_USD, mostrar_descarga, tabla_exportacion)
+from modulos.tabla_paginada import mostrar_tabla
+from modulos.formulas import calcular_global
+
+# TRM si falta un país en trm_actual
+TRM_DEFECTO = {'colombia': 4300.0, 'peru': 3.70, 'chile': 990.0}
+
+# Columnas de consolidated_orders que usa el reporte
+COLUMNAS = [
+    'account_name', 'asignacion', 'order_id', 'order_status_meli', 'logistics_date',
+    'cxp_date', 'logistic_type', 'logistic_weight_lbs', 'net_received_amount',
+    'declare_value', 'quantity', 'logistics_total', 'aditionals_total',
+    'cxp_amt_due', 'cxp_arancel', 'cxp_iva', COLUMNA_FECHA_REPORTE
+]
+
+
+# Cuentas que usan logistics_date (Anicam) - filtrar por logistics_date
+LOGISTICS_ACCOUNTS = ['1-TODOENCARGO-CO', '4-MEGA TIENDAS PERUANAS',
+                      '5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']
+
+# Cuentas que usan cxp_date (Chilexpress) - filtrar por cxp_date
+CXP_ACCOUNTS = list(CUENTAS_FECHA_CXP)
+
+CUENTAS = LOGISTICS_ACCOUNTS + CXP_ACCOUNTS
+
+
+def preparar_datos(supabase, fecha_inicio, fecha_fin, trm_dict, cuentas=None):
+    """
+    Carga los registros del período de todas las cuentas (o solo de `cuentas`)
+    y calcula las columnas del reporte (None si no hay registros; vacío si
+    ninguno tiene fecha válida)
+    """
+    # FILTRAR DIRECTAMENTE EN LA CONSULTA: fecha_reporte ya es la fecha de cada
+    # cuenta (logistics_date en Anicam, cxp_date en Chilexpress), tipada e indexada
+    consultas = [{'columna_fecha': COLUMNA_FECHA_REPORTE, 'fecha_inicio': fecha_inicio,
+                  'fecha_fin': fecha_fin, 'cuentas': account, 'orden': ORDEN_FECHA_REPORTE}
+                 for account in CUENTAS if cuentas is None or account in cuentas]
+
+    # Todas las cuentas (y sus páginas) en paralelo, unidas en el orden de arriba
+    partes = cargar_varias(supabase, COLUMNAS, consultas)
+    partes = [parte for parte in partes if not parte.empty]
+    if not partes:
+        return None
+    df = pd.concat(partes, ignore_index=True)
+
+    # FECHA UNIFICADA (la fecha de reporte calculada por la base de datos)
+    df['fecha_unificada'] = pd.to_datetime(df[COLUMNA_FECHA_REPORTE], format='%Y-%m-%d', errors='coerce')
+
+    # Filtrar registros con fechas válidas
+    df = df[df['fecha_unificada'].notna()]
+    if df.empty:
+        return df
+
+    # CALCULAR COLUMNAS PARA REPORTE GLOBAL
+
+    # Limpiar valores monetarios
+    columnas_monetarias = ['declare_value', 'net_received_amount', 'logistics_total',
+                          'aditionals_total', 'cxp_amt_due', 'cxp_arancel', 'cxp_iva',
+                          'logistic_weight_lbs']
+
+    for col in columnas_monetarias:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    # Asegurar que quantity existe
+    if 'quantity' in df.columns:
+        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(1)
+    else:
+        df['quantity'] = 1
+
+    # Bodegal, Socio_cuenta (MEGATIENDA SPA, MEGA TIENDAS PERUANAS, VEENDELO),
+    # Impuesto_facturacion (DTPT GROUP), Amazon, TRM según país, Meli USD y
+    # utilidad por cuenta (vectorizado)
+    calcular_global(df, trm_dict, TRM_DEFECTO)
+    return df
+
 
 def generar_reporte(fecha_inicio=None, fecha_fin=None):
     """
@@ -35,12 +113,7 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
     
     st.caption("Consolidado de todas las 8 cuentas | Fecha unificada")
 
-    # Initialize Supabase
-    @st.cache_resource
-    def init_supabase():
-        return create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
-
-    supabase = init_supabase()
+    supabase = obtener_cliente()
 
     # Constants
     MESES = {
@@ -73,185 +146,42 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
         # Cargar TRM
         trm_dict = cargar_trm()
         
-        # CARGAR DATOS - FILTRAR DIRECTAMENTE EN LA CONSULTA PARA MEJOR RENDIMIENTO
+        # RESUMEN DEL PERÍODO DESDE LOS AGREGADOS POR CUENTA Y DÍA (cientos de filas, no todas las órdenes)
         try:
-            all_records = []
-            
-            # Cuentas que usan logistics_date (Anicam) - filtrar por logistics_date
-            logistics_accounts = ['1-TODOENCARGO-CO', '4-MEGA TIENDAS PERUANAS', 
-                                 '5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']
+            df = None
+            resumen = resumen_periodo(supabase, fecha_inicio, fecha_fin, trm_dict, CUENTAS)
             
-            st.info("🔄 Cargando cuentas Anicam (logistics_date)...")
-            for account in logistics_accounts:
-                query = supabase.table('consolidated_orders').select('*')
-                query = query.eq('account_name', account)
-                query = query.gte('logistics_date', str(fecha_inicio))
-                query = query.lte('logistics_date', str(fecha_fin))
-                result = query.execute()
-                if result.data:
-                    all_records.extend(result.data)
-            
-            # Cuentas que usan cxp_date (Chilexpress) - filtrar por cxp_date
-            cxp_accounts = ['2-MEGATIENDA SPA', '3-VEENDELO', '8-FABORCARGO']
-            
-            st.info("🔄 Cargando cuentas Chilexpress (cxp_date)...")
-            for account in cxp_accounts:
-                query = supabase.table('consolidated_orders').select('*')
-                query = query.eq('account_name', account)
-                query = query.gte('cxp_date', str(fecha_inicio))
-                query = query.lte('cxp_date', str(fecha_fin))
-                result = query.execute()
-                if result.data:
-                    all_records.extend(result.data)
-            
-            if all_records:
-                df = pd.DataFrame(all_records)
-                
-                # CREAR FECHA UNIFICADA
-                df['fecha_unificada'] = pd.NaT
-                
-                # Asignar fecha unificada según el tipo de cuenta
-                mask_logistics = df['account_name'].isin(logistics_accounts)
-                mask_cxp = df['account_name'].isin(cxp_accounts)
-                
-                if mask_logistics.any():
-                    df.loc[mask_logistics, 'fecha_unificada'] = pd.to_datetime(
-                        df.loc[mask_logistics, 'logistics_date'], errors='coerce'
-                    )
-                
-                if mask_cxp.any():
-                    df.loc[mask_cxp, 'fecha_unificada'] = pd.to_datetime(
-                        df.loc[mask_cxp, 'cxp_date'], errors='coerce'
-                    )
+            if resumen is None:
+                # Sin tablas de agregados: resumen calculado desde el detalle
+                st.info("🔄 Cargando cuentas Anicam (logistics_date)...")
+                st.info("🔄 Cargando cuentas Chilexpress (cxp_date)...")
                 
-                # Filtrar registros con fechas válidas
-                df = df[df['fecha_unificada'].notna()]
-                
-                if not df.empty:
-                    # CALCULAR COLUMNAS PARA REPORTE GLOBAL
-                    
-                    # Limpiar valores monetarios
-                    columnas_monetarias = ['declare_value', 'net_received_amount', 'logistics_total', 
-                                          'aditionals_total', 'cxp_amt_due', 'cxp_arancel', 'cxp_iva',
-                                          'logistic_weight_lbs']
-                    
-                    for col in columnas_monetarias:
-                        if col in df.columns:
-                            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                    
-                    # Asegurar que quantity existe
-                    if 'quantity' in df.columns:
-                        df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').fillna(1)
-                    else:
-                        df['quantity'] = 1
-                    
-                    # CALCULAR BODEGAL (para todas las cuentas)
-                    if 'logistic_type' in df.columns:
-                        df['Bodegal'] = df['logistic_type'].apply(lambda x: 3.5 if x == 'xd_drop_off' else 0)
-                    else:
-                        df['Bodegal'] = 0
-                    
-                    # CALCULAR SOCIO_CUENTA solo para cuentas específicas
-                    def calc_socio_cuenta(row):
-                        cuentas_socio = ['2-MEGATIENDA SPA', '4-MEGA TIENDAS PERUANAS', '3-VEENDELO']
-                        if row['account_name'] in cuentas_socio and row['order_status_meli'] == 'approved':
-                            return 1
-                        return 0
-                    
-                    df['Socio_cuenta'] = df.apply(calc_socio_cuenta, axis=1)
-                    
-                    # CALCULAR IMPUESTO POR FACTURACIÓN (solo para DTPT GROUP)
-                    dtpt_accounts = ['5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']
-                    df['Impuesto_facturacion'] = df.apply(
-                        lambda row: 1 if row['account_name'] in dtpt_accounts and row['order_status_meli'] == 'approved' else 0,
-                        axis=1
-                    )
-                    
-                    # Amazon (declare_value * quantity)
-                    df['Amazon'] = df['declare_value'] * df['quantity']
-                    
-                    # TRM según país
-                    def get_trm(account):
-                        if account in ['1-TODOENCARGO-CO', '5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']:
-                            return trm_dict.get('colombia', 4300.0)
-                        elif account == '4-MEGA TIENDAS PERUANAS':
-                            return trm_dict.get('peru', 3.70)
-                        else:  # Chile accounts
-                            return trm_dict.get('chile', 990.0)
-                    
-                    df['TRM'] = df['account_name'].apply(get_trm)
-                    
-                    # Meli USD
-                    df['Meli_USD'] = df['net_received_amount'] / df['TRM']
-                    
-                    # Calcular utilidades por cuenta (simplificado)
-                    def calc_utilidad_gss(row):
-                        account = row['account_name']
-                        
-                        if account == '8-FABORCARGO':
-                            # Fórmula especial FABORCARGO (simplificada)
-                            if row['cxp_amt_due'] > 0:
-                                return row['cxp_arancel'] + row['cxp_iva'] - row['cxp_amt_due']
-                            return 0
-                        
-                        elif account in ['2-MEGATIENDA SPA', '3-VEENDELO']:
-                            # Chile accounts
-                            if row.get('order_status_meli', '') == 'refunded':
-                                return -(row['Amazon'] + row['cxp_amt_due'] + row['Bodegal'])
-                            elif row['cxp_amt_due'] > 0:
-                                return (row['Meli_USD'] - row['Amazon'] - row['cxp_amt_due'] - 
-                                      row['Bodegal'] - row['Socio_cuenta'])
-                            return 0
-                        
-                        elif account == '4-MEGA TIENDAS PERUANAS':
-                            # Perú
-                            if row.get('order_status_meli', '') == 'refunded':
-                                return -(row['Amazon'] + row['logistics_total'] + row['aditionals_total'])
-                            elif row['logistics_total'] > 0:
-                                return (row['Meli_USD'] - row['Amazon'] - row['logistics_total'] - 
-                                      row['aditionals_total'] - row['Socio_cuenta'])
-                            return 0
-                        
-                        elif account in dtpt_accounts:
-                            # DTPT GROUP
-                            if row.get('order_status_meli', '') == 'refunded':
-                                return -(row['Amazon'] + row['logistics_total'] + row['aditionals_total'])
-                            elif row['logistics_total'] > 0:
-                                utilidad_base = (row['Meli_USD'] - row['Amazon'] - row['logistics_total'] - 
-                                               row['aditionals_total'] - row['Impuesto_facturacion'])
-                                # Para GSS: si utilidad >= 7.5, GSS recibe utilidad - 7.5
-                                return utilidad_base - 7.5 if utilidad_base >= 7.5 else 0
-                            return 0
-                        
-                        elif account == '1-TODOENCARGO-CO':
-                            # TODOENCARGO-CO
-                            if row.get('order_status_meli', '') == 'refunded':
-                                return -(row['Amazon'] + row['logistics_total'] + row['aditionals_total'])
-                            elif row['logistics_total'] > 0:
-                                return row['Meli_USD'] - row['Amazon'] - row['logistics_total'] - row['aditionals_total']
-                            return 0
-                        
-                        return 0
-                    
-                    df['Utilidad_Gss'] = df.apply(calc_utilidad_gss, axis=1)
+                # Carga y cálculo del período (desde la caché si los datos no cambiaron)
+                df = reporte_en_cache(supabase, 'reporte_global', preparar_datos, fecha_inicio, fecha_fin,
+                                      trm_dict)
+                if df is not None:
+                    resumen = agregar(df)
+            
+            if resumen is not None:
+                if not resumen.empty:
                     
                     # MOSTRAR MÉTRICAS PRINCIPALES COMPACTAS
-                    total_registros = len(df)
-                    utilidad_global_gss = df['Utilidad_Gss'].sum()
-                    aprobadas = (df['order_status_meli'] == 'approved').sum()
-                    refunded = (df['order_status_meli'] == 'refunded').sum()
+                    total_registros = int(resumen['registros'].sum())
+                    utilidad_global_gss = resumen['utilidad_gss'].sum()
+                    aprobadas = int(resumen['aprobadas'].sum())
+                    refunded = int(resumen['reembolsadas'].sum())
 
                     # Calcular métricas por país
                     colombia_accounts = ['1-TODOENCARGO-CO', '5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']
-                    df_colombia = df[df['account_name'].isin(colombia_accounts)]
-                    utilidad_colombia = df_colombia['Utilidad_Gss'].sum()
+                    df_colombia = resumen[resumen['account_name'].isin(colombia_accounts)]
+                    utilidad_colombia = df_colombia['utilidad_gss'].sum()
                     
-                    df_peru = df[df['account_name'] == '4-MEGA TIENDAS PERUANAS']
-                    utilidad_peru = df_peru['Utilidad_Gss'].sum()
+                    df_peru = resumen[resumen['account_name'] == '4-MEGA TIENDAS PERUANAS']
+                    utilidad_peru = df_peru['utilidad_gss'].sum()
                     
                     chile_accounts = ['2-MEGATIENDA SPA', '3-VEENDELO', '8-FABORCARGO']
-                    df_chile = df[df['account_name'].isin(chile_accounts)]
-                    utilidad_chile = df_chile['Utilidad_Gss'].sum()
+                    df_chile = resumen[resumen['account_name'].isin(chile_accounts)]
+                    utilidad_chile = df_chile['utilidad_gss'].sum()
 
                     # MOSTRAR MÉTRICAS PRINCIPALES
                     st.markdown("---")
@@ -266,123 +196,74 @@ def generar_reporte(fecha_inicio=None, fecha_fin=None):
                     st.subheader("🌎 Métricas por País")
                     
                     col1, col2, col3 = st.columns(3)
-                    col1.metric("🇨🇴 Colombia", f"{len(df_colombia)} reg.", f"${utilidad_colombia:,.2f}")
-                    col2.metric("🇵🇪 Perú", f"{len(df_peru)} reg.", f"${utilidad_peru:,.2f}")
-                    col3.metric("🇨🇱 Chile", f"{len(df_chile)} reg.", f"${utilidad_chile:,.2f}")
+                    col1.metric("🇨🇴 Colombia", f"{int(df_colombia['registros'].sum())} reg.", f"${utilidad_colombia:,.2f}")
+                    col2.metric("🇵🇪 Perú", f"{int(df_peru['registros'].sum())} reg.", f"${utilidad_peru:,.2f}")
+                    col3.metric("🇨🇱 Chile", f"{int(df_chile['registros'].sum())} reg.", f"${utilidad_chile:,.2f}")
                     
                     # MÉTRICAS POR CUENTA
                     st.markdown("---")
                     st.subheader("📊 Detalle por Cuenta")
                     
                     # Crear resumen por cuenta
-                    resumen_cuentas = df.groupby('account_name').agg({
-                        'order_id': 'count',
-                        'Utilidad_Gss': 'sum',
-                        'Amazon': 'sum',
-                        'Meli_USD': 'sum'
+                    resumen_cuentas = resumen.groupby('account_name').agg({
+                        'ordenes': 'sum',
+                        'utilidad_gss': 'sum',
+                        'amazon': 'sum',
+                        'meli_usd': 'sum'
                     }).round(2)
                     
                     resumen_cuentas.columns = ['Cantidad', 'Utilidad GSS', 'Amazon Total', 'Meli USD Total']
+                    resumen_cuentas['Cantidad'] = resumen_cuentas['Cantidad'].astype(int)
                     st.dataframe(resumen_cuentas, use_container_width=True)
                     
                     # MOSTRAR TABLA DETALLADA
                     st.markdown("---")
                     st.subheader("📋 Detalle del Reporte Global")
                     
-                    # Renombrar columnas con indicadores visuales
-                    df_display = df.copy()
-                    
-                    # Función para formatear net_received_amount según país
-                    def format_net_received_by_country(row):
-                        value = row['net_received_amount']
-                        account = row['account_name']
-                        
-                        if pd.isna(value) or value == 0:
-                            return ""
-                        
-                        # Colombia accounts
-                        if account in ['1-TODOENCARGO-CO', '5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']:
-                            return f"${value:,.0f} COP"
-                        # Perú accounts
-                        elif account == '4-MEGA TIENDAS PERUANAS':
-                            return f"S/{value:,.2f}"
-                        # Chile accounts
-                        else:
-                            return f"${value:,.0f} CLP"
-                    
-                    # Aplicar formato a net_received_amount
-                    df_display['net_received_formatted'] = df.apply(format_net_received_by_country, axis=1)
-                    
-                    # Renombrar columnas con indicadores
-                    column_rename = {
-                        'fecha_unificada': '📅 Fecha',
-                        'account_name': '🏢 Cuenta',
-                        'asignacion': '🏷️ Asignación',
-                        'order_id': '📦 Order ID',
-                        'order_status_meli': '📊 Estado',
-                        'net_received_formatted': '💵 Net Received',
-                        'declare_value': '🟢 Declare Value',
-                        'Amazon': '🟠 Amazon',
-                        'TRM': '💱 TRM',
-                        'Meli_USD': '🟡 Meli USD',
-                        'Bodegal': '🔵 Bodegal',
-                        'Socio_cuenta': '🟣 Socio Cuenta',
-                        'Impuesto_facturacion': '🔴 Impuesto Fact.',
-                        'Utilidad_Gss': '⚪ Utilidad GSS'
-                    }
-                    
-                    # Columnas a mostrar con nuevos nombres
-                    columnas_mostrar = [
-                        'fecha_unificada', 'account_name', 'asignacion', 'order_id',
-                        'order_status_meli', 'net_received_formatted', 
-                        'Amazon', 'TRM', 'Meli_USD',
-                        'Bodegal', 'Socio_cuenta', 'Impuesto_facturacion', 
-                        'Utilidad_Gss'
-                    ]
-                    
-                    columnas_disponibles = [col for col in columnas_mostrar if col in df_display.columns]
-                    df_mostrar = df_display[columnas_disponibles]
-                    
-                    # Renombrar columnas
-                    df_mostrar = df_mostrar.rename(columns={k: v for k, v in column_rename.items() if k in df_mostrar.columns})
-                    
-                    # Mostrar sin formato de estilo
-                    st.dataframe(df_mostrar, use_container_width=True, height=500)
-                    
-                    # EXPORTAR
-                    st.markdown("---")
-                    col1, col2 = st.columns(2)
-                    
-                    nombre = f'reporte_global_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}'
-                    
-                    with col1:
-                        csv = df_mostrar.to_csv(index=False, encoding='utf-8-sig')
-                        st.download_button(
-                            "📥 Descargar CSV",
-                            csv,
-                            f'{nombre}.csv',
-                            'text/csv'
-                        )
-                    
-                    with col2:
-                        buffer = io.BytesIO()
-                        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                            df_mostrar.to_excel(writer, sheet_name='GLOBAL', index=False)
-                        
-                        st.download_button(
-                            "📥 Descargar Excel",
-                            buffer.getvalue(),
-                            f'{nombre}.xlsx',
-                            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                        )
+                    # El detalle son todas las órdenes del período: solo se carga si se pide
+                    if df is None and st.checkbox(f"Cargar las {total_registros:,} órdenes del período",
+                                                  key='reporte_global_detalle'):
+                        df = reporte_en_cache(supabase, 'reporte_global', preparar_datos, fecha_inicio, fecha_fin,
+                                              trm_dict)
+                    
+                    if df is not None and not df.empty:
+                        # Net Received en la moneda de cada cuenta (formato por fila)
+                        formato_net_received = df['account_name'].map({
+                            '1-TODOENCARGO-CO': FORMATO_COP_SIN_CEROS, '5-DETODOPARATODOS': FORMATO_COP_SIN_CEROS,
+                            '6-COMPRAFACIL': FORMATO_COP_SIN_CEROS, '7-COMPRA-YA': FORMATO_COP_SIN_CEROS,
+                            '4-MEGA TIENDAS PERUANAS': FORMATO_PEN_SIN_CEROS,
+                        }).fillna(FORMATO_CLP_SIN_CEROS)
+                    
+                        # Columnas del detalle (valores numéricos; el formato se aplica a la página visible)
+                        tabla, formatos = tabla_exportacion(df, [
+                            ('📅 Fecha', 'fecha_unificada', FORMATO_FECHA),
+                            ('🏢 Cuenta', 'account_name', None),
+                            ('🏷️ Asignación', 'asignacion', None),
+                            ('📦 Order ID', 'order_id', None),
+                            ('📊 Estado', 'order_status_meli', None),
+                            ('💵 Net Received', 'net_received_amount', formato_net_received),
+                            ('🟠 Amazon', 'Amazon', FORMATO_USD),
+                            ('💱 TRM', 'TRM', FORMATO_DECIMAL),
+                            ('🟡 Meli USD', 'Meli_USD', FORMATO_USD),
+                            ('🔵 Bodegal', 'Bodegal', FORMATO_USD),
+                            ('🟣 Socio Cuenta', 'Socio_cuenta', FORMATO_USD),
+                            ('🔴 Impuesto Fact.', 'Impuesto_facturacion', FORMATO_USD),
+                            ('⚪ Utilidad GSS', 'Utilidad_Gss', FORMATO_USD),
+                        ])
+                        mostrar_tabla(tabla, formatos, 'reporte_global')
+                    
+                        # EXPORTAR
+                        st.markdown("---")
+                        nombre = f'reporte_global_{fecha_inicio.strftime("%Y%m%d")}_{fecha_fin.strftime("%Y%m%d")}'
+                        mostrar_descarga(nombre, [('GLOBAL', tabla, formatos)], 'reporte_global')
                     
                     # Información adicional
                     st.info(f"""
                     📌 **Resumen Global:**
                     - Período: {fecha_inicio} a {fecha_fin}
                     - Total de cuentas: 8
-                    - Total registros: {len(df):,}
-                    - Utilidad Global GSS: ${df['Utilidad_Gss'].sum():,.2f}
+                    - Total registros: {total_registros:,}
+                    - Utilidad Global GSS: ${utilidad_global_gss:,.2f}
                     - TRM Colombia: ${trm_dict.get('colombia', 4300):,.0f}
                     - TRM Perú: ${trm_dict.get('peru', 3.70):,.2f}
                     - TRM Chile: ${trm_dict.get('chile', 990):,.0f}
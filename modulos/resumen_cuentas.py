@@ -0,0 +1,94 @@
+"""
+Módulo de Resumen por Cuenta
+Estadísticas de la página de inicio sin recorrer consolidated_orders
+
+Antes cada render del inicio descargaba account_name de toda la tabla para
+contar cuentas, y hacía otra consulta ordenada por date_created. La tabla
+resumen_cuentas (setup_resumen_cuentas.sql) tiene una fila por cuenta con su
+cantidad de registros y el date_created más reciente, y la mantienen al día
+triggers sobre consolidated_orders: leerla es un request de unas pocas filas
+sin importar cuántas órdenes haya.
+
+El resumen se guarda una vez por proceso (compartido entre usuarios y
+sesiones) durante TTL_RESUMEN segundos. invalidar_reportes() lo descarta en
+cada escritura de la app; lo escrito por fuera (SQL Editor, otro proceso) se
+ve al vencer el TTL. Si resumen_cuentas no existe, se calcula como antes
+desde consolidated_orders.
+"""
+
+from typing import Optional
+
+import pandas as pd
+import streamlit as st
+
+TABLA_RESUMEN = 'resumen_cuentas'
+
+# Segundos que se reutiliza el resumen entre renders
+TTL_RESUMEN = 60
+
+
+def _resumen(total: int, distribucion: dict, ultima_fecha) -> dict:
+    return {
+        'total_records': total,
+        'unique_accounts': len(distribucion),
+        'account_distribution': distribucion,
+        'latest_date': ultima_fecha,
+    }
+
+
+def _desde_tabla_resumen(supabase) -> Optional[dict]:
+    try:
+        result = supabase.table(TABLA_RESUMEN).select('account_name, registros, ultima_fecha').execute()
+    except Exception:
+        return None
+
+    filas = result.data or []
+    fechas = [fila['ultima_fecha'] for fila in filas if fila.get('ultima_fecha')]
+    distribucion = {fila['account_name']: int(fila['registros']) for fila in filas if fila['account_name']}
+    return _resumen(sum(int(fila['registros']) for fila in filas), distribucion, max(fechas) if fechas else None)
+
+
+def _desde_consolidated_orders(supabase) -> dict:
+    """Cálculo anterior, para instalaciones sin setup_resumen_cuentas.sql"""
+    try:
+        total_result = supabase.table('consolidated_orders').select('*', count='exact', head=True).execute()
+        accounts_result = supabase.table('consolidated_orders').select('account_name').execute()
+    except Exception:
+        # Si no existe consolidated_orders, usar datos de usuarios
+        total_result = supabase.table('users').select('*', count='exact', head=True).execute()
+        accounts_result = supabase.table('users').select('username').execute()
+    total = total_result.count if hasattr(total_result, 'count') else 0
+
+    distribucion = {}
+    if accounts_result.data:
+        df = pd.DataFrame(accounts_result.data)
+        if 'account_name' in df.columns:
+            distribucion = df['account_name'].value_counts().to_dict()
+
+    latest_result = supabase.table('consolidated_orders').select('date_created').order(
+        'date_created', desc=True).limit(1).execute()
+    ultima_fecha = latest_result.data[0].get('date_created', 'N/A') if latest_result.data else None
+    return _resumen(total, distribucion, ultima_fecha)
+
+
+@st.cache_data(ttl=TTL_RESUMEN, show_spinner=False)
+def _resumen_en_cache(_supabase) -> dict:
+    # _supabase no forma parte de la clave: un solo resumen por proceso
+    return _desde_tabla_resumen(_supabase) or _desde_consolidated_orders(_supabase)
+
+
+def resumen_cuentas(supabase) -> Optional[dict]:
+    """
+    {'total_records', 'unique_accounts', 'account_distribution': {cuenta: registros},
+     'latest_date'} o None si no se pudo consultar la base.
+    Cada llamada entrega una copia (st.cache_data): se puede modificar.
+    """
+    try:
+        return _resumen_en_cache(supabase)
+    except Exception:
+        return None
+
+
+def invalidar_resumen():
+    """Descarta el resumen guardado; el próximo render lo vuelve a leer"""
+    _resumen_en_cache.clear()
@@ -0,0 +1,170 @@
+"""
+Módulo de Tablas Paginadas
+Detalle de los reportes mostrado por páginas, con orden y búsqueda en el servidor
+
+Antes cada reporte convertía a texto ("$1,234.00") todas las columnas de
+montos de todas las filas antes de llamar a st.dataframe. Ahora el reporte
+arma una sola tabla numérica con tabla_exportacion() (la misma que se
+descarga) y mostrar_tabla():
+    - busca y ordena sobre los valores numéricos (el orden por monto es por
+      monto, no alfabético)
+    - recorta la página visible
+    - formatea solo esa página, con los mismos formatos declarados para Excel
+La tabla completa nunca se copia como texto.
+"""
+
+import math
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from modulos.exportar import (
+    FORMATO_CLP, FORMATO_CLP_SIN_CEROS, FORMATO_COP, FORMATO_COP_SIN_CEROS, FORMATO_DECIMAL,
+    FORMATO_ENTERO, FORMATO_FECHA, FORMATO_KILOS, FORMATO_LIBRAS, FORMATO_PEN, FORMATO_PEN_SIN_CEROS,
+    FORMATO_PESOS, FORMATO_USD, FORMATO_USD_SIN_CEROS, Formato,
+)
+
+# Filas por página
+OPCIONES_FILAS = [50, 100, 250, 500]
+FILAS_POR_PAGINA = 100
+
+SIN_ORDEN = '(sin orden)'
+
+# Formato de Excel -> (patrón de texto, ceros y vacíos en blanco)
+FORMATOS_PANTALLA = {
+    FORMATO_USD: ('${:,.2f}', False),
+    FORMATO_USD_SIN_CEROS: ('${:,.2f}', True),
+    FORMATO_COP: ('${:,.0f} COP', False),
+    FORMATO_COP_SIN_CEROS: ('${:,.0f} COP', True),
+    FORMATO_PEN: ('S/{:,.2f}', False),
+    FORMATO_PEN_SIN_CEROS: ('S/{:,.2f}', True),
+    FORMATO_CLP: ('${:,.0f} CLP', False),
+    FORMATO_CLP_SIN_CEROS: ('${:,.0f} CLP', True),
+    FORMATO_PESOS: ('${:,.0f}', False),
+    FORMATO_DECIMAL: ('{:,.2f}', False),
+    FORMATO_ENTERO: ('{:,.0f}', False),
+    FORMATO_LIBRAS: ('{:.2f} lbs', False),
+    FORMATO_KILOS: ('{:.2f} kg', False),
+}
+
+
+def formatear(valores: pd.Series, formato: Optional[str]) -> pd.Series:
+    """Texto de una columna (ya recortada a la página visible) con su formato"""
+    if formato == FORMATO_FECHA:
+        return pd.to_datetime(valores, errors='coerce').dt.strftime('%Y-%m-%d').fillna('')
+    if formato not in FORMATOS_PANTALLA:
+        return valores
+
+    patron, ceros_en_blanco = FORMATOS_PANTALLA[formato]
+    numeros = pd.to_numeric(valores, errors='coerce').tolist()
+    texto = []
+    for numero in numeros:
+        vacio = numero != numero or numero == 0
+        texto.append('' if ceros_en_blanco and vacio else patron.format(0.0 if numero != numero else numero))
+    return pd.Series(texto, index=valores.index, dtype=object)
+
+
+def pagina_formateada(pagina: pd.DataFrame, formatos: Dict[str, Formato]) -> pd.DataFrame:
+    """Copia en texto de las filas visibles (formatos por columna o por fila)"""
+    salida = {}
+    for titulo in pagina.columns:
+        formato = formatos.get(titulo)
+        if isinstance(formato, pd.Series):
+            por_fila = formato.reindex(pagina.index)
+            columna = pd.Series('', index=pagina.index, dtype=object)
+            for valor_formato in por_fila.dropna().unique():
+                filas = por_fila == valor_formato
+                columna[filas] = formatear(pagina.loc[filas, titulo], valor_formato)
+            salida[titulo] = columna
+        elif formato:
+            salida[titulo] = formatear(pagina[titulo], formato)
+        else:
+            salida[titulo] = pagina[titulo]
+    return pd.DataFrame(salida, index=pagina.index)
+
+
+def filtrar_ordenar(tabla: pd.DataFrame, formatos: Dict[str, Formato], busqueda: str = '',
+                    orden: Optional[str] = None, descendente: bool = False) -> pd.DataFrame:
+    """
+    Filas que contienen `busqueda` en alguna columna de texto (sin distinguir
+    mayúsculas), ordenadas por la columna `orden` (valores sin formatear)
+    """
+    vista = tabla
+    busqueda = busqueda.strip()
+    if busqueda:
+        coincide = pd.Series(False, index=tabla.index)
+        for titulo in tabla.columns:
+            columna = tabla[titulo]
+            es_texto = pd.api.types.is_object_dtype(columna) or pd.api.types.is_string_dtype(columna)
+            if titulo not in formatos and es_texto:
+                coincide |= columna.astype(str).str.contains(busqueda, case=False, regex=False, na=False)
+        vista = tabla[coincide]
+
+    if orden and orden in vista.columns:
+        try:
+            vista = vista.sort_values(orden, ascending=not descendente, kind='stable', na_position='last')
+        except TypeError:
+            # Columnas con tipos mezclados (IDs numéricos y texto): orden como texto
+            vista = vista.sort_values(orden, ascending=not descendente, kind='stable', na_position='last',
+                                      key=lambda serie: serie.astype(str))
+    return vista
+
+
+def mostrar_tabla(tabla: pd.DataFrame, formatos: Dict[str, Formato], clave: str,
+                  orden_inicial: Optional[Tuple[str, bool]] = None, height: int = 500):
+    """
+    Muestra `tabla` (de tabla_exportacion) por páginas, con búsqueda y orden.
+    orden_inicial: (título, descendente) con que se abre la tabla.
+    """
+    titulos = [str(titulo) for titulo in tabla.columns]
+    opciones_orden = [SIN_ORDEN] + titulos
+    indice_orden = 0
+    descendente_inicial = False
+    if orden_inicial and orden_inicial[0] in titulos:
+        indice_orden = opciones_orden.index(orden_inicial[0])
+        descendente_inicial = orden_inicial[1]
+
+    col_buscar, col_orden, col_sentido, col_filas = st.columns([3, 2, 1, 1])
+    with col_buscar:
+        busqueda = st.text_input("🔎 Buscar", key=f"tabla_buscar_{clave}",
+                                 placeholder="Order ID, asignación, estado...")
+    with col_orden:
+        orden = st.selectbox("Ordenar por", opciones_orden, index=indice_orden, key=f"tabla_orden_{clave}")
+    with col_sentido:
+        st.markdown("<br>", unsafe_allow_html=True)
+        descendente = st.checkbox("Descendente", value=descendente_inicial, key=f"tabla_descendente_{clave}")
+    with col_filas:
+        filas_por_pagina = st.selectbox("Filas por página", OPCIONES_FILAS,
+                                        index=OPCIONES_FILAS.index(FILAS_POR_PAGINA),
+                                        key=f"tabla_filas_{clave}")
+
+    vista = filtrar_ordenar(tabla, formatos, busqueda, None if orden == SIN_ORDEN else orden, descendente)
+    total_paginas = max(1, math.ceil(len(vista) / filas_por_pagina))
+
+    # Si cambió la búsqueda o el orden se vuelve a la primera página
+    clave_pagina = f"tabla_pagina_{clave}"
+    consulta = (busqueda, orden, descendente, filas_por_pagina, len(tabla))
+    if st.session_state.get(f"tabla_consulta_{clave}") != consulta:
+        st.session_state[f"tabla_consulta_{clave}"] = consulta
+        st.session_state[clave_pagina] = 1
+    elif st.session_state.get(clave_pagina, 1) > total_paginas:
+        st.session_state[clave_pagina] = total_paginas
+
+    inicio_pagina = (st.session_state.get(clave_pagina, 1) - 1) * filas_por_pagina
+    pagina = vista.iloc[inicio_pagina:inicio_pagina + filas_por_pagina]
+    st.dataframe(pagina_formateada(pagina, formatos), use_container_width=True, height=height)
+
+    col_info, col_pagina = st.columns([3, 1])
+    with col_pagina:
+        st.number_input(f"Página (de {total_paginas:,})", min_value=1, max_value=total_paginas,
+                        step=1, key=clave_pagina)
+    with col_info:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if len(vista):
+            texto = f"Filas {inicio_pagina + 1:,}–{inicio_pagina + len(pagina):,} de {len(vista):,}"
+        else:
+            texto = "Sin filas"
+        if len(vista) != len(tabla):
+            texto += f" (filtradas de {len(tabla):,})"
+        st.caption(texto)
@@ -0,0 +1,100 @@
+"""
+Módulo de Tarifas por Peso (ANEXO A)
+Tabla de rangos de peso -> Gss Logística con búsqueda vectorizada
+
+Los rangos se guardan una sola vez como arrays de NumPy ordenados por 'desde'
+y una columna completa de pesos se resuelve con un solo np.searchsorted, en
+vez de recorrer la lista de dicts por cada orden. El resultado es el mismo que
+el recorrido lineal de siempre:
+    - gana el primer rango (en el orden de la lista) con desde <= peso <= hasta
+    - los huecos entre rangos (0.50 < peso < 0.51) y los pesos sin rango dan 0
+    - con extender_ultimo=True, un peso mayor al 'hasta' del último rango de la
+      lista toma el valor de ese rango (regla del reporte FABORCARGO)
+
+`version` identifica el contenido de la tabla (cambia si cambia un rango).
+"""
+
+import hashlib
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Conversión de libras a kilos usada por el reporte FABORCARGO
+LIBRAS_POR_KILO = 2.205
+
+
+def redondear_05(valores):
+    """Redondea hacia arriba a escala de 0.5 (1.2 -> 1.5, 1.8 -> 2.0), por columna"""
+    redondeados = np.ceil(np.asarray(valores, dtype=float) * 2) / 2
+    if isinstance(valores, pd.Series):
+        return pd.Series(redondeados, index=valores.index)
+    return redondeados
+
+
+class TarifaPeso:
+    """Tabla de rangos de peso cargada una vez, con búsqueda por columna"""
+
+    def __init__(self, rangos: List[Dict], clave_desde: str = 'desde', clave_hasta: str = 'hasta',
+                 clave_valor: str = 'gss_logistica'):
+        desde = np.array([float(r[clave_desde]) for r in rangos], dtype=float)
+        hasta = np.array([float(r[clave_hasta]) for r in rangos], dtype=float)
+        valores = np.array([float(r[clave_valor]) for r in rangos], dtype=float)
+
+        # Orden original de la lista: define el "primer rango" y el "último rango"
+        self._desde_lista, self._hasta_lista, self._valores_lista = desde, hasta, valores
+
+        orden = np.argsort(desde, kind='stable')
+        self.desde = desde[orden]
+        self.hasta = hasta[orden]
+        self.valores = valores[orden]
+
+        # Con rangos solapados el primero de la lista debe ganar: searchsorted no sirve
+        self.solapados = bool(np.any(self.hasta[:-1] >= self.desde[1:]))
+
+        huella = hashlib.sha1(np.stack([desde, hasta, valores]).tobytes()).hexdigest()
+        self.version = f"{len(rangos)}-{huella[:12]}"
+
+    def __len__(self):
+        return len(self.desde)
+
+    def __repr__(self):
+        return f"TarifaPeso({len(self)} rangos, version={self.version})"
+
+    def buscar(self, pesos, extender_ultimo: bool = False):
+        """Gss Logística para cada peso (Series -> Series con el mismo índice; escalar -> float)"""
+        es_serie = isinstance(pesos, pd.Series)
+        p = np.asarray(pesos, dtype=float)
+        resultado = np.zeros(p.shape, dtype=float)
+
+        if len(self):
+            if self.solapados:
+                pendientes = np.ones(p.shape, dtype=bool)
+                for d, h, v in zip(self._desde_lista, self._hasta_lista, self._valores_lista):
+                    dentro = pendientes & (p >= d) & (p <= h)
+                    resultado[dentro] = v
+                    pendientes &= ~dentro
+            else:
+                # Rango candidato: el de mayor 'desde' <= peso; vale si además peso <= 'hasta'
+                candidato = np.searchsorted(self.desde, p, side='right') - 1
+                seguro = np.clip(candidato, 0, len(self) - 1)
+                pendientes = ~((candidato >= 0) & (p <= self.hasta[seguro]))
+                resultado = np.where(pendientes, 0.0, self.valores[seguro])
+
+            if extender_ultimo:
+                sobre_maximo = pendientes & (p > self._hasta_lista[-1])
+                resultado = np.where(sobre_maximo, self._valores_lista[-1], resultado)
+
+        if es_serie:
+            return pd.Series(resultado, index=pesos.index)
+        if np.ndim(pesos) == 0:
+            return float(resultado)
+        return resultado
+
+
+@lru_cache(maxsize=1)
+def tarifa_faborcargo() -> TarifaPeso:
+    """Tabla de peso de FABORCARGO (config.TABLA_PESO_FABORCARGO), cargada una sola vez"""
+    import config
+    return TarifaPeso(config.TABLA_PESO_FABORCARGO)
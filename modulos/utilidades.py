@@ -6,11 +6,14 @@ Implementa todas las fórmulas del prompt según account_name
 import streamlit as st
 import pandas as pd
 import numpy as np
-from supabase import create_client, Client
+from supabase import Client
 from datetime import datetime
 import math
 from typing import Dict, List, Optional, Tuple
 
+from modulos.cache_reportes import invalidar_trm
+from modulos.tarifas_peso import TarifaPeso
+
 class CalculadorUtilidades:
     """Clase principal para cálculo de utilidades según reglas de negocio"""
     
@@ -18,6 +21,7 @@ class CalculadorUtilidades:
         self.supabase = supabase_client
         self.trm_actual = {}
         self.anexo_a = []
+        self.tarifa_anexo_a = TarifaPeso([], 'peso_desde', 'peso_hasta')
         self._cargar_datos_base()
     
     def _cargar_datos_base(self):
@@ -31,6 +35,7 @@ class CalculadorUtilidades:
             # Cargar ANEXO A
             anexo_result = self.supabase.table('anexo_a_pesos').select('*').eq('activo', True).execute()
             self.anexo_a = anexo_result.data
+            self.tarifa_anexo_a = TarifaPeso(self.anexo_a, 'peso_desde', 'peso_hasta')
             
             st.success(f"✅ TRM cargadas: {list(self.trm_actual.keys())}")
             st.success(f"✅ ANEXO A cargado: {len(self.anexo_a)} rangos de peso")
@@ -40,6 +45,7 @@ class CalculadorUtilidades:
             # Valores por defecto si falla la carga
             self.trm_actual = {'colombia': 4300.0, 'peru': 3.70, 'chile': 990.0}
             self.anexo_a = []
+            self.tarifa_anexo_a = TarifaPeso([], 'peso_desde', 'peso_hasta')
     
     def actualizar_trm(self, nuevas_trm: Dict[str, float], usuario: str = "sistema") -> bool:
         """Actualiza las TRM en base de datos y recalcula si es necesario"""
@@ -76,6 +82,9 @@ class CalculadorUtilidades:
                     if abs(cambio_porcentual) > 1.0:  # Más del 1%
                         cambios_significativos.append(pais)
             
+            # Los reportes en caché se calcularon con las TRM anteriores
+            invalidar_trm(self.supabase)
+            
             # Mostrar resultado
             if cambios_significativos:
                 st.warning(f"⚠️ Cambios significativos en TRM: {cambios_significativos}")
@@ -89,10 +98,7 @@ class CalculadorUtilidades:
     
     def buscar_gss_logistica(self, peso_kg: float) -> float:
         """Busca el valor de Gss Logística según el peso en la tabla ANEXO A"""
-        for rango in self.anexo_a:
-            if rango['peso_desde'] <= peso_kg <= rango['peso_hasta']:
-                return float(rango['gss_logistica'])
-        return 0.0
+        return self.tarifa_anexo_a.buscar(peso_kg)
     
     def redondear_escala_05(self, valor: float) -> float:
         """Redondea a escala de 0.5 (1.2 -> 1.5, 1.8 -> 2.0)"""
@@ -116,10 +122,14 @@ class CalculadorUtilidades:
         except (ValueError, TypeError):
             return 0.0
     
-    def calcular_utilidades_por_cuenta(self, df: pd.DataFrame) -> pd.DataFrame:
+    def calcular_utilidades_por_cuenta(self, df: pd.DataFrame, por_lotes: bool = True) -> pd.DataFrame:
         """
         Calcula utilidades según las reglas específicas de cada account_name
         Implementa exactamente el prompt proporcionado
+
+        por_lotes=True calcula cada familia de cuentas con operaciones sobre
+        columnas completas (_calcular_por_lotes). por_lotes=False usa el
+        cálculo original fila por fila; ambos dan los mismos resultados.
         """
         st.info("🔄 Iniciando cálculo de utilidades por cuenta...")
         
@@ -129,7 +139,7 @@ class CalculadorUtilidades:
         # Limpiar valores monetarios críticos
         for col in ['Declare Value', 'net_real_amount', 'logistics_total', 'aditionals_total', 'cxp_amt_due']:
             if col in df.columns:
-                df[col] = df[col].apply(self.limpiar_valores_monetarios)
+                df[col] = self._limpiar_columna(df, col) if por_lotes else df[col].apply(self.limpiar_valores_monetarios)
         
         # Inicializar todas las columnas posibles
         columnas_utilidad = [
@@ -141,7 +151,25 @@ class CalculadorUtilidades:
         for col in columnas_utilidad:
             resultado_df[col] = np.nan
         
-        # Procesar cada fila según su account_name
+        if por_lotes:
+            self._calcular_por_lotes(df, resultado_df)
+        else:
+            self._calcular_por_filas(df, resultado_df)
+        
+        # Estadísticas del procesamiento
+        total_procesadas = len(resultado_df)
+        utilidades_calculadas = resultado_df['Utilidad Gss'].notna().sum()
+        utilidad_total = resultado_df['Utilidad Gss'].sum()
+        
+        st.success(f"✅ Procesamiento completado:")
+        st.write(f"📊 Total órdenes: {total_procesadas}")
+        st.write(f"🔢 Utilidades calculadas: {utilidades_calculadas}")
+        st.write(f"💰 Utilidad total: ${utilidad_total:,.2f}")
+        
+        return resultado_df
+    
+    def _calcular_por_filas(self, df: pd.DataFrame, resultado_df: pd.DataFrame):
+        """Cálculo original: iterrows y una función por cuenta"""
         for idx, row in df.iterrows():
             account_name = row.get('account_name', '')
             
@@ -169,18 +197,165 @@ class CalculadorUtilidades:
             except Exception as e:
                 st.error(f"❌ Error procesando fila {idx} ({account_name}): {str(e)}")
                 continue
+    
+    # ------------------------------------------------------------------
+    # Cálculo por lotes (vectorizado)
+    # ------------------------------------------------------------------
+    
+    def _limpiar_columna(self, df: pd.DataFrame, col: str) -> pd.Series:
+        """limpiar_valores_monetarios sobre una columna completa (0.0 si no existe)"""
+        if col not in df.columns:
+            return pd.Series(0.0, index=df.index)
+        serie = df[col]
+        if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            return serie.astype(float).fillna(0.0)
+        # Texto u objetos: limpiar cada valor distinto una sola vez
+        codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+        limpios = np.array([self.limpiar_valores_monetarios(v) for v in unicos], dtype=float)
+        return pd.Series(limpios[codigos], index=df.index)
+    
+    @staticmethod
+    def _cantidad_entera(df: pd.DataFrame):
+        """
+        int(quantity) por columna: (cantidades, inválidas). Las filas donde
+        int() fallaría (NaN, None, '2.0', texto) quedan marcadas como inválidas.
+        """
+        if 'quantity' not in df.columns:
+            return pd.Series(1.0, index=df.index), pd.Series(False, index=df.index)
+        codigos, unicos = pd.factorize(df['quantity'], use_na_sentinel=False)
+        valores = np.zeros(len(unicos), dtype=float)
+        invalidos = np.zeros(len(unicos), dtype=bool)
+        for i, valor in enumerate(unicos):
+            try:
+                valores[i] = int(valor)
+            except (ValueError, TypeError, OverflowError):
+                invalidos[i] = True
+        return pd.Series(valores[codigos], index=df.index), pd.Series(invalidos[codigos], index=df.index)
+    
+    def _gss_logistica_columna(self, pesos: pd.Series) -> pd.Series:
+        """buscar_gss_logistica por columna: primer rango del ANEXO A que contiene el peso, 0.0 si ninguno"""
+        return self.tarifa_anexo_a.buscar(pesos)
+    
+    def _calcular_por_lotes(self, df: pd.DataFrame, resultado_df: pd.DataFrame):
+        """
+        Agrupa las filas por familia de cuentas y calcula las columnas de cada
+        familia con aritmética de arreglos, con las mismas fórmulas (y el mismo
+        orden de operaciones) que _calcular_*. En lugar de try/except por fila,
+        las filas donde el cálculo original fallaría se marcan como inválidas y
+        quedan sin calcular.
+        """
+        cuentas = df['account_name'] if 'account_name' in df.columns else pd.Series('', index=df.index)
         
-        # Estadísticas del procesamiento
-        total_procesadas = len(resultado_df)
-        utilidades_calculadas = resultado_df['Utilidad Gss'].notna().sum()
-        utilidad_total = resultado_df['Utilidad Gss'].sum()
+        declare_value = self._limpiar_columna(df, 'Declare Value')
+        net_real_amount = self._limpiar_columna(df, 'net_real_amount')
+        logistics_total = self._limpiar_columna(df, 'logistics_total')
+        aditionals_total = self._limpiar_columna(df, 'aditionals_total')
+        cxp_amt_due = self._limpiar_columna(df, 'cxp_amt_due')
+        quantity, cantidad_invalida = self._cantidad_entera(df)
         
-        st.success(f"✅ Procesamiento completado:")
-        st.write(f"📊 Total órdenes: {total_procesadas}")
-        st.write(f"🔢 Utilidades calculadas: {utilidades_calculadas}")
-        st.write(f"💰 Utilidad total: ${utilidad_total:,.2f}")
+        estado = df['order_status_meli'] if 'order_status_meli' in df.columns else pd.Series('', index=df.index)
+        logistic_type = df['logistic_type'] if 'logistic_type' in df.columns else pd.Series('', index=df.index)
+        bodegal = pd.Series(np.where(logistic_type == 'xd_drop_off', 3.5, 0), index=df.index)
         
-        return resultado_df
+        costo_amazon = declare_value * quantity
+        total_adicional = logistics_total + aditionals_total
+        
+        familias = {
+            'tdc': cuentas == '1-TODOENCARGO-CO',
+            'peru': cuentas == '4-MEGA TIENDAS PERUANAS',
+            'dtpt': cuentas.isin(['5-DETODOPARATODOS', '6-COMPRAFACIL', '7-COMPRA-YA']),
+            'chile': cuentas.isin(['2-MEGATIENDA SPA', '3-VEENDELO']),
+            'fabor': cuentas == '8-FABORCARGO',
+        }
+        familias = {nombre: mascara.fillna(False).astype(bool) for nombre, mascara in familias.items()}
+        trm = {
+            'tdc': self.trm_actual.get('colombia', 4250.0),
+            'peru': self.trm_actual.get('peru', 3.75),
+            'dtpt': self.trm_actual.get('colombia', 4250.0),
+            'chile': self.trm_actual.get('chile', 850.0),
+        }
+        
+        # Filas inválidas: int(quantity) falla o la TRM es 0 (división por cero)
+        invalidas = pd.Series(False, index=df.index)
+        for nombre in ('tdc', 'peru', 'dtpt', 'chile'):
+            invalidas |= familias[nombre] & (cantidad_invalida | (trm[nombre] == 0))
+        
+        def asignar(mascara, columnas):
+            filas = mascara.to_numpy()
+            for col, valores in columnas.items():
+                resultado_df.loc[filas, col] = np.asarray(valores, dtype=float)[filas]
+        
+        # 1-TODOENCARGO-CO y 4-MEGA TIENDAS PERUANAS
+        for nombre in ('tdc', 'peru'):
+            mascara = familias[nombre] & ~invalidas
+            if mascara.any():
+                meli_usd = net_real_amount / trm[nombre]
+                asignar(mascara, {
+                    'Costo Amazon': costo_amazon,
+                    'Total & Adicional': total_adicional,
+                    'MELI USD': meli_usd,
+                    'Utilidad Gss': meli_usd - costo_amazon - total_adicional,
+                })
+        
+        # 5-DETODOPARATODOS, 6-COMPRAFACIL, 7-COMPRA-YA (regla 7.5)
+        mascara = familias['dtpt'] & ~invalidas
+        if mascara.any():
+            meli_usd = net_real_amount / trm['dtpt']
+            impuesto_facturacion = (estado == 'approved').fillna(False).astype(int)
+            utilidad = meli_usd - costo_amazon - total_adicional - impuesto_facturacion
+            alcanza = utilidad >= 7.5
+            asignar(mascara, {
+                'Costo Amazon': costo_amazon,
+                'Total & Adicional': total_adicional,
+                'MELI USD': meli_usd,
+                'Impuesto por facturación': impuesto_facturacion,
+                'Utilidad': utilidad,
+                'Utilidad Socio': utilidad.where(~alcanza, 7.5),
+                'Utilidad Gss': (utilidad - 7.5).where(alcanza, 0),
+            })
+        
+        # 2-MEGATIENDA SPA, 3-VEENDELO
+        mascara = familias['chile'] & ~invalidas
+        if mascara.any():
+            meli_usd = net_real_amount / trm['chile']
+            socio_cuenta = pd.Series(np.where(estado == 'refunded', 0, 1), index=df.index)
+            asignar(mascara, {
+                'Costo Amazon': costo_amazon,
+                'Bodegal': bodegal,
+                'Socio_cuenta': socio_cuenta,
+                'MELI USD': meli_usd,
+                'Utilidad Gss': meli_usd - cxp_amt_due - costo_amazon - bodegal - socio_cuenta,
+            })
+        
+        # 8-FABORCARGO (peso -> ANEXO A); inválida si el peso no es finito (math.ceil fallaría)
+        if familias['fabor'].any():
+            peso_kg = self._limpiar_columna(df, 'logistic_weight_lbs') / 2.20462
+            invalidas |= familias['fabor'] & ~np.isfinite(peso_kg)
+            mascara = familias['fabor'] & ~invalidas
+            logistic_weight_ks = np.ceil(peso_kg.where(mascara, 0) * 2) / 2
+            impuesto_gss = self._limpiar_columna(df, 'cxp_arancel') + self._limpiar_columna(df, 'cxp_iva')
+            gss_logistica = self._gss_logistica_columna(logistic_weight_ks)
+            asignar(mascara, {
+                'logistic_weight_ks': logistic_weight_ks,
+                'Gss Logística': gss_logistica,
+                'Bodegal': bodegal,
+                'Impuesto Gss': impuesto_gss,
+                'Utilidad Gss': gss_logistica + impuesto_gss - cxp_amt_due,
+            })
+        
+        # Account name no reconocido
+        reconocidas = pd.Series(False, index=df.index)
+        for mascara in familias.values():
+            reconocidas |= mascara
+        if (~reconocidas).any():
+            resultado_df.loc[(~reconocidas).to_numpy(), 'Utilidad Gss'] = 0
+            for account_name, cantidad in cuentas[~reconocidas].value_counts(dropna=False).items():
+                st.warning(f"⚠️ Account name no reconocido: {account_name} ({cantidad} filas)")
+        
+        if invalidas.any():
+            filas = list(df.index[invalidas.to_numpy()])
+            muestra = ', '.join(str(i) for i in filas[:10]) + ('...' if len(filas) > 10 else '')
+            st.error(f"❌ {len(filas)} filas no se pudieron procesar (quantity, TRM o peso inválidos): {muestra}")
     
     def _calcular_todoencargo_co(self, resultado_df: pd.DataFrame, idx: int, row: pd.Series):
         """Cálculo para 1-TODOENCARGO-CO"""
@@ -405,9 +580,9 @@ class CalculadorUtilidades:
 @st.cache_resource
 def get_calculador_utilidades():
     """Factory function para obtener instancia del calculador con cache"""
-    import config
-    
-    # Usar credenciales desde config.py (más limpio y mantenible)
-    supabase = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
+    from modulos.cliente_bd import obtener_cliente
+
+    # Cliente compartido con credenciales de config.py
+    supabase = obtener_cliente()
     
     return CalculadorUtilidades(supabase)
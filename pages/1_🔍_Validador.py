@@ -5,7 +5,6 @@ Verifica si los registros ya existen en la base de datos y genera archivo limpio
 
 import streamlit as st
 import pandas as pd
-from supabase import create_client
 from datetime import datetime
 import io
 import numpy as np
@@ -36,7 +35,8 @@ try:
 except ImportError:
     AUTH_AVAILABLE = False
 
-import config
+from modulos.cliente_bd import obtener_cliente
+from modulos.lotes_bd import buscar_por_ids
 
 # Función para limpiar archivos CXP con títulos
 def limpiar_archivo_cxp(df):
@@ -83,11 +83,7 @@ def limpiar_archivo_cxp(df):
     return df
 
 # Conectar a Supabase
-@st.cache_resource
-def init_supabase():
-    return create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
-
-supabase = init_supabase()
+supabase = obtener_cliente()
 
 # Título principal
 st.title("🔍 Validador de Duplicados")
@@ -212,37 +208,20 @@ if uploaded_file:
                 
                 st.info(f"📊 IDs del archivo: {ids_archivo_normalizados[:5]}")
                 
-                # Consultar DIRECTAMENTE por cada ID para Logistics
-                registros_bd_encontrados = {}
-                
-                for id_norm in set(ids_archivo_normalizados):  # Eliminar duplicados
-                    # Buscar variaciones del ID
-                    variaciones = [id_norm, f"{id_norm}.0", int(id_norm) if id_norm.isdigit() else id_norm]
-                    
-                    for variacion in variaciones:
-                        try:
-                            # Buscar por order_id
-                            result = supabase.table('consolidated_orders').select(
-                                'order_id, prealert_id, logistics_total, logistics_reference, logistics_guide_number, logistics_date'
-                            ).eq('order_id', variacion).execute()
-                            
-                            if result.data:
-                                record = result.data[0]
-                                registros_bd_encontrados[id_norm] = record
-                                break
-                            
-                            # Si no se encuentra por order_id, buscar por prealert_id
-                            result2 = supabase.table('consolidated_orders').select(
-                                'order_id, prealert_id, logistics_total, logistics_reference, logistics_guide_number, logistics_date'
-                            ).eq('prealert_id', variacion).execute()
-                            
-                            if result2.data:
-                                record = result2.data[0]
-                                registros_bd_encontrados[id_norm] = record
-                                break
-                                
-                        except Exception as e:
-                            st.warning(f"Error buscando {variacion}: {e}")
+                # Consultar por lotes (todas las variantes del ID): primero por order_id
+                # y, para los que no aparecen, por prealert_id
+                columnas_logistics = 'order_id, prealert_id, logistics_total, logistics_reference, logistics_guide_number, logistics_date'
+                errores_busqueda = []
+                ids_unicos = list(dict.fromkeys(ids_archivo_normalizados))
+                por_order_id = buscar_por_ids(supabase, 'order_id', ids_unicos,
+                                              columnas=columnas_logistics, errores=errores_busqueda)
+                por_prealert_id = buscar_por_ids(supabase, 'prealert_id',
+                                                 [id_norm for id_norm in ids_unicos if id_norm not in por_order_id],
+                                                 columnas=columnas_logistics, errores=errores_busqueda)
+                registros_bd_encontrados = {id_norm: registros[0]
+                                            for id_norm, registros in {**por_order_id, **por_prealert_id}.items()}
+                for error in errores_busqueda[:5]:
+                    st.warning(f"Error buscando registros: {error}")
                 
                 # Mostrar SOLO tabla con datos de la BD
                 if registros_bd_encontrados:
@@ -368,25 +347,16 @@ if uploaded_file:
                     if id_norm:
                         ids_archivo_normalizados.append(id_norm)
                 
-                # Consultar DIRECTAMENTE por cada ID (sin batch) para debug
-                registros_bd_encontrados = {}
-                
-                for id_norm in ids_archivo_normalizados:
-                    # Buscar variaciones del ID
-                    variaciones = [id_norm, f"{id_norm}.0", int(id_norm) if id_norm.isdigit() else id_norm]
-                    
-                    for variacion in variaciones:
-                        try:
-                            result = supabase.table('consolidated_orders').select(
-                                'prealert_id, order_id, aditionals_total, aditionals_quantity, aditionals_unitprice, aditionals_item, aditionals_reference, aditionals_description, aditionals_order_id'
-                            ).eq('prealert_id', variacion).execute()
-                            
-                            if result.data:
-                                record = result.data[0]
-                                registros_bd_encontrados[id_norm] = record
-                                break
-                        except Exception as e:
-                            st.warning(f"Error buscando {variacion}: {e}")
+                # Consultar por lotes por prealert_id (todas las variantes del ID)
+                errores_busqueda = []
+                encontrados = buscar_por_ids(
+                    supabase, 'prealert_id', ids_archivo_normalizados,
+                    columnas='prealert_id, order_id, aditionals_total, aditionals_quantity, aditionals_unitprice, aditionals_item, aditionals_reference, aditionals_description, aditionals_order_id',
+                    errores=errores_busqueda
+                )
+                registros_bd_encontrados = {id_norm: registros[0] for id_norm, registros in encontrados.items()}
+                for error in errores_busqueda[:5]:
+                    st.warning(f"Error buscando registros: {error}")
                 
                 # Mostrar tabla con TODOS los datos de la BD
                 if registros_bd_encontrados:
@@ -504,26 +474,15 @@ if uploaded_file:
                     if id_norm:
                         ids_archivo_normalizados.append(id_norm)
                 
-                # Consultar DIRECTAMENTE por cada ID para CXP
-                registros_bd_encontrados = {}
-                
-                for id_norm in set(ids_archivo_normalizados):  # Eliminar duplicados
-                    # Buscar variaciones del ID
-                    variaciones = [id_norm, f"{id_norm}.0", int(id_norm) if id_norm.isdigit() else id_norm]
-                    
-                    for variacion in variaciones:
-                        try:
-                            result = supabase.table('consolidated_orders').select(
-                                'asignacion, cxp_amt_due, cxp_arancel, cxp_iva'
-                            ).eq('asignacion', variacion).execute()
-                            
-                            if result.data:
-                                record = result.data[0]
-                                registros_bd_encontrados[id_norm] = record
-                                break
-                                
-                        except Exception as e:
-                            st.warning(f"Error buscando {variacion}: {e}")
+                # Consultar por lotes por asignacion (todas las variantes del ID)
+                errores_busqueda = []
+                encontrados = buscar_por_ids(
+                    supabase, 'asignacion', ids_archivo_normalizados,
+                    columnas='asignacion, cxp_amt_due, cxp_arancel, cxp_iva', errores=errores_busqueda
+                )
+                registros_bd_encontrados = {id_norm: registros[0] for id_norm, registros in encontrados.items()}
+                for error in errores_busqueda[:5]:
+                    st.warning(f"Error buscando registros: {error}")
                 
                 # Mostrar tabla con TODOS los datos de la BD
                 if registros_bd_encontrados:
@@ -2,12 +2,9 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from supabase import create_client, Client
 import os
 from datetime import datetime, timedelta, date
 import io
-import time
-import re
 import hashlib
 import math
 import sys
@@ -15,6 +12,24 @@ import sys
 # Agregar la carpeta raíz al path para importar módulos
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Normalización de IDs (los cruces y el guardado están en modulos/consolidar.py)
+from modulos.consolidacion import (
+    format_date_standard, clean_id_aggressive, normalize_id_for_db_match,
+    clean_numeric_value, calculate_asignacion, detect_cxp_column,
+    LOGISTICS_COLUMNS, ADITIONALS_COLUMNS
+)
+from modulos.lotes_bd import buscar_por_ids, buscar_claves, indice_variantes, escribir_por_id, aviso_por_fila
+from modulos.consultas import paginar_por_id
+from modulos.lectura_archivos import leer_completo, TAMANO_BLOQUE
+from modulos.exportar import FORMATOS, exportar, resumen_exportacion
+from modulos import consolidar
+from modulos.consolidar import count_matched
+from modulos.progreso import ReporteStreamlit
+from modulos.cliente_bd import obtener_cliente
+
+# Archivos Drapify de este tamaño o mayores se procesan por bloques
+STREAMING_THRESHOLD_MB = 50
+
 # Importar sistema de autenticación
 try:
     from modulos.auth import require_auth, log_activity, show_user_info, get_current_user
@@ -41,12 +56,10 @@ if AUTH_AVAILABLE:
     except:
         pass
 
-# Configuración de Supabase usando config.py
-@st.cache_resource
+# Cliente de Supabase compartido (modulos/cliente_bd.py)
 def init_supabase():
     try:
-        import config
-        return create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
+        return obtener_cliente()
     except Exception as e:
         st.error(f"Error conectando a Supabase: {e}")
         return None
@@ -122,20 +135,6 @@ div.stButton > button[data-testid="baseButton-primary"]:active {
 # FUNCIONES DE FORMATO Y LIMPIEZA
 # =====================================================
 
-def fix_encoding(text):
-    """Corrige caracteres mal codificados automáticamente"""
-    if pd.isna(text) or not isinstance(text, str):
-        return text
-    
-    try:
-        if 'Ã' in text:
-            fixed = text.encode('latin-1').decode('utf-8')
-            return fixed
-    except:
-        pass
-    
-    return text
-
 def format_currency_no_decimals(value):
     """Formato currency sin decimales: $#,##0"""
     if pd.isna(value):
@@ -157,33 +156,6 @@ def format_currency_with_decimals(value):
     except:
         return value
 
-def format_date_standard(date_value, input_format="auto"):
-    """Convierte fechas a formato YYYY-MM-DD"""
-    if pd.isna(date_value) or date_value == "":
-        return None
-    
-    date_str = str(date_value).strip()
-    
-    try:
-        if re.match(r'\d{4}-\d{2}-\d{2}\s', date_str):
-            return date_str.split(' ')[0]
-        
-        if re.match(r'\d{1,2}/\d{1,2}/\d{4}', date_str):
-            parts = date_str.split('/')
-            if len(parts) == 3:
-                month = parts[0].zfill(2)
-                day = parts[1].zfill(2)
-                year = parts[2]
-                return f"{year}-{month}-{day}"
-        
-        if re.match(r'\d{4}-\d{2}-\d{2}$', date_str):
-            return date_str
-            
-    except:
-        pass
-    
-    return date_str
-
 def check_existing_data():
     """Verifica si hay datos existentes en la tabla"""
     try:
@@ -192,37 +164,6 @@ def check_existing_data():
     except:
         return False
 
-def clean_id(value):
-    """Limpia y normaliza IDs removiendo comillas y espacios"""
-    if pd.isna(value):
-        return None
-    str_value = str(value).strip()
-    if str_value.startswith("'"):
-        str_value = str_value[1:]
-    if str_value.endswith('.0'):
-        str_value = str_value[:-2]
-    return str_value if str_value and str_value != 'nan' else None
-
-def clean_id_aggressive(value):
-    """Limpieza más agresiva para IDs corruptos"""
-    if pd.isna(value):
-        return None
-    
-    str_value = str(value).strip()
-    str_value = str_value.replace("'", "")
-    str_value = str_value.replace('"', "")
-    str_value = str_value.replace(" ", "")
-    str_value = str_value.replace("\t", "")
-    str_value = str_value.replace("\n", "")
-    str_value = str_value.replace(".", "")
-    
-    if str_value.endswith('0') and len(str_value) > 1:
-        original = str(value)
-        if '.0' in original:
-            str_value = str_value[:-1]
-    
-    return str_value if str_value and str_value != 'nan' else None
-
 def create_error_log(filename, errors_list):
     """Crea un archivo de log con los errores"""
     if not errors_list:
@@ -292,71 +233,28 @@ def show_concise_report(total_in_file, found_in_db, processed, failed_list=None,
                         failed_ids = set(failed_list)
                         
                         # Normalizar la columna clave del dataframe para hacer match
-                        df_filtered = original_df[original_df[key_column].astype(str).str.strip().isin(failed_ids)].copy()
+                        df_filtered = original_df[original_df[key_column].astype(str).str.strip().isin(failed_ids)]
                         
                         if not df_filtered.empty:
-                            # Generar CSV con las columnas exactas del archivo original
-                            csv_content = df_filtered.to_csv(index=False, encoding='utf-8-sig')
+                            # Excel con las columnas exactas del archivo original (se puede volver a cargar)
+                            resultado = exportar('xlsx', [('REZAGADOS', df_filtered, {})])
                             
                             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                            csv_filename = f"registros_rezagados_{file_type.lower()}_{timestamp}.csv"
+                            archivo = f"registros_rezagados_{file_type.lower()}_{timestamp}.xlsx"
                             
                             st.download_button(
                                 label="📊 Descargar registros rezagados",
-                                data=csv_content,
-                                file_name=csv_filename,
-                                mime="text/csv",
+                                data=resultado['datos'],
+                                file_name=archivo,
+                                mime=FORMATOS['Excel (.xlsx)'][1],
                                 help="Descarga los registros del archivo original que no se encontraron en la BD"
                             )
+                            st.caption(resumen_exportacion(resultado))
                 except Exception as e:
-                    st.caption(f"Error generando CSV de rezagados: {str(e)}")
+                    st.caption(f"Error generando archivo de rezagados: {str(e)}")
     
     return success_rate
 
-def normalize_id_for_db_match(value):
-    """Normaliza IDs para hacer match con la base de datos que tiene formato 'ID"""
-    if pd.isna(value):
-        return None
-    
-    # Convertir a string y limpiar espacios
-    str_value = str(value).strip()
-    
-    # Si está vacío o es 'nan', retornar None
-    if not str_value or str_value.lower() == 'nan':
-        return None
-    
-    # Remover .0 si es un número entero (1049072.0 -> 1049072)
-    if str_value.endswith('.0'):
-        str_value = str_value[:-2]
-    
-    # NO agregar comilla aquí - la dejaremos para el matching
-    return str_value
-
-def clean_numeric_value(value):
-    """Limpia valores numéricos, eliminando basura como 'XXXXXXXXXX'"""
-    if pd.isna(value) or value is None:
-        return None
-    
-    str_value = str(value).strip()
-    
-    garbage_values = [
-        'XXXXXXXXXX', 'XXXXXXX', 'XXXXX', 'XXX',
-        'N/A', 'n/a', 'NA', 'na',
-        '-', '--', '---',
-        '#N/A', '#VALUE!', '#REF!',
-        'null', 'NULL', 'Null',
-        '', ' '
-    ]
-    
-    if str_value in garbage_values:
-        return None
-    
-    try:
-        clean_value = str_value.replace('$', '').replace(',', '').replace(' ', '')
-        return float(clean_value)
-    except:
-        return None
-
 def clean_update_data(update_data):
     """Limpia los datos de actualización eliminando NaN e infinitos"""
     cleaned = {}
@@ -387,151 +285,6 @@ def clean_update_data(update_data):
     
     return cleaned
 
-def calculate_asignacion(account_name, serial_number):
-    """Calcula la asignación basada en el account_name y serial_number"""
-    if pd.isna(account_name) or pd.isna(serial_number):
-        return None
-    
-    clean_serial = clean_id(serial_number)
-    if not clean_serial:
-        return None
-    
-    account_mapping = {
-        '1-TODOENCARGO-CO': 'TDC',
-        '2-MEGATIENDA SPA': 'MEGA',
-        '4-MEGA TIENDAS PERUANAS': 'MGA-PE',
-        '5-DETODOPARATODOS': 'DTPT',
-        '6-COMPRAFACIL': 'CFA',
-        '7-COMPRA-YA': 'CPYA',
-        '8-FABORCARGO': 'FBC',
-        '3-VEENDELO': 'VEEN'
-    }
-    
-    prefix = account_mapping.get(account_name, '')
-    return f"{prefix}{clean_serial}" if prefix else clean_serial
-
-def map_column_names(df):
-    """Mapea nombres de columnas del CSV a los nombres de la base de datos"""
-    column_mapping = {
-        'System#': 'system_number',
-        'Serial#': 'serial_number',
-        'order_id': 'order_id',
-        'pack_id': 'pack_id',
-        'ASIN': 'asin',
-        'client_first_name': 'client_first_name',
-        'client_last_name': 'client_last_name',
-        'client_doc_id': 'client_doc_id',
-        'account_name': 'account_name',
-        'date_created': 'date_created',
-        'quantity': 'quantity',
-        'title': 'title',
-        'unit_price': 'unit_price',
-        'logistic_type': 'logistic_type',
-        'address_line': 'address_line',
-        'street_name': 'street_name',
-        'street_number': 'street_number',
-        'city': 'city',
-        'state': 'state',
-        'country': 'country',
-        'receiver_phone': 'receiver_phone',
-        'amz_order_id': 'amz_order_id',
-        'prealert_id': 'prealert_id',
-        'ETIQUETA_ENVIO': 'etiqueta_envio',
-        'order_status_meli': 'order_status_meli',
-        'Declare Value': 'declare_value',
-        'Meli Fee': 'meli_fee',
-        'IVA': 'iva',
-        'ICA': 'ica',
-        'FUENTE': 'fuente',
-        'senders_cost': 'senders_cost',
-        'gross_amount': 'gross_amount',
-        'net_received_amount': 'net_received_amount',
-        'nombre_del_tercero': 'nombre_del_tercero',
-        'direccion': 'direccion',
-        'apelido_del_tercero': 'apelido_del_tercero',
-        'Estado': 'estado',
-        'razon_social': 'razon_social',
-        'Ciudad': 'ciudad',
-        'Numero de documento': 'numero_de_documento',
-        'digital_verification': 'digital_verification',
-        'tipo': 'tipo',
-        'telefono': 'telefono',
-        'giro': 'giro',
-        'correo': 'correo',
-        'net_real_amount': 'net_real_amount',
-        'logistic_weight_lbs': 'logistic_weight_lbs',
-        'refunded_date': 'refunded_date',
-        'Asignacion': 'asignacion',
-    }
-    
-    renamed_df = df.rename(columns={k: v for k, v in column_mapping.items() if k in df.columns})
-    return renamed_df
-
-def apply_basic_formatting(df):
-    """Aplica formatos básicos sin afectar campos numéricos para BD"""
-    
-    st.info("🔧 Aplicando formatos básicos para base de datos...")
-    
-    text_columns = [
-        'client_first_name', 'client_last_name', 'title', 'address_line', 
-        'street_name', 'city', 'state', 'country', 'nombre_del_tercero',
-        'direccion', 'apelido_del_tercero', 'estado', 'razon_social', 'ciudad',
-        'logistics_description', 'logistics_shipper', 'logistics_consignee',
-        'logistics_country', 'logistics_state', 'logistics_city', 'logistics_address'
-    ]
-    
-    for col in text_columns:
-        if col in df.columns:
-            df[col] = df[col].apply(fix_encoding)
-    
-    date_columns = {
-        'date_created': 'datetime',
-        'cxp_date': 'cxp_format'
-    }
-    
-    for col, format_type in date_columns.items():
-        if col in df.columns:
-            df[col] = df[col].apply(format_date_standard)
-    
-    st.success("✅ Formatos básicos aplicados")
-    return df
-
-def detect_cxp_column(df, target_field):
-    """
-    Detecta inteligentemente la columna correcta para un campo CXP
-    NO depende de posiciones, solo de nombres y patrones
-    """
-    column_patterns = {
-        'ot_number': ['OT Number', 'OT_Number', 'ot number', 'OT#', 'OT #', 'Order Transfer'],
-        'date': ['Date', 'DATE', 'Fecha', 'date', 'Creation Date'],
-        'ref_number': ['Ref #', 'Ref#', 'REF #', 'Reference', 'ref_number', 'Referencia', 'REF#'],
-        'consignee': ['Consignee', 'CONSIGNEE', 'Destinatario', 'Recipient'],
-        'co_aereo': ['CO Aereo', 'CO_Aereo', 'co aereo', 'CO AEREO', 'Aereo', 'Air Cost', 'Costo Aereo'],
-        'arancel': ['Arancel', 'ARANCEL', 'Tariff', 'Duty', 'Customs Duty', 'Impuesto'],
-        'iva': ['IVA', 'iva', 'I.V.A.', 'Tax', 'VAT', 'Value Added Tax'],
-        'handling': ['Handling', 'HANDLING', 'Manejo', 'Handle', 'Processing'],
-        'dest_delivery': ['Dest. Delivery', 'Dest Delivery', 'Destination Delivery', 'Delivery', 'Entrega Destino'],
-        'amt_due': ['Amt. Due', 'Amt Due', 'Amount Due', 'Total Due', 'Monto Adeudado', 'Total'],
-        'goods_value': ['Goods Value', 'GOODS VALUE', 'Valor Mercancia', 'Value', 'Merchandise Value']
-    }
-    
-    patterns = column_patterns.get(target_field, [])
-    
-    # Primero buscar coincidencia exacta
-    for pattern in patterns:
-        if pattern in df.columns:
-            return pattern
-    
-    # Luego buscar coincidencia parcial (case-insensitive)
-    for col in df.columns:
-        col_lower = col.lower().strip()
-        for pattern in patterns:
-            pattern_lower = pattern.lower().strip()
-            if pattern_lower in col_lower or col_lower in pattern_lower:
-                return col
-    
-    return None
-
 def get_column_value_safe(row, column_mappings, field_name):
     """
     Obtiene el valor de una columna de forma segura usando el mapeo detectado
@@ -542,488 +295,21 @@ def get_column_value_safe(row, column_mappings, field_name):
     return None
 
 def process_files_according_to_rules(drapify_df, logistics_df=None, aditionals_df=None, cxp_df=None, logistics_date=None):
-    """
-    Procesa y consolida todos los archivos según las reglas especificadas
-    """
-    
-    st.info("🔄 Iniciando consolidación según reglas especificadas...")
-    
-    # PASO 1: Usar Drapify como base
-    consolidated_df = drapify_df.copy()
-    st.success(f"✅ Archivo base Drapify procesado: {len(consolidated_df)} registros")
-    
-    # PASO 2: Procesar archivo Logistics (SE CONECTA VIA Reference = order_id O Order number = order_id)
-    if logistics_df is not None and len(logistics_df) > 0:
-        st.info("🚚 Procesando archivo Logistics...")
-        st.caption("🔗 Conexión: Reference = order_id O Order number = order_id")
-        
-        if logistics_date:
-            st.info(f"📅 Aplicando fecha {logistics_date} a registros de Logistics")
-        
-        logistics_dict_by_reference = {}
-        logistics_dict_by_order_number = {}
-        
-        for idx, row in logistics_df.iterrows():
-            # Limpiar IDs pero no agregar comilla todavía
-            reference = normalize_id_for_db_match(row.get('Reference', ''))
-            order_number = normalize_id_for_db_match(row.get('Order number', ''))
-            
-            # Ignorar valores inválidos como "PACKAGE RECALLED FROM UNKNOWN"
-            if reference and not 'PACKAGE' in str(reference).upper():
-                logistics_dict_by_reference[reference] = row
-            if order_number:
-                logistics_dict_by_order_number[order_number] = row
-        
-        st.info(f"📋 Logistics indexado: {len(logistics_dict_by_reference)} por Reference, {len(logistics_dict_by_order_number)} por Order number")
-        
-        logistics_columns = [
-            'Guide Number', 'Order number', 'Reference', 'SAP Code', 'Invoice', 
-            'Status', 'FOB', 'Unit', 'Weight', 'Length', 'Width', 'Height',
-            'Insurance', 'Logistics', 'Duties Prealert', 'Duties Pay', 
-            'Duty Fee', 'Saving', 'Total', 'Description', 'Shipper', 'Phone',
-            'Consignee', 'Identification', 'Country', 'State', 'City', 
-            'Address', 'Master Guide', 'Tariff Position', 'External Id'
-        ]
-        
-        if logistics_date:
-            consolidated_df['logistics_date'] = np.nan
-        
-        for col in logistics_columns:
-            if col in logistics_df.columns:
-                consolidated_df[f'logistics_{col.lower().replace(" ", "_")}'] = np.nan
-        
-        matched_by_order_id = 0
-        matched_by_prealert_id = 0
-        no_match_count = 0
-        
-        for idx, row in consolidated_df.iterrows():
-            order_id = clean_id_aggressive(row.get('order_id', ''))
-            prealert_id = clean_id_aggressive(row.get('prealert_id', ''))
-            
-            logistics_row = None
-            match_type = None
-            
-            if order_id and order_id in logistics_dict_by_reference:
-                logistics_row = logistics_dict_by_reference[order_id]
-                matched_by_order_id += 1
-                match_type = "order_id->Reference"
-            elif order_id and order_id in logistics_dict_by_order_number:
-                logistics_row = logistics_dict_by_order_number[order_id]
-                matched_by_order_id += 1
-                match_type = "order_id->Order number"
-            elif prealert_id and prealert_id in logistics_dict_by_order_number:
-                logistics_row = logistics_dict_by_order_number[prealert_id]
-                matched_by_prealert_id += 1
-                match_type = "prealert_id->Order number"
-            
-            if logistics_row is not None and not (isinstance(logistics_row, pd.Series) and logistics_row.empty):
-                for col in logistics_columns:
-                    if col in logistics_df.columns:
-                        if isinstance(logistics_row, pd.Series):
-                            value = logistics_row.get(col)
-                        else:
-                            value = logistics_row.get(col)
-                        consolidated_df.loc[idx, f'logistics_{col.lower().replace(" ", "_")}'] = value
-                
-                if logistics_date:
-                    consolidated_df.loc[idx, 'logistics_date'] = str(logistics_date)
-            else:
-                no_match_count += 1
-        
-        st.success(f"✅ Logistics procesado: {matched_by_order_id} por order_id, {matched_by_prealert_id} por prealert_id, {no_match_count} sin match")
-    
-    # PASO 3: Procesar archivo Aditionals (SE CONECTA VIA Order Id = prealert_id)
-    if aditionals_df is not None and len(aditionals_df) > 0:
-        st.info("➕ Procesando archivo Aditionals...")
-        st.caption("🔗 Conexión: Order Id = prealert_id (NO order_id)")
-        
-        # Crear diccionario para sumar múltiples filas del mismo Order Id
-        aditionals_dict = {}
-        for idx, row in aditionals_df.iterrows():
-            order_id = clean_id_aggressive(row.get('Order Id', ''))
-            if order_id:
-                if order_id not in aditionals_dict:
-                    # Primera vez que vemos este order_id - crear entrada nueva
-                    aditionals_dict[order_id] = {
-                        'Order Id': order_id,
-                        'Item': row.get('Item', ''),
-                        'Reference': row.get('Reference', ''),
-                        'Description': row.get('Description', ''),
-                        'Quantity': float(row.get('Quantity', 0)) if pd.notnull(row.get('Quantity')) else 0,
-                        'UnitPrice': float(row.get('UnitPrice', 0)) if pd.notnull(row.get('UnitPrice')) else 0,
-                        'Total': float(row.get('Total', 0)) if pd.notnull(row.get('Total')) else 0
-                    }
-                else:
-                    # Ya existe este order_id - sumar los valores numéricos
-                    existing = aditionals_dict[order_id]
-                    existing['Quantity'] += float(row.get('Quantity', 0)) if pd.notnull(row.get('Quantity')) else 0
-                    existing['UnitPrice'] += float(row.get('UnitPrice', 0)) if pd.notnull(row.get('UnitPrice')) else 0
-                    existing['Total'] += float(row.get('Total', 0)) if pd.notnull(row.get('Total')) else 0
-                    # Para campos de texto, mantener el primero (o concatenar si prefieres)
-                    if not existing['Item'] and row.get('Item'):
-                        existing['Item'] = row.get('Item', '')
-                    if not existing['Reference'] and row.get('Reference'):
-                        existing['Reference'] = row.get('Reference', '')
-                    if not existing['Description'] and row.get('Description'):
-                        existing['Description'] = row.get('Description', '')
-        
-        
-        aditionals_columns = ['Order Id', 'Item', 'Reference', 'Description', 'Quantity', 'UnitPrice', 'Total']
-        
-        for col in aditionals_columns:
-            if col in aditionals_df.columns:
-                consolidated_df[f'aditionals_{col.lower().replace(" ", "_")}'] = np.nan
-        
-        matched_aditionals = 0
-        
-        for idx, row in consolidated_df.iterrows():
-            prealert_id = clean_id_aggressive(row.get('prealert_id', ''))
-            
-            if prealert_id and prealert_id in aditionals_dict:
-                aditionals_row = aditionals_dict[prealert_id]
-                matched_aditionals += 1
-                
-                for col in aditionals_columns:
-                    if col in aditionals_df.columns:
-                        consolidated_df.loc[idx, f'aditionals_{col.lower().replace(" ", "_")}'] = aditionals_row.get(col)
-        
-        # Contar cuántos Order Id tenían múltiples filas
-        total_rows = len(aditionals_df)
-        unique_orders = len(aditionals_dict)
-        multiple_rows = total_rows - unique_orders
-        
-        if multiple_rows > 0:
-            st.info(f"ℹ️ Se encontraron {multiple_rows} filas duplicadas que fueron sumadas automáticamente")
-        
-        st.success(f"✅ Aditionals procesado: {matched_aditionals} matches por prealert_id (de {unique_orders} Order Id únicos procesados)")
-    
-    # PASO 4: Calcular columna Asignacion
-    st.info("🏷️ Calculando columna Asignacion...")
-    
-    if 'account_name' in consolidated_df.columns and 'Serial#' in consolidated_df.columns:
-        consolidated_df['Asignacion'] = consolidated_df.apply(
-            lambda row: calculate_asignacion(row['account_name'], row['Serial#']), 
-            axis=1
-        )
-        asignaciones_calculadas = consolidated_df['Asignacion'].notna().sum()
-        st.success(f"✅ Asignaciones calculadas: {asignaciones_calculadas}")
-    else:
-        st.warning("⚠️ No se pudo calcular Asignacion: faltan columnas account_name o Serial#")
-    
-    # PASO 5: Procesar archivo CXP (SE CONECTA VIA Ref # = asignacion)
-    if cxp_df is not None and len(cxp_df) > 0:
-        st.info("💰 Procesando archivo CXP (Chilexpress)...")
-        st.caption("🔗 Conexión: Ref # = asignacion (campo calculado)")
-        
-        # Detectar automáticamente el mapeo de columnas
-        column_mappings = {}
-        for field in ['ot_number', 'date', 'ref_number', 'consignee', 'co_aereo', 
-                     'arancel', 'iva', 'handling', 'dest_delivery', 'amt_due', 'goods_value']:
-            detected_col = detect_cxp_column(cxp_df, field)
-            if detected_col:
-                column_mappings[field] = detected_col
-        
-        st.write(f"🔍 Columnas detectadas automáticamente en CXP:")
-        for field, col in column_mappings.items():
-            if col:
-                st.write(f"   • {field} → {col}")
-        
-        # Crear diccionario usando la columna de referencia detectada
-        ref_column = column_mappings.get('ref_number')
-        if not ref_column:
-            st.warning("⚠️ No se encontró columna de referencia en CXP")
-            return consolidated_df
-        
-        cxp_dict = {}
-        for idx, row in cxp_df.iterrows():
-            ref_number = clean_id_aggressive(row.get(ref_column, ''))
-            if ref_number:
-                cxp_dict[ref_number] = row
-        
-        st.info(f"📋 CXP indexado: {len(cxp_dict)} registros")
-        
-        # Agregar columnas CXP al dataframe consolidado
-        consolidated_df['cxp_ot_number'] = np.nan
-        consolidated_df['cxp_date'] = np.nan
-        consolidated_df['cxp_ref_number'] = np.nan
-        consolidated_df['cxp_consignee'] = np.nan
-        consolidated_df['cxp_co_aereo'] = np.nan
-        consolidated_df['cxp_arancel'] = np.nan
-        consolidated_df['cxp_iva'] = np.nan
-        consolidated_df['cxp_handling'] = np.nan
-        consolidated_df['cxp_dest_delivery'] = np.nan
-        consolidated_df['cxp_amt_due'] = np.nan
-        consolidated_df['cxp_goods_value'] = np.nan
-        
-        matched_cxp = 0
-        
-        if 'Asignacion' in consolidated_df.columns:
-            for idx, row in consolidated_df.iterrows():
-                asignacion = clean_id_aggressive(row.get('Asignacion', ''))
-                
-                if asignacion and asignacion in cxp_dict:
-                    cxp_row = cxp_dict[asignacion]
-                    matched_cxp += 1
-                    
-                    # MAPEO INTELIGENTE DE VALORES
-                    consolidated_df.loc[idx, 'cxp_ot_number'] = get_column_value_safe(cxp_row, column_mappings, 'ot_number')
-                    consolidated_df.loc[idx, 'cxp_date'] = format_date_standard(
-                        get_column_value_safe(cxp_row, column_mappings, 'date')
-                    )
-                    consolidated_df.loc[idx, 'cxp_ref_number'] = get_column_value_safe(cxp_row, column_mappings, 'ref_number')
-                    consolidated_df.loc[idx, 'cxp_consignee'] = get_column_value_safe(cxp_row, column_mappings, 'consignee')
-                    
-                    # VALORES NUMÉRICOS CON LIMPIEZA
-                    consolidated_df.loc[idx, 'cxp_co_aereo'] = clean_numeric_value(
-                        get_column_value_safe(cxp_row, column_mappings, 'co_aereo')
-                    )
-                    consolidated_df.loc[idx, 'cxp_arancel'] = clean_numeric_value(
-                        get_column_value_safe(cxp_row, column_mappings, 'arancel')
-                    )
-                    consolidated_df.loc[idx, 'cxp_iva'] = clean_numeric_value(
-                        get_column_value_safe(cxp_row, column_mappings, 'iva')
-                    )
-                    consolidated_df.loc[idx, 'cxp_handling'] = clean_numeric_value(
-                        get_column_value_safe(cxp_row, column_mappings, 'handling')
-                    )
-                    consolidated_df.loc[idx, 'cxp_dest_delivery'] = clean_numeric_value(
-                        get_column_value_safe(cxp_row, column_mappings, 'dest_delivery')
-                    )
-                    consolidated_df.loc[idx, 'cxp_amt_due'] = clean_numeric_value(
-                        get_column_value_safe(cxp_row, column_mappings, 'amt_due')
-                    )
-                    consolidated_df.loc[idx, 'cxp_goods_value'] = clean_numeric_value(
-                        get_column_value_safe(cxp_row, column_mappings, 'goods_value')
-                    )
-        
-        st.success(f"✅ CXP procesado: {matched_cxp} matches por Asignacion")
-    
-    # PASO 6: Aplicar formatos básicos
-    consolidated_df = apply_basic_formatting(consolidated_df)
-    
-    # PASO 7: Validación de duplicados
-    st.info("🔍 Validando duplicados por order_id...")
-    
-    if 'order_id' in consolidated_df.columns:
-        initial_count = len(consolidated_df)
-        consolidated_df = consolidated_df.drop_duplicates(subset=['order_id'], keep='first')
-        final_count = len(consolidated_df)
-        
-        if initial_count != final_count:
-            removed_count = initial_count - final_count
-            st.warning(f"⚠️ Se removieron {removed_count} registros duplicados por order_id")
-        else:
-            st.success("✅ No se encontraron duplicados por order_id")
-    
-    st.success(f"🎉 Consolidación completada: {len(consolidated_df)} registros finales")
-    return consolidated_df
-
-def prepare_record_for_db(record):
-    """Prepara un registro para inserción en la base de datos"""
-    
-    integer_columns = ['system_number', 'quantity', 'iva', 'ica']
-    
-    numeric_columns = [
-        'unit_price', 'declare_value', 'meli_fee', 'fuente', 
-        'senders_cost', 'gross_amount', 'net_received_amount',
-        'digital_verification', 'net_real_amount', 'logistic_weight_lbs',
-        'logistics_fob', 'logistics_weight', 'logistics_length', 
-        'logistics_width', 'logistics_height', 'logistics_insurance',
-        'logistics_logistics', 'logistics_duties_prealert', 
-        'logistics_duties_pay', 'logistics_duty_fee', 'logistics_saving',
-        'logistics_total',
-        'aditionals_quantity', 'aditionals_unitprice', 'aditionals_total',
-        'cxp_co_aereo', 'cxp_arancel', 'cxp_iva', 'cxp_handling',
-        'cxp_dest_delivery', 'cxp_amt_due', 'cxp_goods_value'
-    ]
-    
-    date_columns = ['logistics_date', 'date_created', 'refunded_date', 'cxp_date']
-    
-    cleaned_record = {}
-    
-    for key, value in record.items():
-        if pd.isna(value) or value is None:
-            cleaned_record[key] = None
-        elif isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
-            cleaned_record[key] = None
-        elif key in date_columns:
-            if isinstance(value, (pd.Timestamp, datetime)):
-                cleaned_record[key] = value.strftime('%Y-%m-%d')
-            elif isinstance(value, date):
-                cleaned_record[key] = value.strftime('%Y-%m-%d')
-            elif isinstance(value, str) and value and value != 'nan':
-                cleaned_record[key] = value
-            else:
-                cleaned_record[key] = None
-        elif isinstance(value, (pd.Timestamp, datetime)):
-            cleaned_record[key] = value.strftime('%Y-%m-%d') if hasattr(value, 'strftime') else str(value)
-        elif key in integer_columns:
-            try:
-                clean_val = clean_numeric_value(value)
-                if clean_val is not None and not math.isnan(clean_val) and not math.isinf(clean_val):
-                    cleaned_record[key] = int(float(clean_val))
-                else:
-                    cleaned_record[key] = None
-            except:
-                cleaned_record[key] = None
-        elif key in numeric_columns:
-            clean_val = clean_numeric_value(value)
-            if clean_val is not None and not math.isnan(clean_val) and not math.isinf(clean_val):
-                cleaned_record[key] = clean_val
-            else:
-                cleaned_record[key] = None
-        else:
-            str_value = str(value)
-            if str_value == 'nan' or str_value == 'None':
-                cleaned_record[key] = None
-            else:
-                cleaned_record[key] = str_value
-    
-    return cleaned_record
+    """Procesa y consolida todos los archivos según las reglas especificadas (modulos/consolidar.py)"""
+    return consolidar.process_files_according_to_rules(
+        drapify_df, logistics_df, aditionals_df, cxp_df, logistics_date, ReporteStreamlit()
+    )
 
 def insert_or_update_to_supabase(df, filename=None, logistics_matched=0, aditionals_matched=0, cxp_matched=0):
     """Inserta nuevos registros o actualiza existentes en Supabase"""
-    start_time = time.time()
+    total_inserted, total_updated = consolidar.insert_or_update_to_supabase(supabase, df, ReporteStreamlit())
     
-    try:
-        st.info("🔍 Verificando registros existentes en la base de datos...")
-        
-        df_mapped = map_column_names(df)
-        
-        order_ids_to_process = df_mapped['order_id'].dropna().unique().tolist()
-        
-        if not order_ids_to_process:
-            st.error("❌ No se encontraron order_ids válidos para procesar")
-            return 0, 0
-        
-        st.info(f"📊 Procesando {len(order_ids_to_process)} order_ids únicos")
-        
-        existing_order_ids = []
-        batch_size = 100
-        
-        for i in range(0, len(order_ids_to_process), batch_size):
-            batch = order_ids_to_process[i:i + batch_size]
-            try:
-                result = supabase.table('consolidated_orders').select('order_id').in_('order_id', batch).execute()
-                existing_order_ids.extend([record['order_id'] for record in result.data])
-            except Exception as e:
-                st.error(f"Error consultando registros existentes: {str(e)}")
-        
-        existing_order_ids_set = set(existing_order_ids)
-        
-        new_records = []
-        update_records = []
-        
-        db_columns = [
-            'system_number', 'serial_number', 'order_id', 'pack_id', 'asin',
-            'client_first_name', 'client_last_name', 'client_doc_id', 'account_name',
-            'date_created', 'quantity', 'title', 'unit_price', 'logistic_type',
-            'address_line', 'street_name', 'street_number', 'city', 'state', 'country',
-            'receiver_phone', 'amz_order_id', 'prealert_id', 'etiqueta_envio',
-            'order_status_meli', 'declare_value', 'meli_fee', 'iva', 'ica', 'fuente',
-            'senders_cost', 'gross_amount', 'net_received_amount', 'nombre_del_tercero',
-            'direccion', 'apelido_del_tercero', 'estado', 'razon_social', 'ciudad',
-            'numero_de_documento', 'digital_verification', 'tipo', 'telefono', 'giro',
-            'correo', 'net_real_amount', 'logistic_weight_lbs', 'refunded_date',
-            'asignacion'
-        ]
-        
-        for col in df_mapped.columns:
-            if (col.startswith('logistics_') or col.startswith('aditionals_') or col.startswith('cxp_')) and col not in db_columns:
-                db_columns.append(col)
-        
-        df_filtered = df_mapped[[col for col in db_columns if col in df_mapped.columns]]
-        records = df_filtered.to_dict('records')
-        
-        for record in records:
-            cleaned_record = prepare_record_for_db(record)
-            order_id = cleaned_record.get('order_id')
-            
-            if order_id and order_id in existing_order_ids_set:
-                update_records.append(cleaned_record)
-            else:
-                new_records.append(cleaned_record)
-        
-        st.info(f"📊 Resumen de procesamiento:")
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total a procesar", len(records))
-        with col2:
-            st.metric("Registros existentes", len(update_records))
-        with col3:
-            st.metric("Registros nuevos", len(new_records))
-        
-        total_inserted = 0
-        total_updated = 0
-        
-        if new_records:
-            st.info(f"➕ Insertando {len(new_records)} nuevos registros...")
-            
-            batch_size = 50
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            for i in range(0, len(new_records), batch_size):
-                batch = new_records[i:i + batch_size]
-                
-                try:
-                    result = supabase.table('consolidated_orders').insert(batch).execute()
-                    total_inserted += len(batch)
-                    
-                    progress = min(1.0, (i + batch_size) / len(new_records))
-                    progress_bar.progress(progress)
-                    status_text.text(f"Insertando nuevos: {total_inserted}/{len(new_records)} registros")
-                    
-                except Exception as batch_error:
-                    st.error(f"Error insertando lote: {str(batch_error)}")
-                    continue
-            
-            progress_bar.progress(1.0)
-            st.success(f"✅ {total_inserted} registros nuevos insertados")
-            
-            # Log de actividad
-            if AUTH_AVAILABLE:
-                log_activity("process_data", f"Consolidación completa procesada: {total_inserted} registros insertados", 
-                           "consolidation", None, total_inserted)
-        
-        if update_records:
-            st.info(f"🔄 Actualizando {len(update_records)} registros existentes...")
-            
-            batch_size = 50
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            for i in range(0, len(update_records), batch_size):
-                batch = update_records[i:i + batch_size]
-                
-                try:
-                    result = supabase.table('consolidated_orders').upsert(
-                        batch, 
-                        on_conflict='order_id',
-                        ignore_duplicates=False
-                    ).execute()
-                    
-                    total_updated += len(batch)
-                    
-                    progress = (i + batch_size) / len(update_records)
-                    progress_bar.progress(min(1.0, progress))
-                    status_text.text(f"Actualizando: {total_updated}/{len(update_records)} registros")
-                    
-                    if i % 500 == 0 and i > 0:
-                        time.sleep(0.1)
-                    
-                except Exception as update_error:
-                    st.warning(f"Error actualizando lote {i//batch_size + 1}: {str(update_error)}")
-                    continue
-            
-            progress_bar.progress(1.0)
-            st.success(f"✅ {total_updated} registros actualizados")
-        
-        return total_inserted, total_updated
-        
-    except Exception as e:
-        st.error(f"Error general: {str(e)}")
-        return 0, 0
+    # Log de actividad
+    if AUTH_AVAILABLE and total_inserted > 0:
+        log_activity("process_data", f"Consolidación completa procesada: {total_inserted} registros insertados", 
+                   "consolidation", None, total_inserted)
+    
+    return total_inserted, total_updated
 
 def update_logistics_only(logistics_df, logistics_date=None):
     """Actualiza solo las columnas de logistics en registros existentes"""
@@ -1056,101 +342,68 @@ def update_logistics_only(logistics_df, logistics_date=None):
             st.warning("No hay IDs válidos en el archivo Logistics")
             return 0
         
-        # Buscar registros específicos por order_id y prealert_id
+        # Buscar registros por lotes (buscar_por_claves o .in_() con todas las variantes del ID)
         matching_records = []
+        lookup_errors = []
         
-        # Buscar registros específicos por order_id y prealert_id (silencioso)
-        # Buscar por order_id (References del archivo)
-        order_ids_to_search = list(logistics_dict_by_reference.keys())
-        if order_ids_to_search:
-            for ref_id in order_ids_to_search:
-                # Probar múltiples formatos
-                search_variants = [
-                    ref_id,                    # Como está: 2000011458658334
-                    f"'{ref_id}",             # Con comilla: '2000011458658334
-                    f"{ref_id}.0",            # Con .0: 2000011458658334.0
-                    f"'{ref_id}.0"            # Con comilla y .0
-                ]
-                
-                found = False
-                for variant in search_variants:
-                    try:
-                        result = supabase.table('consolidated_orders').select('id, order_id, prealert_id').eq('order_id', variant).limit(1).execute()
-                        if result.data:
-                            matching_records.extend(result.data)
-                            found = True
-                            break
-                    except:
-                        pass
-                
-                if not found:
-                    not_found_records.append(f"Reference: {ref_id}")
-        
-        # Buscar por prealert_id (Order numbers del archivo)
-        prealert_ids_to_search = list(logistics_dict_by_order_number.keys())
-        if prealert_ids_to_search:
-            for order_num in prealert_ids_to_search:
-                # Probar múltiples formatos
-                search_variants = [
-                    order_num,                    # Como está: 1020539
-                    f"{order_num}.0",            # Con .0: 1020539.0
-                    f"'{order_num}",             # Con comilla: '1020539
-                    f"'{order_num}.0"            # Con comilla y .0
-                ]
-                
-                found = False
-                for variant in search_variants:
-                    try:
-                        result = supabase.table('consolidated_orders').select('id, order_id, prealert_id').eq('prealert_id', variant).limit(1).execute()
-                        if result.data:
-                            # Evitar duplicados
-                            existing_ids = {r['id'] for r in matching_records}
-                            if result.data[0]['id'] not in existing_ids:
-                                matching_records.extend(result.data)
-                            found = True
-                            break
-                    except:
-                        pass
-                
-                if not found:
-                    not_found_records.append(f"Order number: {order_num}")
+        # order_id = Reference del archivo
+        found_by_reference = buscar_por_ids(
+            supabase, 'order_id', logistics_dict_by_reference.keys(),
+            columnas='id, order_id, prealert_id, account_name', errores=lookup_errors
+        )
+        for ref_id in logistics_dict_by_reference:
+            if ref_id in found_by_reference:
+                matching_records.append(found_by_reference[ref_id][0])
+            else:
+                not_found_records.append(f"Reference: {ref_id}")
+        
+        # prealert_id = Order number del archivo
+        found_by_order_number = buscar_por_ids(
+            supabase, 'prealert_id', logistics_dict_by_order_number.keys(),
+            columnas='id, order_id, prealert_id, account_name', errores=lookup_errors
+        )
+        existing_ids = {r['id'] for r in matching_records}
+        for order_num in logistics_dict_by_order_number:
+            if order_num in found_by_order_number:
+                record = found_by_order_number[order_num][0]
+                # Evitar duplicados
+                if record['id'] not in existing_ids:
+                    matching_records.append(record)
+                    existing_ids.add(record['id'])
+            else:
+                not_found_records.append(f"Order number: {order_num}")
+        
+        for error in lookup_errors[:5]:
+            st.warning(f"⚠️ Error buscando registros: {error}")
         
         if not matching_records:
             return 0
         
         existing_records = pd.DataFrame(matching_records)
         
+        # Índices variante -> ID del archivo para asignar cada registro de BD en O(1)
+        reference_by_variant = indice_variantes(logistics_dict_by_reference.keys())
+        order_number_by_variant = indice_variantes(logistics_dict_by_order_number.keys())
+        
         updates_to_perform = []
+        cuentas = set()  # account_name de los registros actualizados (caché de reportes)
         matched_count = 0
         
-        for _, record in existing_records.iterrows():
+        for record in matching_records:
             order_id_raw = record.get('order_id', '')
             prealert_id_raw = record.get('prealert_id', '')
             db_id = record.get('id')
             
             logistics_row = None
-            match_info = None
-            
-            # Intentar hacer match con múltiples formatos para order_id -> Reference
-            for ref_key in logistics_dict_by_reference.keys():
-                if str(order_id_raw) == ref_key or \
-                   str(order_id_raw).replace("'", '') == ref_key or \
-                   str(order_id_raw).replace('.0', '') == ref_key or \
-                   str(order_id_raw).replace("'", '').replace('.0', '') == ref_key:
-                    logistics_row = logistics_dict_by_reference[ref_key]
-                    match_info = f"order_id->Reference: {order_id_raw}"
-                    break
             
-            # Si no se encontró, intentar con prealert_id -> Order number
-            if logistics_row is None or (isinstance(logistics_row, pd.Series) and logistics_row.empty):
-                for order_key in logistics_dict_by_order_number.keys():
-                    if str(prealert_id_raw) == order_key or \
-                       str(prealert_id_raw).replace('.0', '') == order_key or \
-                       str(prealert_id_raw).replace("'", '') == order_key or \
-                       str(prealert_id_raw).replace("'", '').replace('.0', '') == order_key:
-                        logistics_row = logistics_dict_by_order_number[order_key]
-                        match_info = f"prealert_id->Order number: {prealert_id_raw}"
-                        break
+            # order_id -> Reference; si no, prealert_id -> Order number
+            ref_key = reference_by_variant.get(str(order_id_raw).strip())
+            if ref_key is not None:
+                logistics_row = logistics_dict_by_reference[ref_key]
+            else:
+                order_key = order_number_by_variant.get(str(prealert_id_raw).strip())
+                if order_key is not None:
+                    logistics_row = logistics_dict_by_order_number[order_key]
             
             if logistics_row is not None and not (isinstance(logistics_row, pd.Series) and logistics_row.empty):
                 matched_count += 1
@@ -1216,32 +469,24 @@ def update_logistics_only(logistics_df, logistics_date=None):
                 
                 cleaned_update = clean_update_data(update_data)
                 updates_to_perform.append(cleaned_update)
+                cuentas.add(record.get('account_name'))
         
         if updates_to_perform:
             
-            batch_size = 50
-            total_updated = 0
             progress_bar = st.progress(0)
             
-            for i in range(0, len(updates_to_perform), batch_size):
-                batch = updates_to_perform[i:i + batch_size]
-                
-                try:
-                    for update in batch:
-                        try:
-                            record_id = update.pop('id')
-                            final_clean_update = clean_update_data(update)
-                            supabase.table('consolidated_orders').update(final_clean_update).eq('id', record_id).execute()
-                            total_updated += 1
-                        except Exception as individual_error:
-                            continue
-                    
-                    progress = min(1.0, (i + batch_size) / len(updates_to_perform))
-                    progress_bar.progress(progress)
-                    
-                except Exception as e:
-                    st.warning(f"Error actualizando lote: {str(e)}")
-                    continue
+            # Un upsert por lote de 50 con solo las columnas de logistics
+            batch_results = escribir_por_id(
+                supabase, updates_to_perform, tamano_lote=50,
+                al_terminar_lote=lambda result, done, total: progress_bar.progress(min(1.0, done / total)),
+                cuentas=cuentas if all(cuentas) else None
+            )
+            total_updated = sum(result['actualizados'] for result in batch_results)
+            
+            for result in [r for r in batch_results if r['error']][:5]:
+                st.warning(f"Error actualizando lote {result['lote']}: {result['error']}")
+            if aviso_por_fila(batch_results):
+                st.warning(aviso_por_fila(batch_results))
             
             progress_bar.progress(1.0)
             
@@ -1310,58 +555,38 @@ def update_aditionals_only(aditionals_df):
         if not aditionals_dict:
             return 0
         
-        aditionals_ids_to_search = list(aditionals_dict.keys())
+        # Buscar registros por lotes (buscar_por_claves o .in_() con todas las variantes del ID)
+        lookup_errors = []
+        found_by_prealert = buscar_por_ids(
+            supabase, 'prealert_id', aditionals_dict.keys(), errores=lookup_errors
+        )
         
-        # Buscar registros específicos por prealert_id
         matching_records = []
-        
-        # Buscar registros específicos por prealert_id (silencioso)
-        # Para cada ID, buscar en múltiples formatos
-        for order_id in aditionals_ids_to_search:
-            # Generar todas las variantes posibles del ID
-            search_variants = [
-                order_id,                    # Como está: 1049072
-                f"{order_id}.0",            # Con .0: 1049072.0
-                f"'{order_id}",             # Con comilla: '1049072
-                f"'{order_id}.0"            # Con comilla y .0: '1049072.0
-            ]
-            
-            found = False
-            for variant in search_variants:
-                try:
-                    result = supabase.table('consolidated_orders').select('id, order_id, prealert_id').eq('prealert_id', variant).limit(1).execute()
-                    if result.data:
-                        matching_records.extend(result.data)
-                        found = True
-                        break
-                except:
-                    pass
-            
-            if not found:
+        for order_id in aditionals_dict:
+            if order_id in found_by_prealert:
+                matching_records.append(found_by_prealert[order_id][0])
+            else:
                 not_found_records.append(f"Order ID: {order_id}")
         
+        for error in lookup_errors[:5]:
+            st.warning(f"⚠️ Error buscando registros: {error}")
+        
         if not matching_records:
             return 0
         
         existing_records = pd.DataFrame(matching_records)
         
+        # Índice variante -> Order Id del archivo para asignar cada registro de BD en O(1)
+        order_id_by_variant = indice_variantes(aditionals_dict.keys())
+        
         updates_to_perform = []
         matched_count = 0
         
-        for _, record in existing_records.iterrows():
+        for record in matching_records:
             prealert_id_raw = record.get('prealert_id', '')
             db_id = record.get('id')
             
-            # Intentar hacer match con múltiples formatos
-            matched_key = None
-            for key in aditionals_dict.keys():
-                # Comparar diferentes formatos
-                if str(prealert_id_raw) == key or \
-                   str(prealert_id_raw).replace('.0', '') == key or \
-                   str(prealert_id_raw).replace("'", '') == key or \
-                   str(prealert_id_raw).replace("'", '').replace('.0', '') == key:
-                    matched_key = key
-                    break
+            matched_key = order_id_by_variant.get(str(prealert_id_raw).strip())
             
             if matched_key:
                 matched_count += 1
@@ -1390,26 +615,21 @@ def update_aditionals_only(aditionals_df):
         
         if updates_to_perform:
             
-            batch_size = 50
-            total_updated = 0
             progress_bar = st.progress(0)
             
-            for i in range(0, len(updates_to_perform), batch_size):
-                batch = updates_to_perform[i:i + batch_size]
-                
-                try:
-                    for update in batch:
-                        record_id = update.pop('id')
-                        clean_update = clean_update_data(update)
-                        supabase.table('consolidated_orders').update(clean_update).eq('id', record_id).execute()
-                        total_updated += 1
-                    
-                    progress = min(1.0, (i + batch_size) / len(updates_to_perform))
-                    progress_bar.progress(progress)
-                    
-                except Exception as e:
-                    st.warning(f"Error actualizando lote: {str(e)}")
-                    continue
+            # Un upsert por lote de 50 con solo las columnas de aditionals
+            payloads = [{'id': update['id'], **clean_update_data({k: v for k, v in update.items() if k != 'id'})}
+                        for update in updates_to_perform]
+            batch_results = escribir_por_id(
+                supabase, payloads, tamano_lote=50,
+                al_terminar_lote=lambda result, done, total: progress_bar.progress(min(1.0, done / total))
+            )
+            total_updated = sum(result['actualizados'] for result in batch_results)
+            
+            for result in [r for r in batch_results if r['error']][:5]:
+                st.warning(f"Error actualizando lote {result['lote']}: {result['error']}")
+            if aviso_por_fila(batch_results):
+                st.warning(aviso_por_fila(batch_results))
             
             progress_bar.progress(1.0)
             
@@ -1482,43 +702,47 @@ def update_cxp_only(cxp_df):
         if ref_values_sample:
             st.write(f"🔍 Ejemplos de ref_number en CXP: {ref_values_sample[:5]}")
         
-        # Obtener TODOS los registros de VEENDELO, FABORCARGO y MEGATIENDA SPA
+        # Cuentas que usan CXP: VEENDELO, FABORCARGO y MEGATIENDA SPA
         cxp_accounts = ['3-VEENDELO', '8-FABORCARGO', '2-MEGATIENDA SPA']
-        
-        # OBTENER TODOS LOS REGISTROS - Cuenta por cuenta para evitar límites
-        st.info("🔍 Obteniendo TODOS los registros de cuentas CXP...")
-        all_records = []
+        cxp_columns = 'id, account_name, serial_number, asignacion, cxp_amt_due'
+        
+        # 1) Registros con asignacion: por asignacion_key (buscar_claves), con la misma
+        #    regla clean_id_aggressive de los Ref # del archivo: encuentra la asignacion
+        #    guardada en cualquier forma
+        st.info("🔍 Buscando por lotes los registros con asignacion del archivo...")
+        lookup_errors = []
+        failed_keys = []
+        all_records = buscar_claves(
+            supabase, 'asignacion', cxp_dict.keys(), cxp_columns,
+            cuentas=cxp_accounts, errores=lookup_errors, claves_fallidas=failed_keys
+        )
+        for error in lookup_errors[:5]:
+            st.warning(f"⚠️ Error buscando registros: {error}")
+        
+        # Sin la función (o si falló algún lote): toda la cuenta, comparando
+        # clean_id_aggressive en ambos lados como siempre
+        full_scan = all_records is None or bool(failed_keys)
+        if full_scan:
+            all_records = []
+            st.info("🔍 Obteniendo todos los registros de las cuentas CXP...")
+        else:
+            st.write(f"   ✅ {len(all_records)} registros encontrados por asignacion")
+            # 2) Registros sin asignacion: se calcula desde account_name + serial_number
+            st.info("🔍 Obteniendo registros de cuentas CXP sin asignacion...")
         
         for account_name in cxp_accounts:
-            st.write(f"   📂 Obteniendo registros de {account_name}...")
-            page_size = 1000
-            current_page = 0
+            # Paginación por id (keyset): toda la cuenta, sin saltar ni repetir registros
             account_records = []
-            
-            while True:
-                offset = current_page * page_size
-                
-                # Query específica por cuenta con paginación
-                result = supabase.table('consolidated_orders').select(
-                    'id, account_name, serial_number, asignacion, cxp_amt_due'
-                ).eq('account_name', account_name).range(offset, offset + page_size - 1).execute()
-                
-                if not result.data or len(result.data) == 0:
-                    break
-                    
-                account_records.extend(result.data)
-                current_page += 1
-                
-                # Si obtenemos menos de 1000, es la última página
-                if len(result.data) < page_size:
-                    break
-                
-                # Límite de seguridad
-                if current_page > 20:  # Máximo 20,000 registros por cuenta
-                    st.warning(f"   ⚠️ Límite de seguridad alcanzado para {account_name}")
-                    break
-            
-            st.write(f"   ✅ {account_name}: {len(account_records)} registros obtenidos")
+            for page in paginar_por_id(
+                supabase, cxp_columns, cuentas=account_name,
+                filtros=None if full_scan else (lambda query: query.or_('asignacion.is.null,asignacion.eq.')),
+                anticipar=True
+            ):
+                account_records.extend(page)
+            
+            if account_records:
+                st.write(f"   ✅ {account_name}: {len(account_records)} registros"
+                         f"{'' if full_scan else ' sin asignacion'}")
             all_records.extend(account_records)
         
         st.success(f"📊 TOTAL REGISTROS OBTENIDOS: {len(all_records)}")
@@ -1536,7 +760,7 @@ def update_cxp_only(cxp_df):
             if pd.notna(cxp_amt) and cxp_amt < 11.2:
                 registros_con_error += 1
         
-        st.info(f"📊 Total registros en BD: {len(existing_records)}")
+        st.info(f"📊 Registros de BD a evaluar: {len(existing_records)}")
         if registros_con_error > 0:
             st.warning(f"⚠️ {registros_con_error} registros tienen cxp_amt_due < 11.2 (valores incorrectos)")
         
@@ -1559,6 +783,7 @@ def update_cxp_only(cxp_df):
         
         # Preparar actualizaciones - SIEMPRE ACTUALIZAR (MODO CORRECCIÓN)
         updates_to_perform = []
+        cuentas = set()  # account_name de los registros corregidos (caché de reportes)
         matched_count = 0
         total_records = len(existing_records)
         
@@ -1614,6 +839,7 @@ def update_cxp_only(cxp_df):
                 # NO actualizar dest_delivery - no existe en la tabla
                 
                 updates_to_perform.append(update_data)
+                cuentas.add(account)
                 
                 if matched_count <= 5:
                     st.write(f"🔄 Corrigiendo {matched_count}: {account} - {asignacion}")
@@ -1624,7 +850,7 @@ def update_cxp_only(cxp_df):
         # MOSTRAR ESTADÍSTICAS DE MATCHING
         st.info(f"📊 **Estadísticas de Matching:**")
         st.write(f"• Total registros en CXP: {len(cxp_dict)}")
-        st.write(f"• Total registros en BD: {total_records}")
+        st.write(f"• Registros de BD evaluados: {total_records}")
         st.write(f"• **Matches encontrados: {matched_count}**")
         
         if matched_count > 0:
@@ -1636,63 +862,45 @@ def update_cxp_only(cxp_df):
             st.success(f"🔄 **FORZANDO ACTUALIZACIÓN** de {len(updates_to_perform)} registros con valores corregidos")
             
             batch_size = 25  # Lotes más pequeños para mayor confiabilidad
-            total_updated = 0
             progress_bar = st.progress(0)
+            
+            payloads = [{'id': update['id'], **clean_update_data({k: v for k, v in update.items() if k != 'id'})}
+                        for update in updates_to_perform]
+            
+            def on_batch_done(result, done, total):
+                progress_bar.progress(min(1.0, done / total))
+                # Mostrar progreso en tiempo real
+                if (result['lote'] - 1) % 2 == 0:
+                    st.write(f"⏳ Procesando lote {result['lote']}... ({done} procesados)")
+            
+            # Un upsert por lote con solo las columnas CXP (FORZAR LA ACTUALIZACIÓN)
+            batch_results = escribir_por_id(supabase, payloads, tamano_lote=batch_size, al_terminar_lote=on_batch_done,
+                                            cuentas=cuentas if all(cuentas) else None)
+            
+            total_updated = 0
             errors_count = 0
             success_details = []
             
-            for i in range(0, len(updates_to_perform), batch_size):
-                batch = updates_to_perform[i:i + batch_size]
-                
-                try:
-                    for update in batch:
-                        try:
-                            # Hacer copia para no modificar el original
-                            update_copy = update.copy()
-                            record_id = update_copy.pop('id')
-                            
-                            # Limpiar datos antes de enviar
-                            clean_update = clean_update_data(update_copy)
-                            
-                            # Verificar que tenemos datos válidos para actualizar
-                            if not clean_update or len(clean_update) == 0:
-                                continue
-                            
-                            # FORZAR LA ACTUALIZACIÓN - Incluir todos los campos
-                            result = supabase.table('consolidated_orders').update(clean_update).eq('id', record_id).execute()
-                            
-                            if result.data and len(result.data) > 0:
-                                total_updated += 1
-                                success_details.append({
-                                    'id': record_id,
-                                    'asignacion': update.get('asignacion'),
-                                    'cxp_amt_due': clean_update.get('cxp_amt_due'),
-                                    'dest_delivery': clean_update.get('dest_delivery'),
-                                    'declare_value': clean_update.get('declare_value')
-                                })
-                            else:
-                                errors_count += 1
-                                if errors_count <= 5:
-                                    st.warning(f"⚠️ No se actualizó registro ID {record_id}: respuesta vacía")
-                                
-                        except Exception as individual_error:
-                            errors_count += 1
-                            if errors_count <= 5:
-                                st.error(f"❌ Error actualizando ID {record_id}: {str(individual_error)}")
-                            continue
-                    
-                    progress = min(1.0, (i + batch_size) / len(updates_to_perform))
-                    progress_bar.progress(progress)
-                    
-                    # Mostrar progreso en tiempo real
-                    if i % 50 == 0:
-                        st.write(f"⏳ Procesando lote {i//batch_size + 1}... ({total_updated} actualizados)")
-                    
-                except Exception as e:
-                    st.warning(f"Error actualizando lote: {str(e)}")
-                    continue
+            for result in batch_results:
+                total_updated += result['actualizados']
+                failed = result['registros'] - result['actualizados']
+                if failed > 0:
+                    errors_count += failed
+                    if errors_count - failed < 5:
+                        st.error(f"❌ Error actualizando lote {result['lote']}: {result['error'] or 'respuesta vacía'}")
+                elif len(success_details) < 5:
+                    for payload in payloads[result['inicio']:result['inicio'] + result['registros']]:
+                        success_details.append({
+                            'id': payload['id'],
+                            'asignacion': payload.get('asignacion'),
+                            'cxp_amt_due': payload.get('cxp_amt_due'),
+                            'dest_delivery': payload.get('dest_delivery'),
+                            'declare_value': payload.get('declare_value')
+                        })
             
             progress_bar.progress(1.0)
+            if aviso_por_fila(batch_results):
+                st.warning(aviso_por_fila(batch_results))
             
             # MOSTRAR RESULTADOS DETALLADOS
             if total_updated > 0:
@@ -1749,6 +957,19 @@ def update_cxp_only(cxp_df):
         st.exception(e)
         return 0
 
+def process_drapify_streaming(drapify_file, logistics_df=None, aditionals_df=None, cxp_df=None, logistics_date=None):
+    """Consolida y guarda Drapify bloque por bloque (modulos/consolidar.py)"""
+    totals = consolidar.process_drapify_streaming(
+        supabase, drapify_file, logistics_df, aditionals_df, cxp_df, logistics_date, ReporteStreamlit()
+    )
+    
+    # Log de actividad
+    if AUTH_AVAILABLE and totals['inserted'] > 0:
+        log_activity("process_data", f"Consolidación completa procesada: {totals['inserted']} registros insertados", 
+                   "consolidation", None, totals['inserted'])
+    
+    return totals
+
 # =====================================================
 # INTERFAZ PRINCIPAL
 # =====================================================
@@ -1818,7 +1039,15 @@ def main():
         st.markdown("• Agrega nuevos registros")
         st.markdown("• Preserva datos históricos")
         st.markdown("• Sin pérdida de información")
-    
+
+        st.markdown("---")
+        st.checkbox(
+            "🌊 Modo streaming (archivos grandes)",
+            key="streaming_mode",
+            help=f"Procesa Drapify en bloques de {TAMANO_BLOQUE:,} registros para limitar el uso de memoria. "
+                 f"Se activa automáticamente con archivos de {STREAMING_THRESHOLD_MB} MB o más."
+        )
+
     # Área principal
     col1, col2 = st.columns([2, 1])
     
@@ -1911,22 +1140,34 @@ def main():
                     # MODO 1: Consolidación completa con Drapify como base
                     st.info("📊 Modo: Consolidación completa con archivo base Drapify")
                     
-                    # Leer archivo Drapify
-                    if drapify_file.name.endswith('.csv'):
-                        drapify_df = pd.read_csv(drapify_file)
+                    use_streaming = (
+                        st.session_state.get('streaming_mode', False)
+                        or drapify_file.size >= STREAMING_THRESHOLD_MB * 1024 * 1024
+                    )
+
+                    # Leer archivo Drapify (en modo streaming se lee por bloques al guardar)
+                    drapify_df = None
+                    if use_streaming:
+                        st.info(f"🌊 Modo streaming: Drapify se procesará en bloques de {TAMANO_BLOQUE:,} registros")
                     else:
-                        drapify_df = pd.read_excel(drapify_file)
-                    st.success(f"✅ Drapify cargado: {len(drapify_df)} registros")
-                    
-                    # Log de actividad
-                    if AUTH_AVAILABLE:
-                        log_activity("upload_file", f"Archivo Drapify procesado", 
-                                   "drapify", drapify_file.name, len(drapify_df))
-                    
+                        if drapify_file.name.endswith('.csv'):
+                            drapify_df = pd.read_csv(drapify_file)
+                        else:
+                            drapify_df = pd.read_excel(drapify_file)
+                        st.success(f"✅ Drapify cargado: {len(drapify_df)} registros")
+
+                        # Log de actividad
+                        if AUTH_AVAILABLE:
+                            log_activity("upload_file", f"Archivo Drapify procesado",
+                                       "drapify", drapify_file.name, len(drapify_df))
+
                     # Leer otros archivos si están disponibles
+                    # En modo streaming solo se cargan las columnas que usan los cruces
                     logistics_df = None
                     if logistics_file:
-                        if logistics_file.name.endswith('.csv'):
+                        if use_streaming:
+                            logistics_df = leer_completo(logistics_file, columnas=LOGISTICS_COLUMNS)
+                        elif logistics_file.name.endswith('.csv'):
                             logistics_df = pd.read_csv(logistics_file)
                         else:
                             logistics_df = pd.read_excel(logistics_file)
@@ -1939,7 +1180,9 @@ def main():
                     
                     aditionals_df = None
                     if aditionals_file:
-                        if aditionals_file.name.endswith('.csv'):
+                        if use_streaming:
+                            aditionals_df = leer_completo(aditionals_file, columnas=ADITIONALS_COLUMNS)
+                        elif aditionals_file.name.endswith('.csv'):
                             aditionals_df = pd.read_csv(aditionals_file)
                         else:
                             aditionals_df = pd.read_excel(aditionals_file)
@@ -1965,89 +1208,100 @@ def main():
                     
                     # Procesar consolidación completa
                     logistics_date = st.session_state.get('logistics_date') if logistics_file else None
-                    consolidated_df = process_files_according_to_rules(
-                        drapify_df, logistics_df, aditionals_df, cxp_df, logistics_date
-                    )
+                    
+                    if use_streaming:
+                        # Cruces y guardado por bloques
+                        st.header("💾 Guardando en Base de Datos")
+                        
+                        with st.spinner("Procesando bloques en Supabase..."):
+                            totals = process_drapify_streaming(
+                                drapify_file, logistics_df, aditionals_df, cxp_df, logistics_date
+                            )
+                        
+                        total_processed = totals['processed']
+                        inserted_count, updated_count = totals['inserted'], totals['updated']
+                        logistics_matched = totals['logistics_matched']
+                        aditionals_matched = totals['aditionals_matched']
+                        cxp_matched = totals['cxp_matched']
+                        
+                        # Log de actividad
+                        if AUTH_AVAILABLE:
+                            log_activity("upload_file", f"Archivo Drapify procesado por bloques",
+                                       "drapify", drapify_file.name, total_processed)
+                    else:
+                        consolidated_df = process_files_according_to_rules(
+                            drapify_df, logistics_df, aditionals_df, cxp_df, logistics_date
+                        )
+                        total_processed = len(consolidated_df)
+                        logistics_matched = count_matched(consolidated_df, 'logistics_')
+                        aditionals_matched = count_matched(consolidated_df, 'aditionals_')
+                        cxp_matched = count_matched(consolidated_df, 'cxp_')
                     
                     # Mostrar estadísticas detalladas
                     col1, col2, col3, col4 = st.columns(4)
                     
                     with col1:
-                        st.metric("Total Registros", len(consolidated_df))
+                        st.metric("Total Registros", total_processed)
                     
                     with col2:
-                        logistics_matched = 0
-                        if any(col.startswith('logistics_') for col in consolidated_df.columns):
-                            logistics_cols = [col for col in consolidated_df.columns if col.startswith('logistics_')]
-                            if logistics_cols:
-                                logistics_matched = consolidated_df[logistics_cols[0]].notna().sum()
                         st.metric("Logistics Matched", logistics_matched)
                     
                     with col3:
-                        aditionals_matched = 0
-                        if any(col.startswith('aditionals_') for col in consolidated_df.columns):
-                            aditionals_cols = [col for col in consolidated_df.columns if col.startswith('aditionals_')]
-                            if aditionals_cols:
-                                aditionals_matched = consolidated_df[aditionals_cols[0]].notna().sum()
                         st.metric("Aditionals Matched", aditionals_matched)
                     
                     with col4:
-                        cxp_matched = 0
-                        if any(col.startswith('cxp_') for col in consolidated_df.columns):
-                            cxp_cols = [col for col in consolidated_df.columns if col.startswith('cxp_')]
-                            if cxp_cols:
-                                cxp_matched = consolidated_df[cxp_cols[0]].notna().sum()
                         st.metric("CXP Matched", cxp_matched)
                     
-                    # Guardar en base de datos
-                    st.header("💾 Guardando en Base de Datos")
+                    if not use_streaming:
+                        # Guardar en base de datos
+                        st.header("💾 Guardando en Base de Datos")
+                        
+                        with st.spinner("Procesando registros en Supabase..."):
+                            filename = drapify_file.name
+                            inserted_count, updated_count = insert_or_update_to_supabase(
+                                consolidated_df, filename, logistics_matched, aditionals_matched, cxp_matched
+                            )
                     
-                    with st.spinner("Procesando registros en Supabase..."):
-                        filename = drapify_file.name
-                        inserted_count, updated_count = insert_or_update_to_supabase(
-                            consolidated_df, filename, logistics_matched, aditionals_matched, cxp_matched
-                        )
+                    if inserted_count > 0 or updated_count > 0:
+                        st.success(f"🎉 ¡Procesamiento completado!")
+                        
+                        # Resumen general
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            st.success(f"📊 {total_processed} procesados")
+                        with col2:
+                            st.success(f"➕ {inserted_count} nuevos")
+                        with col3:
+                            st.success(f"🔄 {updated_count} actualizados")
+                        
+                        # Detalle por archivo
+                        st.info("📋 **Detalle del procesamiento:**")
                         
-                        if inserted_count > 0 or updated_count > 0:
-                            st.success(f"🎉 ¡Procesamiento completado!")
+                        if inserted_count > 0:
+                            st.write(f"• **Drapify**: {inserted_count} registros nuevos agregados")
+                        
+                        if updated_count > 0:
+                            update_details = []
                             
-                            # Resumen general
-                            col1, col2, col3 = st.columns(3)
-                            with col1:
-                                st.success(f"📊 {len(consolidated_df)} procesados")
-                            with col2:
-                                st.success(f"➕ {inserted_count} nuevos")
-                            with col3:
-                                st.success(f"🔄 {updated_count} actualizados")
+                            if logistics_file and logistics_matched > 0:
+                                update_details.append(f"• **Logistics**: {logistics_matched} registros actualizados")
                             
-                            # Detalle por archivo
-                            st.info("📋 **Detalle del procesamiento:**")
+                            if aditionals_file and aditionals_matched > 0:
+                                update_details.append(f"• **Aditionals**: {aditionals_matched} registros actualizados")
                             
-                            if inserted_count > 0:
-                                st.write(f"• **Drapify**: {inserted_count} registros nuevos agregados")
+                            if cxp_file and cxp_matched > 0:
+                                update_details.append(f"• **CXP**: {cxp_matched} registros actualizados")
                             
-                            if updated_count > 0:
-                                update_details = []
-                                
-                                if logistics_file and logistics_matched > 0:
-                                    update_details.append(f"• **Logistics**: {logistics_matched} registros actualizados")
-                                
-                                if aditionals_file and aditionals_matched > 0:
-                                    update_details.append(f"• **Aditionals**: {aditionals_matched} registros actualizados")
-                                
-                                if cxp_file and cxp_matched > 0:
-                                    update_details.append(f"• **CXP**: {cxp_matched} registros actualizados")
-                                
-                                if not update_details and updated_count > 0:
-                                    update_details.append(f"• **Base de datos**: {updated_count} registros actualizados")
-                                
-                                for detail in update_details:
-                                    st.write(detail)
+                            if not update_details and updated_count > 0:
+                                update_details.append(f"• **Base de datos**: {updated_count} registros actualizados")
                             
-                            st.balloons()
-                        else:
-                            st.warning("⚠️ No se realizaron cambios en la base de datos")
-                            st.info("Posibles razones: todos los registros ya existen con la misma información")
+                            for detail in update_details:
+                                st.write(detail)
+                        
+                        st.balloons()
+                    else:
+                        st.warning("⚠️ No se realizaron cambios en la base de datos")
+                        st.info("Posibles razones: todos los registros ya existen con la misma información")
                 
                 else:
                     # MODO 2: Actualización parcial sin Drapify
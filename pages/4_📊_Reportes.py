@@ -13,6 +13,8 @@ import calendar
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, parent_dir)
 
+from modulos.exportar import descartar_archivos
+
 # Page config
 st.set_page_config(
     page_title="📊 Reportes",
@@ -119,8 +121,15 @@ with col_boton:
 
 st.markdown("---")
 
-# Área de reporte usando todo el ancho
+# Recordar el reporte generado: los controles dentro del reporte (p. ej. cargar
+# el detalle) vuelven a ejecutar la página y no deben borrarlo
+seleccion = (reporte_seleccionado, fecha_inicio, fecha_fin)
 if generar_btn:
+    st.session_state['reporte_generado'] = seleccion
+    descartar_archivos()  # los archivos preparados eran de la generación anterior
+
+# Área de reporte usando todo el ancho
+if st.session_state.get('reporte_generado') == seleccion:
     # Cargar el módulo del reporte seleccionado
     modulo_nombre = REPORTES[reporte_seleccionado]
     
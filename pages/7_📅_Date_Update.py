@@ -6,7 +6,6 @@ Hace match por prealert_id o order_id según disponibilidad
 
 import pandas as pd
 import streamlit as st
-from supabase import create_client
 import sys
 import os
 from datetime import datetime
@@ -15,18 +14,16 @@ from datetime import datetime
 parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, parent_dir)
 
-import config
+from modulos.cache_reportes import invalidar_reportes
+from modulos.lotes_bd import ejecutar_lotes, reintentar
+from modulos.cliente_bd import obtener_cliente
 
 def main():
     st.set_page_config(page_title="Actualizar Logistics Date", layout="wide")
     st.title("📅 Actualizar Logistics Date desde Excel")
     
     # Conectar a Supabase
-    @st.cache_resource
-    def init_supabase():
-        return create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
-    
-    supabase = init_supabase()
+    supabase = obtener_cliente()
     
     st.info("""
     📋 **Instrucciones:**
@@ -192,106 +189,112 @@ def main():
                 total_registros = len(registros_a_procesar)
                 lotes = [registros_a_procesar[i:i + batch_size] for i in range(0, total_registros, batch_size)]
                 
-                for lote_idx, lote in enumerate(lotes):
-                    try:
-                        # Extraer todos los IDs del lote (incluyendo formatos alternativos)
-                        prealert_ids = []
-                        order_ids = []
-                        
-                        for r in lote:
-                            if r['prealert_id']:
-                                prealert_ids.append(r['prealert_id'])
-                            if r['prealert_id_alt']:
-                                prealert_ids.append(r['prealert_id_alt'])
-                            if r['order_id']:
-                                order_ids.append(r['order_id'])
-                            if r['order_id_alt']:
-                                order_ids.append(r['order_id_alt'])
+                def procesar_lote(lote):
+                    """Busca los IDs del lote y actualiza logistics_date; retorna [(registro, metodo)]"""
+                    # Extraer todos los IDs del lote (incluyendo formatos alternativos)
+                    prealert_ids = []
+                    order_ids = []
+                    
+                    for r in lote:
+                        if r['prealert_id']:
+                            prealert_ids.append(r['prealert_id'])
+                        if r['prealert_id_alt']:
+                            prealert_ids.append(r['prealert_id_alt'])
+                        if r['order_id']:
+                            order_ids.append(r['order_id'])
+                        if r['order_id_alt']:
+                            order_ids.append(r['order_id_alt'])
+                    
+                    # Eliminar duplicados
+                    prealert_ids = list(set(prealert_ids))
+                    order_ids = list(set(order_ids))
+                    
+                    # Consultar registros existentes en una sola query por lote
+                    # (con sus cuentas, para la caché de reportes)
+                    registros_existentes = {}
+                    
+                    # Buscar por prealert_id si hay
+                    if prealert_ids:
+                        result = supabase.table('consolidated_orders').select('id, prealert_id, account_name').in_('prealert_id', prealert_ids).execute()
+                        for record in result.data:
+                            registros_existentes.setdefault(f"prealert_{record['prealert_id']}", set()).add(record['account_name'])
+                    
+                    # Buscar por order_id si hay (solo para los que no se encontraron por prealert)
+                    if order_ids:
+                        result = supabase.table('consolidated_orders').select('id, order_id, account_name').in_('order_id', order_ids).execute()
+                        for record in result.data:
+                            registros_existentes.setdefault(f"order_{record['order_id']}", set()).add(record['account_name'])
+                    
+                    # Procesar cada registro del lote
+                    resultados_lote = []
+                    for registro in lote:
+                        metodo = None
                         
-                        # Eliminar duplicados
-                        prealert_ids = list(set(prealert_ids))
-                        order_ids = list(set(order_ids))
+                        # Buscar si existe por prealert_id primero (probar ambos formatos)
+                        prealert_usado = None
+                        if registro['prealert_id']:
+                            if f"prealert_{registro['prealert_id']}" in registros_existentes:
+                                prealert_usado = registro['prealert_id']
+                            elif registro['prealert_id_alt'] and f"prealert_{registro['prealert_id_alt']}" in registros_existentes:
+                                prealert_usado = registro['prealert_id_alt']
                         
-                        # Consultar registros existentes en una sola query por lote
-                        registros_existentes = {}
+                        if prealert_usado:
+                            if not modo_test:
+                                # Actualizar usando el prealert_id que funcionó
+                                reintentar(lambda: supabase.table('consolidated_orders').update({
+                                    'logistics_date': registro['logistics_date']
+                                }).eq('prealert_id', prealert_usado).execute())
+                            metodo = 'Prealert ID'
+                            registro['cuentas'] = registros_existentes[f"prealert_{prealert_usado}"]
                         
-                        # Buscar por prealert_id si hay
-                        if prealert_ids:
-                            if modo_test:
-                                result = supabase.table('consolidated_orders').select('id, prealert_id').in_('prealert_id', prealert_ids).execute()
-                            else:
-                                result = supabase.table('consolidated_orders').select('id, prealert_id').in_('prealert_id', prealert_ids).execute()
-                            
-                            for record in result.data:
-                                registros_existentes[f"prealert_{record['prealert_id']}"] = record['id']
+                        # Si no se encontró por prealert, buscar por order_id
+                        order_usado = None
+                        if not metodo and registro['order_id']:
+                            if f"order_{registro['order_id']}" in registros_existentes:
+                                order_usado = registro['order_id']
+                            elif registro['order_id_alt'] and f"order_{registro['order_id_alt']}" in registros_existentes:
+                                order_usado = registro['order_id_alt']
                         
-                        # Buscar por order_id si hay (solo para los que no se encontraron por prealert)
-                        if order_ids:
-                            if modo_test:
-                                result = supabase.table('consolidated_orders').select('id, order_id').in_('order_id', order_ids).execute()
-                            else:
-                                result = supabase.table('consolidated_orders').select('id, order_id').in_('order_id', order_ids).execute()
-                            
-                            for record in result.data:
-                                registros_existentes[f"order_{record['order_id']}"] = record['id']
+                        if order_usado:
+                            if not modo_test:
+                                # Actualizar usando el order_id que funcionó
+                                reintentar(lambda: supabase.table('consolidated_orders').update({
+                                    'logistics_date': registro['logistics_date']
+                                }).eq('order_id', order_usado).execute())
+                            metodo = 'Order ID'
+                            registro['cuentas'] = registros_existentes[f"order_{order_usado}"]
                         
-                        # Procesar cada registro del lote
+                        resultados_lote.append((registro, metodo))
+                    
+                    return resultados_lote
+                
+                def al_terminar_lote(resultado, terminados, total):
+                    nonlocal actualizados_por_prealert, actualizados_por_order
+                    lote = lotes[resultado['lote'] - 1]
+                    
+                    if resultado['error']:
+                        # Agregar error para todo el lote
                         for registro in lote:
-                            actualizado = False
-                            metodo = 'N/A'
-                            prealert_usado = None
-                            order_usado = None
-                            
-                            # Buscar si existe por prealert_id primero (probar ambos formatos)
-                            if registro['prealert_id']:
-                                # Probar formato original
-                                key = f"prealert_{registro['prealert_id']}"
-                                if key in registros_existentes:
-                                    prealert_usado = registro['prealert_id']
-                                    actualizado = True
-                                # Probar formato alternativo con .0
-                                elif registro['prealert_id_alt']:
-                                    key_alt = f"prealert_{registro['prealert_id_alt']}"
-                                    if key_alt in registros_existentes:
-                                        prealert_usado = registro['prealert_id_alt']
-                                        actualizado = True
-                                
-                                if actualizado:
-                                    if not modo_test:
-                                        # Actualizar usando el prealert_id que funcionó
-                                        supabase.table('consolidated_orders').update({
-                                            'logistics_date': registro['logistics_date']
-                                        }).eq('prealert_id', prealert_usado).execute()
-                                    
+                            errores.append({
+                                'order_id': registro['order_id'],
+                                'prealert_id': registro['prealert_id'],
+                                'error': resultado['error']
+                            })
+                            log_detalle.append({
+                                'fila': registro['fila'],
+                                'order_id': registro['order_id'],
+                                'prealert_id': registro['prealert_id'],
+                                'resultado': f"❌ Error: {resultado['error']}",
+                                'metodo': 'N/A'
+                            })
+                    else:
+                        for registro, metodo in resultado['resultado']:
+                            # Agregar al log
+                            if metodo:
+                                if metodo == 'Prealert ID':
                                     actualizados_por_prealert += 1
-                                    metodo = 'Prealert ID'
-                            
-                            # Si no se encontró por prealert, buscar por order_id
-                            if not actualizado and registro['order_id']:
-                                # Probar formato original
-                                key = f"order_{registro['order_id']}"
-                                if key in registros_existentes:
-                                    order_usado = registro['order_id']
-                                    actualizado = True
-                                # Probar formato alternativo con comilla
-                                elif registro['order_id_alt']:
-                                    key_alt = f"order_{registro['order_id_alt']}"
-                                    if key_alt in registros_existentes:
-                                        order_usado = registro['order_id_alt']
-                                        actualizado = True
-                                
-                                if actualizado:
-                                    if not modo_test:
-                                        # Actualizar usando el order_id que funcionó
-                                        supabase.table('consolidated_orders').update({
-                                            'logistics_date': registro['logistics_date']
-                                        }).eq('order_id', order_usado).execute()
-                                    
+                                else:
                                     actualizados_por_order += 1
-                                    metodo = 'Order ID'
-                            
-                            # Agregar al log
-                            if actualizado:
                                 log_detalle.append({
                                     'fila': registro['fila'],
                                     'order_id': registro['order_id'],
@@ -312,27 +315,19 @@ def main():
                                     'resultado': '❌ No encontrado',
                                     'metodo': 'N/A'
                                 })
-                        
-                        # Actualizar progreso por lote
-                        progress = (lote_idx + 1) / len(lotes)
-                        progress_bar.progress(progress)
-                        status_text.text(f"Lote {lote_idx + 1}/{len(lotes)} | Prealert: {actualizados_por_prealert} | Order: {actualizados_por_order} | No encontrados: {len(no_encontrados)}")
-                        
-                    except Exception as e:
-                        # Agregar error para todo el lote
-                        for registro in lote:
-                            errores.append({
-                                'order_id': registro['order_id'],
-                                'prealert_id': registro['prealert_id'],
-                                'error': str(e)
-                            })
-                            log_detalle.append({
-                                'fila': registro['fila'],
-                                'order_id': registro['order_id'],
-                                'prealert_id': registro['prealert_id'],
-                                'resultado': f'❌ Error: {str(e)}',
-                                'metodo': 'N/A'
-                            })
+                    
+                    # Actualizar progreso por lote
+                    progress_bar.progress(terminados / total)
+                    status_text.text(f"Lote {terminados}/{total} | Prealert: {actualizados_por_prealert} | Order: {actualizados_por_order} | No encontrados: {len(no_encontrados)}")
+                
+                # Lotes en paralelo con reintentos ante errores transitorios
+                ejecutar_lotes(procesar_lote, lotes, al_terminar_lote=al_terminar_lote)
+                log_detalle.sort(key=lambda entrada: entrada['fila'])
+                
+                # Las fechas cambiaron: los reportes en caché de esas cuentas ya no sirven
+                if not modo_test and (actualizados_por_prealert or actualizados_por_order):
+                    cuentas = {cuenta for registro in registros_a_procesar for cuenta in registro.get('cuentas', ())}
+                    invalidar_reportes(supabase, cuentas if all(cuentas) else None)
                 
                 # Mostrar resultados
                 st.markdown("---")
@@ -1,8 +1,17 @@
 import streamlit as st
 import pandas as pd
-from supabase import create_client, Client
+from supabase import Client
 from datetime import datetime
 import io
+import os
+import sys
+
+# Agregar la carpeta raíz al path para importar módulos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modulos.cache_reportes import invalidar_reportes
+from modulos.cliente_bd import obtener_cliente
+from modulos.lotes_bd import ejecutar_lotes, reintentar
 
 # ====================================
 # CREDENCIALES DE SUPABASE (YA CONFIGURADAS)
@@ -32,7 +41,7 @@ connection_status = st.sidebar.empty()
 
 if SUPABASE_URL and SUPABASE_KEY:
     try:
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        supabase: Client = obtener_cliente(SUPABASE_URL, SUPABASE_KEY)
         connection_status.success("✅ Conectado a Supabase")
         st.sidebar.info(f"📊 Tabla: {TABLE_NAME}")
     except Exception as e:
@@ -206,36 +215,50 @@ if df_valid is not None and supabase is not None:
                 error_count = 0
                 errors = []
                 
-                # Procesar en lotes
-                total_batches = (len(df_valid) + batch_size - 1) // batch_size
+                # Procesar en lotes (en paralelo, con reintentos ante errores transitorios)
+                batches = [df_valid.iloc[i:i+batch_size] for i in range(0, len(df_valid), batch_size)]
                 
-                for i in range(0, len(df_valid), batch_size):
-                    batch = df_valid.iloc[i:i+batch_size]
-                    batch_num = (i // batch_size) + 1
-                    
-                    status_text.text(f"Procesando lote {batch_num}/{total_batches}...")
-                    
+                def process_batch(batch):
+                    """Actualiza cada fila del lote; retorna (exitos, errores del lote)"""
+                    batch_success = 0
+                    batch_errors = []
                     for _, row in batch.iterrows():
                         try:
                             # IMPORTANTE: Usar el nombre correcto de la tabla
-                            response = supabase.table(TABLE_NAME).update({
+                            response = reintentar(lambda: supabase.table(TABLE_NAME).update({
                                 'logistics_date': row['formatted_date']
-                            }).eq('order_id', row['order_reference']).execute()
+                            }).eq('order_id', row['order_reference']).execute())
                             
                             if response.data:
-                                success_count += 1
+                                batch_success += 1
                             else:
-                                error_count += 1
-                                if len(errors) <= 10:
-                                    errors.append(f"Order {row['order_reference']}: No se encontró")
+                                batch_errors.append(f"Order {row['order_reference']}: No se encontró")
                         except Exception as e:
-                            error_count += 1
-                            if len(errors) <= 10:
-                                errors.append(f"Order {row['order_reference']}: {str(e)}")
-                    
-                    # Actualizar progreso
-                    progress = min((i + batch_size) / len(df_valid), 1.0)
-                    progress_bar.progress(progress)
+                            batch_errors.append(f"Order {row['order_reference']}: {str(e)}")
+                    return batch_success, batch_errors
+                
+                def on_batch_done(result, done, total):
+                    status_text.text(f"Procesando lote {done}/{total}...")
+                    progress_bar.progress(min(done / total, 1.0))
+                
+                batch_results = ejecutar_lotes(process_batch, batches, al_terminar_lote=on_batch_done)
+                
+                for batch, result in zip(batches, batch_results):
+                    if result['error']:
+                        error_count += len(batch)
+                        if len(errors) <= 10:
+                            errors.append(f"Lote {result['lote']}: {result['error']}")
+                        continue
+                    batch_success, batch_errors = result['resultado']
+                    success_count += batch_success
+                    error_count += len(batch_errors)
+                    for error in batch_errors:
+                        if len(errors) <= 10:
+                            errors.append(error)
+                
+                # Las fechas cambiaron: los reportes en caché ya no sirven
+                if success_count:
+                    invalidar_reportes(supabase)
                 
                 # Mostrar resultados
                 status_text.empty()
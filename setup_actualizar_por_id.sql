@@ -0,0 +1,68 @@
+-- Actualización masiva por id (modulos/lotes_bd.py: escribir_por_id)
+-- Las actualizaciones parciales (solo las columnas de logistics, aditionals o
+-- CXP) se enviaban como upsert(on_conflict='id'). Un upsert es un INSERT ...
+-- ON CONFLICT: PostgreSQL revisa las restricciones NOT NULL de la fila
+-- completa antes de ver el conflicto, así que un lote con columnas faltantes
+-- fallaba y se escribía registro por registro (un request por registro).
+-- actualizar_por_id() recibe el lote como un arreglo JSON y lo aplica con un
+-- solo UPDATE ... FROM: no inserta filas y cada columna cambia solo en los
+-- registros que la traen.
+--
+--   filas: [{"id": 1, "logistics_date": "2025-08-01", ...}, ...]
+--   retorna la cantidad de registros actualizados
+--
+-- Los valores se convierten al tipo de cada columna con jsonb_populate_record
+-- (como PostgREST). Columnas desconocidas o generadas (fecha_reporte) dan error.
+
+CREATE OR REPLACE FUNCTION actualizar_por_id(filas JSONB) RETURNS INTEGER AS $$
+DECLARE
+    columnas TEXT[];
+    desconocidas TEXT[];
+    asignaciones TEXT;
+    actualizados INTEGER;
+BEGIN
+    SELECT array_agg(DISTINCT clave) INTO columnas
+    FROM jsonb_array_elements(filas) AS fila, jsonb_object_keys(fila) AS clave
+    WHERE clave <> 'id';
+    IF columnas IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    -- Solo columnas que existen en consolidated_orders y se pueden escribir
+    SELECT array_agg(nombre) INTO desconocidas
+    FROM unnest(columnas) AS nombre
+    WHERE nombre NOT IN (SELECT attname FROM pg_attribute
+                         WHERE attrelid = 'consolidated_orders'::regclass
+                           AND attnum > 0 AND NOT attisdropped AND attgenerated = '');
+    IF desconocidas IS NOT NULL THEN
+        RAISE EXCEPTION 'Columnas desconocidas o generadas en consolidated_orders: %', desconocidas;
+    END IF;
+
+    -- Un registro sin la columna conserva su valor
+    SELECT string_agg(format('%1$I = CASE WHEN f.fila ? %2$L THEN (f.datos).%1$I ELSE t.%1$I END',
+                             nombre, nombre), ', ')
+    INTO asignaciones
+    FROM unnest(columnas) AS nombre;
+
+    -- MATERIALIZED: jsonb_populate_record una vez por registro, no una por columna
+    EXECUTE format(
+        'WITH f AS MATERIALIZED (
+             SELECT fila, jsonb_populate_record(NULL::consolidated_orders, fila) AS datos
+             FROM jsonb_array_elements($1) AS fila
+         )
+         UPDATE consolidated_orders AS t SET %s
+         FROM f
+         WHERE t.id = (f.datos).id',
+        asignaciones)
+    USING filas;
+
+    GET DIAGNOSTICS actualizados = ROW_COUNT;
+    RETURN actualizados;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Que PostgREST vea la función sin esperar a que recargue el esquema
+NOTIFY pgrst, 'reload schema';
+
+-- Verificar: un lote vacío no actualiza nada (debe devolver 0)
+SELECT actualizar_por_id('[]'::jsonb);
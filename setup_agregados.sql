@@ -0,0 +1,188 @@
+-- Agregados diarios del Reporte Global (modulos/agregados.py)
+-- Una fila por cuenta y día con las sumas del reporte: el resumen de un mes
+-- son unos cientos de filas en vez de todas las órdenes.
+-- agregados_meses dice qué meses de cada cuenta ya están calculados y con qué
+-- TRM; si falta el mes o cambiaron las TRM, la app lo calcula completo desde
+-- consolidated_orders.
+-- agregados_pendientes: días (cuenta, fecha de reporte) que cambiaron desde
+-- que se calcularon. Los marca un trigger por sentencia sobre
+-- consolidated_orders con la fecha de cada fila antes y después del cambio
+-- (cualquier escritura: app, scripts, SQL Editor); la app recalcula solo esos
+-- días al consultar el período y los desmarca.
+-- Las tablas tienen RLS: con la clave anon solo se pueden leer. La app toma
+-- los días pendientes y guarda lo recalculado con funciones SECURITY DEFINER
+-- (corren con los permisos de su dueño); el trigger también es SECURITY DEFINER.
+-- Requiere setup_fecha_reporte.sql (fecha_reporte_de).
+
+CREATE TABLE IF NOT EXISTS agregados_diarios (
+    id BIGSERIAL PRIMARY KEY,
+    account_name TEXT NOT NULL,
+    fecha DATE NOT NULL,
+    registros INTEGER NOT NULL DEFAULT 0,
+    ordenes INTEGER NOT NULL DEFAULT 0,
+    aprobadas INTEGER NOT NULL DEFAULT 0,
+    reembolsadas INTEGER NOT NULL DEFAULT 0,
+    amazon DOUBLE PRECISION NOT NULL DEFAULT 0,
+    meli_usd DOUBLE PRECISION NOT NULL DEFAULT 0,
+    utilidad_gss DOUBLE PRECISION NOT NULL DEFAULT 0,
+    bodegal DOUBLE PRECISION NOT NULL DEFAULT 0,
+    socio_cuenta DOUBLE PRECISION NOT NULL DEFAULT 0,
+    impuesto_facturacion DOUBLE PRECISION NOT NULL DEFAULT 0,
+    UNIQUE (account_name, fecha)
+);
+
+CREATE INDEX IF NOT EXISTS idx_agregados_diarios_fecha ON agregados_diarios (fecha);
+
+CREATE TABLE IF NOT EXISTS agregados_meses (
+    account_name TEXT NOT NULL,
+    mes DATE NOT NULL,
+    trm TEXT NOT NULL,
+    actualizado TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (account_name, mes)
+);
+
+-- Instalaciones anteriores: los meses se validaban con versiones_datos.
+-- Sin días marcados desde entonces, se vuelven a calcular al consultarlos.
+DO $$
+BEGIN
+    IF to_regclass('agregados_pendientes') IS NULL THEN
+        DELETE FROM agregados_meses;
+    END IF;
+END $$;
+
+ALTER TABLE agregados_meses DROP COLUMN IF EXISTS version;
+
+CREATE TABLE IF NOT EXISTS agregados_pendientes (
+    account_name TEXT NOT NULL,
+    fecha DATE NOT NULL,
+    marcado TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (account_name, fecha)
+);
+
+ALTER TABLE agregados_diarios ENABLE ROW LEVEL SECURITY;
+ALTER TABLE agregados_meses ENABLE ROW LEVEL SECURITY;
+ALTER TABLE agregados_pendientes ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS agregados_diarios_lectura ON agregados_diarios;
+CREATE POLICY agregados_diarios_lectura ON agregados_diarios FOR SELECT USING (true);
+DROP POLICY IF EXISTS agregados_meses_lectura ON agregados_meses;
+CREATE POLICY agregados_meses_lectura ON agregados_meses FOR SELECT USING (true);
+DROP POLICY IF EXISTS agregados_pendientes_lectura ON agregados_pendientes;
+CREATE POLICY agregados_pendientes_lectura ON agregados_pendientes FOR SELECT USING (true);
+
+-- Saca y devuelve los días pendientes de las cuentas en el rango. La app los
+-- toma ANTES de cargar las órdenes: lo que se escriba en medio vuelve a quedar marcado.
+CREATE OR REPLACE FUNCTION tomar_agregados_pendientes(cuentas TEXT[], desde DATE, hasta DATE)
+RETURNS TABLE (account_name TEXT, fecha DATE) AS $$
+    DELETE FROM agregados_pendientes AS p
+    WHERE p.account_name = ANY(cuentas) AND p.fecha BETWEEN desde AND hasta
+    RETURNING p.account_name, p.fecha;
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+-- Vuelve a marcar días tomados que la app no alcanzó a guardar
+CREATE OR REPLACE FUNCTION devolver_agregados_pendientes(dias JSONB) RETURNS VOID AS $$
+    INSERT INTO agregados_pendientes (account_name, fecha, marcado)
+    SELECT DISTINCT account_name, fecha, NOW()
+    FROM jsonb_to_recordset(dias) AS d(account_name TEXT, fecha DATE)
+    WHERE account_name IS NOT NULL AND fecha IS NOT NULL
+    ON CONFLICT (account_name, fecha) DO UPDATE SET marcado = EXCLUDED.marcado;
+$$ LANGUAGE sql SECURITY DEFINER SET search_path = public;
+
+-- Guarda lo recalculado en una sola transacción:
+--   borrar: [{account_name, desde, hasta}] rangos de días que se reemplazan
+--   dias:   filas de agregados_diarios (sin id) con las sumas nuevas
+--   meses:  [{account_name, mes, trm}] meses que quedan calculados
+CREATE OR REPLACE FUNCTION guardar_agregados(borrar JSONB, dias JSONB, meses JSONB) RETURNS VOID AS $$
+BEGIN
+    DELETE FROM agregados_diarios AS a
+    USING jsonb_to_recordset(borrar) AS b(account_name TEXT, desde DATE, hasta DATE)
+    WHERE a.account_name = b.account_name AND a.fecha BETWEEN b.desde AND b.hasta;
+
+    INSERT INTO agregados_diarios (account_name, fecha, registros, ordenes, aprobadas, reembolsadas,
+                                   amazon, meli_usd, utilidad_gss, bodegal, socio_cuenta, impuesto_facturacion)
+    SELECT account_name, fecha, registros, ordenes, aprobadas, reembolsadas,
+           amazon, meli_usd, utilidad_gss, bodegal, socio_cuenta, impuesto_facturacion
+    FROM jsonb_populate_recordset(NULL::agregados_diarios, dias)
+    ON CONFLICT (account_name, fecha) DO UPDATE SET
+        registros = EXCLUDED.registros, ordenes = EXCLUDED.ordenes,
+        aprobadas = EXCLUDED.aprobadas, reembolsadas = EXCLUDED.reembolsadas,
+        amazon = EXCLUDED.amazon, meli_usd = EXCLUDED.meli_usd,
+        utilidad_gss = EXCLUDED.utilidad_gss, bodegal = EXCLUDED.bodegal,
+        socio_cuenta = EXCLUDED.socio_cuenta, impuesto_facturacion = EXCLUDED.impuesto_facturacion;
+
+    INSERT INTO agregados_meses (account_name, mes, trm, actualizado)
+    SELECT account_name, mes, trm, NOW()
+    FROM jsonb_to_recordset(meses) AS m(account_name TEXT, mes DATE, trm TEXT)
+    ON CONFLICT (account_name, mes) DO UPDATE SET trm = EXCLUDED.trm, actualizado = EXCLUDED.actualizado;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION tomar_agregados_pendientes(TEXT[], DATE, DATE) FROM PUBLIC;
+REVOKE ALL ON FUNCTION devolver_agregados_pendientes(JSONB) FROM PUBLIC;
+REVOKE ALL ON FUNCTION guardar_agregados(JSONB, JSONB, JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION tomar_agregados_pendientes(TEXT[], DATE, DATE) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION devolver_agregados_pendientes(JSONB) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION guardar_agregados(JSONB, JSONB, JSONB) TO anon, authenticated, service_role;
+
+-- Marca los días de las filas que tocó la sentencia (una vez por sentencia).
+-- DO UPDATE y no DO NOTHING: el día marcado queda bloqueado hasta que la
+-- escritura confirma, así la app no lo desmarca antes de poder leerla.
+CREATE OR REPLACE FUNCTION marcar_agregados_pendientes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM agregados_diarios;
+        DELETE FROM agregados_meses;
+        DELETE FROM agregados_pendientes;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO agregados_pendientes (account_name, fecha, marcado)
+        SELECT DISTINCT account_name, fecha_reporte_de(account_name, logistics_date::text, cxp_date::text), NOW()
+        FROM filas_nuevas
+        WHERE account_name IS NOT NULL
+          AND fecha_reporte_de(account_name, logistics_date::text, cxp_date::text) IS NOT NULL
+        ON CONFLICT (account_name, fecha) DO UPDATE SET marcado = EXCLUDED.marcado;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO agregados_pendientes (account_name, fecha, marcado)
+        SELECT DISTINCT account_name, fecha_reporte_de(account_name, logistics_date::text, cxp_date::text), NOW()
+        FROM filas_viejas
+        WHERE account_name IS NOT NULL
+          AND fecha_reporte_de(account_name, logistics_date::text, cxp_date::text) IS NOT NULL
+        ON CONFLICT (account_name, fecha) DO UPDATE SET marcado = EXCLUDED.marcado;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS agregados_consolidated_orders_insert ON consolidated_orders;
+CREATE TRIGGER agregados_consolidated_orders_insert
+    AFTER INSERT ON consolidated_orders
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_agregados_pendientes();
+
+DROP TRIGGER IF EXISTS agregados_consolidated_orders_update ON consolidated_orders;
+CREATE TRIGGER agregados_consolidated_orders_update
+    AFTER UPDATE ON consolidated_orders
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_agregados_pendientes();
+
+DROP TRIGGER IF EXISTS agregados_consolidated_orders_delete ON consolidated_orders;
+CREATE TRIGGER agregados_consolidated_orders_delete
+    AFTER DELETE ON consolidated_orders
+    REFERENCING OLD TABLE AS filas_viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_agregados_pendientes();
+
+DROP TRIGGER IF EXISTS agregados_consolidated_orders_truncate ON consolidated_orders;
+CREATE TRIGGER agregados_consolidated_orders_truncate
+    AFTER TRUNCATE ON consolidated_orders
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_agregados_pendientes();
+
+-- Que PostgREST vea las funciones sin esperar a que recargue el esquema
+NOTIFY pgrst, 'reload schema';
+
+-- Verificar
+SELECT account_name, mes, actualizado FROM agregados_meses ORDER BY mes DESC, account_name;
+SELECT COUNT(*) AS dias_pendientes FROM agregados_pendientes;
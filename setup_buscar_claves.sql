@@ -0,0 +1,76 @@
+-- Búsqueda masiva por claves normalizadas (modulos/lotes_bd.py: buscar_claves)
+-- Buscar miles de IDs con .in_() obliga a lotes de 50-100: la lista viaja en la
+-- URL del GET y una URL larga se corta. buscar_por_claves() se llama con rpc():
+-- las claves van en el cuerpo del POST (miles por llamada) y el resultado es un
+-- solo arreglo JSON con las columnas pedidas, así que tampoco lo corta el límite
+-- de filas por respuesta de PostgREST.
+--
+--   columna:  'order_id_key', 'prealert_id_key' o 'asignacion_key'
+--   claves:   claves con la regla de clean_id_aggressive (modulos/consolidacion.py)
+--   columnas: columnas de consolidated_orders a devolver (la columna de clave va siempre)
+--   cuentas:  account_name a los que se limita la búsqueda (NULL = todas)
+--
+-- Requiere setup_claves_id.sql (columnas *_key, clave_id() y el trigger que las
+-- calcula). Un registro con la clave vacía (escrito antes del trigger y sin
+-- backfill) también se encuentra: se compara clave_id() de su ID, con los
+-- índices parciales de abajo (solo tienen esos registros, casi vacíos).
+
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_order_id_sin_clave
+    ON consolidated_orders (clave_id(order_id::text))
+    WHERE order_id_key IS NULL AND order_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_prealert_id_sin_clave
+    ON consolidated_orders (clave_id(prealert_id::text))
+    WHERE prealert_id_key IS NULL AND prealert_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_asignacion_sin_clave
+    ON consolidated_orders (clave_id(asignacion::text))
+    WHERE asignacion_key IS NULL AND asignacion IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION buscar_por_claves(
+    columna TEXT,
+    claves TEXT[],
+    columnas TEXT[] DEFAULT ARRAY['id'],
+    cuentas TEXT[] DEFAULT NULL
+) RETURNS JSONB AS $$
+DECLARE
+    columna_id TEXT := left(columna, -4);
+    lista TEXT;
+    desconocidas TEXT[];
+    resultado JSONB;
+BEGIN
+    IF columna NOT IN ('order_id_key', 'prealert_id_key', 'asignacion_key') THEN
+        RAISE EXCEPTION 'Columna de clave no permitida: %', columna;
+    END IF;
+
+    -- Solo columnas que existen en consolidated_orders
+    SELECT array_agg(pedida) INTO desconocidas
+    FROM unnest(columnas) AS pedida
+    WHERE pedida NOT IN (SELECT column_name FROM information_schema.columns
+                         WHERE table_schema = 'public' AND table_name = 'consolidated_orders');
+    IF desconocidas IS NOT NULL THEN
+        RAISE EXCEPTION 'Columnas desconocidas en consolidated_orders: %', desconocidas;
+    END IF;
+
+    SELECT string_agg(quote_ident(nombre), ', ') INTO lista
+    FROM (SELECT DISTINCT unnest(columnas || columna) AS nombre) nombres;
+
+    -- = ANY($1) usa el índice de la columna de clave (idx_consolidated_orders_*_key);
+    -- los registros con la clave vacía, el índice parcial *_sin_clave
+    EXECUTE format(
+        'SELECT COALESCE(jsonb_agg(to_jsonb(fila)), ''[]''::jsonb)
+         FROM (SELECT %s FROM consolidated_orders
+               WHERE (%I = ANY($1)
+                      OR (%I IS NULL AND %I IS NOT NULL AND clave_id(%I::text) = ANY($1)))
+                 AND ($2 IS NULL OR account_name = ANY($2))) fila',
+        lista, columna, columna, columna_id, columna_id)
+    INTO resultado
+    USING claves, cuentas;
+
+    RETURN resultado;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Que PostgREST vea la función sin esperar a que recargue el esquema
+NOTIFY pgrst, 'reload schema';
+
+-- Verificar: debe devolver un arreglo (vacío si la clave no existe)
+SELECT buscar_por_claves('order_id_key', ARRAY['0'], ARRAY['id', 'order_id']);
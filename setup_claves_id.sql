@@ -0,0 +1,67 @@
+-- Claves normalizadas de IDs en consolidated_orders
+-- order_id / prealert_id / asignacion se guardan en varias formas ('123, 123.0, 123).
+-- Las columnas *_key guardan una sola forma, con la regla de clean_id_aggressive
+-- (modulos/consolidacion.py): sin comillas, espacios, tabs, saltos de línea ni
+-- puntos, y sin el sufijo .0. Así cada búsqueda es un match exacto.
+--
+-- Las claves las calcula la base de datos (trigger BEFORE INSERT/UPDATE con
+-- clave_id(), la misma regla en SQL): ningún camino de escritura (Consolidador,
+-- escribir_por_id, Date Update, scripts, SQL Editor) las deja vacías o viejas.
+-- El script termina llenando las claves de los registros existentes; en una
+-- tabla muy grande, si el UPDATE de abajo excede el tiempo del SQL Editor,
+-- omitirlo y correr por lotes:
+--     python backfill_claves_id.py
+
+ALTER TABLE consolidated_orders ADD COLUMN IF NOT EXISTS order_id_key TEXT;
+ALTER TABLE consolidated_orders ADD COLUMN IF NOT EXISTS prealert_id_key TEXT;
+ALTER TABLE consolidated_orders ADD COLUMN IF NOT EXISTS asignacion_key TEXT;
+
+-- Índices para las búsquedas por clave
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_order_id_key ON consolidated_orders(order_id_key);
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_prealert_id_key ON consolidated_orders(prealert_id_key);
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_asignacion_key ON consolidated_orders(asignacion_key);
+
+-- clean_id_aggressive en SQL: debe coincidir con modulos/consolidacion.py
+CREATE OR REPLACE FUNCTION clave_id(valor TEXT) RETURNS TEXT AS $$
+    SELECT NULLIF(NULLIF(
+        CASE WHEN limpio LIKE '%0' AND length(limpio) > 1 AND strpos(valor, '.0') > 0
+             THEN left(limpio, -1)
+             ELSE limpio
+        END, ''), 'nan')
+    FROM (SELECT translate(btrim(valor, E' \t\n\r\f\v'), E'''" \t\n.', '') AS limpio) valores;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION calcular_claves_id() RETURNS trigger AS $$
+BEGIN
+    NEW.order_id_key := clave_id(NEW.order_id::text);
+    NEW.prealert_id_key := clave_id(NEW.prealert_id::text);
+    NEW.asignacion_key := clave_id(NEW.asignacion::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- También al escribir una clave directamente: siempre queda la calculada
+DROP TRIGGER IF EXISTS claves_id_consolidated_orders ON consolidated_orders;
+CREATE TRIGGER claves_id_consolidated_orders
+    BEFORE INSERT OR UPDATE OF order_id, prealert_id, asignacion, order_id_key, prealert_id_key, asignacion_key
+    ON consolidated_orders
+    FOR EACH ROW EXECUTE FUNCTION calcular_claves_id();
+
+-- Registros existentes: el trigger recalcula las claves de las filas que tocan
+UPDATE consolidated_orders
+SET order_id = order_id
+WHERE order_id_key IS DISTINCT FROM clave_id(order_id::text)
+   OR prealert_id_key IS DISTINCT FROM clave_id(prealert_id::text)
+   OR asignacion_key IS DISTINCT FROM clave_id(asignacion::text);
+
+-- Verificar: columnas creadas y registros con claves pendientes (debe ser 0)
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'consolidated_orders'
+  AND column_name IN ('order_id_key', 'prealert_id_key', 'asignacion_key');
+
+SELECT COUNT(*) AS claves_pendientes
+FROM consolidated_orders
+WHERE order_id_key IS DISTINCT FROM clave_id(order_id::text)
+   OR prealert_id_key IS DISTINCT FROM clave_id(prealert_id::text)
+   OR asignacion_key IS DISTINCT FROM clave_id(asignacion::text);
@@ -0,0 +1,55 @@
+-- Fecha de reporte tipada en consolidated_orders
+-- logistics_date y cxp_date se guardan como texto y los reportes filtraban con
+-- gte/lte sobre texto ('2025-08-31 10:00' quedaba fuera del 31). fecha_reporte
+-- es una columna DATE generada que la base de datos calcula al escribir cada fila:
+--   cuentas Chilexpress (2-MEGATIENDA SPA, 3-VEENDELO, 8-FABORCARGO) -> cxp_date
+--   las demás (Anicam)                                                -> logistics_date
+-- Acepta 'YYYY-MM-DD...' y 'M/D/YYYY...'; un texto que no es fecha válida da NULL.
+-- La misma regla está en Python: modulos/consultas.py (fecha_reporte, CUENTAS_FECHA_CXP).
+--
+-- Al agregar la columna PostgreSQL la calcula para todas las filas existentes
+-- (reescribe la tabla): ejecutar fuera del horario de carga.
+
+CREATE OR REPLACE FUNCTION fecha_texto_a_date(valor TEXT) RETURNS DATE AS $$
+DECLARE
+    partes TEXT[];
+BEGIN
+    partes := regexp_match(valor, '^\s*(\d{4})-(\d{2})-(\d{2})');
+    IF partes IS NOT NULL THEN
+        RETURN make_date(partes[1]::int, partes[2]::int, partes[3]::int);
+    END IF;
+    partes := regexp_match(valor, '^\s*(\d{1,2})/(\d{1,2})/(\d{4})');
+    IF partes IS NOT NULL THEN
+        RETURN make_date(partes[3]::int, partes[1]::int, partes[2]::int);
+    END IF;
+    RETURN NULL;
+EXCEPTION WHEN others THEN
+    -- Fecha imposible (mes 13, 30 de febrero...)
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION fecha_reporte_de(cuenta TEXT, logistics_date TEXT, cxp_date TEXT) RETURNS DATE AS $$
+    SELECT fecha_texto_a_date(
+        CASE WHEN cuenta IN ('2-MEGATIENDA SPA', '3-VEENDELO', '8-FABORCARGO') THEN cxp_date ELSE logistics_date END
+    );
+$$ LANGUAGE sql IMMUTABLE;
+
+ALTER TABLE consolidated_orders ADD COLUMN IF NOT EXISTS fecha_reporte DATE
+    GENERATED ALWAYS AS (fecha_reporte_de(account_name, logistics_date::text, cxp_date::text)) STORED;
+
+-- Filtro por cuenta y rango de fechas, ordenado por fecha e id (paginación de los reportes)
+CREATE INDEX IF NOT EXISTS idx_consolidated_orders_cuenta_fecha_reporte
+    ON consolidated_orders(account_name, fecha_reporte, id);
+
+ANALYZE consolidated_orders;
+
+-- Verificar: filas por familia de cuenta sin fecha de reporte
+SELECT account_name,
+       COUNT(*) AS registros,
+       COUNT(*) FILTER (WHERE fecha_reporte IS NULL) AS sin_fecha_reporte,
+       MIN(fecha_reporte) AS desde,
+       MAX(fecha_reporte) AS hasta
+FROM consolidated_orders
+GROUP BY account_name
+ORDER BY account_name;
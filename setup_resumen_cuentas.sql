@@ -0,0 +1,105 @@
+-- Resumen por cuenta para la página de inicio (modulos/resumen_cuentas.py)
+-- Una fila por account_name con su cantidad de registros y el date_created más
+-- reciente. La mantienen triggers por sentencia sobre consolidated_orders
+-- (sumando y restando lo que cada INSERT/UPDATE/DELETE tocó), así que leer el
+-- resumen son unas pocas filas aunque la tabla crezca.
+-- Los registros sin account_name quedan en la fila ''.
+-- ultima_fecha no baja al borrar registros: es la fecha más reciente cargada.
+-- La tabla tiene RLS: con la clave anon solo se puede leer. La escriben solo
+-- los triggers (SECURITY DEFINER: corren con los permisos de su dueño).
+--
+-- Se puede ejecutar más de una vez: al final recalcula el resumen desde
+-- consolidated_orders (bloquea las escrituras mientras lo hace).
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS resumen_cuentas (
+    account_name TEXT PRIMARY KEY,
+    registros BIGINT NOT NULL DEFAULT 0,
+    ultima_fecha TEXT,
+    actualizado TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE resumen_cuentas ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS resumen_cuentas_lectura ON resumen_cuentas;
+CREATE POLICY resumen_cuentas_lectura ON resumen_cuentas FOR SELECT USING (true);
+
+-- Suma la diferencia por cuenta de la sentencia (una sola vez por sentencia, no por fila)
+CREATE OR REPLACE FUNCTION actualizar_resumen_cuentas() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO resumen_cuentas (account_name, registros, ultima_fecha, actualizado)
+        SELECT COALESCE(account_name, ''), COUNT(*), MAX(date_created::text), NOW()
+        FROM filas_nuevas
+        GROUP BY 1
+        ON CONFLICT (account_name) DO UPDATE SET
+            registros = resumen_cuentas.registros + EXCLUDED.registros,
+            ultima_fecha = GREATEST(resumen_cuentas.ultima_fecha, EXCLUDED.ultima_fecha),
+            actualizado = EXCLUDED.actualizado;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO resumen_cuentas (account_name, registros, ultima_fecha, actualizado)
+        SELECT cuenta, SUM(cambio), MAX(fecha), NOW()
+        FROM (SELECT COALESCE(account_name, '') AS cuenta, 1 AS cambio, date_created::text AS fecha
+              FROM filas_nuevas
+              UNION ALL
+              SELECT COALESCE(account_name, ''), -1, NULL FROM filas_viejas) cambios
+        GROUP BY cuenta
+        HAVING SUM(cambio) <> 0 OR MAX(fecha) IS NOT NULL
+        ON CONFLICT (account_name) DO UPDATE SET
+            registros = resumen_cuentas.registros + EXCLUDED.registros,
+            ultima_fecha = GREATEST(resumen_cuentas.ultima_fecha, EXCLUDED.ultima_fecha),
+            actualizado = EXCLUDED.actualizado;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE resumen_cuentas
+        SET registros = resumen_cuentas.registros - borrados.cantidad, actualizado = NOW()
+        FROM (SELECT COALESCE(account_name, '') AS cuenta, COUNT(*) AS cantidad
+              FROM filas_viejas GROUP BY 1) borrados
+        WHERE resumen_cuentas.account_name = borrados.cuenta;
+    ELSE
+        DELETE FROM resumen_cuentas;
+    END IF;
+    DELETE FROM resumen_cuentas WHERE registros <= 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS resumen_consolidated_orders_insert ON consolidated_orders;
+CREATE TRIGGER resumen_consolidated_orders_insert
+    AFTER INSERT ON consolidated_orders
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_cuentas();
+
+DROP TRIGGER IF EXISTS resumen_consolidated_orders_update ON consolidated_orders;
+CREATE TRIGGER resumen_consolidated_orders_update
+    AFTER UPDATE ON consolidated_orders
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_cuentas();
+
+DROP TRIGGER IF EXISTS resumen_consolidated_orders_delete ON consolidated_orders;
+CREATE TRIGGER resumen_consolidated_orders_delete
+    AFTER DELETE ON consolidated_orders
+    REFERENCING OLD TABLE AS filas_viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_cuentas();
+
+DROP TRIGGER IF EXISTS resumen_consolidated_orders_truncate ON consolidated_orders;
+CREATE TRIGGER resumen_consolidated_orders_truncate
+    AFTER TRUNCATE ON consolidated_orders
+    FOR EACH STATEMENT EXECUTE FUNCTION actualizar_resumen_cuentas();
+
+-- Carga inicial (o recálculo) con las escrituras bloqueadas: ningún cambio
+-- queda contado dos veces ni fuera del resumen
+LOCK TABLE consolidated_orders IN SHARE ROW EXCLUSIVE MODE;
+
+DELETE FROM resumen_cuentas;
+
+INSERT INTO resumen_cuentas (account_name, registros, ultima_fecha)
+SELECT COALESCE(account_name, ''), COUNT(*), MAX(date_created::text)
+FROM consolidated_orders
+GROUP BY 1;
+
+COMMIT;
+
+-- Verificar: la suma debe ser el total de consolidated_orders
+SELECT (SELECT SUM(registros) FROM resumen_cuentas) AS resumen,
+       (SELECT COUNT(*) FROM consolidated_orders) AS tabla;
@@ -0,0 +1,98 @@
+-- Versiones de los datos para la caché de reportes (modulos/cache_reportes.py)
+-- Una fila por ámbito con un token que cambia en cada escritura:
+--   account_name  -> escrituras sobre registros de esa cuenta
+--   '*'           -> escrituras que no saben qué cuentas tocan (afecta a todas)
+--   'trm_actual'  -> cambios de TRM
+-- Los reportes guardan su resultado con los tokens de sus cuentas; si un token
+-- cambia, el reporte se vuelve a calcular. La app cambia los tokens después de
+-- cada escritura; los triggers de abajo cubren además los cambios hechos
+-- directamente en el SQL Editor.
+--
+-- La tabla tiene RLS: con la clave anon solo se puede leer. Los tokens se
+-- cambian con cambiar_versiones() (SECURITY DEFINER: corre con los permisos
+-- de su dueño), que usan tanto la app (rpc) como los triggers.
+
+CREATE TABLE IF NOT EXISTS versiones_datos (
+    ambito TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    actualizado TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE versiones_datos ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS versiones_datos_lectura ON versiones_datos;
+CREATE POLICY versiones_datos_lectura ON versiones_datos FOR SELECT USING (true);
+
+-- Único camino de escritura: un token nuevo por ámbito. Solo invalida cachés,
+-- no permite escribir otra cosa en la tabla.
+CREATE OR REPLACE FUNCTION cambiar_versiones(ambitos TEXT[]) RETURNS VOID AS $$
+BEGIN
+    IF cardinality(ambitos) > 1000 THEN
+        RAISE EXCEPTION 'Demasiados ámbitos: %', cardinality(ambitos);
+    END IF;
+    INSERT INTO versiones_datos (ambito, version, actualizado)
+    SELECT DISTINCT ambito, md5(random()::text || clock_timestamp()::text || ambito), NOW()
+    FROM unnest(ambitos) AS ambito
+    WHERE ambito IS NOT NULL AND ambito <> ''
+    ON CONFLICT (ambito) DO UPDATE SET version = EXCLUDED.version, actualizado = EXCLUDED.actualizado;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION cambiar_versiones(TEXT[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION cambiar_versiones(TEXT[]) TO anon, authenticated, service_role;
+
+-- Cuentas tocadas por la sentencia (una sola vez por sentencia, no por fila)
+CREATE OR REPLACE FUNCTION cambiar_version_cuentas() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM cambiar_versiones(ARRAY(
+            SELECT DISTINCT COALESCE(NULLIF(account_name, ''), '*') FROM filas_nuevas));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM cambiar_versiones(ARRAY(
+            SELECT COALESCE(NULLIF(account_name, ''), '*') FROM filas_nuevas
+            UNION
+            SELECT COALESCE(NULLIF(account_name, ''), '*') FROM filas_viejas));
+    ELSE
+        PERFORM cambiar_versiones(ARRAY(
+            SELECT DISTINCT COALESCE(NULLIF(account_name, ''), '*') FROM filas_viejas));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS versiones_consolidated_orders_insert ON consolidated_orders;
+CREATE TRIGGER versiones_consolidated_orders_insert
+    AFTER INSERT ON consolidated_orders
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION cambiar_version_cuentas();
+
+DROP TRIGGER IF EXISTS versiones_consolidated_orders_update ON consolidated_orders;
+CREATE TRIGGER versiones_consolidated_orders_update
+    AFTER UPDATE ON consolidated_orders
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION cambiar_version_cuentas();
+
+DROP TRIGGER IF EXISTS versiones_consolidated_orders_delete ON consolidated_orders;
+CREATE TRIGGER versiones_consolidated_orders_delete
+    AFTER DELETE ON consolidated_orders
+    REFERENCING OLD TABLE AS filas_viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION cambiar_version_cuentas();
+
+-- Cambios de TRM
+CREATE OR REPLACE FUNCTION cambiar_version_trm() RETURNS trigger AS $$
+BEGIN
+    PERFORM cambiar_versiones(ARRAY['trm_actual']);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS versiones_trm_actual ON trm_actual;
+CREATE TRIGGER versiones_trm_actual
+    AFTER INSERT OR UPDATE OR DELETE ON trm_actual
+    FOR EACH STATEMENT EXECUTE FUNCTION cambiar_version_trm();
+
+-- Que PostgREST vea la función sin esperar a que recargue el esquema
+NOTIFY pgrst, 'reload schema';
+
+-- Verificar
+SELECT ambito, version, actualizado FROM versiones_datos ORDER BY ambito;
@@ -50,10 +50,9 @@ st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 def check_database_connection():
     """Verifica la conexión a Supabase"""
     try:
-        from supabase import create_client
-        import config
-        
-        supabase = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
+        from modulos.cliente_bd import obtener_cliente
+
+        supabase = obtener_cliente()
         # Test de conexión con tabla que seguro existe
         result = supabase.table('users').select('id').limit(1).execute()
         return True, supabase
@@ -62,46 +61,12 @@ def check_database_connection():
 
 # Función para obtener estadísticas
 def get_database_stats():
-    """Obtiene estadísticas de la base de datos"""
+    """Obtiene estadísticas de la base de datos (resumen por cuenta en caché, modulos/resumen_cuentas.py)"""
     try:
-        from supabase import create_client
-        import config
-        
-        supabase = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
-        
-        # Verificar si existe tabla consolidated_orders
-        try:
-            total_result = supabase.table('consolidated_orders').select('*', count='exact', head=True).execute()
-            total_records = total_result.count if hasattr(total_result, 'count') else 0
-            
-            # Obtener cuentas únicas
-            accounts_result = supabase.table('consolidated_orders').select('account_name').execute()
-        except:
-            # Si no existe consolidated_orders, usar datos de usuarios
-            total_result = supabase.table('users').select('*', count='exact', head=True).execute()
-            total_records = total_result.count if hasattr(total_result, 'count') else 0
-            accounts_result = supabase.table('users').select('username').execute()
-        unique_accounts = 0
-        account_distribution = {}
-        
-        if accounts_result.data:
-            df = pd.DataFrame(accounts_result.data)
-            if 'account_name' in df.columns:
-                unique_accounts = df['account_name'].nunique()
-                account_distribution = df['account_name'].value_counts().to_dict()
-        
-        # Obtener fecha del registro más reciente
-        latest_result = supabase.table('consolidated_orders').select('date_created').order('date_created', desc=True).limit(1).execute()
-        latest_date = None
-        if latest_result.data and len(latest_result.data) > 0:
-            latest_date = latest_result.data[0].get('date_created', 'N/A')
-        
-        return {
-            'total_records': total_records,
-            'unique_accounts': unique_accounts,
-            'account_distribution': account_distribution,
-            'latest_date': latest_date
-        }
+        from modulos.cliente_bd import obtener_cliente
+        from modulos.resumen_cuentas import resumen_cuentas
+
+        return resumen_cuentas(obtener_cliente())
     except Exception as e:
         return None
 
@@ -153,6 +118,20 @@ with st.sidebar:
             st.metric("Cuentas Activas", stats['unique_accounts'])
             if stats['latest_date']:
                 st.caption(f"Última actualización: {stats['latest_date']}")
+
+        # Requests de todo el proceso (cliente compartido, modulos/cliente_bd.py)
+        with st.expander("📶 Requests a Supabase"):
+            from modulos.cliente_bd import estadisticas, reiniciar_estadisticas, tabla_estadisticas
+
+            resumen = estadisticas()
+            promedio = resumen['segundos'] / resumen['requests'] * 1000 if resumen['requests'] else 0
+            st.caption(f"{resumen['requests']:,} requests · {resumen['errores']:,} errores · "
+                       f"{promedio:,.0f} ms promedio · {resumen['bytes'] / 1024 / 1024:,.2f} MB · "
+                       f"{resumen['conexiones_abiertas']} conexiones abiertas")
+            st.dataframe(tabla_estadisticas(), use_container_width=True, hide_index=True)
+            if st.button("Reiniciar contadores", key="reiniciar_estadisticas_bd"):
+                reiniciar_estadisticas()
+                st.rerun()
     else:
         st.error("❌ Sin conexión a BD")
         with st.expander("Ver detalles del error"):
@@ -330,12 +309,11 @@ elif pagina == "👥 Usuarios":
             # Si no existe, mostrar versión básica
             st.title("📊 Módulo de Reportes de Utilidad")
             
-            import config
             from modulos.gestion_trm import obtener_trm_fecha
-            from supabase import create_client
+            from modulos.cliente_bd import obtener_cliente
             from datetime import date, timedelta
             
-            supabase = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
+            supabase = obtener_cliente()
             
             # Selector de tipo de reporte
             tipo_reporte = st.selectbox(
@@ -8,6 +8,7 @@ import streamlit as st
 from supabase import create_client
 import config
 from datetime import datetime
+from modulos.lotes_bd import buscar_por_ids, escribir_por_id, aviso_por_fila
 
 def main():
     st.set_page_config(page_title="Actualizar Logistics Date", layout="wide")
@@ -23,7 +24,7 @@ def main():
     st.info("""
     📋 **Instrucciones:**
     1. El archivo Excel debe tener 3 columnas: `order_id`, `prealert_id`, `logistics_date`
-    2. El script intentará hacer match primero por `prealert_id`, luego por `order_id`
+    2. El script intentará hacer match primero por `prealert_id`, luego por `order_id` (búsqueda por lotes)
     3. Solo actualizará registros que tengan match en la base de datos
     """)
     
@@ -141,99 +142,85 @@ def main():
                 
                 st.info(f"🔄 Procesando {total_filas} registros...")
                 
+                # Filas del archivo (IDs sin 'nan' ni vacíos)
+                filas = []
                 for idx, row in df_excel.iterrows():
-                    try:
-                        order_id = str(row['order_id']) if pd.notna(row['order_id']) else None
-                        prealert_id = str(row['prealert_id']) if pd.notna(row['prealert_id']) else None
-                        # Asegurar que logistics_date es string, no Timestamp
-                        logistics_date = str(row['logistics_date']) if pd.notna(row['logistics_date']) else None
-                        
-                        # Remover valores 'nan' o vacíos
-                        if order_id == 'nan' or order_id == '':
-                            order_id = None
-                        if prealert_id == 'nan' or prealert_id == '':
-                            prealert_id = None
-                        
-                        actualizado = False
-                        
-                        # Intentar actualizar por prealert_id primero
-                        if prealert_id and prealert_id != 'nan':
-                            if modo_test:
-                                # En modo test, solo verificar si existe
-                                result = supabase.table('consolidated_orders').select('id').eq('prealert_id', prealert_id).limit(1).execute()
-                                if result.data:
-                                    actualizados_por_prealert += 1
-                                    actualizado = True
-                            else:
-                                # Actualizar en base de datos
-                                result = supabase.table('consolidated_orders').update({
-                                    'logistics_date': logistics_date
-                                }).eq('prealert_id', prealert_id).execute()
-                                
-                                if result.data:
-                                    actualizados_por_prealert += 1
-                                    actualizado = True
-                        
-                        # Si no se actualizó por prealert_id, intentar por order_id
-                        if not actualizado and order_id and order_id != 'nan':
-                            if modo_test:
-                                # En modo test, solo verificar si existe
-                                result = supabase.table('consolidated_orders').select('id').eq('order_id', order_id).limit(1).execute()
-                                if result.data:
-                                    actualizados_por_order += 1
-                                    actualizado = True
-                            else:
-                                # Actualizar en base de datos
-                                result = supabase.table('consolidated_orders').update({
-                                    'logistics_date': logistics_date
-                                }).eq('order_id', order_id).execute()
-                                
-                                if result.data:
-                                    actualizados_por_order += 1
-                                    actualizado = True
-                        
-                        # Si no se encontró registro
-                        if not actualizado:
-                            no_encontrados.append({
-                                'order_id': order_id,
-                                'prealert_id': prealert_id,
-                                'logistics_date': logistics_date
-                            })
-                            log_detalle.append({
-                                'fila': idx + 1,
-                                'order_id': order_id,
-                                'prealert_id': prealert_id,
-                                'resultado': '❌ No encontrado',
-                                'metodo': 'N/A'
-                            })
-                        else:
-                            metodo = 'Prealert ID' if actualizados_por_prealert > actualizados_por_order else 'Order ID'
-                            log_detalle.append({
-                                'fila': idx + 1,
-                                'order_id': order_id,
-                                'prealert_id': prealert_id,
-                                'resultado': '✅ Actualizado' if not modo_test else '✅ Encontrado (TEST)',
-                                'metodo': metodo
-                            })
-                        
-                        # Actualizar progreso
-                        progress = (idx + 1) / total_filas
-                        progress_bar.progress(progress)
-                        status_text.text(f"Procesando: {idx + 1}/{total_filas} | Prealert: {actualizados_por_prealert} | Order: {actualizados_por_order}")
-                        
-                    except Exception as e:
-                        errores.append({
-                            'order_id': order_id,
-                            'prealert_id': prealert_id,
-                            'error': str(e)
-                        })
-                        log_detalle.append({
-                            'fila': idx + 1,
+                    order_id = str(row['order_id']) if pd.notna(row['order_id']) else None
+                    prealert_id = str(row['prealert_id']) if pd.notna(row['prealert_id']) else None
+                    # Asegurar que logistics_date es string, no Timestamp
+                    logistics_date = str(row['logistics_date']) if pd.notna(row['logistics_date']) else None
+                    
+                    # Remover valores 'nan' o vacíos
+                    if order_id == 'nan' or order_id == '':
+                        order_id = None
+                    if prealert_id == 'nan' or prealert_id == '':
+                        prealert_id = None
+                    filas.append((idx, order_id, prealert_id, logistics_date))
+                
+                # Búsqueda por lotes: primero por prealert_id, luego por order_id
+                # para las filas que no se encontraron (claves normalizadas, ver lotes_bd)
+                status_text.text("Buscando registros por prealert_id...")
+                errores_busqueda = []
+                por_prealert = buscar_por_ids(
+                    supabase, 'prealert_id', [prealert_id for _, _, prealert_id, _ in filas if prealert_id],
+                    columnas='id', errores=errores_busqueda
+                )
+                progress_bar.progress(0.25)
+                status_text.text("Buscando registros por order_id...")
+                por_order = buscar_por_ids(
+                    supabase, 'order_id',
+                    [order_id for _, order_id, prealert_id, _ in filas if order_id and prealert_id not in por_prealert],
+                    columnas='id', errores=errores_busqueda
+                )
+                progress_bar.progress(0.5)
+                for error in errores_busqueda:
+                    errores.append({'order_id': None, 'prealert_id': None, 'error': error})
+                
+                actualizaciones = []
+                for idx, order_id, prealert_id, logistics_date in filas:
+                    if prealert_id in por_prealert:
+                        registros, metodo = por_prealert[prealert_id], 'Prealert ID'
+                        actualizados_por_prealert += 1
+                    elif order_id in por_order:
+                        registros, metodo = por_order[order_id], 'Order ID'
+                        actualizados_por_order += 1
+                    else:
+                        registros, metodo = None, 'N/A'
+                    
+                    if registros:
+                        actualizaciones.extend({'id': registro['id'], 'logistics_date': logistics_date}
+                                               for registro in registros)
+                    else:
+                        no_encontrados.append({
                             'order_id': order_id,
                             'prealert_id': prealert_id,
-                            'resultado': f'❌ Error: {str(e)}',
-                            'metodo': 'N/A'
+                            'logistics_date': logistics_date
                         })
+                    log_detalle.append({
+                        'fila': idx + 1,
+                        'order_id': order_id,
+                        'prealert_id': prealert_id,
+                        'resultado': ('✅ Actualizado' if not modo_test else '✅ Encontrado (TEST)') if registros
+                                     else '❌ No encontrado',
+                        'metodo': metodo
+                    })
+                
+                # Escritura por lotes (upsert por id en paralelo; invalida la caché de reportes)
+                if not modo_test and actualizaciones:
+                    def avance(resultado, procesados, total):
+                        progress_bar.progress(0.5 + 0.5 * procesados / total)
+                        status_text.text(f"Actualizando: {procesados}/{total} registros")
+                    
+                    resultados = escribir_por_id(supabase, actualizaciones, tamano_lote=int(batch_size),
+                                                 al_terminar_lote=avance)
+                    for resultado in resultados:
+                        if resultado['error']:
+                            errores.append({'order_id': None, 'prealert_id': None,
+                                            'error': f"Lote {resultado['lote']}: {resultado['error']}"})
+                    if aviso_por_fila(resultados):
+                        st.warning(aviso_por_fila(resultados))
+                progress_bar.progress(1.0)
+                status_text.text(f"Procesados: {total_filas} | Prealert: {actualizados_por_prealert} | Order: {actualizados_por_order}")
                 
                 # Mostrar resultados
                 st.markdown("---")
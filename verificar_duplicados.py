@@ -7,6 +7,7 @@ import streamlit as st
 import pandas as pd
 from supabase import create_client
 import config
+from modulos.lotes_bd import buscar_por_ids
 from datetime import datetime
 import io
 import numpy as np
@@ -134,31 +135,17 @@ def main():
                             ids_limpios = df_original[col].apply(clean_id).dropna()
                             ids_archivo.update(ids_limpios)
                         
-                        # Consultar base de datos con campos logistics
+                        # Consultar base de datos con campos logistics (por order_id y por
+                        # prealert_id; si un ID está en ambos, gana prealert_id)
+                        columnas_logistics = 'order_id, prealert_id, logistics_total, logistics_reference, logistics_guide_number'
+                        errores_busqueda = []
                         registros_bd = {}
-                        
-                        # Buscar por order_id con campos logistics
-                        for batch_ids in [list(ids_archivo)[i:i+50] for i in range(0, len(ids_archivo), 50)]:
-                            try:
-                                result = supabase.table('consolidated_orders').select(
-                                    'order_id, prealert_id, logistics_total, logistics_reference, logistics_guide_number'
-                                ).in_('order_id', batch_ids).execute()
-                                for record in result.data:
-                                    registros_bd[record['order_id']] = record
-                            except Exception as e:
-                                st.warning(f"Error consultando por order_id: {str(e)}")
-                        
-                        # Buscar por prealert_id con campos logistics
-                        for batch_ids in [list(ids_archivo)[i:i+50] for i in range(0, len(ids_archivo), 50)]:
-                            try:
-                                result = supabase.table('consolidated_orders').select(
-                                    'order_id, prealert_id, logistics_total, logistics_reference, logistics_guide_number'
-                                ).in_('prealert_id', batch_ids).execute()
-                                for record in result.data:
-                                    if record['prealert_id']:
-                                        registros_bd[record['prealert_id']] = record
-                            except Exception as e:
-                                st.warning(f"Error consultando por prealert_id: {str(e)}")
+                        for columna_bd in ['order_id', 'prealert_id']:
+                            encontrados = buscar_por_ids(supabase, columna_bd, ids_archivo,
+                                                         columnas=columnas_logistics, errores=errores_busqueda)
+                            registros_bd.update({id_limpio: registros[0] for id_limpio, registros in encontrados.items()})
+                        for error in errores_busqueda[:5]:
+                            st.warning(f"Error consultando registros: {error}")
                         
                         # Clasificar registros
                         for idx, row in df_original.iterrows():
@@ -201,19 +188,20 @@ def main():
                         
                         # Consultar base de datos con campos aditionals
                         registros_bd = {}
-                        for batch_ids in [list(ids_archivo)[i:i+50] for i in range(0, len(ids_archivo), 50)]:
-                            try:
-                                result = supabase.table('consolidated_orders').select(
-                                    'prealert_id, aditionals_total, aditionals_quantity, aditionals_item'
-                                ).in_('prealert_id', batch_ids).execute()
-                                for record in result.data:
-                                    if record['prealert_id']:
-                                        # Normalizar el ID de la BD también
-                                        id_normalizado = normalize_id_for_comparison(record['prealert_id'])
-                                        if id_normalizado:
-                                            registros_bd[id_normalizado] = record
-                            except Exception as e:
-                                st.warning(f"Error consultando aditionals: {str(e)}")
+                        errores_busqueda = []
+                        encontrados = buscar_por_ids(
+                            supabase, 'prealert_id', ids_archivo,
+                            columnas='prealert_id, aditionals_total, aditionals_quantity, aditionals_item',
+                            errores=errores_busqueda
+                        )
+                        for registros in encontrados.values():
+                            for record in registros:
+                                # Normalizar el ID de la BD también
+                                id_normalizado = normalize_id_for_comparison(record['prealert_id'])
+                                if id_normalizado:
+                                    registros_bd[id_normalizado] = record
+                        for error in errores_busqueda[:5]:
+                            st.warning(f"Error consultando aditionals: {error}")
                         
                         st.caption(f"🔍 Debug: Se encontraron {len(registros_bd)} registros en BD")
                         
@@ -259,17 +247,14 @@ def main():
                         ids_archivo = set(df_original[ref_column].apply(clean_id).dropna())
                         
                         # Consultar base de datos con campos CXP
-                        registros_bd = {}
-                        for batch_ids in [list(ids_archivo)[i:i+50] for i in range(0, len(ids_archivo), 50)]:
-                            try:
-                                result = supabase.table('consolidated_orders').select(
-                                    'asignacion, cxp_amt_due, cxp_arancel, cxp_iva'
-                                ).in_('asignacion', batch_ids).execute()
-                                for record in result.data:
-                                    if record['asignacion']:
-                                        registros_bd[record['asignacion']] = record
-                            except Exception as e:
-                                st.warning(f"Error consultando CXP: {str(e)}")
+                        errores_busqueda = []
+                        encontrados = buscar_por_ids(
+                            supabase, 'asignacion', ids_archivo,
+                            columnas='asignacion, cxp_amt_due, cxp_arancel, cxp_iva', errores=errores_busqueda
+                        )
+                        registros_bd = {id_limpio: registros[0] for id_limpio, registros in encontrados.items()}
+                        for error in errores_busqueda[:5]:
+                            st.warning(f"Error consultando CXP: {error}")
                         
                         # Clasificar registros
                         for idx, row in df_original.iterrows():